@@ -7,8 +7,16 @@ from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 import logging
-from .routes import router
-from .logging_config import setup_logging
+from contextlib import asynccontextmanager
+from .routes import router, service, offloader, coalescer, portfolio, sessions
+from .logging_config import setup_logging, get_sampling_stats
+from .metrics import register_collector
+from .tracing import TracingMiddleware
+from .profiling import ProfilerController, ProfilingMiddleware
+from .memory import MemoryTracker
+from .admission import AdmissionController, AdmissionMiddleware
+from .rules import RulesMiddleware, publisher as rules_publisher, watch_interval_from_env
+from .admin import admin_router, get_admin_token
 from .schemas import ErrorResponse
 
 def create_app() -> FastAPI:
@@ -16,6 +24,33 @@ def create_app() -> FastAPI:
     
     # Configurar logging
     setup_logging()
+    register_collector('logging', get_sampling_stats)
+    register_collector('offload', offloader.stats)
+    register_collector('coalescing', coalescer.stats)
+    register_collector('websocket', sessions.stats)
+    if service.cache is not None:
+        register_collector('cache', service.cache.stats)
+    
+    # Reglas: se validan al arrancar (un fichero inválido impide arrancar)
+    rules_publisher.current
+    register_collector('rules', rules_publisher.stats)
+    rules_publisher.subscribe(offloader.recycle)
+    
+    # Cartera almacenada: se recalcula (solo lo afectado) al cambiar las reglas
+    if portfolio is not None:
+        register_collector('portfolio', portfolio.stats)
+        rules_publisher.subscribe(portfolio.sync_rules)
+    
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        interval = watch_interval_from_env()
+        if interval > 0:
+            rules_publisher.watch(interval)
+        if portfolio is not None:
+            portfolio.sync_rules()
+        yield
+        rules_publisher.stop_watching()
+        offloader.shutdown()
     
     app = FastAPI(
         title="Complemento de Paternidad API",
@@ -23,23 +58,44 @@ def create_app() -> FastAPI:
         version="1.0.0",
         docs_url="/docs",
         redoc_url="/redoc",
-        openapi_url="/openapi.json"
+        openapi_url="/openapi.json",
+        lifespan=lifespan
     )
     
-    # Configurar CORS
+    # Reglas fijadas por petición (cabecera X-Rules-Version)
+    app.add_middleware(RulesMiddleware, publisher=rules_publisher)
+    
+    # Perfilado bajo demanda (/debug/profile o cabecera X-Profile con el token de administración)
+    app.state.profiler = ProfilerController.from_env()
+    app.add_middleware(ProfilingMiddleware, controller=app.state.profiler, header_token=get_admin_token())
+    
+    # Contabilidad de memoria con tracemalloc (/debug/memory)
+    app.state.memory = MemoryTracker()
+    
+    # Trazas por petición (cabecera Server-Timing)
+    app.add_middleware(TracingMiddleware, exporter=TracingMiddleware.exporter_from_env())
+    
+    # Control de admisión: descarta la sobrecarga antes de hacer nada más
+    app.state.admission = AdmissionController.from_env()
+    register_collector('admission', app.state.admission.stats)
+    app.add_middleware(AdmissionMiddleware, controller=app.state.admission)
+    
+    # Configurar CORS: el más externo (el último añadido), para que también
+    # las respuestas 503/429 de la admisión lleven sus cabeceras
     app.add_middleware(
         CORSMiddleware,
         allow_origins=["*"],
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["Server-Timing", "Retry-After", "X-Rules-Version"],
     )
     
     # Registrar manejadores de excepciones
     @app.exception_handler(ValueError)
     async def value_error_handler(request: Request, exc: ValueError):
         """Manejador de errores de validación."""
-        logging.error(f"Error de validación: {str(exc)}")
+        logging.error("Error de validación: %s", exc)
         return JSONResponse(
             status_code=400,
             content=ErrorResponse(
@@ -51,7 +107,7 @@ def create_app() -> FastAPI:
     @app.exception_handler(Exception)
     async def general_exception_handler(request: Request, exc: Exception):
         """Manejador general de errores."""
-        logging.error(f"Error interno: {str(exc)}", exc_info=True)
+        logging.error("Error interno: %s", exc, exc_info=True)
         return JSONResponse(
             status_code=500,
             content=ErrorResponse(
@@ -62,6 +118,7 @@ def create_app() -> FastAPI:
     
     # Registrar rutas
     app.include_router(router)
+    app.include_router(admin_router)
     
     return app
 
@@ -0,0 +1,282 @@
+"""
+Endpoints de administración y diagnóstico (solo administradores).
+
+Requieren la cabecera ``X-Admin-Token`` con el valor de la variable de
+entorno ``ADMIN_TOKEN``. Si la variable no está definida, la administración
+queda deshabilitada.
+"""
+
+import asyncio
+import hmac
+import os
+import tempfile
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse, Response
+from typing import Optional
+
+from .schemas import (
+    ProfileRequest, ProfileReport, ProfileStatusResponse,
+    MemoryStartRequest, MemorySnapshotRequest, MemorySnapshotInfo, MemoryStatusResponse, MemoryStatsResponse,
+    RulesStatusResponse
+)
+from .rules import RulesError, publisher as rules_publisher
+from .logging_config import get_logger
+
+logger = get_logger('admin')
+
+
+def get_admin_token() -> Optional[str]:
+    """Token de administración configurado (None si la administración está deshabilitada)."""
+    return os.getenv('ADMIN_TOKEN') or None
+
+
+async def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """
+    Dependencia que exige el token de administración.
+    
+    Raises:
+        HTTPException: 403 si la administración está deshabilitada o el token no coincide
+    """
+    expected = get_admin_token()
+    if expected is None:
+        raise HTTPException(status_code=403, detail="Administración deshabilitada (ADMIN_TOKEN no configurado)")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token, expected):
+        logger.warning("Acceso de administración rechazado")
+        raise HTTPException(status_code=403, detail="Token de administración inválido")
+
+
+admin_router = APIRouter(dependencies=[Depends(require_admin)], include_in_schema=False)
+
+
+def _profile_status(request: Request) -> ProfileStatusResponse:
+    profiler = request.app.state.profiler
+    return ProfileStatusResponse(
+        active=profiler.active,
+        pid=os.getpid(),
+        last=profiler.last.summary() if profiler.last else None
+    )
+
+
+@admin_router.post("/debug/profile", response_model=ProfileStatusResponse, status_code=202)
+async def start_profile(body: ProfileRequest, request: Request):
+    """
+    Activar el perfilador de este worker para las próximas N peticiones o S segundos.
+    
+    Args:
+        body: requests o seconds (uno de los dos)
+        
+    Returns:
+        Estado del perfilador
+    """
+    if (body.requests is None) == (body.seconds is None):
+        raise HTTPException(status_code=400, detail="Indique requests o seconds (uno de los dos)")
+    
+    try:
+        request.app.state.profiler.start(requests=body.requests, seconds=body.seconds)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    return _profile_status(request)
+
+
+@admin_router.delete("/debug/profile", response_model=ProfileStatusResponse)
+async def stop_profile(request: Request):
+    """
+    Detener la sesión de perfilado en curso.
+    
+    Returns:
+        Estado del perfilador con la sesión recién terminada
+    """
+    request.app.state.profiler.stop()
+    return _profile_status(request)
+
+
+@admin_router.get("/debug/profile")
+async def get_profile(request: Request, format: str = "json"):
+    """
+    Obtener el resultado de la última sesión de perfilado de este worker.
+    
+    Args:
+        format: json (estadísticas y pilas), collapsed (texto para flame graphs)
+            o prof (binario de pstats, para snakeviz o pstats)
+    
+    Returns:
+        Informe de la sesión en el formato pedido
+    """
+    result = request.app.state.profiler.last
+    if result is None:
+        raise HTTPException(status_code=404, detail="No hay ninguna sesión de perfilado terminada")
+    
+    if format == "collapsed":
+        return PlainTextResponse(result.collapsed())
+    
+    if format == "prof":
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "profile.prof")
+            result.dump(path)
+            with open(path, 'rb') as handle:
+                content = handle.read()
+        return Response(
+            content=content,
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": f'attachment; filename="profile-{result.id}.prof"'}
+        )
+    
+    if format != "json":
+        raise HTTPException(status_code=400, detail="format debe ser json, collapsed o prof")
+    
+    return ProfileReport(**result.summary(), stats=result.stats_text(), collapsed=result.collapsed())
+
+
+
+def _memory_status(request: Request) -> MemoryStatusResponse:
+    memory = request.app.state.memory
+    return MemoryStatusResponse(active=memory.active, pid=os.getpid(), snapshots=memory.list_snapshots())
+
+
+@admin_router.get("/debug/memory", response_model=MemoryStatusResponse)
+async def memory_status(request: Request):
+    """
+    Estado de tracemalloc y de las instantáneas de este worker.
+    
+    Returns:
+        Estado y lista de instantáneas
+    """
+    return _memory_status(request)
+
+
+@admin_router.post("/debug/memory/start", response_model=MemoryStatusResponse)
+async def start_memory_tracing(body: MemoryStartRequest, request: Request):
+    """
+    Activar tracemalloc en este worker.
+    
+    Args:
+        body: Profundidad de pila a guardar por asignación
+        
+    Returns:
+        Estado de tracemalloc
+    """
+    try:
+        request.app.state.memory.start(frames=body.frames)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    return _memory_status(request)
+
+
+@admin_router.post("/debug/memory/stop", response_model=MemoryStatusResponse)
+async def stop_memory_tracing(request: Request):
+    """
+    Desactivar tracemalloc y descartar las instantáneas.
+    
+    Returns:
+        Estado de tracemalloc
+    """
+    request.app.state.memory.stop()
+    return _memory_status(request)
+
+
+@admin_router.post("/debug/memory/snapshots", response_model=MemorySnapshotInfo, status_code=201)
+async def take_memory_snapshot(body: MemorySnapshotRequest, request: Request):
+    """
+    Tomar una instantánea con nombre de la memoria asignada desde app/.
+    
+    Args:
+        body: Nombre de la instantánea
+        
+    Returns:
+        Metadatos de la instantánea
+    """
+    try:
+        return request.app.state.memory.take_snapshot(body.name)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@admin_router.get("/debug/memory/snapshots/{name}", response_model=MemoryStatsResponse)
+async def memory_snapshot_top(
+    name: str,
+    request: Request,
+    limit: int = Query(20, ge=1, le=500),
+    group_by: str = "lineno"
+):
+    """
+    Puntos de asignación de app/ con más memoria viva en una instantánea.
+    
+    Args:
+        name: Nombre de la instantánea
+        limit: Número máximo de entradas
+        group_by: lineno (fichero y línea) o filename
+        
+    Returns:
+        Entradas ordenadas por tamaño
+    """
+    try:
+        stats = request.app.state.memory.top(name, limit=limit, group_by=group_by)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=e.args[0])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return MemoryStatsResponse(snapshot=name, group_by=group_by, stats=stats)
+
+
+@admin_router.get("/debug/memory/diff", response_model=MemoryStatsResponse)
+async def memory_snapshot_diff(
+    base: str,
+    target: str,
+    request: Request,
+    limit: int = Query(20, ge=1, le=500),
+    group_by: str = "lineno"
+):
+    """
+    Diferencia entre dos instantáneas (target - base), por punto de asignación de app/.
+    
+    Args:
+        base: Instantánea de referencia
+        target: Instantánea posterior
+        limit: Número máximo de entradas
+        group_by: lineno (fichero y línea) o filename
+        
+    Returns:
+        Entradas ordenadas por el crecimiento en bytes
+    """
+    try:
+        stats = request.app.state.memory.diff(base, target, limit=limit, group_by=group_by)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=e.args[0])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return MemoryStatsResponse(snapshot=target, base=base, group_by=group_by, stats=stats)
+
+
+@admin_router.get("/debug/rules", response_model=RulesStatusResponse)
+async def rules_status():
+    """
+    Versión y estado de las reglas publicadas en este worker.
+    
+    Returns:
+        Estado de las reglas
+    """
+    return RulesStatusResponse(pid=os.getpid(), **rules_publisher.stats())
+
+
+@admin_router.post("/debug/rules/reload", response_model=RulesStatusResponse)
+async def reload_rules():
+    """
+    Recargar el fichero de reglas en este worker sin reiniciarlo.
+    
+    La lectura y compilación se hacen en un hilo, fuera del bucle de
+    eventos; las peticiones en curso terminan con las reglas anteriores.
+    
+    Returns:
+        Estado de las reglas con la versión sustituida
+    """
+    previous = rules_publisher.current.version
+    try:
+        await asyncio.to_thread(rules_publisher.reload)
+    except RulesError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    
+    return RulesStatusResponse(pid=os.getpid(), previous_version=previous, **rules_publisher.stats())
@@ -0,0 +1,314 @@
+"""
+Control de admisión y descarte de carga.
+
+Ante una ráfaga, admitir todas las peticiones hace crecer la cola del bucle
+de eventos hasta que la latencia se dispara para todos. Este middleware
+limita las peticiones en curso (globalmente y por ruta), deja esperar a
+unas pocas en una cola acotada con tiempo máximo y rechaza el resto en el
+acto con 503 y ``Retry-After``, de modo que las admitidas mantienen una
+latencia acotada.
+
+Opcionalmente aplica un cubo de fichas (token bucket) por cliente,
+identificado por una cabecera, y responde 429 cuando un cliente supera su
+cuota.
+"""
+
+import asyncio
+import json
+import logging
+import math
+from collections import OrderedDict, deque
+from time import monotonic
+from typing import Dict, Optional
+
+from .config import env_float, env_int, env_str, parse_mapping
+
+logger = logging.getLogger('app.admission')
+
+# Rutas que nunca se limitan (sondas y diagnóstico)
+EXEMPT_PREFIXES = ('/health', '/metrics', '/debug/')
+
+
+class ConcurrencyLimit:
+    """
+    Límite de peticiones en curso con cola de espera acotada (FIFO).
+
+    Al liberar un hueco se cede directamente al primero de la cola, de modo
+    que una petición nueva no adelanta a las que ya esperan.
+    """
+
+    def __init__(self, limit: int, max_queue: int, queue_timeout: float):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.waiters = deque()
+        self.admitted = 0
+        self.queued = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+
+    async def acquire(self) -> bool:
+        """
+        Obtener un hueco, esperando en la cola si hace falta.
+
+        Returns:
+            True si se admite la petición, False si se debe descartar
+        """
+        if self.in_flight < self.limit and not self.waiters:
+            self.in_flight += 1
+            self.admitted += 1
+            return True
+
+        if len(self.waiters) >= self.max_queue:
+            self.rejected_queue_full += 1
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        self.queued += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if waiter.done():
+                # El hueco llegó justo al vencer el plazo: se acepta
+                self.admitted += 1
+                return True
+            waiter.cancel()
+            self.waiters.remove(waiter)
+            self.rejected_timeout += 1
+            return False
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            else:
+                waiter.cancel()
+                self.waiters.remove(waiter)
+            raise
+
+        self.admitted += 1
+        return True
+
+    def release(self) -> None:
+        """Liberar un hueco, cediéndolo al primero de la cola si lo hay."""
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def stats(self) -> dict:
+        return {
+            'limit': self.limit,
+            'in_flight': self.in_flight,
+            'queue_length': len(self.waiters),
+            'max_queue': self.max_queue,
+            'admitted': self.admitted,
+            'queued': self.queued,
+            'rejected_queue_full': self.rejected_queue_full,
+            'rejected_timeout': self.rejected_timeout
+        }
+
+
+class TokenBucket:
+    """Cubo de fichas: ``rate`` fichas por segundo y capacidad ``burst``."""
+
+    __slots__ = ('rate', 'burst', 'tokens', 'updated')
+
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, now: float) -> float:
+        """
+        Consumir una ficha.
+
+        Returns:
+            0 si se pudo consumir; si no, segundos hasta que haya una ficha
+        """
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class ClientRateLimiter:
+    """Cubos de fichas por cliente, con un número máximo de clientes recordados (LRU)."""
+
+    def __init__(self, rate: float, burst: float, max_clients: int = 10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self.buckets = OrderedDict()
+        self.limited = 0
+
+    def check(self, client: str) -> float:
+        """
+        Contabilizar una petición del cliente.
+
+        Returns:
+            0 si se admite; si no, segundos que debe esperar el cliente
+        """
+        now = monotonic()
+        bucket = self.buckets.get(client)
+        if bucket is None:
+            bucket = self.buckets[client] = TokenBucket(self.rate, self.burst, now)
+            if len(self.buckets) > self.max_clients:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(client)
+
+        wait = bucket.take(now)
+        if wait:
+            self.limited += 1
+        return wait
+
+    def stats(self) -> dict:
+        return {
+            'rate': self.rate,
+            'burst': self.burst,
+            'clients': len(self.buckets),
+            'rate_limited': self.limited
+        }
+
+
+class AdmissionController:
+    """Configuración y estado del control de admisión."""
+
+    def __init__(
+        self,
+        max_in_flight: int = 0,
+        max_queue: int = 0,
+        queue_timeout: float = 0.5,
+        route_limits: Optional[Dict[str, int]] = None,
+        retry_after: int = 1,
+        client_header: Optional[str] = None,
+        client_rate: float = 0.0,
+        client_burst: float = 0.0
+    ):
+        self.retry_after = retry_after
+        self.global_limit = (
+            ConcurrencyLimit(max_in_flight, max_queue, queue_timeout) if max_in_flight > 0 else None
+        )
+        self.route_limits = {
+            path: ConcurrencyLimit(limit, max_queue, queue_timeout)
+            for path, limit in (route_limits or {}).items() if limit > 0
+        }
+        self.client_header = client_header.lower().encode('latin-1') if client_header else None
+        # Cada petición consume una ficha entera: un cubo de menos de una no
+        # admitiría nunca a nadie
+        if client_burst and client_burst < 1:
+            raise ValueError(f"RATE_LIMIT_BURST debe ser al menos 1 (es {client_burst})")
+        self.clients = (
+            ClientRateLimiter(client_rate, client_burst or max(1.0, client_rate))
+            if self.client_header and client_rate > 0 else None
+        )
+
+    @classmethod
+    def from_env(cls) -> "AdmissionController":
+        """
+        Crear el controlador a partir de las variables de entorno.
+
+        ADMISSION_MAX_IN_FLIGHT (0 = sin límite global), ADMISSION_MAX_QUEUE,
+        ADMISSION_QUEUE_TIMEOUT (segundos), ADMISSION_ROUTE_LIMITS
+        ("/sweep=2,/batch/calculate=4"), ADMISSION_RETRY_AFTER (segundos),
+        RATE_LIMIT_HEADER, RATE_LIMIT_RATE (peticiones/s) y RATE_LIMIT_BURST.
+        """
+        return cls(
+            max_in_flight=env_int('ADMISSION_MAX_IN_FLIGHT', 0),
+            max_queue=env_int('ADMISSION_MAX_QUEUE', 0),
+            queue_timeout=env_float('ADMISSION_QUEUE_TIMEOUT', 0.5),
+            route_limits=parse_mapping(env_str('ADMISSION_ROUTE_LIMITS', ''), int),
+            retry_after=env_int('ADMISSION_RETRY_AFTER', 1),
+            client_header=env_str('RATE_LIMIT_HEADER'),
+            client_rate=env_float('RATE_LIMIT_RATE', 0.0),
+            client_burst=env_float('RATE_LIMIT_BURST', 0.0)
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.global_limit is not None or bool(self.route_limits) or self.clients is not None
+
+    def stats(self) -> dict:
+        """Estado de los límites para /metrics."""
+        return {
+            'global': self.global_limit.stats() if self.global_limit else None,
+            'routes': {path: limit.stats() for path, limit in self.route_limits.items()},
+            'clients': self.clients.stats() if self.clients else None
+        }
+
+
+class AdmissionMiddleware:
+    """Middleware ASGI que aplica el control de admisión."""
+
+    def __init__(self, app, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        controller = self.controller
+        if scope['type'] != 'http' or not controller.enabled or scope['path'].startswith(EXEMPT_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+
+        if controller.clients is not None:
+            client = self._client(scope)
+            if client is not None:
+                wait = controller.clients.check(client)
+                if wait:
+                    await self._reject(send, 429, "TooManyRequests",
+                                       "Cuota de peticiones superada", math.ceil(wait))
+                    return
+
+        global_limit = controller.global_limit
+        route_limit = controller.route_limits.get(scope['path'])
+
+        if global_limit is not None and not await global_limit.acquire():
+            await self._shed(send, scope, 'global')
+            return
+        try:
+            if route_limit is not None and not await route_limit.acquire():
+                await self._shed(send, scope, 'route')
+                return
+            try:
+                # Ceder el bucle una vez tras admitir: los endpoints de cálculo no
+                # hacen E/S y, sin este punto de espera, una ráfaga se ejecutaría
+                # petición a petición sin que ninguna llegase a contar como en curso.
+                await asyncio.sleep(0)
+                await self.app(scope, receive, send)
+            finally:
+                if route_limit is not None:
+                    route_limit.release()
+        finally:
+            if global_limit is not None:
+                global_limit.release()
+
+    def _client(self, scope) -> Optional[str]:
+        for name, value in scope['headers']:
+            if name == self.controller.client_header:
+                return value.decode('latin-1')
+        return None
+
+    async def _shed(self, send, scope, limit: str) -> None:
+        logger.info("Petición descartada por saturación (%s): %s", limit, scope['path'])
+        await self._reject(send, 503, "ServiceUnavailable",
+                           "Servicio saturado, reintente más tarde", self.controller.retry_after)
+
+    @staticmethod
+    async def _reject(send, status: int, error: str, message: str, retry_after: int) -> None:
+        body = json.dumps({'error': error, 'message': message, 'details': None}).encode()
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [
+                (b'content-type', b'application/json'),
+                (b'content-length', str(len(body)).encode()),
+                (b'retry-after', str(max(1, retry_after)).encode())
+            ]
+        })
+        await send({'type': 'http.response.body', 'body': body})
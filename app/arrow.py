@@ -0,0 +1,252 @@
+"""
+Cálculo por lotes sobre flujos Arrow IPC.
+
+Para carteras grandes, ni JSON ni MessagePack evitan construir un objeto
+Python por pensionista. Con Arrow las columnas llegan como buffers
+contiguos: se leen sin copiar (``pa.py_buffer`` sobre el cuerpo y vistas
+numpy de cada columna) y pasan directamente al motor vectorizado.
+
+Columnas de entrada (una fila por pensionista):
+
+- clave (``id`` por defecto, de cualquier tipo): se devuelve tal cual.
+- ``pension_type``: texto o diccionario de texto.
+- ``start_date``: date32 (también date64, timestamp o texto ISO).
+- ``num_children``: entero entre 1 y 4.
+- ``pension_amount``: número mayor que 0.
+
+Las restricciones son las de ``CalculationRequest``; sin nulos.
+
+Columnas de salida: la clave, ``period`` ("1"/"2", nulo fuera de rango),
+``eligible``, ``amount`` (nulo si no es elegible) y ``reason`` (código
+corto de ``REASON_NAMES``, nulo si es elegible). Los metadatos del esquema
+llevan la versión de las reglas aplicadas.
+
+El flujo se procesa lote de registros a lote de registros, así que la
+salida conserva el orden y la partición de la entrada.
+
+``pyarrow`` es una dependencia opcional: sin ella el endpoint responde 415
+y la CLI termina con error.
+"""
+
+from typing import BinaryIO, Iterator, Optional
+
+import numpy as np
+
+from .engine import (
+    PENSION_TYPES, PERIODS, REASON_NAMES, REASON_OK, EPOCH_ORDINAL, round_cents
+)
+from .schemas import MIN_START_DATE, MIN_CHILDREN, MAX_CHILDREN
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:  # pragma: no cover - depende del entorno
+    pa = None
+    pc = None
+
+ARROW_STREAM_MEDIA_TYPE = 'application/vnd.apache.arrow.stream'
+
+
+def arrow_available() -> bool:
+    """Si está instalado el paquete pyarrow."""
+    return pa is not None
+
+
+def is_arrow_stream(content_type: Optional[str]) -> bool:
+    """Si un Content-Type corresponde a un flujo Arrow IPC."""
+    if not content_type:
+        return False
+    return content_type.split(';', 1)[0].strip().lower() == ARROW_STREAM_MEDIA_TYPE
+
+
+def _fail(offset: int, invalid: np.ndarray, message: str) -> None:
+    """Rechazar el lote si alguna fila es inválida, indicando la primera."""
+    if invalid.any():
+        row = offset + int(np.argmax(invalid))
+        raise ValueError(f"Fila {row}: {message} ({int(np.count_nonzero(invalid))} filas inválidas)")
+
+
+def _column(batch, name: str, offset: int):
+    index = batch.schema.get_field_index(name)
+    if index < 0:
+        raise ValueError(f"Falta la columna '{name}'")
+    column = batch.column(index)
+    if column.null_count:
+        invalid = np.asarray(column.is_null().to_numpy(zero_copy_only=False))
+        _fail(offset, invalid, f"'{name}' no puede ser nulo")
+    return column
+
+
+def _type_codes(column, offset: int) -> np.ndarray:
+    if pa.types.is_dictionary(column.type):
+        # Se traduce el diccionario (pocos valores) y se indexa con los índices
+        dictionary_codes = pc.index_in(column.dictionary, value_set=_PENSION_TYPE_VALUES)
+        codes = dictionary_codes.take(column.indices)
+    elif pa.types.is_string(column.type) or pa.types.is_large_string(column.type):
+        codes = pc.index_in(column, value_set=_PENSION_TYPE_VALUES)
+    else:
+        raise ValueError(f"'pension_type' debe ser texto, no {column.type}")
+    if codes.null_count:
+        _fail(offset, np.asarray(codes.is_null().to_numpy(zero_copy_only=False)),
+              f"'pension_type' debe ser uno de {', '.join(_PENSION_TYPE_VALUES.to_pylist())}")
+    return codes.to_numpy()
+
+
+def _epoch_days(column) -> np.ndarray:
+    if not pa.types.is_date32(column.type):
+        if pa.types.is_date(column.type) or pa.types.is_timestamp(column.type) or pa.types.is_string(column.type):
+            try:
+                column = column.cast(pa.date32())
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+                raise ValueError(f"'start_date' inválida: {e}") from e
+        else:
+            raise ValueError(f"'start_date' debe ser una fecha, no {column.type}")
+    # date32 son días desde 1970-01-01 en int32: vista sin copia
+    return column.view(pa.int32()).to_numpy(zero_copy_only=True)
+
+
+def _numbers(column, name: str, arrow_type, numpy_type) -> np.ndarray:
+    if column.type != arrow_type:
+        if not (pa.types.is_integer(column.type) or pa.types.is_floating(column.type)):
+            raise ValueError(f"'{name}' debe ser numérico, no {column.type}")
+        try:
+            column = column.cast(arrow_type)
+        except pa.ArrowInvalid as e:
+            raise ValueError(f"'{name}' inválido: {e}") from e
+    return np.asarray(column.to_numpy(zero_copy_only=True), dtype=numpy_type)
+
+
+def calculate_batch(batch, rules, key: str = 'id', offset: int = 0):
+    """
+    Calcular el complemento para un lote de registros Arrow.
+
+    Args:
+        batch: pa.RecordBatch con la clave y las columnas de entrada
+        rules: CompiledRules a aplicar
+        key: Nombre de la columna clave
+        offset: Filas de lotes anteriores (para numerar los errores)
+
+    Returns:
+        pa.RecordBatch con la clave, period, eligible, amount y reason
+
+    Raises:
+        ValueError: Si faltan columnas o alguna fila es inválida
+    """
+    schema = output_schema(batch.schema, rules, key)
+    type_codes = _type_codes(_column(batch, 'pension_type', offset), offset)
+    days = _epoch_days(_column(batch, 'start_date', offset))
+    children = _numbers(_column(batch, 'num_children', offset), 'num_children', pa.int64(), np.int64)
+    amounts = _numbers(_column(batch, 'pension_amount', offset), 'pension_amount', pa.float64(), np.float64)
+
+    _fail(offset, days < MIN_START_DATE.toordinal() - EPOCH_ORDINAL,
+          f"La fecha debe ser posterior al {MIN_START_DATE}")
+    _fail(offset, (children < MIN_CHILDREN) | (children > MAX_CHILDREN),
+          f"'num_children' debe estar entre {MIN_CHILDREN} y {MAX_CHILDREN}")
+    _fail(offset, ~(amounts > 0), "'pension_amount' debe ser mayor que 0")
+
+    engine = rules.engine
+    period_codes = engine.periods_from_epoch_days(days)
+    reasons, complements = engine.calculate(type_codes, period_codes, children, amounts)
+    eligible = reasons == REASON_OK
+
+    return pa.RecordBatch.from_arrays([
+        batch.column(key),
+        pa.DictionaryArray.from_arrays(
+            pa.array(period_codes - 1, mask=period_codes == 0, type=pa.int8()), _PERIOD_VALUES
+        ),
+        pa.array(eligible, type=pa.bool_()),
+        pa.array(round_cents(complements), mask=~eligible, type=pa.float64()),
+        pa.DictionaryArray.from_arrays(pa.array(reasons, mask=eligible, type=pa.int8()), _REASON_VALUES),
+    ], schema=schema)
+
+
+def calculate_stream(reader, rules, key: str = 'id') -> Iterator:
+    """
+    Calcular un flujo de lotes de registros, uno a uno y en orden.
+
+    Args:
+        reader: Iterable de pa.RecordBatch (p. ej. un lector IPC)
+        rules: CompiledRules a aplicar
+        key: Nombre de la columna clave
+
+    Yields:
+        pa.RecordBatch de resultados por cada lote de entrada
+    """
+    offset = 0
+    for batch in reader:
+        yield calculate_batch(batch, rules, key, offset)
+        offset += batch.num_rows
+
+
+def output_schema(input_schema, rules, key: str = 'id'):
+    """Esquema de salida para un esquema de entrada (con la versión de las reglas)."""
+    index = input_schema.get_field_index(key)
+    if index < 0:
+        raise ValueError(f"Falta la columna '{key}'")
+    return pa.schema([
+        input_schema.field(index),
+        pa.field('period', pa.dictionary(pa.int8(), pa.string())),
+        pa.field('eligible', pa.bool_()),
+        pa.field('amount', pa.float64()),
+        pa.field('reason', pa.dictionary(pa.int8(), pa.string())),
+    ], metadata={'rules_version': rules.version})
+
+
+def open_stream(source):
+    """
+    Abrir un flujo Arrow IPC.
+
+    Args:
+        source: bytes del flujo o fichero binario abierto
+
+    Raises:
+        ValueError: Si no es un flujo Arrow IPC válido
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = pa.py_buffer(source)
+    try:
+        return pa.ipc.open_stream(source)
+    except (pa.ArrowInvalid, OSError) as e:
+        raise ValueError(f"Flujo Arrow IPC inválido: {e}") from e
+
+
+def convert_stream(source, sink: BinaryIO, rules, key: str = 'id') -> int:
+    """
+    Leer un flujo Arrow IPC, calcularlo y escribir el flujo de resultados.
+
+    Args:
+        source: bytes o fichero binario con el flujo de entrada
+        sink: Fichero binario donde escribir el flujo de salida
+        rules: CompiledRules a aplicar
+        key: Nombre de la columna clave
+
+    Returns:
+        Número de filas calculadas
+
+    Raises:
+        ValueError: Si el flujo, sus columnas o alguna fila son inválidos
+    """
+    reader = open_stream(source)
+    schema = output_schema(reader.schema, rules, key)
+    rows = 0
+    with pa.ipc.new_stream(sink, schema) as writer:
+        try:
+            for batch in calculate_stream(reader, rules, key):
+                writer.write_batch(batch)
+                rows += batch.num_rows
+        except pa.ArrowInvalid as e:
+            raise ValueError(f"Flujo Arrow IPC inválido: {e}") from e
+    return rows
+
+
+def calculate_ipc(body: bytes, rules, key: str = 'id') -> bytes:
+    """Calcular un cuerpo Arrow IPC y devolver el flujo de resultados."""
+    sink = pa.BufferOutputStream()
+    convert_stream(body, sink, rules, key)
+    return sink.getvalue().to_pybytes()
+
+
+if pa is not None:
+    _PENSION_TYPE_VALUES = pa.array([pension_type.value for pension_type in PENSION_TYPES])
+    _PERIOD_VALUES = pa.array([period.value for period in PERIODS[1:]])
+    _REASON_VALUES = pa.array(list(REASON_NAMES))
@@ -0,0 +1,265 @@
+"""
+Cálculo de ficheros CSV de pensionistas de cualquier tamaño.
+
+Un extracto nacional no cabe en memoria de una vez. El fichero se proyecta
+en memoria (mmap) solo para partirlo en rangos de bytes alineados con los
+saltos de línea; cada rango se procesa después por separado, en paralelo
+en un pool de procesos:
+
+1. el proceso proyecta únicamente su rango, lo decodifica y lo parsea;
+2. calcula todas sus filas de una vez con el motor vectorizado;
+3. devuelve el CSV de resultados del rango ya codificado.
+
+El proceso principal escribe los resultados en el orden de los rangos y
+mantiene como mucho ``2 x procesos`` rangos en vuelo, así que la memoria
+máxima depende del tamaño de rango y del número de procesos, no del
+tamaño del fichero.
+
+Formato de entrada: CSV UTF-8 con cabecera, separado por comas, con la
+columna clave y ``pension_type``, ``start_date`` (YYYY-MM-DD),
+``num_children`` y ``pension_amount`` en cualquier orden. Los campos no
+pueden contener saltos de línea (los rangos se cortan en cada ``\\n``).
+
+Formato de salida: CSV con la clave, ``period``, ``eligible``, ``amount``
+y ``reason`` (los mismos códigos que ``POST /batch/arrow``). Las filas que
+no cumplen las restricciones de ``CalculationRequest`` no detienen el
+proceso: se escriben como no elegibles con el motivo ``datos_invalidos``.
+"""
+
+import csv
+import io
+import logging
+import math
+import mmap
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from itertools import islice
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .engine import PENSION_TYPE_CODES, PERIODS, REASON_NAMES, REASON_OK, round_cents
+from .rules import CompiledRules, get_rules, load_rules
+from .schemas import MIN_START_DATE, MIN_CHILDREN, MAX_CHILDREN
+
+logger = logging.getLogger('app.bulk')
+
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+
+INPUT_COLUMNS = ('pension_type', 'start_date', 'num_children', 'pension_amount')
+OUTPUT_COLUMNS = ('period', 'eligible', 'amount', 'reason')
+
+REASON_INVALID = 'datos_invalidos'
+
+_TYPE_CODES = {pension_type.value: code for pension_type, code in PENSION_TYPE_CODES.items()}
+_PERIOD_TEXT = [period.value if period else '' for period in PERIODS]
+_REASON_TEXT = [''] + list(REASON_NAMES[1:])
+_MIN_ORDINAL = MIN_START_DATE.toordinal()
+
+# Reglas de cada proceso del pool (ver _init_worker)
+_worker_rules = None
+
+
+def split_ranges(path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Tuple[List[str], List[Tuple[int, int]]]:
+    """
+    Leer la cabecera y partir el resto del fichero en rangos de líneas completas.
+
+    Cada rango empieza tras un salto de línea y termina justo después de
+    otro (o al final del fichero), de modo que ninguna línea queda partida.
+    Solo se leen las páginas de la cabecera y de cada frontera.
+
+    Args:
+        path: Fichero CSV
+        chunk_size: Tamaño aproximado de cada rango en bytes
+
+    Returns:
+        Tupla (columnas de la cabecera, lista de rangos (inicio, fin))
+
+    Raises:
+        ValueError: Si el fichero está vacío
+    """
+    if chunk_size < 1:
+        raise ValueError("El tamaño de rango debe ser positivo")
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            raise ValueError(f"El fichero {path} está vacío")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            header_end = mm.find(b'\n')
+            header_end = size if header_end < 0 else header_end + 1
+            header = next(csv.reader([mm[:header_end].decode('utf-8-sig').strip('\r\n')]))
+
+            ranges = []
+            start = header_end
+            while start < size:
+                end = mm.find(b'\n', min(start + chunk_size, size) - 1)
+                end = size if end < 0 else end + 1
+                ranges.append((start, end))
+                start = end
+    return [name.strip() for name in header], ranges
+
+
+def column_indexes(columns: List[str], key: str = 'id') -> Tuple[int, ...]:
+    """
+    Posición de la clave y de las columnas de entrada en la cabecera.
+
+    Raises:
+        ValueError: Si falta alguna columna
+    """
+    missing = [name for name in (key,) + INPUT_COLUMNS if name not in columns]
+    if missing:
+        raise ValueError(f"Faltan columnas en la cabecera: {', '.join(missing)}")
+    return tuple(columns.index(name) for name in (key,) + INPUT_COLUMNS)
+
+
+def _read_range(path: str, start: int, end: int) -> str:
+    """Proyectar solo el rango [start, end) del fichero y decodificarlo."""
+    offset = start - start % mmap.ALLOCATIONGRANULARITY
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), end - offset, access=mmap.ACCESS_READ, offset=offset) as mm:
+        return mm[start - offset:].decode('utf-8')
+
+
+def calculate_range(path: str, span: Tuple[int, int], indexes: Tuple[int, ...], rules: CompiledRules) -> Tuple[bytes, dict]:
+    """
+    Parsear y calcular un rango de líneas del fichero.
+
+    Args:
+        path: Fichero CSV
+        span: Rango (inicio, fin) en bytes, alineado con saltos de línea
+        indexes: Posiciones de la clave y las columnas de entrada (column_indexes)
+        rules: CompiledRules a aplicar
+
+    Returns:
+        Tupla (CSV de resultados del rango sin cabecera, contadores del rango)
+    """
+    key_at, type_at, date_at, children_at, amount_at = indexes
+    keys, type_codes, ordinals, children, amounts, valid = [], [], [], [], [], []
+
+    for row in csv.reader(io.StringIO(_read_range(path, *span), newline='')):
+        if not row:
+            continue
+        try:
+            type_code = _TYPE_CODES[row[type_at]]
+            ordinal = date.fromisoformat(row[date_at]).toordinal()
+            num_children = int(row[children_at])
+            amount = float(row[amount_at])
+            ok = (ordinal >= _MIN_ORDINAL and MIN_CHILDREN <= num_children <= MAX_CHILDREN
+                  and amount > 0 and math.isfinite(amount))
+        except (KeyError, IndexError, ValueError):
+            ok = False
+        if not ok:
+            type_code, ordinal, num_children, amount = 0, 0, MIN_CHILDREN, 0.0
+        keys.append(row[key_at] if key_at < len(row) else '')
+        type_codes.append(type_code)
+        ordinals.append(ordinal)
+        children.append(num_children)
+        amounts.append(amount)
+        valid.append(ok)
+
+    engine = rules.engine
+    valid = np.array(valid, dtype=bool)
+    period_codes = np.where(valid, engine.periods(np.array(ordinals, dtype=np.int64)), 0)
+    reasons, complements = engine.calculate(
+        np.array(type_codes, dtype=np.int8),
+        period_codes,
+        np.array(children, dtype=np.int64),
+        np.array(amounts, dtype=np.float64)
+    )
+    eligible = valid & (reasons == REASON_OK)
+    complements = round_cents(complements)
+
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator='\n')
+    for key, period, ok, is_eligible, amount, reason in zip(
+        keys, period_codes.tolist(), valid.tolist(), eligible.tolist(), complements.tolist(), reasons.tolist()
+    ):
+        writer.writerow((
+            key,
+            _PERIOD_TEXT[period],
+            'true' if is_eligible else 'false',
+            f'{amount:.2f}' if is_eligible else '',
+            _REASON_TEXT[reason] if ok else REASON_INVALID
+        ))
+
+    counts = {
+        'rows': len(keys),
+        'eligible': int(np.count_nonzero(eligible)),
+        'invalid': int(np.count_nonzero(~valid)),
+        'total_amount': float(complements[eligible].sum())
+    }
+    return out.getvalue().encode('utf-8'), counts
+
+
+def _init_worker(rules_path: Optional[str]) -> None:
+    global _worker_rules
+    _worker_rules = load_rules(rules_path) if rules_path else get_rules()
+
+
+def _calculate_in_worker(path: str, span: Tuple[int, int], indexes: Tuple[int, ...]) -> Tuple[bytes, dict]:
+    return calculate_range(path, span, indexes, _worker_rules)
+
+
+def _ordered_results(path: str, ranges: List[Tuple[int, int]], indexes: Tuple[int, ...],
+                     workers: int, rules_path: Optional[str]) -> Iterator[Tuple[bytes, dict]]:
+    """Resultados de cada rango en orden, con como mucho 2 x workers rangos en vuelo."""
+    if workers == 1:
+        rules = load_rules(rules_path) if rules_path else get_rules()
+        for span in ranges:
+            yield calculate_range(path, span, indexes, rules)
+        return
+
+    # spawn: como en app/offload.py, sin heredar hilos ni estado del padre
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_worker,
+        initargs=(rules_path,)
+    ) as pool:
+        remaining = iter(ranges)
+        pending = deque(
+            pool.submit(_calculate_in_worker, path, span, indexes) for span in islice(remaining, 2 * workers)
+        )
+        while pending:
+            result = pending.popleft().result()
+            span = next(remaining, None)
+            if span is not None:
+                pending.append(pool.submit(_calculate_in_worker, path, span, indexes))
+            yield result
+
+
+def calculate_csv(path: str, sink: BinaryIO, key: str = 'id', workers: Optional[int] = None,
+                  chunk_size: int = DEFAULT_CHUNK_SIZE, rules_path: Optional[str] = None) -> dict:
+    """
+    Calcular un fichero CSV de pensionistas y escribir el CSV de resultados.
+
+    Args:
+        path: Fichero CSV de entrada (debe ser un fichero, para proyectarlo)
+        sink: Fichero binario donde escribir los resultados
+        key: Columna clave que se copia a la salida
+        workers: Procesos del pool (por defecto uno por CPU; 1 = sin pool)
+        chunk_size: Tamaño aproximado de cada rango en bytes
+        rules_path: Fichero de reglas (por defecto las reglas vigentes del proceso)
+
+    Returns:
+        Dict con filas, elegibles, inválidas, importe total, rangos y procesos
+
+    Raises:
+        ValueError: Si el fichero está vacío o faltan columnas
+    """
+    columns, ranges = split_ranges(path, chunk_size)
+    indexes = column_indexes(columns, key)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(ranges) or 1))
+    logger.info("Calculando %s en %s rangos con %s procesos", path, len(ranges), workers)
+
+    summary = {'rows': 0, 'eligible': 0, 'invalid': 0, 'total_amount': 0.0,
+               'ranges': len(ranges), 'workers': workers}
+    sink.write((','.join((key,) + OUTPUT_COLUMNS) + '\n').encode('utf-8'))
+    for data, counts in _ordered_results(path, ranges, indexes, workers, rules_path):
+        sink.write(data)
+        for name, value in counts.items():
+            summary[name] += value
+    summary['total_amount'] = round(summary['total_amount'], 2)
+    return summary
@@ -0,0 +1,356 @@
+"""
+Cachés de resultados del servicio.
+
+Ambas implementaciones comparten la misma interfaz (claves y valores en
+bytes) para que el servicio no dependa de cuál se use:
+
+- ``MemoryCache``: LRU en memoria del proceso. Cada worker tiene la suya,
+  así que con N workers la caché se calienta N veces.
+- ``SharedMemoryCache``: tabla hash en un fichero proyectado en memoria
+  (mmap), compartida por todos los workers del host. Conviene ubicarla en
+  un tmpfs (``/dev/shm``) para que nunca toque disco.
+
+Diseño de ``SharedMemoryCache``:
+
+- Ranuras de tamaño fijo agrupadas en conjuntos de ``WAYS`` ranuras
+  (asociativa por conjuntos): la clave solo puede vivir en las ranuras de
+  su conjunto, así que una búsqueda lee como mucho ``WAYS`` ranuras.
+- Lecturas sin bloqueo con seqlock: cada ranura tiene un contador que el
+  escritor deja impar mientras escribe; el lector descarta la lectura si
+  el contador era impar o cambió entre el principio y el final.
+- Escrituras con bloqueos por franjas: cada conjunto pertenece a una
+  franja, protegida por un bloqueo fcntl de rango de bytes (entre
+  procesos) y un threading.Lock (entre hilos del mismo proceso, porque los
+  bloqueos fcntl son por proceso).
+- Desalojo LRU aproximado: cada acierto actualiza (sin bloqueo) la marca
+  de último acceso de la ranura; al insertar en un conjunto lleno se
+  reemplaza la ranura con la marca más antigua.
+"""
+
+import fcntl
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from .config import env_int, env_str
+
+logger = logging.getLogger('app.cache')
+
+
+class ResultCache:
+    """Interfaz común de las cachés de resultados."""
+
+    def get(self, key: bytes) -> Optional[bytes]:
+        """Valor asociado a la clave o None si no está."""
+        raise NotImplementedError
+
+    def set(self, key: bytes, value: bytes) -> None:
+        """Guardar un valor (puede descartarse si no cabe)."""
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        """Vaciar la caché."""
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        """Estado para /metrics."""
+        raise NotImplementedError
+
+
+class MemoryCache(ResultCache):
+    """LRU en memoria del proceso."""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: bytes) -> Optional[bytes]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: bytes, value: bytes) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            'backend': 'memory',
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions
+        }
+
+
+# Cabecera del fichero: magic, versión, ranuras, tamaño de ranura, franjas
+_FILE_HEADER = struct.Struct('<8sIIII')
+_MAGIC = b'CPCACHE1'
+_FORMAT_VERSION = 1
+# Zona de la cabecera reservada para los bloqueos fcntl (un byte por franja)
+_LOCK_BASE = 64
+_DATA_OFFSET = 4096
+
+# Cabecera de ranura: secuencia (seqlock), hash de la clave, último acceso,
+# longitud de la clave, longitud del valor
+_SLOT_HEADER = struct.Struct('<IQIHH')
+_SEQ = struct.Struct('<I')
+_ACCESS = struct.Struct('<I')
+_ACCESS_OFFSET = 12
+
+WAYS = 4
+READ_RETRIES = 3
+
+
+def _hash_key(key: bytes) -> int:
+    """Hash estable entre procesos (hash() de Python cambia en cada proceso)."""
+    value = int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), 'little')
+    return value or 1  # 0 marca una ranura vacía
+
+
+def _clock() -> int:
+    """Marca de tiempo en décimas de segundo (CLOCK_MONOTONIC es común a todo el host)."""
+    return int(time.monotonic() * 10) & 0xFFFFFFFF
+
+
+class SharedMemoryCache(ResultCache):
+    """Tabla hash de ranuras fijas en un fichero mmap compartido entre procesos."""
+
+    def __init__(self, path: str, slots: int = 16384, slot_size: int = 512, stripes: int = 64):
+        if slots < WAYS or slots % WAYS:
+            raise ValueError(f"El número de ranuras debe ser múltiplo de {WAYS}")
+        if slot_size <= _SLOT_HEADER.size:
+            raise ValueError(f"El tamaño de ranura debe ser mayor que {_SLOT_HEADER.size} bytes")
+        if not 1 <= stripes <= _DATA_OFFSET - _LOCK_BASE:
+            raise ValueError("Número de franjas de bloqueo fuera de rango")
+
+        self.path = path
+        self.slots = slots
+        self.slot_size = slot_size
+        self.stripes = stripes
+        self.sets = slots // WAYS
+        self.max_payload = slot_size - _SLOT_HEADER.size
+        self._thread_locks = [threading.Lock() for _ in range(stripes)]
+
+        self.hits = 0
+        self.misses = 0
+        self.sets_written = 0
+        self.evictions = 0
+        self.too_large = 0
+        self.read_conflicts = 0
+
+        self._fd = self._open()
+        self._map = mmap.mmap(self._fd, _DATA_OFFSET + slots * slot_size)
+
+    def _open(self) -> int:
+        """Abrir el fichero, creándolo (o recreándolo si su formato no coincide)."""
+        size = _DATA_OFFSET + self.slots * self.slot_size
+        header = _FILE_HEADER.pack(_MAGIC, _FORMAT_VERSION, self.slots, self.slot_size, self.stripes)
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        lock_fd = os.open(self.path + '.lock', os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.lockf(lock_fd, fcntl.LOCK_EX)
+            try:
+                fd = os.open(self.path, os.O_RDWR)
+                if os.fstat(fd).st_size == size and os.pread(fd, len(header), 0) == header:
+                    return fd
+                os.close(fd)
+                logger.warning("Formato de caché compartida distinto en %s: se recrea", self.path)
+            except FileNotFoundError:
+                pass
+
+            # Fichero nuevo con os.replace: los procesos que aún usen el
+            # anterior conservan su inodo en lugar de leer datos a medio escribir
+            temp_fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.cache-')
+            os.ftruncate(temp_fd, size)
+            os.pwrite(temp_fd, header, 0)
+            os.fchmod(temp_fd, 0o600)
+            os.replace(temp_path, self.path)
+            return temp_fd
+        finally:
+            fcntl.lockf(lock_fd, fcntl.LOCK_UN)
+            os.close(lock_fd)
+
+    def _slot_offset(self, index: int) -> int:
+        return _DATA_OFFSET + index * self.slot_size
+
+    def _read_slot(self, offset: int, key_hash: int, key: bytes) -> Optional[bytes]:
+        """Leer una ranura con el protocolo seqlock (None si no contiene la clave)."""
+        buffer = self._map
+        for _ in range(READ_RETRIES):
+            sequence, slot_hash, _, key_length, value_length = _SLOT_HEADER.unpack_from(buffer, offset)
+            if sequence & 1:
+                self.read_conflicts += 1
+                continue
+            if slot_hash != key_hash or key_length != len(key):
+                return None
+            start = offset + _SLOT_HEADER.size
+            payload = buffer[start:start + key_length + value_length]
+            if _SEQ.unpack_from(buffer, offset)[0] != sequence:
+                self.read_conflicts += 1
+                continue
+            if payload[:key_length] != key:
+                return None
+            return payload[key_length:]
+        return None
+
+    def get(self, key: bytes) -> Optional[bytes]:
+        key_hash = _hash_key(key)
+        first = (key_hash % self.sets) * WAYS
+        for index in range(first, first + WAYS):
+            offset = self._slot_offset(index)
+            value = self._read_slot(offset, key_hash, key)
+            if value is not None:
+                # Actualización de la marca LRU sin bloqueo: una carrera solo
+                # afecta a la precisión del desalojo, no a los datos
+                _ACCESS.pack_into(self._map, offset + _ACCESS_OFFSET, _clock())
+                self.hits += 1
+                return value
+        self.misses += 1
+        return None
+
+    def set(self, key: bytes, value: bytes) -> None:
+        if len(key) + len(value) > self.max_payload:
+            self.too_large += 1
+            return
+
+        key_hash = _hash_key(key)
+        set_index = key_hash % self.sets
+        first = set_index * WAYS
+        stripe = set_index % self.stripes
+
+        with self._thread_locks[stripe]:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, _LOCK_BASE + stripe)
+            try:
+                target = self._choose_slot(first, key_hash, key)
+                self._write_slot(self._slot_offset(target), key_hash, key, value)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, _LOCK_BASE + stripe)
+        self.sets_written += 1
+
+    def _choose_slot(self, first: int, key_hash: int, key: bytes) -> int:
+        """Ranura del conjunto donde escribir: la misma clave, una vacía o la menos usada."""
+        empty = None
+        oldest, oldest_access = first, None
+        for index in range(first, first + WAYS):
+            offset = self._slot_offset(index)
+            _, slot_hash, last_access, key_length, _ = _SLOT_HEADER.unpack_from(self._map, offset)
+            if slot_hash == key_hash and key_length == len(key):
+                start = offset + _SLOT_HEADER.size
+                if self._map[start:start + key_length] == key:
+                    return index
+            if slot_hash == 0:
+                if empty is None:
+                    empty = index
+            elif oldest_access is None or last_access < oldest_access:
+                oldest, oldest_access = index, last_access
+        if empty is not None:
+            return empty
+        self.evictions += 1
+        return oldest
+
+    def _write_slot(self, offset: int, key_hash: int, key: bytes, value: bytes) -> None:
+        buffer = self._map
+        sequence = _SEQ.unpack_from(buffer, offset)[0]
+        _SEQ.pack_into(buffer, offset, sequence + 1)  # impar: escritura en curso
+        start = offset + _SLOT_HEADER.size
+        buffer[start:start + len(key) + len(value)] = key + value
+        _SLOT_HEADER.pack_into(buffer, offset, sequence + 1, key_hash, _clock(), len(key), len(value))
+        _SEQ.pack_into(buffer, offset, (sequence + 2) & 0xFFFFFFFF)
+
+    def clear(self) -> None:
+        for stripe in range(self.stripes):
+            self._thread_locks[stripe].acquire()
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, self.stripes, _LOCK_BASE)
+        try:
+            for index in range(self.slots):
+                offset = self._slot_offset(index)
+                sequence = _SEQ.unpack_from(self._map, offset)[0]
+                _SEQ.pack_into(self._map, offset, sequence + 1)
+                _SLOT_HEADER.pack_into(self._map, offset, sequence + 1, 0, 0, 0, 0)
+                _SEQ.pack_into(self._map, offset, (sequence + 2) & 0xFFFFFFFF)
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, self.stripes, _LOCK_BASE)
+            for stripe in range(self.stripes):
+                self._thread_locks[stripe].release()
+
+    def entries(self) -> int:
+        """Ranuras ocupadas (recorre toda la tabla)."""
+        return sum(
+            1 for index in range(self.slots)
+            if _SLOT_HEADER.unpack_from(self._map, self._slot_offset(index))[1]
+        )
+
+    def close(self) -> None:
+        self._map.close()
+        os.close(self._fd)
+
+    def stats(self) -> dict:
+        return {
+            'backend': 'shared',
+            'path': self.path,
+            'entries': self.entries(),
+            'slots': self.slots,
+            'slot_size': self.slot_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'sets': self.sets_written,
+            'evictions': self.evictions,
+            'too_large': self.too_large,
+            'read_conflicts': self.read_conflicts
+        }
+
+
+def cache_from_env() -> Optional[ResultCache]:
+    """
+    Crear la caché configurada en CACHE_BACKEND.
+
+    - ``memory`` (por defecto): MemoryCache con CACHE_MAX_ENTRIES entradas.
+    - ``shared``: SharedMemoryCache en CACHE_PATH (por defecto en /dev/shm
+      si existe) con CACHE_SLOTS, CACHE_SLOT_SIZE y CACHE_STRIPES.
+    - ``none``: sin caché.
+
+    Returns:
+        Caché configurada o None
+    """
+    backend = env_str('CACHE_BACKEND', 'memory')
+    if backend == 'none':
+        return None
+    if backend == 'memory':
+        return MemoryCache(env_int('CACHE_MAX_ENTRIES', 10000))
+    if backend == 'shared':
+        default_dir = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+        return SharedMemoryCache(
+            env_str('CACHE_PATH', os.path.join(default_dir, 'complemento-cache')),
+            slots=env_int('CACHE_SLOTS', 16384),
+            slot_size=env_int('CACHE_SLOT_SIZE', 512),
+            stripes=env_int('CACHE_STRIPES', 64)
+        )
+    raise ValueError(f"CACHE_BACKEND inválido '{backend}' (se espera memory, shared o none)")
@@ -0,0 +1,112 @@
+"""
+Agrupación de peticiones idénticas concurrentes ("single flight").
+
+Cuando llegan a la vez varias copias de la misma petición (reintentos del
+cliente, el front end recargando varias vistas), solo la primera (líder)
+calcula; las demás esperan su resultado. La entrada se elimina en cuanto
+termina el cálculo, con éxito o con error: no es una caché, un error se
+comparte con las peticiones que ya esperaban pero nunca con las
+posteriores.
+"""
+
+import asyncio
+import logging
+from datetime import date
+from enum import Enum
+from typing import Awaitable, Callable, Dict, Hashable
+
+logger = logging.getLogger('app.coalescing')
+
+
+def request_key(operation: str, *values) -> tuple:
+    """
+    Clave canónica de una petición a partir de sus entradas ya validadas.
+
+    Normaliza los tipos para que entradas equivalentes (``1000`` y
+    ``1000.0``, un Enum y su valor) produzcan la misma clave.
+
+    Args:
+        operation: Nombre de la operación (p. ej. "calculate")
+        values: Entradas de la petición
+
+    Returns:
+        Tupla hashable
+    """
+    return (operation,) + tuple(_canonical(value) for value in values)
+
+
+def _canonical(value) -> Hashable:
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, (list, tuple)):
+        return tuple(_canonical(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _canonical(item)) for key, item in value.items()))
+    return value
+
+
+class SingleFlight:
+    """Cálculos en curso indexados por clave de petición."""
+
+    def __init__(self):
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.errors = 0
+
+    async def run(self, key: Hashable, compute: Callable[[], Awaitable]):
+        """
+        Obtener el resultado de ``compute()`` compartiéndolo con las
+        peticiones concurrentes de la misma clave.
+
+        El cálculo corre en su propia tarea: si el líder se cancela (el
+        cliente se desconecta), las demás peticiones siguen esperándolo.
+
+        Args:
+            key: Clave canónica (ver request_key)
+            compute: Función sin argumentos que devuelve el awaitable del cálculo
+
+        Returns:
+            Resultado del cálculo
+
+        Raises:
+            La excepción del cálculo, en todas las peticiones que lo esperaban
+        """
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return await asyncio.shield(task)
+
+        self.leaders += 1
+        task = asyncio.ensure_future(self._lead(key, compute))
+        # Si todas las peticiones se cancelan, nadie recoge el error: se marca como recogido
+        task.add_done_callback(lambda done: done.cancelled() or done.exception())
+        self._in_flight[key] = task
+        return await asyncio.shield(task)
+
+    async def _lead(self, key: Hashable, compute: Callable[[], Awaitable]):
+        try:
+            # Una vuelta del bucle antes de calcular: las copias que ya han
+            # llegado (una ráfaga) alcanzan a unirse a este cálculo.
+            await asyncio.sleep(0)
+            return await compute()
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            del self._in_flight[key]
+
+    def stats(self) -> dict:
+        """Estado para /metrics."""
+        return {
+            'leaders': self.leaders,
+            'coalesced': self.coalesced,
+            'errors': self.errors,
+            'in_flight': len(self._in_flight)
+        }
@@ -0,0 +1,77 @@
+"""
+Lectura de parámetros de configuración desde variables de entorno.
+"""
+
+import os
+from typing import Callable, Dict, Optional
+
+
+def env_int(name: str, default: int) -> int:
+    """
+    Leer un entero de una variable de entorno.
+    
+    Args:
+        name: Nombre de la variable
+        default: Valor si no está definida o está vacía
+        
+    Returns:
+        Valor entero
+    """
+    value = os.getenv(name, '').strip()
+    return int(value) if value else default
+
+
+def env_float(name: str, default: float) -> float:
+    """
+    Leer un número decimal de una variable de entorno.
+    
+    Args:
+        name: Nombre de la variable
+        default: Valor si no está definida o está vacía
+        
+    Returns:
+        Valor decimal
+    """
+    value = os.getenv(name, '').strip()
+    return float(value) if value else default
+
+
+def env_str(name: str, default: Optional[str] = None) -> Optional[str]:
+    """
+    Leer un texto de una variable de entorno (vacío equivale a no definida).
+    
+    Args:
+        name: Nombre de la variable
+        default: Valor si no está definida o está vacía
+        
+    Returns:
+        Valor de la variable o default
+    """
+    value = os.getenv(name, '').strip()
+    return value or default
+
+
+def parse_mapping(value: str, cast: Callable = float) -> Dict[str, object]:
+    """
+    Interpretar una lista "clave=valor,clave=valor" (p. ej. "app.routes=0.1").
+    
+    Args:
+        value: Texto a interpretar
+        cast: Conversión aplicada a cada valor
+        
+    Returns:
+        Dict clave -> valor convertido
+        
+    Raises:
+        ValueError: Si algún elemento no tiene la forma clave=valor
+    """
+    mapping = {}
+    for item in value.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        key, separator, raw = item.partition('=')
+        if not separator or not key.strip():
+            raise ValueError(f"Elemento de configuración inválido: '{item}' (se espera clave=valor)")
+        mapping[key.strip()] = cast(raw.strip())
+    return mapping
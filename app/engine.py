@@ -0,0 +1,191 @@
+"""
+Motor vectorizado (numpy) para calcular el Complemento de Paternidad sobre
+muchos pensionistas o escenarios en una sola pasada.
+
+Se construye a partir de las mismas reglas compiladas (``app/rules.py``)
+que ``ComplementoPaternidadService``, así que ambos coinciden, pero
+trabaja con arrays: tipos de pensión y períodos codificados como enteros y
+tablas de consulta indexadas por (período, hijos).
+"""
+
+from typing import Tuple
+import numpy as np
+
+from .schemas import PensionType, PeriodType
+
+# Códigos enteros de tipo de pensión (orden de declaración del Enum)
+PENSION_TYPES = list(PensionType)
+PENSION_TYPE_CODES = {pension_type: code for code, pension_type in enumerate(PENSION_TYPES)}
+
+# Códigos enteros de período (0 = fuera de rango)
+PERIOD_NONE = 0
+PERIODS = [None, PeriodType.PERIOD_1, PeriodType.PERIOD_2]
+PERIOD_CODES = {period: code for code, period in enumerate(PERIODS)}
+
+# Códigos de motivo de no elegibilidad
+REASON_OK = 0
+REASON_OUT_OF_RANGE = 1
+REASON_PENSION_TYPE = 2
+REASON_MIN_CHILDREN = 3
+
+# Nombre corto de cada código de motivo (indexado por código)
+REASON_NAMES = ('ok', 'fuera_de_rango', 'tipo_de_pension', 'minimo_de_hijos')
+
+# Ordinal de 1970-01-01: las fechas en días desde la época se desplazan por él
+EPOCH_ORDINAL = 719163
+
+
+def encode_dates(dates) -> np.ndarray:
+    """
+    Convertir fechas a ordinales (días desde 0001-01-01) para comparar en bloque.
+
+    Args:
+        dates: Iterable de objetos date
+
+    Returns:
+        Array int64 de ordinales
+    """
+    return np.fromiter((d.toordinal() for d in dates), dtype=np.int64)
+
+
+def encode_pension_types(pension_types) -> np.ndarray:
+    """
+    Convertir tipos de pensión (Enum o texto) a sus códigos enteros.
+
+    Args:
+        pension_types: Iterable de PensionType o str
+
+    Returns:
+        Array int8 de códigos
+    """
+    return np.fromiter(
+        (PENSION_TYPE_CODES[PensionType(t)] for t in pension_types), dtype=np.int8
+    )
+
+
+def round_cents(amounts):
+    """
+    Redondear importes a céntimos exactamente como ``round(importe, 2)``.
+
+    ``np.round`` multiplica por 100 antes de redondear (y desempata a par),
+    así que en los medios céntimos puede dar un céntimo distinto que el
+    redondeo de Python. Aquí se redondea en bloque y solo los importes
+    cercanos a medio céntimo se resuelven con ``round``. Todos los caminos
+    (escalares y vectorizados) redondean con esta función para que un mismo
+    pensionista reciba los mismos céntimos en cualquier endpoint.
+
+    Args:
+        amounts: Importe o array de importes
+
+    Returns:
+        Array float64 con la misma forma (escalar 0-d si se pasa un escalar)
+    """
+    amounts = np.asarray(amounts, dtype=np.float64)
+    scaled = amounts * 100
+    cents = np.rint(scaled)
+    rounded = np.asarray(cents / 100)
+    with np.errstate(invalid='ignore'):  # inf - inf
+        near_half = np.abs(np.abs(scaled - cents) - 0.5) < 1e-6
+    if near_half.any():
+        rounded[near_half] = [round(amount, 2) for amount in amounts[near_half].tolist()]
+    return rounded
+
+
+class VectorizedEngine:
+    """Tablas de consulta y cálculo vectorizado del complemento."""
+
+    def __init__(self, rules):
+        """
+        Args:
+            rules: CompiledRules de las que se construyen las tablas
+        """
+        # Fronteras de período: searchsorted(period_edges) indexa period_codes;
+        # antes del primer período, en los huecos y tras un período cerrado -> 0
+        edges, codes = [], [PERIOD_NONE]
+        for rule in rules.periods:
+            if edges and edges[-1] == rule.start.toordinal():
+                codes[-1] = PERIOD_CODES[rule.period]
+            else:
+                edges.append(rule.start.toordinal())
+                codes.append(PERIOD_CODES[rule.period])
+            if rule.end is not None:
+                edges.append(rule.end.toordinal() + 1)
+                codes.append(PERIOD_NONE)
+        self.period_edges = np.array(edges, dtype=np.int64)
+        self.period_codes = np.array(codes, dtype=np.int8)
+
+        # Hijos computables como máximo en cualquier período (más cuentan como este)
+        self.max_children = max(rule.max_children for rule in rules.periods)
+
+        # Tipos de pensión admitidos y mínimo de hijos por período
+        self.eligible_types = np.zeros((len(PERIODS), len(PENSION_TYPES)), dtype=bool)
+        self.min_children = np.zeros(len(PERIODS), dtype=np.int64)
+
+        # Tablas por (período, hijos computables): tanto por uno e importe fijo total
+        self.rates = np.zeros((len(PERIODS), self.max_children + 1), dtype=np.float64)
+        self.fixed = np.zeros((len(PERIODS), self.max_children + 1), dtype=np.float64)
+
+        for rule in rules.periods:
+            code = PERIOD_CODES[rule.period]
+            for pension_type in rule.eligible_types:
+                self.eligible_types[code, PENSION_TYPE_CODES[pension_type]] = True
+            self.min_children[code] = rule.min_children
+            for children in range(rule.min_children, self.max_children + 1):
+                percent, amount_per_child, _ = rule.calculate(children, 0.0)
+                if percent is not None:
+                    self.rates[code, children] = percent / 100
+                else:
+                    self.fixed[code, children] = amount_per_child * min(children, rule.max_children)
+
+    def periods(self, date_ordinals: np.ndarray) -> np.ndarray:
+        """Código de período para cada ordinal de fecha."""
+        return self.period_codes[np.searchsorted(self.period_edges, date_ordinals, side='right')]
+
+    def periods_from_epoch_days(self, days: np.ndarray) -> np.ndarray:
+        """
+        Código de período para fechas en días desde 1970-01-01 (date32 de Arrow).
+
+        Se desplazan las fronteras y no las fechas, así que el array de
+        entrada se usa tal cual, sin convertirlo.
+        """
+        days = np.asarray(days)
+        edges = (self.period_edges - EPOCH_ORDINAL).astype(days.dtype, copy=False)
+        return self.period_codes[np.searchsorted(edges, days, side='right')]
+
+    def calculate(
+        self,
+        type_codes: np.ndarray,
+        period_codes: np.ndarray,
+        num_children: np.ndarray,
+        pension_amounts: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Calcular elegibilidad e importe para arrays compatibles por broadcasting.
+
+        Args:
+            type_codes: Códigos de tipo de pensión
+            period_codes: Códigos de período
+            num_children: Número de hijos
+            pension_amounts: Cuantías de la pensión
+
+        Returns:
+            Tupla (motivos, importes): código de motivo (REASON_OK si es elegible)
+            e importe del complemento (0 si no es elegible)
+        """
+        num_children = np.asarray(num_children, dtype=np.int64)
+        children = np.clip(num_children, 0, self.max_children)
+
+        reasons = np.where(
+            period_codes == PERIOD_NONE,
+            REASON_OUT_OF_RANGE,
+            np.where(
+                ~self.eligible_types[period_codes, type_codes],
+                REASON_PENSION_TYPE,
+                np.where(num_children < self.min_children[period_codes], REASON_MIN_CHILDREN, REASON_OK)
+            )
+        ).astype(np.int8)
+
+        amounts = pension_amounts * self.rates[period_codes, children] + self.fixed[period_codes, children]
+        amounts = np.where(reasons == REASON_OK, amounts, 0.0)
+
+        return reasons, amounts
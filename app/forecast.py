@@ -0,0 +1,212 @@
+"""
+Previsión mensual del complemento a pagar a toda la población.
+
+Sumar ``calculate_retroactive`` pensionista a pensionista cuesta
+O(pensionistas × meses). Aquí cada pensionista solo aporta sus cambios de
+importe a un array de diferencias indexado por mes: +importe en el mes de
+su primer pago, la diferencia de importe en el mes en que sus pagos pasan
+a otro tramo de las reglas y -importe en el mes en que deja de cobrar. Una
+suma acumulada sobre ese array da el total de cada mes. El coste es
+O(pensionistas × fronteras de las reglas + meses) para cualquier horizonte.
+
+Los pagos siguen el mismo calendario que los atrasos: uno por paso
+mensual desde la fecha de inicio (ver ``count_month_steps``), anterior a
+la fecha de baja si la hay, con el importe del período vigente en la fecha
+del pago. Cada pago cuenta en el mes natural en que cae.
+"""
+
+import logging
+import re
+from datetime import date
+from typing import Iterable, Optional
+
+import numpy as np
+
+from .engine import encode_pension_types, round_cents
+from .rules import CompiledRules
+from .schemas import PensionType, MIN_START_DATE, MIN_CHILDREN, MAX_CHILDREN
+
+logger = logging.getLogger('app.forecast')
+
+# Meses desde 1970-01 (como datetime64[M])
+_EPOCH_MONTH = 1970 * 12
+
+_MONTH_PATTERN = re.compile(r'^(\d{4})-(\d{2})$')
+
+
+def parse_month(text: str) -> date:
+    """
+    Convertir un mes 'YYYY-MM' en la fecha de su primer día.
+
+    Raises:
+        ValueError: Si el texto no es un mes válido
+    """
+    match = _MONTH_PATTERN.match(text.strip())
+    if not match or not 1 <= int(match.group(2)) <= 12:
+        raise ValueError(f"Mes inválido '{text}' (se espera YYYY-MM)")
+    return date(int(match.group(1)), int(match.group(2)), 1)
+
+
+def month_steps(starts: np.ndarray, ends) -> np.ndarray:
+    """
+    Versión vectorizada de ``count_month_steps``.
+
+    Args:
+        starts: Fechas de inicio (datetime64[D])
+        ends: Fechas límite, excluidas (datetime64[D], array o escalar)
+
+    Returns:
+        Array int64 con los pasos mensuales de cada inicio anteriores a su límite
+    """
+    starts = np.asarray(starts, dtype='datetime64[D]')
+    ends = np.asarray(ends, dtype='datetime64[D]')
+    start_months = starts.astype('datetime64[M]')
+    end_months = ends.astype('datetime64[M]')
+    start_days = (starts - start_months.astype('datetime64[D]')).astype(np.int64) + 1
+    end_days = (ends - end_months.astype('datetime64[D]')).astype(np.int64) + 1
+    month_lengths = ((end_months + 1).astype('datetime64[D]') - end_months.astype('datetime64[D]')).astype(np.int64)
+
+    # Pasos hasta el mes del límite, más el de ese mes si cae antes del límite
+    steps = (end_months - start_months).astype(np.int64) + (np.minimum(start_days, month_lengths) < end_days)
+    return np.where(ends > starts, steps, 0)
+
+
+def forecast_payouts(
+    rules: CompiledRules,
+    type_codes: np.ndarray,
+    start_dates: np.ndarray,
+    num_children: np.ndarray,
+    pension_amounts: np.ndarray,
+    first_month: date,
+    months: int,
+    end_dates: Optional[np.ndarray] = None
+) -> dict:
+    """
+    Calcular el total mensual del complemento de una población.
+
+    Args:
+        rules: CompiledRules a aplicar
+        type_codes: Códigos de tipo de pensión (ver app/engine.py)
+        start_dates: Fechas de inicio (datetime64[D])
+        num_children: Número de hijos
+        pension_amounts: Cuantías de la pensión
+        first_month: Primer mes de la previsión (se usan su año y mes)
+        months: Meses de la previsión
+        end_dates: Fechas de baja, excluidas (datetime64[D]; NaT = sin baja)
+
+    Returns:
+        Dict con start, months, population, series (month, beneficiaries y
+        amount de cada mes), total_amount y rules_version
+
+    Raises:
+        ValueError: Si la previsión no tiene ningún mes
+    """
+    if months < 1:
+        raise ValueError("La previsión debe tener al menos un mes")
+    start_dates = np.asarray(start_dates, dtype='datetime64[D]')
+    num_children = np.asarray(num_children, dtype=np.int64)
+    pension_amounts = np.asarray(pension_amounts, dtype=np.float64)
+    engine = rules.engine
+
+    # Índice de cada mes dentro de la previsión (negativo = anterior)
+    offset = first_month.year * 12 + first_month.month - 1 - _EPOCH_MONTH
+    start_months = start_dates.astype('datetime64[M]').astype(np.int64) - offset
+
+    if end_dates is not None:
+        end_dates = np.asarray(end_dates, dtype='datetime64[D]')
+        # Sin baja: el primer mes tras la previsión
+        exits = np.where(np.isnat(end_dates), months - start_months, month_steps(start_dates, end_dates))
+    else:
+        exits = None
+
+    amount_diff = np.zeros(months + 1)
+    payee_diff = np.zeros(months + 1)
+
+    def add(steps, amounts, payees):
+        if exits is not None:
+            steps = np.minimum(steps, exits)
+        # Lo anterior a la previsión entra en el primer mes; lo posterior se descarta
+        index = np.clip(start_months + steps, 0, months)
+        amount_diff[:] += np.bincount(index, amounts, minlength=months + 1)
+        payee_diff[:] += np.bincount(index, payees, minlength=months + 1)
+
+    # Tramos de fechas de pago: antes de la primera frontera y desde cada una
+    previous_amounts = np.zeros(len(start_dates))
+    pieces = [(date.min, np.zeros(len(start_dates), dtype=np.int64))] + [
+        (boundary, month_steps(start_dates, np.datetime64(boundary, 'D'))) for boundary in rules.boundaries
+    ]
+    for piece_start, steps in pieces:
+        period_code = engine.periods(np.array([piece_start.toordinal()]))[0]
+        _, amounts = engine.calculate(type_codes, period_code, num_children, pension_amounts)
+        # Cada mes se abona en céntimos, con el mismo redondeo que los atrasos
+        amounts = round_cents(amounts)
+        add(steps, amounts - previous_amounts, (amounts > 0).astype(np.float64) - (previous_amounts > 0))
+        previous_amounts = amounts
+
+    if exits is not None:
+        add(exits, -previous_amounts, -(previous_amounts > 0).astype(np.float64))
+
+    amounts = np.cumsum(amount_diff[:months])
+    payees = np.rint(np.cumsum(payee_diff[:months])).astype(np.int64)
+    labels = np.arange(offset, offset + months).astype('datetime64[M]').astype(str)
+
+    total = float(amounts.sum())
+    logger.info(
+        "Previsión de %s pensionistas en %s meses desde %s: %s€",
+        len(start_dates), months, labels[0], round(total, 2)
+    )
+
+    return {
+        'start': f"{first_month.year:04d}-{first_month.month:02d}",
+        'months': months,
+        'population': len(start_dates),
+        'series': [
+            {'month': label, 'beneficiaries': count, 'amount': round(amount, 2)}
+            for label, count, amount in zip(labels.tolist(), payees.tolist(), amounts.tolist())
+        ],
+        'total_amount': round(total, 2),
+        'rules_version': rules.version
+    }
+
+
+def read_population(records: Iterable[dict]) -> tuple:
+    """
+    Validar una población y convertirla a los arrays de ``forecast_payouts``.
+
+    Cada registro lleva pension_type, start_date, num_children,
+    pension_amount y, opcionalmente, end_date (vacía = sin baja).
+
+    Returns:
+        Tupla (type_codes, start_dates, num_children, pension_amounts, end_dates)
+
+    Raises:
+        ValueError: Con el número de fila del primer registro inválido
+    """
+    pension_types, start_dates, children, amounts, end_dates = [], [], [], [], []
+    for index, record in enumerate(records, start=1):
+        try:
+            start_date = date.fromisoformat(record['start_date'])
+            end_date = record.get('end_date') or None
+            row = (
+                PensionType(record['pension_type']).value, start_date,
+                int(record['num_children']), float(record['pension_amount']),
+                date.fromisoformat(end_date) if end_date else None
+            )
+        except (KeyError, ValueError, TypeError) as e:
+            raise ValueError(f"Fila {index}: {e}") from e
+        if row[1] < MIN_START_DATE:
+            raise ValueError(f"Fila {index}: la fecha debe ser posterior al {MIN_START_DATE}")
+        if not MIN_CHILDREN <= row[2] <= MAX_CHILDREN:
+            raise ValueError(f"Fila {index}: el número de hijos debe estar entre {MIN_CHILDREN} y {MAX_CHILDREN}")
+        if not row[3] > 0:
+            raise ValueError(f"Fila {index}: la cuantía debe ser mayor que 0")
+        for values, value in zip((pension_types, start_dates, children, amounts, end_dates), row):
+            values.append(value)
+
+    return (
+        encode_pension_types(pension_types),
+        np.array(start_dates, dtype='datetime64[D]'),
+        np.array(children, dtype=np.int64),
+        np.array(amounts, dtype=np.float64),
+        np.array(end_dates, dtype='datetime64[D]')
+    )
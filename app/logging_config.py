@@ -5,8 +5,12 @@ Configuración de logging estructurado para la API.
 import logging
 import logging.config
 import json
+import random
+from collections import Counter
 from datetime import datetime
 import os
+from typing import Dict, Optional
+from .config import env_float, parse_mapping
 
 class JSONFormatter(logging.Formatter):
     """Formateador JSON para logs estructurados."""
@@ -33,20 +37,90 @@ class JSONFormatter(logging.Formatter):
         if hasattr(record, 'duration'):
             log_entry['duration_ms'] = record.duration
         
+        if hasattr(record, 'spans'):
+            log_entry['spans_ms'] = record.spans
+        
         if record.exc_info:
             log_entry['exception'] = self.formatException(record.exc_info)
         
         return json.dumps(log_entry, ensure_ascii=False)
 
+class SamplingFilter(logging.Filter):
+    """
+    Muestreo de los registros de éxito (DEBUG/INFO) por logger.
+    
+    Cada logger tiene una tasa entre 0 y 1 (la del prefijo más largo
+    configurado, p. ej. "app.routes" aplica también a "app.routes.x"). Los
+    registros WARNING o superiores se emiten siempre. Se cuentan los
+    registros emitidos y descartados por logger.
+    """
+    
+    def __init__(self, rates: Optional[Dict[str, float]] = None, default_rate: float = 1.0):
+        super().__init__()
+        self.rates = dict(rates or {})
+        self.default_rate = default_rate
+        self.kept = Counter()
+        self.sampled_out = Counter()
+        self._resolved = {}
+    
+    def rate_for(self, name: str) -> float:
+        """Tasa de muestreo aplicable a un logger."""
+        rate = self._resolved.get(name)
+        if rate is None:
+            rate, best = self.default_rate, -1
+            for prefix, value in self.rates.items():
+                if (name == prefix or name.startswith(prefix + '.')) and len(prefix) > best:
+                    rate, best = value, len(prefix)
+            self._resolved[name] = rate
+        return rate
+    
+    def filter(self, record):
+        """Decidir si el registro se emite."""
+        if record.levelno >= logging.WARNING:
+            return True
+        
+        rate = self.rate_for(record.name)
+        if rate >= 1.0 or random.random() < rate:
+            self.kept[record.name] += 1
+            return True
+        
+        self.sampled_out[record.name] += 1
+        return False
+    
+    def stats(self) -> dict:
+        """Registros emitidos y descartados por logger."""
+        return {
+            name: {
+                'rate': self.rate_for(name),
+                'kept': self.kept[name],
+                'sampled_out': self.sampled_out[name]
+            }
+            for name in sorted(set(self.kept) | set(self.sampled_out))
+        }
+
+_sampling_filter = SamplingFilter()
+
 def setup_logging():
     """Configurar el sistema de logging."""
+    global _sampling_filter
     
     # Determinar el nivel de log desde variable de entorno
     log_level = os.getenv('LOG_LEVEL', 'INFO').upper()
     
+    # Muestreo de logs de éxito, p. ej. LOG_SAMPLING="app.routes=0.1,app.services=0.01"
+    _sampling_filter = SamplingFilter(
+        parse_mapping(os.getenv('LOG_SAMPLING', '')),
+        env_float('LOG_SAMPLING_DEFAULT', 1.0)
+    )
+    
     logging_config = {
         'version': 1,
         'disable_existing_loggers': False,
+        'filters': {
+            'sampling': {
+                '()': lambda: _sampling_filter,
+            }
+        },
         'formatters': {
             'json': {
                 '()': JSONFormatter,
@@ -60,7 +134,8 @@ def setup_logging():
                 'level': log_level,
                 'class': 'logging.StreamHandler',
                 'formatter': 'json' if os.getenv('JSON_LOGS', 'true').lower() == 'true' else 'standard',
-                'stream': 'ext://sys.stdout'
+                'filters': ['sampling'],
+                'stream': 'ext://sys.stderr' if os.getenv('LOG_STREAM', 'stdout').lower() == 'stderr' else 'ext://sys.stdout'
             }
         },
         'loggers': {
@@ -96,7 +171,7 @@ def setup_logging():
     
     # Log inicial
     logger = logging.getLogger('app')
-    logger.info(f"Sistema de logging configurado con nivel {log_level}")
+    logger.info("Sistema de logging configurado con nivel %s", log_level)
 
 def get_logger(name: str) -> logging.Logger:
     """
@@ -108,4 +183,13 @@ def get_logger(name: str) -> logging.Logger:
     Returns:
         Logger configurado
     """
-    return logging.getLogger(f'app.{name}')
\ No newline at end of file
+    return logging.getLogger(f'app.{name}')
+
+def get_sampling_stats() -> dict:
+    """
+    Obtener los contadores del muestreo de logs.
+    
+    Returns:
+        Dict logger -> tasa, registros emitidos y descartados
+    """
+    return _sampling_filter.stats()
@@ -0,0 +1,210 @@
+"""
+Contabilidad de memoria con tracemalloc.
+
+Permite activar tracemalloc en el worker, tomar instantáneas con nombre y
+consultar los puntos de asignación con más memoria viva, o la diferencia
+entre dos instantáneas, agrupados por fichero y línea del paquete ``app``.
+
+tracemalloc tiene un coste apreciable en CPU y memoria mientras está
+activo; está pensado para sesiones de diagnóstico cortas.
+"""
+
+import linecache
+import logging
+import os
+import tracemalloc
+from collections import OrderedDict
+from datetime import datetime
+from typing import List
+
+logger = logging.getLogger('app.memory')
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+_THIS_FILE = os.path.abspath(__file__)
+
+GROUP_BY = ('lineno', 'filename')
+
+
+class MemoryTracker:
+    """Sesión de tracemalloc e instantáneas con nombre de este worker."""
+
+    def __init__(self, max_snapshots: int = 10):
+        self.max_snapshots = max_snapshots
+        self.snapshots = OrderedDict()
+
+    @property
+    def active(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int = 25) -> None:
+        """
+        Activar tracemalloc.
+
+        Args:
+            frames: Profundidad de pila guardada por asignación. Con 1 solo se
+                ven las asignaciones hechas directamente en ``app/``; con más
+                se atribuyen a ``app/`` las que hacen las librerías que llama
+
+        Raises:
+            RuntimeError: Si tracemalloc ya está activo
+        """
+        if tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc ya está activo")
+        tracemalloc.start(frames)
+        logger.warning("tracemalloc activado (frames=%s)", frames)
+
+    def stop(self) -> None:
+        """Desactivar tracemalloc y descartar las instantáneas."""
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.snapshots.clear()
+        logger.warning("tracemalloc desactivado")
+
+    def take_snapshot(self, name: str) -> dict:
+        """
+        Tomar una instantánea con nombre, filtrada al paquete ``app``.
+
+        Si se supera ``max_snapshots`` se descarta la más antigua.
+
+        Args:
+            name: Nombre de la instantánea (reemplaza a otra con el mismo nombre)
+
+        Returns:
+            Resumen de la instantánea
+
+        Raises:
+            RuntimeError: Si tracemalloc no está activo
+        """
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc no está activo")
+
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(True, os.path.join(APP_DIR, '*'), all_frames=True)]
+        )
+        current, peak = tracemalloc.get_traced_memory()
+
+        self.snapshots.pop(name, None)
+        self.snapshots[name] = {
+            'snapshot': snapshot,
+            'taken_at': datetime.utcnow().isoformat() + 'Z',
+            'traced_current': current,
+            'traced_peak': peak
+        }
+        while len(self.snapshots) > self.max_snapshots:
+            self.snapshots.popitem(last=False)
+
+        return self.describe(name)
+
+    def describe(self, name: str) -> dict:
+        """Metadatos de una instantánea."""
+        entry = self._get(name)
+        total = sum(trace.size for trace in entry['snapshot'].traces)
+        return {
+            'name': name,
+            'taken_at': entry['taken_at'],
+            'app_bytes': total,
+            'traced_current': entry['traced_current'],
+            'traced_peak': entry['traced_peak']
+        }
+
+    def list_snapshots(self) -> List[dict]:
+        """Metadatos de todas las instantáneas, de la más antigua a la más reciente."""
+        return [self.describe(name) for name in self.snapshots]
+
+    def top(self, name: str, limit: int = 20, group_by: str = 'lineno') -> List[dict]:
+        """
+        Puntos de asignación con más memoria viva en una instantánea.
+
+        Args:
+            name: Nombre de la instantánea
+            limit: Número máximo de entradas
+            group_by: lineno o filename
+
+        Returns:
+            Lista de entradas ordenadas por tamaño
+        """
+        groups = _attribute(self._get(name)['snapshot'], self._check_group_by(group_by))
+        entries = [_entry(key, size, count) for key, (size, count) in groups.items()]
+        entries.sort(key=lambda entry: entry['size'], reverse=True)
+        return entries[:limit]
+
+    def diff(self, base: str, target: str, limit: int = 20, group_by: str = 'lineno') -> List[dict]:
+        """
+        Diferencia entre dos instantáneas (target - base).
+
+        Args:
+            base: Instantánea de referencia
+            target: Instantánea posterior
+            limit: Número máximo de entradas
+            group_by: lineno o filename
+
+        Returns:
+            Lista de entradas ordenadas por el valor absoluto del crecimiento
+        """
+        group_by = self._check_group_by(group_by)
+        before = _attribute(self._get(base)['snapshot'], group_by)
+        after = _attribute(self._get(target)['snapshot'], group_by)
+
+        entries = []
+        for key in before.keys() | after.keys():
+            size, count = after.get(key, (0, 0))
+            old_size, old_count = before.get(key, (0, 0))
+            entry = _entry(key, size, count)
+            entry['size_diff'] = size - old_size
+            entry['count_diff'] = count - old_count
+            if entry['size_diff'] or entry['count_diff']:
+                entries.append(entry)
+
+        entries.sort(key=lambda entry: (abs(entry['size_diff']), entry['size']), reverse=True)
+        return entries[:limit]
+
+    def _get(self, name: str) -> dict:
+        try:
+            return self.snapshots[name]
+        except KeyError:
+            raise KeyError(f"No existe la instantánea '{name}'")
+
+    @staticmethod
+    def _check_group_by(group_by: str) -> str:
+        if group_by not in GROUP_BY:
+            raise ValueError(f"group_by debe ser uno de: {', '.join(GROUP_BY)}")
+        return group_by
+
+
+def _attribute(snapshot, group_by: str) -> dict:
+    """
+    Agrupar las asignaciones por el frame más interno del paquete ``app``.
+
+    Así, la memoria que reservan pydantic, json o numpy se atribuye a la
+    línea de ``app/`` que los llamó (si la pila guardada llega hasta ella).
+    Las reservas del propio tracker (instantáneas) no se cuentan.
+
+    Returns:
+        Diccionario (fichero, línea) -> [bytes, bloques]
+    """
+    groups = {}
+    for trace in snapshot.traces:
+        frame = None
+        for candidate in trace.traceback:  # del más antiguo al más reciente
+            if candidate.filename.startswith(APP_DIR) and candidate.filename != _THIS_FILE:
+                frame = candidate
+        if frame is None:
+            continue
+        key = (frame.filename, frame.lineno if group_by == 'lineno' else 0)
+        group = groups.setdefault(key, [0, 0])
+        group[0] += trace.size
+        group[1] += 1
+    return groups
+
+
+def _entry(key, size: int, count: int) -> dict:
+    filename, lineno = key
+    return {
+        'file': os.path.relpath(filename, os.path.dirname(APP_DIR)),
+        'line': lineno,
+        'code': linecache.getline(filename, lineno).strip() if lineno else '',
+        'size': size,
+        'count': count,
+        'size_diff': None,
+        'count_diff': None
+    }
@@ -0,0 +1,31 @@
+"""
+Registro de métricas internas expuestas en el endpoint /metrics.
+
+Cada componente registra una función que devuelve un dict con su estado;
+el endpoint las evalúa en el momento de la consulta.
+"""
+
+from typing import Callable, Dict
+
+_collectors: Dict[str, Callable[[], dict]] = {}
+
+
+def register_collector(name: str, collector: Callable[[], dict]) -> None:
+    """
+    Registrar (o reemplazar) la función que informa de las métricas de un componente.
+    
+    Args:
+        name: Sección de métricas (p. ej. "logging")
+        collector: Función sin argumentos que devuelve un dict serializable
+    """
+    _collectors[name] = collector
+
+
+def collect() -> Dict[str, dict]:
+    """
+    Obtener las métricas actuales de todos los componentes registrados.
+    
+    Returns:
+        Dict sección -> métricas
+    """
+    return {name: collector() for name, collector in _collectors.items()}
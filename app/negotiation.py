@@ -0,0 +1,239 @@
+"""
+Negociación de contenido JSON / MessagePack.
+
+Con lotes grandes, codificar y decodificar JSON cuesta más que el propio
+cálculo. Los endpoints de la API aceptan cuerpos ``application/msgpack``
+(cabecera Content-Type) y los de lote y atrasos responden en MessagePack
+si el cliente lo pide en la cabecera Accept.
+
+La semántica es la misma que en JSON: el cuerpo MessagePack se decodifica
+al mismo dict que daría el JSON y se valida con los mismos esquemas. Como
+única diferencia de forma, en MessagePack los campos que el esquema declara
+como lista de objetos (``items``, ``segments``) pueden ir por columnas,
+como un mapa de arrays de la misma longitud::
+
+    {"items": {"pension_type": [...], "start_date": [...], ...}}
+
+El resto de campos, aunque sean mapas de listas (el ``overlay`` de una
+simulación), se pasan tal cual.
+
+y las respuestas MessagePack devuelven siempre así sus listas de objetos.
+Las fechas viajan como texto ISO, igual que en JSON.
+
+``msgpack`` es una dependencia opcional: sin ella los cuerpos MessagePack
+se rechazan con 415 y las respuestas son siempre JSON.
+"""
+
+from datetime import date
+from enum import Enum
+from typing import Callable, FrozenSet, List, Optional, Union, get_args, get_origin, get_type_hints
+
+from fastapi import HTTPException, Request, Response
+from fastapi.routing import APIRoute
+from pydantic import BaseModel
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - depende del entorno
+    msgpack = None
+
+MSGPACK_MEDIA_TYPE = 'application/msgpack'
+MSGPACK_MEDIA_TYPES = (MSGPACK_MEDIA_TYPE, 'application/x-msgpack')
+
+
+def msgpack_available() -> bool:
+    """Si está instalado el paquete msgpack."""
+    return msgpack is not None
+
+
+def is_msgpack(content_type: Optional[str]) -> bool:
+    """Si un Content-Type corresponde a MessagePack."""
+    if not content_type:
+        return False
+    return content_type.split(';', 1)[0].strip().lower() in MSGPACK_MEDIA_TYPES
+
+
+def accepts_msgpack(accept: Optional[str]) -> bool:
+    """
+    Decidir si responder en MessagePack según la cabecera Accept.
+
+    Gana el tipo con mayor calidad (q); a igualdad, el primero de la lista.
+    Sin msgpack instalado se responde siempre en JSON.
+
+    Args:
+        accept: Valor de la cabecera Accept
+
+    Returns:
+        True si el cliente prefiere MessagePack a JSON
+    """
+    if not accept or msgpack is None:
+        return False
+
+    best_msgpack, best_json = (-1.0, 0), (-1.0, 0)
+    for position, media_range in enumerate(accept.split(',')):
+        media_type, *params = [part.strip() for part in media_range.split(';')]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        # Mayor calidad y, a igualdad, menor posición
+        rank = (quality, -position)
+        media_type = media_type.lower()
+        if media_type in MSGPACK_MEDIA_TYPES:
+            best_msgpack = max(best_msgpack, rank)
+        elif media_type in ('application/json', 'application/*', '*/*'):
+            best_json = max(best_json, rank)
+
+    return best_msgpack[0] > 0 and best_msgpack > best_json
+
+
+def rows_from_columns(value):
+    """
+    Convertir un mapa de columnas (arrays de igual longitud) en lista de objetos.
+
+    Cualquier otro valor se devuelve sin cambios.
+    """
+    if not isinstance(value, dict) or not value:
+        return value
+    columns = list(value.values())
+    if not all(isinstance(column, list) for column in columns):
+        return value
+    length = len(columns[0])
+    if any(len(column) != length for column in columns):
+        raise ValueError("Las columnas deben tener todas la misma longitud")
+    names = list(value)
+    return [dict(zip(names, row)) for row in zip(*columns)]
+
+
+def row_list_fields(model) -> FrozenSet[str]:
+    """
+    Campos del primer nivel de un esquema declarados como lista de objetos.
+
+    Son los únicos que un cuerpo MessagePack puede enviar por columnas.
+
+    Args:
+        model: Esquema pydantic del cuerpo (cualquier otra cosa no tiene ninguno)
+    """
+    if not (isinstance(model, type) and issubclass(model, BaseModel)):
+        return frozenset()
+    return frozenset(name for name, annotation in get_type_hints(model).items() if _is_object_list(annotation))
+
+
+def _is_object_list(annotation) -> bool:
+    origin = get_origin(annotation)
+    if origin is Union:
+        return any(_is_object_list(arg) for arg in get_args(annotation) if arg is not type(None))
+    if origin in (list, List):
+        args = get_args(annotation)
+        return bool(args) and isinstance(args[0], type) and issubclass(args[0], BaseModel)
+    return False
+
+
+def columns_from_rows(rows: list, names: Optional[list] = None) -> dict:
+    """
+    Convertir una lista de objetos en un mapa de columnas.
+
+    Args:
+        rows: Dicts con las mismas claves
+        names: Columnas a extraer (por defecto las claves del primer objeto)
+
+    Returns:
+        Dict columna -> lista de valores
+    """
+    names = names if names is not None else (list(rows[0]) if rows else [])
+    return {name: [row[name] for row in rows] for name in names}
+
+
+def columnar(data: dict) -> dict:
+    """Pasar a columnas las listas de objetos del primer nivel de una respuesta."""
+    return {
+        key: columns_from_rows(value) if value and isinstance(value, list) and isinstance(value[0], dict) else value
+        for key, value in data.items()
+    }
+
+
+def _default(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    raise TypeError(f"Tipo no serializable en MessagePack: {type(value).__name__}")
+
+
+def encode_msgpack(data) -> bytes:
+    """Codificar en MessagePack (fechas como texto ISO)."""
+    return msgpack.packb(data, default=_default, use_bin_type=True)
+
+
+def decode_msgpack(body: bytes, row_fields: FrozenSet[str] = frozenset()):
+    """
+    Decodificar un cuerpo MessagePack, expandiendo las listas por columnas
+    de los campos del primer nivel indicados.
+
+    Args:
+        body: Cuerpo MessagePack
+        row_fields: Campos que pueden venir por columnas (ver row_list_fields)
+
+    Raises:
+        ValueError: Si el cuerpo no es MessagePack válido o las columnas no cuadran
+    """
+    try:
+        data = msgpack.unpackb(body, raw=False, strict_map_key=False)
+    except Exception as e:
+        raise ValueError(f"Cuerpo MessagePack inválido: {e or type(e).__name__}") from e
+    if isinstance(data, dict) and row_fields:
+        data = {key: rows_from_columns(value) if key in row_fields else value for key, value in data.items()}
+    return data
+
+
+class MsgpackRequest(Request):
+    """
+    Petición con cuerpo MessagePack presentada a FastAPI como JSON ya
+    decodificado: ``json()`` devuelve el dict del cuerpo MessagePack, de
+    modo que la validación es la misma que la de un cuerpo JSON.
+    """
+
+    def __init__(self, request: Request, row_fields: FrozenSet[str] = frozenset()):
+        self.row_fields = row_fields
+        headers = [
+            (name, b'application/json' if name == b'content-type' else value)
+            for name, value in request.scope['headers']
+        ]
+        super().__init__({**request.scope, 'headers': headers}, request.receive)
+
+    async def json(self):
+        if not hasattr(self, '_json'):
+            try:
+                self._json = decode_msgpack(await self.body(), self.row_fields)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+        return self._json
+
+
+class MsgpackRoute(APIRoute):
+    """Ruta que acepta cuerpos MessagePack además de JSON."""
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        row_fields = row_list_fields(_body_model(self.body_field))
+
+        async def route_handler(request: Request) -> Response:
+            if is_msgpack(request.headers.get('content-type')):
+                if msgpack is None:
+                    raise HTTPException(status_code=415, detail="MessagePack no disponible en este servidor")
+                request = MsgpackRequest(request, row_fields)
+            return await handler(request)
+
+        return route_handler
+
+
+def _body_model(body_field):
+    """Esquema del cuerpo de una ruta (None si no tiene cuerpo)."""
+    if body_field is None:
+        return None
+    model = getattr(body_field, 'type_', None)
+    return model if model is not None else body_field.field_info.annotation
@@ -0,0 +1,150 @@
+"""
+Descarga del trabajo de cálculo fuera del bucle de eventos.
+
+Los endpoints son ``async def`` pero el servicio es síncrono y de CPU: un
+lote grande ejecutado en línea bloquea todas las demás conexiones del
+worker. ``ServiceOffloader`` estima el coste de cada llamada y:
+
+- por debajo del umbral la ejecuta en línea (despachar a un pool cuesta
+  más que el propio cálculo);
+- por encima la envía a un pool de hilos o de procesos.
+
+Con hilos el cálculo comparte el GIL, pero el intérprete alterna entre
+hilos cada pocos milisegundos, así que las peticiones pequeñas siguen
+avanzando. Con procesos el cálculo es realmente paralelo; cada proceso
+tiene su propia instancia del servicio y solo viajan argumentos y
+resultado.
+"""
+
+import asyncio
+import contextvars
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
+from .config import env_int, env_str
+
+logger = logging.getLogger('app.offload')
+
+OFFLOAD_MODES = ('thread', 'process', 'off')
+
+# Instancia del servicio en cada proceso del pool (ver _call_in_worker)
+_worker_service = None
+
+
+def _init_worker() -> None:
+    global _worker_service
+    from .cache import cache_from_env
+    from .services import ComplementoPaternidadService
+    _worker_service = ComplementoPaternidadService(cache=cache_from_env())
+
+
+def _call_in_worker(method: str, args: tuple, kwargs: dict):
+    return getattr(_worker_service, method)(*args, **kwargs)
+
+
+class ServiceOffloader:
+    """Ejecuta métodos del servicio en línea o en un pool según su coste estimado."""
+
+    def __init__(self, service, mode: str = 'thread', threshold: int = 200,
+                 threads: int = 4, processes: Optional[int] = None):
+        if mode not in OFFLOAD_MODES:
+            raise ValueError(f"Modo de descarga inválido '{mode}' (se espera {', '.join(OFFLOAD_MODES)})")
+        self.service = service
+        self.mode = mode
+        self.threshold = threshold
+        self.threads = threads
+        self.processes = processes or os.cpu_count() or 1
+        self._pool = None
+        self.inline = 0
+        self.offloaded = 0
+        self.in_pool = 0
+
+    @classmethod
+    def from_env(cls, service) -> "ServiceOffloader":
+        """
+        Crear el despachador con OFFLOAD_MODE (thread, process u off),
+        OFFLOAD_THRESHOLD, OFFLOAD_THREADS y OFFLOAD_PROCESSES.
+        """
+        return cls(
+            service,
+            mode=env_str('OFFLOAD_MODE', 'thread'),
+            threshold=env_int('OFFLOAD_THRESHOLD', 200),
+            threads=env_int('OFFLOAD_THREADS', 4),
+            processes=env_int('OFFLOAD_PROCESSES', 0) or None
+        )
+
+    async def call(self, cost: int, method: str, *args, **kwargs):
+        """
+        Ejecutar ``service.<method>(*args, **kwargs)``.
+
+        Args:
+            cost: Coste estimado (unidades equivalentes a un pensionista de lote)
+            method: Nombre del método del servicio
+            args: Argumentos posicionales (deben ser serializables en modo process)
+            kwargs: Argumentos con nombre
+
+        Returns:
+            Resultado del método
+        """
+        if self.mode == 'off' or cost < self.threshold:
+            self.inline += 1
+            return getattr(self.service, method)(*args, **kwargs)
+
+        loop = asyncio.get_running_loop()
+        pool = self._get_pool()
+        self.offloaded += 1
+        self.in_pool += 1
+        try:
+            if self.mode == 'process':
+                return await loop.run_in_executor(pool, _call_in_worker, method, args, kwargs)
+            # Con hilos se copia el contexto para conservar la traza de la petición
+            context = contextvars.copy_context()
+            function = getattr(self.service, method)
+            return await loop.run_in_executor(pool, lambda: context.run(function, *args, **kwargs))
+        finally:
+            self.in_pool -= 1
+
+    def _get_pool(self):
+        if self._pool is None:
+            if self.mode == 'process':
+                # spawn: no se hereda el estado del bucle de eventos ni de los hilos del padre
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker
+                )
+            else:
+                self._pool = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix='offload')
+            logger.info("Pool de descarga creado (%s)", self.mode)
+        return self._pool
+
+    def recycle(self) -> None:
+        """
+        Sustituir el pool de procesos por uno nuevo (p. ej. tras recargar las
+        reglas, que cada proceso carga al arrancar). Las llamadas en curso
+        terminan en los procesos anteriores; las siguientes crean el pool nuevo.
+        """
+        if self.mode == 'process' and self._pool is not None:
+            pool, self._pool = self._pool, None
+            pool.shutdown(wait=False)
+            logger.info("Pool de procesos renovado")
+    
+    def shutdown(self) -> None:
+        """Cerrar el pool (si se llegó a crear)."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def stats(self) -> dict:
+        """Estado para /metrics."""
+        return {
+            'mode': self.mode,
+            'threshold': self.threshold,
+            'pool_size': self.processes if self.mode == 'process' else self.threads,
+            'inline': self.inline,
+            'offloaded': self.offloaded,
+            'in_pool': self.in_pool
+        }
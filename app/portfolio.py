@@ -0,0 +1,716 @@
+"""
+Cartera de cálculos almacenada y su recálculo incremental.
+
+La cartera guarda en SQLite, por pensionista, los datos de entrada y el
+resultado calculado: período, versión de la tabla de importes,
+elegibilidad, importe y motivo. Guarda también el documento de las reglas
+con las que se calculó.
+
+Cuando cambian las reglas no se recalcula toda la cartera.
+``changed_intervals`` (app/rules.py) compara las dos versiones y devuelve
+los tramos de fechas de inicio en los que el resultado puede cambiar, con
+el período y la versión de importes antiguos de cada tramo. El índice de
+dependencias ``(period, rate_version, start_date)`` localiza exactamente
+esos registros. Solo esos registros se recalculan con el motor
+vectorizado, y el informe de diferencias contiene solo los que cambian.
+
+Por ejemplo, revalorizar el importe por hijo del período 2 afecta solo a
+los registros del período 2; los del período 1 no se leen.
+
+Los totales por período, tipo de pensión y número de hijos se mantienen en
+``portfolio_rollup`` con disparadores, en la misma transacción que cada
+escritura o recálculo. ``summary`` agrupa esos contadores (como mucho una
+fila por combinación), sin recorrer los registros; ``rebuild_rollup`` los
+reconstruye desde los registros y comprueba que cuadraban. ``forecast``
+da la previsión mensual de pagos de la cartera (ver app/forecast.py).
+
+``start_dates`` responde a consultas por rango de fechas de inicio con un
+índice ordenado en memoria (ver app/start_index.py). Unos disparadores
+anotan cada cambio en ``calculations_log`` y cada proceso funde en su
+índice, como un lote, los cambios que aún no ha leído. ``simulate``
+calcula toda la cartera con unas reglas modificadas sin aplicarlas (ver
+app/simulation.py).
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import date
+from typing import Iterable, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from .config import env_str
+from .engine import (
+    REASON_NAMES, REASON_OK, PERIODS, PENSION_TYPE_CODES, encode_dates, encode_pension_types, round_cents
+)
+from .forecast import forecast_payouts
+from .rules import CompiledRules, RulesError, changed_intervals, compile_rules, publisher
+from .schemas import PensionType, PeriodType, MIN_START_DATE, MIN_CHILDREN, MAX_CHILDREN
+from .simulation import DEFAULT_SAMPLE_SIZE, apply_overlay, simulate
+from .start_index import StartDateIndex
+
+logger = logging.getLogger('app.portfolio')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS calculations (
+    key TEXT PRIMARY KEY,
+    pension_type TEXT NOT NULL,
+    start_date TEXT NOT NULL,
+    num_children INTEGER NOT NULL,
+    pension_amount REAL NOT NULL,
+    period TEXT,
+    rate_version TEXT,
+    eligible INTEGER NOT NULL,
+    amount REAL NOT NULL,
+    reason TEXT
+);
+CREATE INDEX IF NOT EXISTS calculations_dependency ON calculations (period, rate_version, start_date);
+CREATE TABLE IF NOT EXISTS portfolio_meta (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+
+-- Contadores por (período, tipo, hijos), mantenidos por disparadores en la
+-- misma transacción que cada escritura. Fuera de rango: período ''.
+-- Importes en céntimos para que las sumas sean exactas.
+CREATE TABLE IF NOT EXISTS portfolio_rollup (
+    period TEXT NOT NULL,
+    pension_type TEXT NOT NULL,
+    num_children INTEGER NOT NULL,
+    records INTEGER NOT NULL,
+    eligible INTEGER NOT NULL,
+    amount_cents INTEGER NOT NULL,
+    PRIMARY KEY (period, pension_type, num_children)
+);
+CREATE TRIGGER IF NOT EXISTS calculations_rollup_insert AFTER INSERT ON calculations BEGIN
+    INSERT INTO portfolio_rollup
+    VALUES (coalesce(NEW.period, ''), NEW.pension_type, NEW.num_children, 1, NEW.eligible,
+            CAST(round(NEW.amount * 100) AS INTEGER))
+    ON CONFLICT (period, pension_type, num_children) DO UPDATE SET
+        records = records + 1, eligible = eligible + excluded.eligible,
+        amount_cents = amount_cents + excluded.amount_cents;
+END;
+CREATE TRIGGER IF NOT EXISTS calculations_rollup_delete AFTER DELETE ON calculations BEGIN
+    UPDATE portfolio_rollup SET
+        records = records - 1, eligible = eligible - OLD.eligible,
+        amount_cents = amount_cents - CAST(round(OLD.amount * 100) AS INTEGER)
+    WHERE period = coalesce(OLD.period, '') AND pension_type = OLD.pension_type
+      AND num_children = OLD.num_children;
+END;
+CREATE TRIGGER IF NOT EXISTS calculations_rollup_update AFTER UPDATE ON calculations BEGIN
+    UPDATE portfolio_rollup SET
+        records = records - 1, eligible = eligible - OLD.eligible,
+        amount_cents = amount_cents - CAST(round(OLD.amount * 100) AS INTEGER)
+    WHERE period = coalesce(OLD.period, '') AND pension_type = OLD.pension_type
+      AND num_children = OLD.num_children;
+    INSERT INTO portfolio_rollup
+    VALUES (coalesce(NEW.period, ''), NEW.pension_type, NEW.num_children, 1, NEW.eligible,
+            CAST(round(NEW.amount * 100) AS INTEGER))
+    ON CONFLICT (period, pension_type, num_children) DO UPDATE SET
+        records = records + 1, eligible = eligible + excluded.eligible,
+        amount_cents = amount_cents + excluded.amount_cents;
+END;
+
+-- Cambios por (tipo, fecha de inicio) para el índice de fechas en memoria
+-- (ver app/start_index.py): cada proceso funde los que aún no ha leído.
+CREATE TABLE IF NOT EXISTS calculations_log (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    pension_type TEXT NOT NULL,
+    start_date TEXT NOT NULL,
+    records INTEGER NOT NULL,
+    eligible INTEGER NOT NULL,
+    amount_cents INTEGER NOT NULL
+);
+CREATE TRIGGER IF NOT EXISTS calculations_log_insert AFTER INSERT ON calculations BEGIN
+    INSERT INTO calculations_log (pension_type, start_date, records, eligible, amount_cents)
+    VALUES (NEW.pension_type, NEW.start_date, 1, NEW.eligible, CAST(round(NEW.amount * 100) AS INTEGER));
+END;
+CREATE TRIGGER IF NOT EXISTS calculations_log_delete AFTER DELETE ON calculations BEGIN
+    INSERT INTO calculations_log (pension_type, start_date, records, eligible, amount_cents)
+    VALUES (OLD.pension_type, OLD.start_date, -1, -OLD.eligible, -CAST(round(OLD.amount * 100) AS INTEGER));
+END;
+CREATE TRIGGER IF NOT EXISTS calculations_log_update AFTER UPDATE ON calculations BEGIN
+    INSERT INTO calculations_log (pension_type, start_date, records, eligible, amount_cents)
+    VALUES (OLD.pension_type, OLD.start_date, -1, -OLD.eligible, -CAST(round(OLD.amount * 100) AS INTEGER)),
+           (NEW.pension_type, NEW.start_date, 1, NEW.eligible, CAST(round(NEW.amount * 100) AS INTEGER));
+END;
+"""
+
+# Filas por bloque al leer columnas de toda la cartera
+READ_BLOCK_ROWS = 100000
+
+# Dtype de las columnas de entrada leídas para cálculos en bloque
+_INPUT_DTYPE = [
+    ('pension_type', 'U32'), ('start_date', 'datetime64[D]'),
+    ('num_children', 'i8'), ('pension_amount', 'f8')
+]
+
+# Cambios que se conservan en calculations_log; un índice que se quede más
+# atrás se reconstruye desde los registros
+LOG_RETENTION = 200000
+
+# Dimensiones de los contadores (y de GET /portfolio/summary)
+SUMMARY_DIMENSIONS = ('period', 'pension_type', 'num_children')
+
+INPUT_FIELDS = ('key', 'pension_type', 'start_date', 'num_children', 'pension_amount')
+RESULT_FIELDS = ('period', 'rate_version', 'eligible', 'amount', 'reason')
+
+_PERIOD_TEXT = [period.value if period else None for period in PERIODS]
+_REASON_TEXT = [None] + list(REASON_NAMES[1:])
+
+
+def evaluate(rules: CompiledRules, rows: List[tuple]) -> List[tuple]:
+    """
+    Calcular en bloque el resultado almacenable de varios pensionistas.
+
+    Args:
+        rules: CompiledRules a aplicar
+        rows: Tuplas (pension_type, start_date, num_children, pension_amount)
+            con fechas date
+
+    Returns:
+        Tuplas (period, rate_version, eligible, amount, reason) en el mismo orden
+    """
+    if not rows:
+        return []
+    pension_types, start_dates, children, amounts = zip(*rows)
+    ordinals = encode_dates(start_dates)
+    engine = rules.engine
+    period_codes = engine.periods(ordinals)
+    reasons, complements = engine.calculate(
+        encode_pension_types(pension_types), period_codes,
+        np.array(children, dtype=np.int64), np.array(amounts, dtype=np.float64)
+    )
+
+    rate_starts = np.array([start.toordinal() for start in rules.rate_version_starts], dtype=np.int64)
+    rate_ids = [None] + [version for _, version in rules.rate_versions]
+    rate_positions = np.searchsorted(rate_starts, ordinals, side='right')
+
+    return [
+        (_PERIOD_TEXT[period], rate_ids[position], int(reason == REASON_OK),
+         amount if reason == REASON_OK else 0.0, _REASON_TEXT[reason])
+        for period, position, reason, amount in zip(
+            period_codes.tolist(), rate_positions.tolist(), reasons.tolist(), round_cents(complements).tolist()
+        )
+    ]
+
+
+def _parse_record(index: int, record: dict) -> tuple:
+    """Validar un registro de entrada con los límites de CalculationRequest."""
+    try:
+        start_date = record['start_date']
+        if not isinstance(start_date, date):
+            start_date = date.fromisoformat(start_date)
+        row = (
+            str(record['key']), PensionType(record['pension_type']).value, start_date,
+            int(record['num_children']), float(record['pension_amount'])
+        )
+    except (KeyError, ValueError, TypeError) as e:
+        raise ValueError(f"Registro {index}: {e}") from e
+    if row[2] < MIN_START_DATE:
+        raise ValueError(f"Registro {index}: la fecha debe ser posterior al {MIN_START_DATE}")
+    if not MIN_CHILDREN <= row[3] <= MAX_CHILDREN:
+        raise ValueError(f"Registro {index}: el número de hijos debe estar entre {MIN_CHILDREN} y {MAX_CHILDREN}")
+    if not row[4] > 0:
+        raise ValueError(f"Registro {index}: la cuantía debe ser mayor que 0")
+    return row
+
+
+def _read_columns(conn: sqlite3.Connection, query: str, dtype: list) -> np.ndarray:
+    """Leer una consulta como array estructurado, por bloques de filas."""
+    cursor = conn.execute(query)
+    blocks = []
+    while True:
+        rows = cursor.fetchmany(READ_BLOCK_ROWS)
+        if not rows:
+            break
+        blocks.append(np.array(rows, dtype=dtype))
+    return np.concatenate(blocks) if blocks else np.empty(0, dtype=dtype)
+
+
+def _type_codes(names: np.ndarray) -> np.ndarray:
+    """Códigos de tipo de pensión de un array de textos, comparando por tipo."""
+    codes = np.zeros(len(names), dtype=np.int8)
+    for pension_type, code in PENSION_TYPE_CODES.items():
+        codes[names == pension_type.value] = code
+    return codes
+
+
+class PortfolioStore:
+    """Cartera de cálculos en un fichero SQLite."""
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Fichero SQLite (se crea si no existe)
+        """
+        self.path = path
+        # Escrituras y recálculos de este proceso, de uno en uno
+        self._lock = threading.Lock()
+        self.last_report: Optional[dict] = None
+        self._applied = None
+        # Índice de fechas de inicio y último cambio del registro fundido
+        self._index = StartDateIndex()
+        self._index_position: Optional[int] = None
+        self._index_lock = threading.Lock()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+            # Carteras anteriores a los contadores: se construyen una vez
+            has_records = conn.execute("SELECT EXISTS (SELECT 1 FROM calculations)").fetchone()[0]
+            has_rollup = conn.execute("SELECT EXISTS (SELECT 1 FROM portfolio_rollup)").fetchone()[0]
+            if has_records and not has_rollup:
+                self._rebuild_rollup(conn)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Conexión propia de cada operación, dentro de una transacción."""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _applied_rules(self, conn: sqlite3.Connection) -> Optional[CompiledRules]:
+        row = conn.execute("SELECT value FROM portfolio_meta WHERE name = 'rules'").fetchone()
+        if row is None:
+            return None
+        # Se compilan una vez por documento, no en cada escritura
+        if self._applied is None or self._applied[0] != row[0]:
+            self._applied = (row[0], compile_rules(json.loads(row[0]), source=f'{self.path} (reglas aplicadas)'))
+        return self._applied[1]
+
+    def applied_rules(self) -> Optional[CompiledRules]:
+        """Reglas con las que está calculada la cartera (None si está vacía)."""
+        with self._connect() as conn:
+            return self._applied_rules(conn)
+
+    def write(self, records: Iterable[dict], rules: CompiledRules) -> int:
+        """
+        Calcular y guardar (o sustituir) registros de la cartera.
+
+        Si la cartera estaba calculada con otras reglas, antes se recalcula
+        de forma incremental, para que toda ella use las mismas reglas.
+
+        Args:
+            records: Dicts con key, pension_type, start_date, num_children y pension_amount
+            rules: CompiledRules a aplicar
+
+        Returns:
+            Número de registros guardados
+
+        Raises:
+            ValueError: Si algún registro es inválido (no se guarda ninguno)
+        """
+        rows = [_parse_record(index, record) for index, record in enumerate(records)]
+        results = evaluate(rules, [row[1:] for row in rows])
+        with self._lock, self._connect() as conn:
+            self._recompute(conn, rules)
+            conn.executemany(
+                """
+                INSERT INTO calculations (key, pension_type, start_date, num_children, pension_amount,
+                                          period, rate_version, eligible, amount, reason)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (key) DO UPDATE SET
+                    pension_type = excluded.pension_type, start_date = excluded.start_date,
+                    num_children = excluded.num_children, pension_amount = excluded.pension_amount,
+                    period = excluded.period, rate_version = excluded.rate_version,
+                    eligible = excluded.eligible, amount = excluded.amount, reason = excluded.reason
+                """,
+                [(key, pension_type, start_date.isoformat(), children, amount) + result
+                 for (key, pension_type, start_date, children, amount), result in zip(rows, results)]
+            )
+            self._trim_log(conn)
+        return len(rows)
+
+    def recompute(self, rules: CompiledRules) -> dict:
+        """
+        Recalcular solo los registros afectados por el cambio a ``rules``.
+
+        Args:
+            rules: Reglas nuevas
+
+        Returns:
+            Informe: versiones, tramos afectados, registros recalculados y
+            diferencias (solo los registros cuyo resultado cambia)
+        """
+        with self._lock, self._connect() as conn:
+            report = self._recompute(conn, rules)
+            self._trim_log(conn)
+            return report
+
+    @staticmethod
+    def _trim_log(conn: sqlite3.Connection) -> None:
+        conn.execute(
+            "DELETE FROM calculations_log WHERE id <= (SELECT MAX(id) FROM calculations_log) - ?",
+            (LOG_RETENTION,)
+        )
+
+    def _recompute(self, conn: sqlite3.Connection, rules: CompiledRules) -> dict:
+        old = self._applied_rules(conn)
+        document = rules.document.json()
+        report = {
+            'from_version': old.version if old is not None else None,
+            'to_version': rules.version,
+            'intervals': [],
+            'recomputed': 0,
+            'changes': [],
+            'total_delta': 0.0
+        }
+        if old is not None and self._applied[0] == document:
+            return report
+
+        for start, end, period, rate_version in (changed_intervals(old, rules) if old is not None else []):
+            report['intervals'].append({
+                'start': start.isoformat(),
+                'end': end.isoformat() if end else None,
+                'period': period.value if period else None,
+                'rate_version': rate_version
+            })
+            query = (
+                "SELECT key, pension_type, start_date, num_children, pension_amount, period, eligible, amount "
+                "FROM calculations WHERE period IS ? AND rate_version IS ? AND start_date >= ?"
+            )
+            params = [period.value if period else None, rate_version, start.isoformat()]
+            if end is not None:
+                query += " AND start_date < ?"
+                params.append(end.isoformat())
+            affected = conn.execute(query, params).fetchall()
+            if not affected:
+                continue
+
+            results = evaluate(rules, [
+                (pension_type, date.fromisoformat(start_date), children, amount)
+                for _, pension_type, start_date, children, amount, *_ in affected
+            ])
+            conn.executemany(
+                "UPDATE calculations SET period = ?, rate_version = ?, eligible = ?, amount = ?, reason = ? "
+                "WHERE key = ?",
+                [result + (row[0],) for row, result in zip(affected, results)]
+            )
+            report['recomputed'] += len(affected)
+            for (key, _, start_date, _, _, old_period, old_eligible, old_amount), result in zip(affected, results):
+                new_period, _, new_eligible, new_amount, _ = result
+                if (old_period, old_eligible, old_amount) != (new_period, new_eligible, new_amount):
+                    report['changes'].append({
+                        'key': key,
+                        'start_date': start_date,
+                        'old_period': old_period,
+                        'new_period': new_period,
+                        'old_amount': old_amount,
+                        'new_amount': new_amount,
+                        'delta': round(new_amount - old_amount, 2)
+                    })
+
+        report['total_delta'] = round(sum(change['delta'] for change in report['changes']), 2)
+        self.last_report = report
+        conn.execute(
+            "INSERT INTO portfolio_meta (name, value) VALUES ('rules', ?) "
+            "ON CONFLICT (name) DO UPDATE SET value = excluded.value",
+            (document,)
+        )
+        if old is not None:
+            logger.info(
+                "Cartera recalculada %s -> %s: %s registros afectados, %s cambian (%s€)",
+                report['from_version'], report['to_version'], report['recomputed'],
+                len(report['changes']), report['total_delta']
+            )
+        return report
+
+    def summary(self, group_by: Sequence[str] = (), **filters) -> dict:
+        """
+        Totales de la cartera agrupados, a partir de los contadores.
+
+        Los contadores tienen como mucho una fila por (período, tipo, hijos),
+        así que el coste no depende del número de registros.
+
+        Args:
+            group_by: Dimensiones por las que agrupar (de SUMMARY_DIMENSIONS);
+                vacío para el total
+            filters: Valor de cada dimensión a la que restringir (period,
+                pension_type, num_children)
+
+        Returns:
+            Dict con los grupos (dimensiones agrupadas, registros, elegibles e
+            importe total), el total y la versión de las reglas aplicadas
+
+        Raises:
+            ValueError: Si alguna dimensión no existe
+        """
+        unknown = [name for name in list(group_by) + list(filters) if name not in SUMMARY_DIMENSIONS]
+        if unknown:
+            raise ValueError(
+                f"Dimensiones desconocidas: {', '.join(unknown)} (se admiten {', '.join(SUMMARY_DIMENSIONS)})"
+            )
+        with self._connect() as conn:
+            counters = conn.execute(
+                "SELECT period, pension_type, num_children, records, eligible, amount_cents "
+                "FROM portfolio_rollup WHERE records != 0"
+            ).fetchall()
+            applied = self._applied_rules(conn)
+
+        groups = {}
+        total = [0, 0, 0]
+        for period, pension_type, num_children, records, eligible, cents in counters:
+            values = {'period': period or None, 'pension_type': pension_type, 'num_children': num_children}
+            if any(values[name] != value for name, value in filters.items()):
+                continue
+            group = groups.setdefault(tuple(values[name] for name in group_by), [0, 0, 0])
+            for counts in (group, total):
+                counts[0] += records
+                counts[1] += eligible
+                counts[2] += cents
+
+        def totals(counts):
+            return {'records': counts[0], 'eligible': counts[1], 'total_amount': counts[2] / 100}
+
+        return {
+            'group_by': list(group_by),
+            'groups': [
+                {**dict(zip(group_by, key)), **totals(counts)}
+                for key, counts in sorted(groups.items(), key=lambda item: tuple(str(v) for v in item[0]))
+            ],
+            'total': totals(total),
+            'rules_version': applied.version if applied is not None else None
+        }
+
+    def forecast(self, first_month: date, months: int, rules: Optional[CompiledRules] = None) -> dict:
+        """
+        Previsión mensual del complemento a pagar a toda la cartera (ver
+        app/forecast.py). La cartera no guarda fechas de baja: cada
+        pensionista cobra hasta el final de la previsión.
+
+        Args:
+            first_month: Primer mes de la previsión
+            months: Meses de la previsión
+            rules: Reglas a aplicar (por defecto las aplicadas a la cartera,
+                o las publicadas si está vacía)
+
+        Returns:
+            Dict de ``forecast_payouts``
+        """
+        with self._connect() as conn:
+            population = _read_columns(
+                conn, "SELECT pension_type, start_date, num_children, pension_amount FROM calculations", _INPUT_DTYPE
+            )
+            if rules is None:
+                rules = self._applied_rules(conn) or publisher.current
+        return forecast_payouts(
+            rules, _type_codes(population['pension_type']), population['start_date'],
+            population['num_children'], population['pension_amount'], first_month, months
+        )
+
+    def simulate(self, overlay: dict, sample_size: int = DEFAULT_SAMPLE_SIZE) -> dict:
+        """
+        Simular un cambio de reglas sobre toda la cartera sin aplicarlo (ver
+        app/simulation.py). Ni las reglas publicadas ni los registros cambian.
+
+        Args:
+            overlay: Superposición sobre las reglas aplicadas a la cartera
+            sample_size: Registros cambiados a devolver como muestra
+
+        Returns:
+            Dict de ``simulate`` con la versión de partida en base_version
+
+        Raises:
+            RulesError: Si la superposición no es válida o la cartera está vacía
+        """
+        with self._connect() as conn:
+            base = self._applied_rules(conn)
+            if base is None:
+                raise RulesError("La cartera está vacía: no hay reglas aplicadas sobre las que simular")
+            rules = apply_overlay(base, overlay)
+            population = _read_columns(
+                conn,
+                "SELECT rowid, pension_type, start_date, num_children, pension_amount, eligible, amount "
+                "FROM calculations",
+                [('rowid', 'i8')] + _INPUT_DTYPE + [('eligible', '?'), ('amount', 'f8')]
+            )
+            result = simulate(
+                rules, population['rowid'], _type_codes(population['pension_type']),
+                population['start_date'].astype(np.int64), population['num_children'],
+                population['pension_amount'], population['eligible'], population['amount'], sample_size
+            )
+            # La muestra se identifica por rowid: solo se leen esas claves
+            rowids = [record['key'] for record in result['sample']]
+            keys = dict(conn.execute(
+                f"SELECT rowid, key FROM calculations WHERE rowid IN ({', '.join('?' * len(rowids))})", rowids
+            )) if rowids else {}
+        for record in result['sample']:
+            record['key'] = keys[record['key']]
+        return {'base_version': base.version, **result}
+
+    def start_dates(
+        self,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+        period: Optional[PeriodType] = None,
+        pension_types: Optional[Sequence[PensionType]] = None
+    ) -> dict:
+        """
+        Totales por tipo de pensión de los registros con fecha de inicio en
+        un rango, con el índice ordenado de fechas (ver app/start_index.py).
+
+        Antes de consultar se funden en el índice, como un lote, los cambios
+        de la cartera aún no leídos, también los de otros procesos.
+
+        Args:
+            date_from: Primera fecha de inicio (incluida)
+            date_to: Última fecha de inicio (incluida)
+            period: Restringir el rango a las fechas del período en las
+                reglas aplicadas
+            pension_types: Tipos de pensión a consultar (por defecto todos)
+
+        Returns:
+            Dict con el rango consultado, los totales por tipo de pensión, el
+            total y la versión de las reglas aplicadas
+        """
+        with self._index_lock:
+            with self._connect() as conn:
+                applied = self._sync_index(conn)
+            rule = None
+            if period is not None and applied is not None:
+                rule = next((rule for rule in applied.periods if rule.period == period), None)
+            if rule is not None:
+                date_from = max(date_from, rule.start) if date_from else rule.start
+                if rule.end is not None:
+                    date_to = min(date_to, rule.end) if date_to else rule.end
+            empty = (period is not None and rule is None) or (date_from and date_to and date_to < date_from)
+            groups = {} if empty else self._index.query(date_from, date_to, pension_types)
+
+        total = {'records': 0, 'eligible': 0, 'total_amount': 0.0}
+        for counts in groups.values():
+            total['records'] += counts['records']
+            total['eligible'] += counts['eligible']
+            total['total_amount'] += counts['total_amount']
+        total['total_amount'] = round(total['total_amount'], 2)
+        return {
+            'date_from': date_from,
+            'date_to': date_to,
+            'groups': [{'pension_type': name, **counts} for name, counts in groups.items()],
+            'total': total,
+            'rules_version': applied.version if applied is not None else None
+        }
+
+    def _sync_index(self, conn: sqlite3.Connection) -> Optional[CompiledRules]:
+        """Fundir en el índice los cambios nuevos del registro (o reconstruirlo)."""
+        # Lecturas en una misma transacción: registros y cambios coherentes
+        conn.execute("BEGIN")
+        first = conn.execute("SELECT MIN(id) FROM calculations_log").fetchone()[0]
+        if self._index_position is None or (first is not None and first > self._index_position + 1):
+            # Primera consulta, o el índice se quedó atrás de lo que conserva el registro
+            self._index.clear()
+            self._index.add(conn.execute(
+                "SELECT pension_type, start_date, COUNT(*), SUM(eligible), "
+                "SUM(CAST(round(amount * 100) AS INTEGER)) FROM calculations GROUP BY pension_type, start_date"
+            ))
+            self._index_position = conn.execute("SELECT COALESCE(MAX(id), 0) FROM calculations_log").fetchone()[0]
+            merged = self._index.merge()
+            logger.info("Índice de fechas de inicio de %s construido: %s fechas", self.path, merged)
+        else:
+            changes = conn.execute(
+                "SELECT id, pension_type, start_date, records, eligible, amount_cents "
+                "FROM calculations_log WHERE id > ? ORDER BY id", (self._index_position,)
+            ).fetchall()
+            if changes:
+                self._index.add(change[1:] for change in changes)
+                self._index_position = changes[-1][0]
+                self._index.merge()
+        return self._applied_rules(conn)
+
+    def rebuild_rollup(self) -> dict:
+        """
+        Reconstruir los contadores desde los registros y comprobarlos.
+
+        Returns:
+            Dict con los grupos y registros contados y las diferencias
+            encontradas con los contadores anteriores (ya corregidas)
+        """
+        with self._lock, self._connect() as conn:
+            return self._rebuild_rollup(conn)
+
+    def _rebuild_rollup(self, conn: sqlite3.Connection) -> dict:
+        expected = {
+            row[:3]: row[3:] for row in conn.execute(
+                "SELECT coalesce(period, ''), pension_type, num_children, COUNT(*), SUM(eligible), "
+                "SUM(CAST(round(amount * 100) AS INTEGER)) FROM calculations GROUP BY 1, 2, 3"
+            )
+        }
+        found = {
+            row[:3]: row[3:] for row in conn.execute(
+                "SELECT period, pension_type, num_children, records, eligible, amount_cents "
+                "FROM portfolio_rollup WHERE records != 0 OR eligible != 0 OR amount_cents != 0"
+            )
+        }
+        mismatches = [
+            {'period': key[0] or None, 'pension_type': key[1], 'num_children': key[2],
+             'expected': expected.get(key), 'found': found.get(key)}
+            for key in sorted(set(expected) | set(found))
+            if expected.get(key) != found.get(key)
+        ]
+        conn.execute("DELETE FROM portfolio_rollup")
+        conn.executemany(
+            "INSERT INTO portfolio_rollup VALUES (?, ?, ?, ?, ?, ?)",
+            [key + counts for key, counts in expected.items()]
+        )
+        if mismatches:
+            logger.warning("Contadores de la cartera %s corregidos: %s grupos distintos", self.path, len(mismatches))
+        return {
+            'groups': len(expected),
+            'records': sum(counts[0] for counts in expected.values()),
+            'mismatches': mismatches
+        }
+
+    def sync_rules(self) -> None:
+        """
+        Recalcular la cartera con las reglas publicadas (suscriptor de
+        RulesPublisher). Los errores se registran sin interrumpir la recarga.
+        """
+        try:
+            self.recompute(publisher.current)
+        except (sqlite3.Error, RulesError) as e:
+            logger.error("No se pudo recalcular la cartera %s: %s", self.path, e, exc_info=True)
+
+    def count(self) -> int:
+        """Número de registros de la cartera (de los contadores, sin recorrer la tabla)."""
+        with self._connect() as conn:
+            return conn.execute("SELECT coalesce(sum(records), 0) FROM portfolio_rollup").fetchone()[0]
+
+    def get(self, key: str) -> Optional[dict]:
+        """Registro de la cartera por clave (None si no existe)."""
+        with self._connect() as conn:
+            row = conn.execute(
+                f"SELECT {', '.join(INPUT_FIELDS + RESULT_FIELDS)} FROM calculations WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        record = dict(zip(INPUT_FIELDS + RESULT_FIELDS, row))
+        record['eligible'] = bool(record['eligible'])
+        return record
+
+    def stats(self) -> dict:
+        """Estado para /metrics: registros, último recálculo e índice de fechas."""
+        report = self.last_report
+        with self._index_lock:
+            index = {'position': self._index_position, 'types': self._index.stats()}
+        return {
+            'path': self.path,
+            'records': self.count(),
+            'last_recompute': {
+                'from_version': report['from_version'],
+                'to_version': report['to_version'],
+                'recomputed': report['recomputed'],
+                'changed': len(report['changes']),
+                'total_delta': report['total_delta']
+            } if report is not None else None,
+            'start_index': index
+        }
+
+
+def portfolio_from_env() -> Optional[PortfolioStore]:
+    """Cartera del fichero de PORTFOLIO_DB (None si no está configurada)."""
+    path = env_str('PORTFOLIO_DB')
+    return PortfolioStore(path) if path else None
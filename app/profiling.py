@@ -0,0 +1,265 @@
+"""
+Perfilado bajo demanda del worker en ejecución.
+
+Un administrador arma el perfilador para las próximas N peticiones o durante
+S segundos (o para una sola petición mediante cabecera). Mientras está
+activo se combinan dos fuentes:
+
+- cProfile (determinista) sobre el hilo del bucle de eventos, para las
+  estadísticas por función.
+- Un muestreador de pilas en un hilo aparte, que genera el formato
+  "collapsed stacks" que consumen flamegraph.pl, speedscope o inferno.
+
+Con el perfilador apagado el middleware solo comprueba un atributo.
+"""
+
+import asyncio
+import cProfile
+import io
+import itertools
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Optional
+
+from .config import env_float, env_str
+
+logger = logging.getLogger('app.profiling')
+
+PROFILE_HEADER = b'x-profile'
+
+
+class ProfileResult:
+    """Resultado de una sesión de perfilado."""
+
+    def __init__(self, profile_id: int, started_at: str, duration: float, requests: int,
+                 profile: cProfile.Profile, stacks: Counter):
+        self.id = profile_id
+        self.started_at = started_at
+        self.duration = duration
+        self.requests = requests
+        self.profile = profile
+        self.stacks = stacks
+        self.files = []
+
+    def stats_text(self, limit: int = 50) -> str:
+        """Estadísticas de cProfile ordenadas por tiempo acumulado."""
+        stream = io.StringIO()
+        pstats.Stats(self.profile, stream=stream).sort_stats('cumulative').print_stats(limit)
+        return stream.getvalue()
+
+    def collapsed(self) -> str:
+        """Pilas muestreadas en formato collapsed ("raíz;...;hoja cuenta")."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def dump(self, path: str) -> None:
+        """Guardar las estadísticas en formato binario de pstats (.prof)."""
+        self.profile.dump_stats(path)
+
+    def summary(self) -> dict:
+        """Metadatos de la sesión."""
+        return {
+            'id': self.id,
+            'started_at': self.started_at,
+            'duration_s': round(self.duration, 3),
+            'requests': self.requests,
+            'samples': sum(self.stacks.values()),
+            'files': self.files
+        }
+
+
+class StackSampler(threading.Thread):
+    """Hilo que muestrea periódicamente la pila de otro hilo."""
+
+    def __init__(self, thread_id: int, interval: float):
+        super().__init__(name='stack-sampler', daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(names))] += 1
+
+    def stop(self) -> Counter:
+        """Detener el muestreo y devolver las pilas acumuladas."""
+        self._stop_event.set()
+        self.join()
+        return self.stacks
+
+
+class ProfilerController:
+    """Estado del perfilador de este worker."""
+
+    def __init__(self, output_dir: Optional[str] = None, sample_interval: float = 0.005):
+        self.output_dir = output_dir
+        self.sample_interval = sample_interval
+        self.active = False
+        self.last: Optional[ProfileResult] = None
+        self._ids = itertools.count(1)
+        self._profile = None
+        self._sampler = None
+        self._started = 0.0
+        self._started_at = None
+        self._remaining_requests = None
+        self._requests = 0
+        self._timer = None
+        # Quién arrancó la sesión: None para las del administrador, o la
+        # marca de la petición que se perfila sola (cabecera X-Profile)
+        self.owner = None
+
+    @classmethod
+    def from_env(cls) -> "ProfilerController":
+        """Crear el controlador con PROFILE_OUTPUT_DIR y PROFILE_SAMPLE_INTERVAL."""
+        return cls(env_str('PROFILE_OUTPUT_DIR'), env_float('PROFILE_SAMPLE_INTERVAL', 0.005))
+
+    def start(self, requests: Optional[int] = None, seconds: Optional[float] = None, owner: object = None) -> None:
+        """
+        Activar el perfilador en el hilo actual (el del bucle de eventos).
+
+        Args:
+            requests: Detener tras este número de peticiones
+            seconds: Detener tras este número de segundos
+            owner: Marca de la petición dueña de la sesión (None = administrador)
+
+        Raises:
+            RuntimeError: Si ya hay una sesión activa
+        """
+        if self.active:
+            raise RuntimeError("Ya hay una sesión de perfilado activa")
+
+        self._profile = cProfile.Profile()
+        self._sampler = StackSampler(threading.get_ident(), self.sample_interval)
+        self._remaining_requests = requests
+        self._requests = 0
+        self.owner = owner
+        self._started = time.perf_counter()
+        self._started_at = datetime.utcnow().isoformat() + 'Z'
+        self.active = True
+
+        self._sampler.start()
+        self._profile.enable()
+
+        if seconds is not None:
+            self._timer = asyncio.get_running_loop().call_later(seconds, self.stop)
+
+        logger.warning("Perfilador activado (peticiones=%s, segundos=%s)", requests, seconds)
+
+    def request_finished(self, owner: object = None) -> Optional[ProfileResult]:
+        """
+        Contabilizar una petición perfilada y parar si se alcanzó el límite.
+
+        Solo cuentan las peticiones de la sesión de ``owner``: las que
+        terminan durante el perfilado de otra petición no lo detienen.
+        """
+        if not self.active or self.owner is not owner:
+            return None
+        self._requests += 1
+        if self._remaining_requests is not None:
+            self._remaining_requests -= 1
+            if self._remaining_requests <= 0:
+                return self.stop()
+        return None
+
+    def stop(self) -> Optional[ProfileResult]:
+        """Detener la sesión activa y guardar su resultado."""
+        if not self.active:
+            return None
+
+        self._profile.disable()
+        stacks = self._sampler.stop()
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self.active = False
+        self.owner = None
+
+        result = ProfileResult(
+            next(self._ids), self._started_at, time.perf_counter() - self._started,
+            self._requests, self._profile, stacks
+        )
+        if self.output_dir:
+            self._save(result)
+
+        self.last = result
+        self._profile = None
+        self._sampler = None
+
+        logger.warning("Perfilador detenido: sesión %s, %s peticiones", result.id, result.requests)
+        return result
+
+    def _save(self, result: ProfileResult) -> None:
+        os.makedirs(self.output_dir, exist_ok=True)
+        base = os.path.join(self.output_dir, f"profile-{os.getpid()}-{result.id}")
+        result.dump(base + ".prof")
+        with open(base + ".folded", 'w', encoding='utf-8') as handle:
+            handle.write(result.collapsed())
+        result.files = [base + ".prof", base + ".folded"]
+
+
+class ProfilingMiddleware:
+    """
+    Middleware ASGI que aplica el perfilador a las peticiones.
+
+    Con el perfilador apagado y sin token de administración configurado
+    no hace más que comprobar un atributo. Si hay token, una petición con
+    la cabecera ``X-Profile: <token>`` se perfila de forma aislada.
+    """
+
+    def __init__(self, app, controller: ProfilerController, header_token: Optional[str] = None):
+        self.app = app
+        self.controller = controller
+        self.header_token = header_token.encode() if header_token else None
+
+    async def __call__(self, scope, receive, send):
+        controller = self.controller
+
+        if controller.active:
+            await self.app(scope, receive, send)
+            if scope['type'] == 'http':
+                controller.request_finished()
+            return
+
+        if self.header_token is None or scope['type'] != 'http' or not self._requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        # Perfilado de esta única petición: se detiene al empezar la respuesta.
+        # La sesión es suya: ni otras peticiones ni este final paran otra
+        owner = object()
+        controller.start(requests=1, owner=owner)
+
+        async def send_with_profile_id(message):
+            if message['type'] == 'http.response.start':
+                result = controller.request_finished(owner)
+                if result is not None:
+                    headers = list(message.get('headers', []))
+                    headers.append((b'x-profile-id', str(result.id).encode()))
+                    message = {**message, 'headers': headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            if controller.owner is owner:
+                controller.stop()
+
+    def _requested(self, scope) -> bool:
+        for name, value in scope['headers']:
+            if name == PROFILE_HEADER:
+                return value == self.header_token
+        return False
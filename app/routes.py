@@ -2,25 +2,59 @@
 Endpoints REST para la API del Complemento de Paternidad.
 """
 
+import asyncio
 import logging
-from datetime import datetime
-from fastapi import APIRouter, HTTPException, Request
-from fastapi.responses import JSONResponse
+from datetime import date, datetime
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Request, WebSocket
+from fastapi.responses import JSONResponse, StreamingResponse, Response
 import json
 
 from .schemas import (
     EligibilityRequest, EligibilityResponse,
     CalculationRequest, CalculationResponse,
     RetroactiveRequest, RetroactiveResponse,
+    RetroactiveTimelineResponse, MAX_TIMELINE_PAGE,
+    RetroactiveSegmentsRequest, RetroactiveSegmentsResponse,
     CompareRequest, CompareResponse,
+    BatchCalculationRequest, BatchCalculationResponse,
+    SweepRequest, SweepResponse,
+    PensionType, PeriodType, PortfolioSummaryResponse, PortfolioStartsResponse,
+    ForecastResponse, MAX_FORECAST_MONTHS,
+    SimulationRequest, SimulationResponse,
     HealthResponse, ErrorResponse
 )
 from .services import ComplementoPaternidadService
+from .offload import ServiceOffloader
+from .cache import cache_from_env
+from .portfolio import portfolio_from_env
+from .forecast import parse_month
+from .rules import RulesError
+from .sessions import SessionManager
+from .coalescing import SingleFlight, request_key
 from .logging_config import get_logger
+from .metrics import collect as collect_metrics
+from .tracing import span, mark
+from .utils import count_month_steps, encode_cursor, decode_cursor, query_fingerprint
+from .negotiation import MsgpackRoute, MSGPACK_MEDIA_TYPE, accepts_msgpack, columnar, encode_msgpack
+from .arrow import ARROW_STREAM_MEDIA_TYPE, arrow_available, is_arrow_stream
 
 logger = get_logger('routes')
-router = APIRouter()
-service = ComplementoPaternidadService()
+# Todas las rutas aceptan también cuerpos MessagePack (ver app/negotiation.py)
+router = APIRouter(route_class=MsgpackRoute)
+service = ComplementoPaternidadService(cache=cache_from_env())
+offloader = ServiceOffloader.from_env(service)
+coalescer = SingleFlight()
+portfolio = portfolio_from_env()
+sessions = SessionManager.from_env(service)
+
+# Coste estimado de cada petición para decidir si se descarga a un pool
+# (ver app/offload.py). La unidad es un pensionista de lote (~10 µs);
+# la rejilla vectorizada cuesta bastante menos por punto.
+SWEEP_POINTS_PER_COST_UNIT = 100
+# En Arrow no se conoce el número de filas sin leer el flujo: ~30 bytes por
+# fila, así que 4 KiB son unas 100 filas vectorizadas
+ARROW_BYTES_PER_COST_UNIT = 4096
 
 # Los manejadores de excepciones se registrarán en la aplicación principal
 
@@ -40,6 +74,16 @@ async def health_check():
         version="1.0.0"
     )
 
+@router.get("/metrics")
+async def get_metrics():
+    """
+    Métricas internas de los componentes del servicio.
+    
+    Returns:
+        Dict sección -> métricas (p. ej. contadores del muestreo de logs)
+    """
+    return collect_metrics()
+
 @router.get("/eligibility", response_model=EligibilityResponse)
 async def check_eligibility(
     pension_type: str,
@@ -64,10 +108,11 @@ async def check_eligibility(
             num_children=num_children
         )
     except Exception as e:
-        logger.error(f"Error validando parámetros de elegibilidad: {str(e)}")
+        logger.error("Error validando parámetros de elegibilidad: %s", e)
         raise HTTPException(status_code=400, detail=f"Parámetros inválidos: {str(e)}")
     
-    logger.info(f"Verificando elegibilidad: {request_data.dict()}")
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("Verificando elegibilidad: %s", request_data.dict())
     
     result = service.check_eligibility(
         request_data.pension_type,
@@ -75,7 +120,8 @@ async def check_eligibility(
         request_data.num_children
     )
     
-    logger.info(f"Resultado elegibilidad: {result.dict()}")
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("Resultado elegibilidad: %s", result.dict())
     return result
 
 @router.post("/calculate", response_model=CalculationResponse)
@@ -89,25 +135,252 @@ async def calculate_complement(request: CalculationRequest):
     Returns:
         Cálculo detallado del complemento incluyendo período y cantidad
     """
-    logger.info(f"Calculando complemento: {request.dict()}")
+    mark("validation")
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("Calculando complemento: %s", request.dict())
     
+    key = request_key(
+        'calculate', service.rules.version, request.pension_type, request.start_date, request.num_children, request.pension_amount
+    )
     try:
+        body = await coalescer.run(key, lambda: _calculate_body(request))
+        return Response(content=body, media_type="application/json")
+        
+    except ValueError as e:
+        logger.error("Error en cálculo: %s", e)
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error("Error interno en cálculo: %s", e, exc_info=True)
+        raise HTTPException(status_code=500, detail="Error interno en el cálculo")
+
+async def _calculate_body(request: CalculationRequest) -> str:
+    """Calcular y serializar el complemento (una vez por grupo de peticiones idénticas)."""
+    with span("service"):
         result = service.calculate_complement(
             request.pension_type,
             request.start_date,
             request.num_children,
             request.pension_amount
         )
+    
+    logger.info("Complemento calculado: %s€", result.amount)
+    return _serialize(result)
+
+@router.post("/batch/calculate", response_model=BatchCalculationResponse)
+async def calculate_batch(request: BatchCalculationRequest, http_request: Request):
+    """
+    Calcular el complemento para un lote de pensionistas.
+    
+    Acepta y devuelve `application/msgpack` (con `items` y `results` por
+    columnas) además de JSON.
+    
+    Args:
+        request: Lista de pensionistas (máximo MAX_BATCH_SIZE por llamada)
+        
+    Returns:
+        Resultado por pensionista, en el orden de entrada, y totales del lote
+    """
+    mark("validation")
+    logger.info("Calculando lote de %s pensionistas", len(request.items))
+    
+    try:
+        with span("service"):
+            result = await offloader.call(
+                len(request.items), 'calculate_batch', [item.dict() for item in request.items]
+            )
+        
+        with span("response_model"):
+            response = BatchCalculationResponse(**result)
+        logger.info("Lote calculado: %s elegibles, %s€", response.eligible_count, response.total_amount)
+        return _negotiated_response(http_request, response)
+        
+    except Exception as e:
+        logger.error("Error calculando lote: %s", e, exc_info=True)
+        raise HTTPException(status_code=500, detail="Error interno calculando el lote")
+
+@router.post("/sweep", response_model=SweepResponse)
+async def sweep_scenarios(request: SweepRequest):
+    """
+    Evaluar el complemento sobre una rejilla de escenarios (qué pasaría si).
+    
+    Args:
+        request: Listas o rangos de fechas de inicio, hijos y cuantías
+        
+    Returns:
+        Ejes de la rejilla y array plano de importes listo para un mapa de calor
+    """
+    logger.info("Evaluando rejilla de escenarios para %s", request.pension_type)
+    
+    try:
+        axes = dict(
+            pension_amounts=request.pension_amounts,
+            pension_amount_range=request.pension_amount_range.dict() if request.pension_amount_range else None,
+            start_dates=request.start_dates,
+            start_date_range=request.start_date_range.dict() if request.start_date_range else None
+        )
+        cost = service.sweep_points(request.num_children, **axes) // SWEEP_POINTS_PER_COST_UNIT
+        result = await offloader.call(cost, 'sweep', request.pension_type, request.num_children, **axes)
         
-        logger.info(f"Complemento calculado: {result.amount}€")
-        return result
+        response = SweepResponse(**result)
+        logger.info("Rejilla evaluada: %s escenarios elegibles", response.eligible_count)
+        return response
         
     except ValueError as e:
-        logger.error(f"Error en cálculo: {str(e)}")
+        logger.error("Error en la rejilla de escenarios: %s", e)
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.error(f"Error interno en cálculo: {str(e)}", exc_info=True)
-        raise HTTPException(status_code=500, detail="Error interno en el cálculo")
+        logger.error("Error interno evaluando la rejilla: %s", e, exc_info=True)
+        raise HTTPException(status_code=500, detail="Error interno evaluando la rejilla")
+
+@router.post("/batch/arrow", response_class=Response)
+async def calculate_batch_arrow(http_request: Request, key: str = "id"):
+    """
+    Calcular el complemento sobre un flujo Arrow IPC de pensionistas.
+    
+    El cuerpo (`application/vnd.apache.arrow.stream`) lleva la columna
+    clave y pension_type, start_date, num_children y pension_amount. La
+    respuesta es otro flujo Arrow con la clave, period, eligible, amount y
+    reason, lote a lote y en el orden de entrada (ver app/arrow.py).
+    
+    Args:
+        key: Nombre de la columna clave que se devuelve con cada resultado
+        
+    Returns:
+        Flujo Arrow IPC de resultados
+    """
+    if not arrow_available():
+        raise HTTPException(status_code=415, detail="Arrow no disponible en este servidor")
+    if not is_arrow_stream(http_request.headers.get("content-type")):
+        raise HTTPException(status_code=415, detail=f"Se espera un cuerpo {ARROW_STREAM_MEDIA_TYPE}")
+    
+    body = await http_request.body()
+    mark("validation")
+    logger.info("Calculando flujo Arrow de %s bytes", len(body))
+    
+    try:
+        with span("service"):
+            content = await offloader.call(len(body) // ARROW_BYTES_PER_COST_UNIT, 'calculate_arrow', body, key)
+        return Response(content=content, media_type=ARROW_STREAM_MEDIA_TYPE)
+        
+    except ValueError as e:
+        logger.error("Error en el flujo Arrow: %s", e)
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error("Error interno calculando el flujo Arrow: %s", e, exc_info=True)
+        raise HTTPException(status_code=500, detail="Error interno calculando el flujo Arrow")
+
+@router.get("/portfolio/summary", response_model=PortfolioSummaryResponse)
+async def portfolio_summary(
+    group_by: str = "",
+    period: Optional[PeriodType] = None,
+    pension_type: Optional[PensionType] = None,
+    num_children: Optional[int] = None
+):
+    """
+    Totales de la cartera almacenada agrupados por período, tipo de pensión
+    y/o número de hijos, a partir de contadores mantenidos en cada escritura.
+    
+    Args:
+        group_by: Dimensiones separadas por comas (period, pension_type,
+            num_children); vacío para el total
+        period: Restringir a un período
+        pension_type: Restringir a un tipo de pensión
+        num_children: Restringir a un número de hijos
+        
+    Returns:
+        Registros, elegibles e importe total de cada grupo y en conjunto
+    """
+    if portfolio is None:
+        raise HTTPException(status_code=404, detail="Cartera no configurada (PORTFOLIO_DB)")
+    
+    dimensions = [name.strip() for name in group_by.split(",") if name.strip()]
+    filters = {
+        name: value for name, value in
+        (("period", period), ("pension_type", pension_type), ("num_children", num_children))
+        if value is not None
+    }
+    try:
+        return portfolio.summary(dimensions, **filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/portfolio/starts", response_model=PortfolioStartsResponse)
+async def portfolio_starts(
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    period: Optional[PeriodType] = None,
+    pension_type: Optional[PensionType] = None
+):
+    """
+    Registros, elegibles e importe por tipo de pensión de los pensionistas
+    de la cartera que empezaron en un rango de fechas, con búsqueda binaria
+    sobre un índice ordenado de fechas de inicio (ver app/start_index.py).
+    
+    Args:
+        date_from: Primera fecha de inicio (incluida)
+        date_to: Última fecha de inicio (incluida)
+        period: Restringir a las fechas de un período
+        pension_type: Restringir a un tipo de pensión
+        
+    Returns:
+        Totales de cada tipo de pensión y en conjunto
+    """
+    if portfolio is None:
+        raise HTTPException(status_code=404, detail="Cartera no configurada (PORTFOLIO_DB)")
+    if date_from and date_to and date_to < date_from:
+        raise HTTPException(status_code=400, detail="date_to es anterior a date_from")
+    
+    # Puede reconstruir el índice (un GROUP BY sobre toda la cartera): fuera del bucle de eventos
+    return await asyncio.to_thread(
+        portfolio.start_dates, date_from, date_to, period, [pension_type] if pension_type else None
+    )
+
+@router.post("/portfolio/simulate", response_model=SimulationResponse)
+async def portfolio_simulate(request: SimulationRequest):
+    """
+    Simular un cambio de reglas sobre toda la cartera almacenada sin
+    aplicarlo: ni las reglas publicadas ni los registros cambian (ver
+    app/simulation.py).
+    
+    Args:
+        request: Superposición sobre las reglas aplicadas y tamaño de la muestra
+        
+    Returns:
+        Totales antes y después, grupos con cambios y muestra de registros
+    """
+    if portfolio is None:
+        raise HTTPException(status_code=404, detail="Cartera no configurada (PORTFOLIO_DB)")
+    
+    try:
+        # Lee y calcula toda la cartera: fuera del bucle de eventos
+        return await asyncio.to_thread(portfolio.simulate, request.overlay, request.sample_size)
+    except RulesError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/portfolio/forecast", response_model=ForecastResponse)
+async def portfolio_forecast(start: Optional[str] = None, months: int = 12):
+    """
+    Previsión mensual del complemento a pagar a toda la cartera almacenada,
+    con un array de diferencias por mes (ver app/forecast.py).
+    
+    Args:
+        start: Primer mes (YYYY-MM); por defecto el mes en curso
+        months: Meses de la previsión (1-MAX_FORECAST_MONTHS)
+        
+    Returns:
+        Pensionistas que cobran e importe total de cada mes
+    """
+    if portfolio is None:
+        raise HTTPException(status_code=404, detail="Cartera no configurada (PORTFOLIO_DB)")
+    if not 1 <= months <= MAX_FORECAST_MONTHS:
+        raise HTTPException(status_code=400, detail=f"months debe estar entre 1 y {MAX_FORECAST_MONTHS}")
+    try:
+        first_month = parse_month(start) if start else date.today().replace(day=1)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # Lee toda la cartera: fuera del bucle de eventos
+    return await asyncio.to_thread(portfolio.forecast, first_month, months)
 
 @router.get("/retroactive", response_model=RetroactiveResponse)
 async def calculate_retroactive(
@@ -136,27 +409,208 @@ async def calculate_retroactive(
             num_children=num_children
         )
     except Exception as e:
-        logger.error(f"Error validando parámetros retroactivos: {str(e)}")
+        logger.error("Error validando parámetros retroactivos: %s", e)
         raise HTTPException(status_code=400, detail=f"Parámetros inválidos: {str(e)}")
     
-    logger.info(f"Calculando atrasos: {request_data.dict()}")
+    mark("validation")
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("Calculando atrasos: %s", request_data.dict())
     
+    key = request_key(
+        'retroactive', service.rules.version, request_data.start_date, request_data.end_date,
+        request_data.pension_amount, request_data.num_children
+    )
     try:
+        body = await coalescer.run(key, lambda: _retroactive_body(request_data))
+        return Response(content=body, media_type="application/json")
+        
+    except Exception as e:
+        logger.error("Error calculando atrasos: %s", e, exc_info=True)
+        raise HTTPException(status_code=500, detail="Error interno calculando atrasos")
+
+async def _retroactive_body(request_data: RetroactiveRequest) -> str:
+    """Calcular y serializar los atrasos (una vez por grupo de peticiones idénticas)."""
+    with span("service"):
         result = service.calculate_retroactive(
             request_data.start_date,
             request_data.end_date,
             request_data.pension_amount,
             request_data.num_children
         )
-        
+    
+    with span("response_model"):
         response = RetroactiveResponse(**result)
-        logger.info(f"Atrasos calculados: {response.total_amount}€ en {response.months_calculated} meses")
-        return response
+    logger.info("Atrasos calculados: %s€ en %s meses", response.total_amount, response.months_calculated)
+    return _serialize(response)
+
+@router.post("/retroactive/segments", response_model=RetroactiveSegmentsResponse)
+async def calculate_retroactive_segments(request: RetroactiveSegmentsRequest, http_request: Request):
+    """
+    Calcular atrasos con un historial de pensión por tramos.
+    
+    Acepta y devuelve `application/msgpack` (con `segments` por columnas)
+    además de JSON.
+    
+    Args:
+        request: Rango de fechas y tramos (effective_from, pension_amount, num_children)
+        
+    Returns:
+        Total de atrasos con desglose por períodos y por tramo homogéneo
+    """
+    mark("validation")
+    logger.info("Calculando atrasos por tramos: %s tramos", len(request.segments))
+    
+    try:
+        with span("service"):
+            result = await offloader.call(
+                len(request.segments),
+                'calculate_retroactive_segments',
+                request.start_date,
+                request.end_date,
+                [segment.dict() for segment in request.segments]
+            )
         
+        with span("response_model"):
+            response = RetroactiveSegmentsResponse(**result)
+        logger.info("Atrasos calculados: %s€ en %s meses", response.total_amount, response.months_calculated)
+        return _negotiated_response(http_request, response)
+        
+    except ValueError as e:
+        logger.error("Error en atrasos por tramos: %s", e)
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.error(f"Error calculando atrasos: {str(e)}", exc_info=True)
+        logger.error("Error calculando atrasos por tramos: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail="Error interno calculando atrasos")
 
+@router.get("/retroactive/timeline", response_model=RetroactiveTimelineResponse)
+async def retroactive_timeline(
+    request: Request,
+    start_date: str,
+    end_date: str,
+    pension_amount: float,
+    num_children: int,
+    limit: int = 120,
+    cursor: Optional[str] = None
+):
+    """
+    Desglose mensual de atrasos, paginado con cursor o en streaming NDJSON.
+    
+    Con la cabecera `Accept: application/x-ndjson` se devuelven en streaming
+    todos los meses restantes (desde el cursor, si se indica), una línea JSON
+    por mes, sin construir el desglose completo en memoria. Con
+    `Accept: application/msgpack` la página se devuelve en MessagePack, con
+    `items` por columnas.
+    
+    Args:
+        start_date: Fecha de inicio del período (YYYY-MM-DD)
+        end_date: Fecha de fin del período (YYYY-MM-DD)
+        pension_amount: Cuantía de la pensión en euros
+        num_children: Número de hijos
+        limit: Meses por página (1-MAX_TIMELINE_PAGE)
+        cursor: Cursor opaco devuelto por la página anterior
+        
+    Returns:
+        Página de meses con período, versión de la tabla de importes e importe
+    """
+    try:
+        request_data = RetroactiveRequest(
+            start_date=start_date,
+            end_date=end_date,
+            pension_amount=pension_amount,
+            num_children=num_children
+        )
+    except Exception as e:
+        logger.error("Error validando parámetros del desglose: %s", e)
+        raise HTTPException(status_code=400, detail=f"Parámetros inválidos: {str(e)}")
+    
+    if not 1 <= limit <= MAX_TIMELINE_PAGE:
+        raise HTTPException(status_code=400, detail=f"limit debe estar entre 1 y {MAX_TIMELINE_PAGE}")
+    
+    # Con la versión de las reglas: tras una recarga los cursores anteriores
+    # se rechazan en lugar de mezclar meses de dos versiones
+    fingerprint = query_fingerprint(
+        service.rules.version, request_data.start_date, request_data.end_date,
+        request_data.pension_amount, request_data.num_children
+    )
+    try:
+        start_index = decode_cursor(cursor, fingerprint) if cursor else 0
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if "application/x-ndjson" in request.headers.get("accept", ""):
+        months = service.iter_retroactive_months(
+            request_data.start_date,
+            request_data.end_date,
+            request_data.pension_amount,
+            request_data.num_children,
+            start_index=start_index
+        )
+        logger.info("Desglose de atrasos en streaming desde el mes %s", start_index)
+        # StreamingResponse consume los generadores síncronos en el pool de hilos
+        lines = (json.dumps(_timeline_item(month)) + "\n" for month in months)
+        return StreamingResponse(lines, media_type="application/x-ndjson")
+    
+    months = await offloader.call(
+        limit,
+        'retroactive_months_page',
+        request_data.start_date,
+        request_data.end_date,
+        request_data.pension_amount,
+        request_data.num_children,
+        start_index,
+        limit
+    )
+    items = [_timeline_item(month) for month in months]
+    months_in_range = count_month_steps(request_data.start_date, request_data.end_date)
+    next_index = start_index + len(items)
+    
+    logger.info("Desglose de atrasos: meses %s-%s de %s", start_index, next_index, months_in_range)
+    
+    response = RetroactiveTimelineResponse(
+        items=items,
+        months_in_range=months_in_range,
+        next_cursor=encode_cursor(next_index, fingerprint) if next_index < months_in_range else None
+    )
+    return _negotiated_response(request, response)
+
+def _json_response(model) -> Response:
+    """
+    Serializar un modelo de respuesta dentro de la fase "serialization".
+    
+    Devolver un Response ya construido evita que FastAPI vuelva a validar
+    el modelo contra response_model antes de codificarlo.
+    """
+    return Response(content=_serialize(model), media_type="application/json")
+
+def _negotiated_response(http_request: Request, model) -> Response:
+    """
+    Serializar un modelo en MessagePack (listas de objetos por columnas) si
+    el cliente lo prefiere según Accept, o en JSON.
+    """
+    if accepts_msgpack(http_request.headers.get("accept")):
+        with span("serialization"):
+            content = encode_msgpack(columnar(model.dict()))
+        return Response(content=content, media_type=MSGPACK_MEDIA_TYPE, headers={"Vary": "Accept"})
+    response = _json_response(model)
+    response.headers["Vary"] = "Accept"
+    return response
+
+def _serialize(model) -> str:
+    """Serializar un modelo a JSON dentro de la fase "serialization"."""
+    with span("serialization"):
+        return model.json()
+
+def _timeline_item(month: dict) -> dict:
+    """Serializar un mes del desglose a tipos JSON."""
+    return {
+        'index': month['index'],
+        'month': month['month'].isoformat(),
+        'period': month['period'].value if month['period'] else None,
+        'rate_version': month['rate_version'],
+        # Ya en céntimos: es el mismo importe mensual que suman los atrasos
+        'amount': month['amount']
+    }
+
 @router.post("/compare", response_model=CompareResponse)
 async def compare_progenitors(request: CompareRequest):
     """
@@ -168,22 +622,35 @@ async def compare_progenitors(request: CompareRequest):
     Returns:
         Resultado de la comparación indicando quién tiene derecho y por qué
     """
-    logger.info(f"Comparando progenitores: {request.progenitor_1.name} vs {request.progenitor_2.name}")
+    mark("validation")
+    logger.info("Comparando progenitores: %s vs %s", request.progenitor_1.name, request.progenitor_2.name)
     
     try:
         progenitor_1_data = request.progenitor_1.dict()
         progenitor_2_data = request.progenitor_2.dict()
         
-        result = service.compare_progenitors(progenitor_1_data, progenitor_2_data)
+        with span("service"):
+            result = service.compare_progenitors(progenitor_1_data, progenitor_2_data)
         
-        response = CompareResponse(**result)
-        logger.info(f"Resultado comparación: {response.eligible_progenitor} tiene derecho")
-        return response
+        with span("response_model"):
+            response = CompareResponse(**result)
+        logger.info("Resultado comparación: %s tiene derecho", response.eligible_progenitor)
+        return _json_response(response)
         
     except Exception as e:
-        logger.error(f"Error comparando progenitores: {str(e)}", exc_info=True)
+        logger.error("Error comparando progenitores: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail="Error interno en la comparación")
 
+@router.websocket("/ws")
+async def calculation_session(websocket: WebSocket):
+    """
+    Sesión de cálculo interactivo (ver app/sessions.py).
+    
+    El cliente envía mensajes calculate/retroactive con solo los campos que
+    cambian y recibe cada resultado con el id del mensaje.
+    """
+    await sessions.serve(websocket)
+
 @router.get("/spec")
 async def get_openapi_spec():
     """
@@ -0,0 +1,548 @@
+"""
+Reglas del complemento cargadas desde un fichero de datos versionado.
+
+La normativa (períodos, tipos de pensión con derecho, mínimos y máximos de
+hijos, porcentajes e importes) vive en ``app/rules.json`` (o en el fichero
+de RULES_FILE). Al arrancar se valida con ``RulesFile`` y se compila en
+estructuras planas: para cada período un conjunto de tipos admitidos, una
+tabla indexada por número de hijos y una función de cálculo ya
+especializada. Las peticiones solo consultan esas tablas; ninguna vuelve a
+recorrer las condiciones de la normativa.
+
+Las reglas se pueden recargar sin reiniciar el worker (``RulesPublisher``):
+la versión nueva se lee y compila fuera del camino de las peticiones y se
+publica sustituyendo una única referencia. ``RulesMiddleware`` fija en
+cada petición las reglas vigentes al llegar, así que las peticiones en
+curso terminan con la versión con la que empezaron.
+"""
+
+import bisect
+import json
+import logging
+import os
+import threading
+from contextvars import ContextVar
+from datetime import date, datetime, timedelta, timezone
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from pydantic import ValidationError
+
+from .config import env_float, env_str
+from .engine import (
+    VectorizedEngine, REASON_OK, REASON_OUT_OF_RANGE, REASON_PENSION_TYPE, REASON_MIN_CHILDREN, REASON_NAMES,
+    round_cents
+)
+from .schemas import PensionType, PeriodType, RulesFile, RulePeriod
+
+logger = logging.getLogger('app.rules')
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rules.json')
+
+# Fórmula compilada: (hijos, cuantía) -> (porcentaje, importe fijo por hijo, complemento)
+Formula = Callable[[int, float], Tuple[Optional[float], Optional[float], float]]
+
+
+class RulesError(ValueError):
+    """El fichero de reglas no existe, no es JSON o no supera la validación."""
+
+
+class Outcome(NamedTuple):
+    """
+    Resultado de un cálculo como valor: el complemento o el motivo por el
+    que no aplica, sin lanzar excepciones (ver ``CompiledRules.evaluate``).
+    """
+    rule: Optional['CompiledPeriod']
+    # Código de motivo de app/engine.py (REASON_OK si es elegible)
+    reason_code: int
+    reason: Optional[str] = None
+    percentage: Optional[float] = None
+    fixed: Optional[float] = None
+    amount: Optional[float] = None
+
+    @property
+    def eligible(self) -> bool:
+        return self.reason_code == REASON_OK
+
+    @property
+    def reason_name(self) -> Optional[str]:
+        """Nombre corto del motivo (REASON_NAMES), None si es elegible."""
+        return None if self.reason_code == REASON_OK else REASON_NAMES[self.reason_code]
+
+
+class CompiledPeriod:
+    """Reglas de un período listas para consultar."""
+
+    __slots__ = (
+        'period', 'name', 'start', 'end', 'description', 'eligible_types',
+        'eligible_types_text', 'own_min_children', 'min_children', 'max_children',
+        'percentages', 'fixed_per_child', 'calculate'
+    )
+
+    def __init__(self, rule: RulePeriod, global_min_children: int):
+        self.period = rule.period
+        self.name = rule.name
+        self.start = rule.start
+        self.end = rule.end
+        self.description = rule.description
+        self.eligible_types = frozenset(rule.eligible_pension_types)
+        self.eligible_types_text = rule.eligible_pension_types_text
+        self.own_min_children = rule.min_children
+        self.min_children = max(global_min_children, rule.min_children or 0)
+        self.max_children = rule.max_children
+
+        # Tablas indexadas por hijos computables (0..max_children)
+        calculation = rule.calculation
+        if calculation.method == 'percentage':
+            self.percentages = tuple(
+                calculation.percentages.get(children) for children in range(self.max_children + 1)
+            )
+            self.fixed_per_child = None
+        else:
+            self.percentages = None
+            self.fixed_per_child = calculation.amount_per_child
+        self.calculate = self._compile_formula()
+
+    def _compile_formula(self) -> Formula:
+        max_children = self.max_children
+        if self.percentages is not None:
+            percentages = self.percentages
+
+            def percentage(num_children: int, pension_amount: float):
+                percent = percentages[min(num_children, max_children)]
+                return percent, None, pension_amount * (percent / 100)
+            return percentage
+
+        amount_per_child = self.fixed_per_child
+
+        def fixed_per_child(num_children: int, pension_amount: float):
+            return None, amount_per_child, amount_per_child * min(num_children, max_children)
+        return fixed_per_child
+
+    def monthly_amount(self, num_children: int, pension_amount: float) -> float:
+        """
+        Complemento mensual en céntimos, tal como se abona cada mes.
+
+        Los atrasos multiplican este importe por los meses (y el calendario
+        mensual lo repite), así que el redondeo a céntimos se hace aquí una
+        sola vez. Es 0 si no se alcanza el mínimo de hijos.
+        """
+        if num_children < self.min_children:
+            return 0.0
+        return float(round_cents(self.calculate(num_children, pension_amount)[2]))
+
+    def signature(self) -> tuple:
+        """Todo lo que determina el resultado del período, salvo sus fechas."""
+        return (
+            self.period, self.eligible_types, self.own_min_children, self.min_children,
+            self.max_children, self.percentages, self.fixed_per_child
+        )
+
+
+class CompiledRules:
+    """Reglas completas compiladas a partir de un RulesFile."""
+
+    def __init__(self, rules: RulesFile, source: Optional[str] = None):
+        self.version = rules.version
+        self.source = source
+        self.document = rules
+        self.min_children = rules.min_children
+        self.periods: List[CompiledPeriod] = [CompiledPeriod(rule, rules.min_children) for rule in rules.periods]
+        self.by_period: Dict[PeriodType, CompiledPeriod] = {rule.period: rule for rule in self.periods}
+        self._starts = [rule.start for rule in self.periods]
+
+        self.rate_versions = [(version.effective_from, version.id) for version in rules.rate_versions]
+        self.rate_version_starts = [start for start, _ in self.rate_versions]
+
+        # Fechas en las que puede cambiar el importe mensual: inicios y fines
+        # de período e inicios de versión de la tabla de importes
+        boundaries = set(self.rate_version_starts)
+        for rule in self.periods:
+            boundaries.add(rule.start)
+            if rule.end is not None:
+                boundaries.add(rule.end + timedelta(days=1))
+        self.boundaries = sorted(boundaries)
+
+        # Tablas del motor vectorizado, compiladas junto con el resto
+        self.engine = VectorizedEngine(self)
+
+    def period_for(self, input_date: date) -> Optional[CompiledPeriod]:
+        """
+        Obtener el período vigente en una fecha.
+
+        Args:
+            input_date: Fecha a evaluar
+
+        Returns:
+            CompiledPeriod o None si la fecha está fuera de todos los períodos
+        """
+        position = bisect.bisect_right(self._starts, input_date)
+        if not position:
+            return None
+        rule = self.periods[position - 1]
+        if rule.end is not None and input_date > rule.end:
+            return None
+        return rule
+
+    def check(
+        self,
+        pension_type: PensionType,
+        start_date: date,
+        num_children: int
+    ) -> Tuple[Optional[CompiledPeriod], Optional[str]]:
+        """
+        Comprobar la elegibilidad.
+
+        Args:
+            pension_type: Tipo de pensión
+            start_date: Fecha de inicio de la pensión
+            num_children: Número de hijos
+
+        Returns:
+            Tupla (período, motivo): motivo es None si cumple los criterios;
+            período es None si la fecha está fuera de rango
+        """
+        rule, _, reason = self._check(pension_type, start_date, num_children)
+        return rule, reason
+
+    def _check(
+        self,
+        pension_type: PensionType,
+        start_date: date,
+        num_children: int
+    ) -> Tuple[Optional[CompiledPeriod], int, Optional[str]]:
+        rule = self.period_for(start_date)
+        if rule is None:
+            return None, REASON_OUT_OF_RANGE, "Fecha fuera del rango de aplicación del complemento"
+
+        if pension_type not in rule.eligible_types:
+            return (
+                rule, REASON_PENSION_TYPE,
+                f"En el {rule.name} solo aplica para {rule.eligible_types_text}, no {pension_type}"
+            )
+
+        if rule.own_min_children is not None and num_children < rule.own_min_children:
+            return (
+                rule, REASON_MIN_CHILDREN,
+                f"Para el {rule.name} se requieren al menos {rule.own_min_children} hijos (tiene {num_children})"
+            )
+
+        if num_children < self.min_children:
+            plural = '' if self.min_children == 1 else 's'
+            return (
+                rule, REASON_MIN_CHILDREN,
+                f"Debe tener al menos {self.min_children} hijo{plural} para optar al complemento"
+            )
+
+        return rule, REASON_OK, None
+
+    def evaluate(
+        self,
+        pension_type: PensionType,
+        start_date: date,
+        num_children: int,
+        pension_amount: float
+    ) -> Outcome:
+        """
+        Comprobar la elegibilidad y calcular el complemento sin excepciones.
+
+        Para los caminos que procesan muchos pensionistas (lotes,
+        comparaciones): un no elegible es un resultado más, con su código
+        de motivo, y no cuesta lanzar y capturar una excepción.
+
+        Args:
+            pension_type: Tipo de pensión
+            start_date: Fecha de inicio de la pensión
+            num_children: Número de hijos
+            pension_amount: Cuantía de la pensión
+
+        Returns:
+            Outcome con el importe si es elegible o con el motivo si no
+        """
+        rule, code, reason = self._check(pension_type, start_date, num_children)
+        if code != REASON_OK:
+            return Outcome(rule, code, reason)
+        percentage, fixed, amount = rule.calculate(num_children, pension_amount)
+        return Outcome(rule, REASON_OK, None, percentage, fixed, amount)
+
+    def rate_version(self, input_date: date) -> Optional[str]:
+        """
+        Obtener la versión de la tabla de importes vigente en una fecha.
+
+        Args:
+            input_date: Fecha a evaluar
+
+        Returns:
+            Identificador de la versión o None si la fecha es anterior a todas
+        """
+        position = bisect.bisect_right(self.rate_version_starts, input_date)
+        return self.rate_versions[position - 1][1] if position else None
+
+
+def changed_intervals(
+    old: CompiledRules,
+    new: CompiledRules
+) -> List[Tuple[date, Optional[date], Optional[PeriodType], Optional[str]]]:
+    """
+    Intervalos de fechas de inicio cuyo resultado puede cambiar de unas
+    reglas a otras.
+
+    Entre dos fronteras consecutivas (de cualquiera de las dos versiones)
+    las reglas son constantes, así que basta comparar en el inicio de cada
+    tramo el período vigente (salvo sus fechas) y la versión de la tabla de
+    importes. Los tramos contiguos con el mismo período y versión antiguos
+    se unen.
+
+    Args:
+        old: Reglas con las que se calcularon los resultados
+        new: Reglas nuevas
+
+    Returns:
+        Lista de (inicio, fin exclusivo o None, período antiguo, versión de
+        importes antigua) para localizar los resultados afectados
+    """
+    points = sorted(set(old.boundaries) | set(new.boundaries) | {date.min})
+    intervals = []
+    for start, end in zip(points, points[1:] + [None]):
+        before, after = old.period_for(start), new.period_for(start)
+        unchanged = (
+            (before.signature() if before else None) == (after.signature() if after else None)
+            and old.rate_version(start) == new.rate_version(start)
+        )
+        if unchanged:
+            continue
+        period, rate_version = (before.period if before else None), old.rate_version(start)
+        if intervals and intervals[-1][1] == start and intervals[-1][2:] == (period, rate_version):
+            intervals[-1] = (intervals[-1][0], end, period, rate_version)
+        else:
+            intervals.append((start, end, period, rate_version))
+    return intervals
+
+
+def compile_rules(data: dict, source: Optional[str] = None) -> CompiledRules:
+    """
+    Validar y compilar unas reglas ya leídas.
+
+    Args:
+        data: Contenido del fichero de reglas
+        source: Origen de las reglas (para los mensajes)
+
+    Returns:
+        CompiledRules
+
+    Raises:
+        RulesError: Si las reglas no superan la validación
+    """
+    try:
+        rules = RulesFile.parse_obj(data)
+    except ValidationError as e:
+        raise RulesError(f"Reglas inválidas en {source or 'datos'}: {e}") from e
+    return CompiledRules(rules, source)
+
+
+def load_rules(path: Optional[str] = None) -> CompiledRules:
+    """
+    Leer, validar y compilar un fichero de reglas.
+
+    Args:
+        path: Ruta del fichero (por defecto RULES_FILE o app/rules.json)
+
+    Returns:
+        CompiledRules
+
+    Raises:
+        RulesError: Si el fichero no se puede leer o no es válido
+    """
+    path = path or env_str('RULES_FILE', DEFAULT_RULES_PATH)
+    try:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        raise RulesError(f"No se pudo leer el fichero de reglas {path}: {e}") from e
+
+    rules = compile_rules(data, path)
+    logger.info("Reglas %s cargadas desde %s (%s períodos)", rules.version, path, len(rules.periods))
+    return rules
+
+
+class RulesPublisher:
+    """Reglas vigentes del proceso, sustituibles en caliente."""
+
+    def __init__(self, source: Optional[str] = None):
+        """
+        Args:
+            source: Fichero de reglas (por defecto RULES_FILE o app/rules.json)
+        """
+        self.source = source or env_str('RULES_FILE', DEFAULT_RULES_PATH)
+        self._current: Optional[CompiledRules] = None
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[], None]] = []
+        self.loaded_at: Optional[str] = None
+        self.reloads = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        self._watcher: Optional[threading.Thread] = None
+        self._stop_watching = threading.Event()
+
+    @property
+    def current(self) -> CompiledRules:
+        """Reglas publicadas (se cargan en el primer acceso)."""
+        rules = self._current
+        if rules is None:
+            with self._lock:
+                if self._current is None:
+                    self._publish(load_rules(self.source))
+                rules = self._current
+        return rules
+
+    def reload(self) -> CompiledRules:
+        """
+        Leer, validar y compilar de nuevo el fichero de reglas y publicarlo.
+
+        Las peticiones que ya tenían las reglas anteriores terminan con
+        ellas; las siguientes ven las nuevas. Si el fichero no es válido se
+        conservan las reglas vigentes.
+
+        Returns:
+            Reglas recién publicadas
+
+        Raises:
+            RulesError: Si el fichero no se puede leer o no es válido
+        """
+        with self._lock:
+            previous = self._current
+            try:
+                rules = load_rules(self.source)
+            except RulesError as e:
+                self.failures += 1
+                self.last_error = str(e)
+                logger.error("Recarga de reglas rechazada, se mantienen las vigentes: %s", e)
+                raise
+            self._publish(rules)
+            self.reloads += 1
+
+        logger.info(
+            "Reglas publicadas: %s -> %s",
+            previous.version if previous is not None else None, rules.version
+        )
+        # Las reglas nuevas ya están publicadas: el fallo de un oyente se
+        # registra pero no convierte la recarga en un error
+        for listener in self._listeners:
+            try:
+                listener()
+            except Exception:
+                logger.exception("Fallo al avisar de la recarga de reglas a %r", listener)
+        return rules
+
+    def _publish(self, rules: CompiledRules) -> None:
+        # Una sola asignación: quien lea _current ve las reglas viejas o las nuevas, nunca una mezcla
+        self._current = rules
+        self.loaded_at = datetime.now(timezone.utc).isoformat()
+        self.last_error = None
+
+    def subscribe(self, listener: Callable[[], None]) -> None:
+        """Registrar una función a la que avisar tras cada recarga (una sola vez)."""
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def watch(self, interval: float) -> None:
+        """
+        Vigilar el fichero de reglas y recargarlo cuando cambie.
+
+        Args:
+            interval: Segundos entre comprobaciones de la fecha de modificación
+        """
+        if self._watcher is not None:
+            return
+        self._stop_watching.clear()
+        self._watcher = threading.Thread(
+            target=self._watch_loop, args=(interval, self._file_signature()), name='rules-watch', daemon=True
+        )
+        self._watcher.start()
+        logger.info("Vigilando %s cada %ss", self.source, interval)
+
+    def stop_watching(self) -> None:
+        """Detener la vigilancia del fichero."""
+        if self._watcher is not None:
+            self._stop_watching.set()
+            self._watcher.join()
+            self._watcher = None
+
+    def _watch_loop(self, interval: float, signature: Optional[Tuple[int, int]]) -> None:
+        while not self._stop_watching.wait(interval):
+            current = self._file_signature()
+            if current == signature:
+                continue
+            signature = current
+            try:
+                self.reload()
+            except RulesError:
+                pass  # ya registrado; se reintenta en el siguiente cambio
+            except Exception:
+                # Un error inesperado no debe matar el hilo de vigilancia
+                logger.exception("Error inesperado al recargar %s", self.source)
+
+    def _file_signature(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.source)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def stats(self) -> dict:
+        """Estado para /metrics y /debug/rules."""
+        rules = self._current
+        return {
+            'version': rules.version if rules is not None else None,
+            'source': self.source,
+            'loaded_at': self.loaded_at,
+            'reloads': self.reloads,
+            'failures': self.failures,
+            'last_error': self.last_error,
+            'watching': self._watcher is not None and self._watcher.is_alive()
+        }
+
+
+publisher = RulesPublisher()
+
+# Reglas fijadas para la petición en curso (ver RulesMiddleware)
+_request_rules: ContextVar[Optional[CompiledRules]] = ContextVar('request_rules', default=None)
+
+
+def get_rules() -> CompiledRules:
+    """Reglas de la petición en curso o, fuera de una petición, las publicadas."""
+    return _request_rules.get() or publisher.current
+
+
+def watch_interval_from_env() -> float:
+    """Segundos entre comprobaciones del fichero de reglas (RULES_WATCH_INTERVAL; 0 = sin vigilancia)."""
+    return env_float('RULES_WATCH_INTERVAL', 0.0)
+
+
+class RulesMiddleware:
+    """
+    Middleware ASGI que fija las reglas vigentes al empezar cada petición
+    y devuelve su versión en la cabecera X-Rules-Version.
+    """
+
+    def __init__(self, app, publisher: RulesPublisher = publisher):
+        self.app = app
+        self.publisher = publisher
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        rules = self.publisher.current
+        version = rules.version.encode('latin-1')
+        token = _request_rules.set(rules)
+
+        async def send_with_version(message):
+            if message['type'] == 'http.response.start':
+                message = {**message, 'headers': [*message.get('headers', []), (b'x-rules-version', version)]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_version)
+        finally:
+            _request_rules.reset(token)
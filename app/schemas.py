@@ -2,8 +2,8 @@
 Esquemas Pydantic para validación de datos de entrada y salida.
 """
 
-from pydantic import BaseModel, Field, validator
-from typing import Optional, Literal
+from pydantic import BaseModel, Field, confloat, validator
+from typing import Any, Optional, Literal, List, Dict
 from datetime import date
 from enum import Enum
 
@@ -19,6 +19,10 @@ class PeriodType(str, Enum):
     PERIOD_1 = "1"  # 01-01-2016 a 03-02-2021
     PERIOD_2 = "2"  # a partir de febrero 2021
 
+# Límites de los datos de un pensionista (también en los lotes Arrow y CSV)
+MIN_START_DATE = date(2016, 1, 1)
+MIN_CHILDREN, MAX_CHILDREN = 1, 4
+
 class EligibilityRequest(BaseModel):
     """Esquema para verificar elegibilidad básica."""
     pension_type: PensionType = Field(..., description="Tipo de pensión (jubilacion|jubilacion_anticipada|incapacidad|viudedad)")
@@ -43,14 +47,13 @@ class CalculationRequest(BaseModel):
     """Esquema para calcular el complemento."""
     pension_type: PensionType = Field(..., description="Tipo de pensión")
     start_date: date = Field(..., description="Fecha de inicio de la pensión")
-    num_children: int = Field(..., ge=1, le=4, description="Número de hijos (1-4)")
+    num_children: int = Field(..., ge=MIN_CHILDREN, le=MAX_CHILDREN, description="Número de hijos (1-4)")
     pension_amount: float = Field(..., gt=0, description="Cuantía de la pensión en euros")
     
     @validator('start_date')
     def validate_start_date(cls, v):
-        min_date = date(2016, 1, 1)
-        if v < min_date:
-            raise ValueError(f'La fecha debe ser posterior al {min_date}')
+        if v < MIN_START_DATE:
+            raise ValueError(f'La fecha debe ser posterior al {MIN_START_DATE}')
         return v
 
 class CalculationResponse(BaseModel):
@@ -81,6 +84,71 @@ class RetroactiveResponse(BaseModel):
     period_1_amount: Optional[float] = Field(None, description="Importe del Período 1")
     period_2_amount: Optional[float] = Field(None, description="Importe del Período 2")
 
+MAX_PENSION_SEGMENTS = 600
+
+class PensionSegment(BaseModel):
+    """Tramo del historial de la pensión con cuantía e hijos constantes."""
+    effective_from: date = Field(..., description="Fecha desde la que aplica el tramo")
+    pension_amount: float = Field(..., gt=0, description="Cuantía de la pensión en el tramo")
+    num_children: int = Field(..., ge=1, le=4, description="Número de hijos en el tramo")
+
+class RetroactiveSegmentsRequest(BaseModel):
+    """Esquema para cálculo de atrasos con historial de pensión por tramos."""
+    start_date: date = Field(..., description="Fecha de inicio del período")
+    end_date: date = Field(..., description="Fecha de fin del período")
+    segments: List[PensionSegment] = Field(
+        ..., min_length=1, max_length=MAX_PENSION_SEGMENTS,
+        description="Tramos ordenados por effective_from; el primero debe empezar en start_date o antes"
+    )
+    
+    @validator('end_date')
+    def validate_end_date(cls, v, values):
+        if 'start_date' in values and v <= values['start_date']:
+            raise ValueError('La fecha de fin debe ser posterior a la fecha de inicio')
+        return v
+    
+    @validator('segments')
+    def validate_segments(cls, v, values):
+        """Validar que los tramos estén ordenados y cubran el inicio del período."""
+        for previous, current in zip(v, v[1:]):
+            if current.effective_from <= previous.effective_from:
+                raise ValueError('Los tramos deben estar ordenados por effective_from sin fechas repetidas')
+        if 'start_date' in values and v[0].effective_from > values['start_date']:
+            raise ValueError('El primer tramo debe empezar en la fecha de inicio o antes')
+        return v
+
+class RetroactiveSegmentBreakdown(BaseModel):
+    """Desglose de atrasos de un tramo homogéneo (pensión, hijos y tarifa constantes)."""
+    date_from: date = Field(..., description="Inicio del tramo (incluido)")
+    date_to: date = Field(..., description="Fin del tramo (excluido)")
+    pension_amount: float = Field(..., description="Cuantía de la pensión en el tramo")
+    num_children: int = Field(..., description="Número de hijos en el tramo")
+    period: Optional[PeriodType] = Field(None, description="Período aplicable")
+    rate_version: Optional[str] = Field(None, description="Versión de la tabla de importes")
+    months: int = Field(..., description="Meses del tramo con derecho al complemento")
+    monthly_amount: float = Field(..., description="Complemento mensual en el tramo")
+    amount: float = Field(..., description="Atrasos del tramo")
+
+class RetroactiveSegmentsResponse(RetroactiveResponse):
+    """Respuesta de cálculo de atrasos con desglose por tramos."""
+    segments: List[RetroactiveSegmentBreakdown] = Field(..., description="Desglose por tramo homogéneo")
+
+MAX_TIMELINE_PAGE = 500
+
+class TimelineMonth(BaseModel):
+    """Línea mensual del desglose de atrasos."""
+    index: int = Field(..., description="Número de mes dentro del rango (desde 0)")
+    month: date = Field(..., description="Fecha del mes")
+    period: Optional[PeriodType] = Field(None, description="Período aplicable")
+    rate_version: Optional[str] = Field(None, description="Versión de la tabla de importes aplicada")
+    amount: float = Field(..., description="Importe del complemento en ese mes")
+
+class RetroactiveTimelineResponse(BaseModel):
+    """Página del desglose mensual de atrasos."""
+    items: List[TimelineMonth] = Field(..., description="Meses de esta página")
+    months_in_range: int = Field(..., description="Número total de meses del rango")
+    next_cursor: Optional[str] = Field(None, description="Cursor para pedir la siguiente página (null si no hay más)")
+
 class CompareProgenitor(BaseModel):
     """Datos de un progenitor para comparación."""
     name: str = Field(..., description="Nombre del progenitor")
@@ -100,6 +168,10 @@ class CompareResult(BaseModel):
     eligible: bool = Field(..., description="Si tiene derecho al complemento")
     complement_amount: Optional[float] = Field(None, description="Cantidad del complemento")
     total_pension: Optional[float] = Field(None, description="Pensión total con complemento")
+    reason: Optional[str] = Field(None, description="Razón de no elegibilidad")
+    reason_code: Optional[str] = Field(
+        None, description="Código del motivo: fuera_de_rango, tipo_de_pension o minimo_de_hijos"
+    )
 
 class CompareResponse(BaseModel):
     """Respuesta de comparación entre progenitores."""
@@ -108,6 +180,321 @@ class CompareResponse(BaseModel):
     progenitor_2: CompareResult = Field(..., description="Resultado del segundo progenitor")
     explanation: str = Field(..., description="Explicación de por qué tiene derecho")
 
+MAX_BATCH_SIZE = 1000
+
+class BatchCalculationRequest(BaseModel):
+    """Esquema para calcular el complemento de varios pensionistas en una sola llamada."""
+    items: List[CalculationRequest] = Field(
+        ..., min_length=1, max_length=MAX_BATCH_SIZE,
+        description=f"Pensionistas a calcular (máximo {MAX_BATCH_SIZE} por llamada)"
+    )
+
+class BatchCalculationItem(BaseModel):
+    """Resultado del cálculo para un pensionista del lote."""
+    index: int = Field(..., description="Posición del pensionista en el lote")
+    eligible: bool = Field(..., description="Si tiene derecho al complemento")
+    period: Optional[PeriodType] = Field(None, description="Período aplicable")
+    amount: Optional[float] = Field(None, description="Cantidad del complemento en euros")
+    pension_with_complement: Optional[float] = Field(None, description="Pensión total con complemento")
+    reason: Optional[str] = Field(None, description="Razón de no elegibilidad")
+    reason_code: Optional[str] = Field(
+        None, description="Código del motivo: fuera_de_rango, tipo_de_pension o minimo_de_hijos"
+    )
+
+class BatchCalculationResponse(BaseModel):
+    """Respuesta del cálculo por lotes."""
+    results: List[BatchCalculationItem] = Field(..., description="Resultados en el orden de entrada")
+    eligible_count: int = Field(..., description="Número de pensionistas con derecho")
+    total_amount: float = Field(..., description="Suma de los complementos del lote")
+
+MAX_SWEEP_POINTS = 50000
+
+class AmountRange(BaseModel):
+    """Rango de cuantías de pensión [start, stop] con paso fijo."""
+    start: float = Field(..., gt=0, description="Primera cuantía")
+    stop: float = Field(..., gt=0, description="Última cuantía (incluida si cae en el paso)")
+    step: float = Field(..., gt=0, description="Incremento entre cuantías")
+
+class DateRange(BaseModel):
+    """Rango de fechas [start, end] con paso en meses."""
+    start: date = Field(..., description="Primera fecha")
+    end: date = Field(..., description="Última fecha (incluida si cae en el paso)")
+    step_months: int = Field(1, ge=1, description="Meses entre fechas consecutivas")
+
+class SweepRequest(BaseModel):
+    """Esquema para evaluar una rejilla de escenarios (producto cartesiano)."""
+    pension_type: PensionType = Field(PensionType.JUBILACION, description="Tipo de pensión")
+    pension_amounts: Optional[List[confloat(gt=0)]] = Field(None, description="Cuantías a evaluar (mayores que 0)")
+    pension_amount_range: Optional[AmountRange] = Field(None, description="Rango de cuantías (alternativa a pension_amounts)")
+    num_children: List[int] = Field([1, 2, 3, 4], min_length=1, description="Números de hijos a evaluar")
+    start_dates: Optional[List[date]] = Field(None, description="Fechas de inicio a evaluar")
+    start_date_range: Optional[DateRange] = Field(None, description="Rango de fechas (alternativa a start_dates)")
+
+class SweepAxes(BaseModel):
+    """Valores de cada eje de la rejilla."""
+    start_date: List[date] = Field(..., description="Eje de fechas de inicio")
+    num_children: List[int] = Field(..., description="Eje de número de hijos")
+    pension_amount: List[float] = Field(..., description="Eje de cuantías")
+
+class SweepResponse(BaseModel):
+    """Resultado columnar de la rejilla de escenarios."""
+    pension_type: PensionType = Field(..., description="Tipo de pensión evaluado")
+    axes: SweepAxes = Field(..., description="Valores de cada eje")
+    order: List[str] = Field(..., description="Orden de los ejes en el array plano (el último varía más rápido)")
+    shape: List[int] = Field(..., description="Tamaño de cada eje")
+    amounts: List[Optional[float]] = Field(..., description="Complemento por punto de la rejilla (null si no es elegible)")
+    eligible_count: int = Field(..., description="Puntos de la rejilla con derecho al complemento")
+
+class ProfileRequest(BaseModel):
+    """Esquema para activar el perfilador (indicar requests o seconds)."""
+    requests: Optional[int] = Field(None, ge=1, le=10000, description="Perfilar las próximas N peticiones")
+    seconds: Optional[float] = Field(None, gt=0, le=600, description="Perfilar durante S segundos")
+
+class ProfileSession(BaseModel):
+    """Metadatos de una sesión de perfilado."""
+    id: int = Field(..., description="Identificador de la sesión en este worker")
+    started_at: str = Field(..., description="Inicio de la sesión")
+    duration_s: float = Field(..., description="Duración en segundos")
+    requests: int = Field(..., description="Peticiones perfiladas")
+    samples: int = Field(..., description="Muestras de pila tomadas")
+    files: List[str] = Field([], description="Ficheros guardados (.prof y .folded)")
+
+class ProfileReport(ProfileSession):
+    """Informe completo de una sesión de perfilado."""
+    stats: str = Field(..., description="Estadísticas de cProfile (tiempo acumulado)")
+    collapsed: str = Field(..., description="Pilas muestreadas en formato collapsed para flame graphs")
+
+class ProfileStatusResponse(BaseModel):
+    """Estado del perfilador del worker."""
+    active: bool = Field(..., description="Si hay una sesión en curso")
+    pid: int = Field(..., description="Proceso (worker) que responde")
+    last: Optional[ProfileSession] = Field(None, description="Última sesión terminada")
+
+class MemoryStartRequest(BaseModel):
+    """Esquema para activar tracemalloc."""
+    frames: int = Field(25, ge=1, le=100, description="Profundidad de pila guardada por asignación")
+
+class MemorySnapshotRequest(BaseModel):
+    """Esquema para tomar una instantánea de memoria."""
+    name: str = Field(..., min_length=1, max_length=64, description="Nombre de la instantánea")
+
+class MemorySnapshotInfo(BaseModel):
+    """Metadatos de una instantánea de memoria."""
+    name: str = Field(..., description="Nombre de la instantánea")
+    taken_at: str = Field(..., description="Momento en que se tomó")
+    app_bytes: int = Field(..., description="Memoria viva asignada desde el paquete app")
+    traced_current: int = Field(..., description="Memoria trazada total en ese momento")
+    traced_peak: int = Field(..., description="Pico de memoria trazada hasta ese momento")
+
+class MemoryStatusResponse(BaseModel):
+    """Estado de tracemalloc en el worker."""
+    active: bool = Field(..., description="Si tracemalloc está activo")
+    pid: int = Field(..., description="Proceso (worker) que responde")
+    snapshots: List[MemorySnapshotInfo] = Field([], description="Instantáneas disponibles")
+
+class MemoryStat(BaseModel):
+    """Memoria viva (o su variación) de un punto de asignación."""
+    file: str = Field(..., description="Fichero")
+    line: int = Field(..., description="Línea (0 si se agrupa por fichero)")
+    code: str = Field("", description="Código fuente de la línea")
+    size: int = Field(..., description="Bytes vivos")
+    count: int = Field(..., description="Bloques vivos")
+    size_diff: Optional[int] = Field(None, description="Variación de bytes respecto a la instantánea base")
+    count_diff: Optional[int] = Field(None, description="Variación de bloques respecto a la instantánea base")
+
+class MemoryStatsResponse(BaseModel):
+    """Puntos de asignación de una instantánea o de la diferencia entre dos."""
+    snapshot: str = Field(..., description="Instantánea consultada")
+    base: Optional[str] = Field(None, description="Instantánea de referencia (solo en diferencias)")
+    group_by: str = Field(..., description="Agrupación usada")
+    stats: List[MemoryStat] = Field(..., description="Entradas ordenadas por tamaño o crecimiento")
+
+class RuleCalculation(BaseModel):
+    """Fórmula del complemento en un período de las reglas."""
+    method: Literal['percentage', 'fixed_per_child'] = Field(..., description="Porcentaje de la pensión o importe fijo por hijo")
+    percentages: Optional[Dict[int, float]] = Field(None, description="Porcentaje por número de hijos (método percentage)")
+    amount_per_child: Optional[float] = Field(None, gt=0, description="Importe mensual por hijo (método fixed_per_child)")
+    
+    @validator('percentages')
+    def validate_percentages(cls, v):
+        if v is not None and any(percentage <= 0 for percentage in v.values()):
+            raise ValueError('Los porcentajes deben ser positivos')
+        return v
+
+class RulePeriod(BaseModel):
+    """Período de aplicación del complemento en el fichero de reglas."""
+    period: PeriodType = Field(..., description="Período al que corresponden las reglas")
+    name: str = Field(..., description="Nombre del período en los mensajes")
+    start: date = Field(..., description="Primer día del período")
+    end: Optional[date] = Field(None, description="Último día del período (incluido); abierto si es null")
+    description: str = Field(..., description="Descripción textual del período")
+    eligible_pension_types: List[PensionType] = Field(..., min_length=1, description="Tipos de pensión con derecho")
+    eligible_pension_types_text: str = Field(..., description="Tipos con derecho, redactados para los mensajes")
+    min_children: Optional[int] = Field(None, ge=1, description="Mínimo de hijos propio del período")
+    max_children: int = Field(..., ge=1, description="Hijos computables como máximo")
+    calculation: RuleCalculation = Field(..., description="Fórmula del complemento")
+    
+    @validator('end')
+    def validate_end(cls, v, values):
+        if v is not None and 'start' in values and v < values['start']:
+            raise ValueError('El período termina antes de empezar')
+        return v
+    
+    @validator('calculation')
+    def validate_calculation(cls, v, values):
+        """Validar que la fórmula cubra todos los números de hijos computables."""
+        if v.method == 'fixed_per_child':
+            if v.amount_per_child is None:
+                raise ValueError('El método fixed_per_child requiere amount_per_child')
+            return v
+        if not v.percentages:
+            raise ValueError('El método percentage requiere percentages')
+        if 'max_children' in values:
+            first = values.get('min_children') or 1
+            missing = [n for n in range(first, values['max_children'] + 1) if n not in v.percentages]
+            if missing:
+                raise ValueError(f'Faltan porcentajes para {missing} hijos')
+        return v
+
+class RuleRateVersion(BaseModel):
+    """Versión de la tabla de importes y fecha desde la que rige."""
+    id: str = Field(..., min_length=1, description="Identificador de la versión")
+    effective_from: date = Field(..., description="Fecha de efecto")
+
+class RulesFile(BaseModel):
+    """Fichero de reglas del complemento (ver app/rules.json)."""
+    version: str = Field(..., min_length=1, description="Versión de las reglas")
+    description: Optional[str] = Field(None, description="Descripción libre")
+    min_children: int = Field(1, ge=1, description="Mínimo de hijos en cualquier período")
+    periods: List[RulePeriod] = Field(..., min_length=1, description="Períodos ordenados por fecha de inicio")
+    rate_versions: List[RuleRateVersion] = Field(..., min_length=1, description="Versiones ordenadas por fecha de efecto")
+    
+    @validator('periods')
+    def validate_periods(cls, v):
+        """Validar que los períodos estén ordenados, sin solaparse ni repetirse."""
+        if len({rule.period for rule in v}) != len(v):
+            raise ValueError('Cada período solo puede aparecer una vez')
+        for previous, current in zip(v, v[1:]):
+            if previous.end is None or current.start <= previous.end:
+                raise ValueError(f'{current.name} se solapa con {previous.name} o no está ordenado')
+        return v
+    
+    @validator('rate_versions')
+    def validate_rate_versions(cls, v):
+        for previous, current in zip(v, v[1:]):
+            if current.effective_from <= previous.effective_from:
+                raise ValueError('Las versiones deben estar ordenadas por effective_from sin fechas repetidas')
+        return v
+
+class RulesStatusResponse(BaseModel):
+    """Estado de las reglas publicadas en un worker."""
+    pid: int = Field(..., description="Proceso del worker")
+    version: Optional[str] = Field(None, description="Versión de las reglas vigentes")
+    previous_version: Optional[str] = Field(None, description="Versión sustituida (solo al recargar)")
+    source: str = Field(..., description="Fichero de reglas")
+    loaded_at: Optional[str] = Field(None, description="Instante de publicación (UTC)")
+    reloads: int = Field(..., description="Recargas realizadas")
+    failures: int = Field(..., description="Recargas rechazadas por un fichero inválido")
+    last_error: Optional[str] = Field(None, description="Error de la última recarga rechazada")
+    watching: bool = Field(..., description="Si se vigila el fichero para recargarlo al cambiar")
+
+class PortfolioTotals(BaseModel):
+    """Contadores de un grupo de la cartera."""
+    records: int = Field(..., description="Registros")
+    eligible: int = Field(..., description="Registros elegibles")
+    total_amount: float = Field(..., description="Suma de los complementos en euros")
+
+class PortfolioSummaryGroup(PortfolioTotals):
+    """Grupo de la cartera (solo llevan valor las dimensiones agrupadas)."""
+    period: Optional[PeriodType] = Field(None, description="Período (nulo también fuera de rango)")
+    pension_type: Optional[PensionType] = Field(None, description="Tipo de pensión")
+    num_children: Optional[int] = Field(None, description="Número de hijos")
+
+class PortfolioSummaryResponse(BaseModel):
+    """Totales agrupados de la cartera almacenada."""
+    group_by: List[str] = Field(..., description="Dimensiones agrupadas")
+    groups: List[PortfolioSummaryGroup] = Field(..., description="Un elemento por combinación de valores")
+    total: PortfolioTotals = Field(..., description="Totales de los grupos")
+    rules_version: Optional[str] = Field(None, description="Versión de las reglas aplicadas a la cartera")
+
+class PortfolioStartsGroup(PortfolioTotals):
+    """Totales de un tipo de pensión en un rango de fechas de inicio."""
+    pension_type: PensionType = Field(..., description="Tipo de pensión")
+
+class PortfolioStartsResponse(BaseModel):
+    """Totales por tipo de pensión de un rango de fechas de inicio de la cartera."""
+    date_from: Optional[date] = Field(None, description="Primera fecha de inicio (incluida)")
+    date_to: Optional[date] = Field(None, description="Última fecha de inicio (incluida)")
+    groups: List[PortfolioStartsGroup] = Field(..., description="Un elemento por tipo de pensión con registros")
+    total: PortfolioTotals = Field(..., description="Totales de los grupos")
+    rules_version: Optional[str] = Field(None, description="Versión de las reglas aplicadas a la cartera")
+
+# Registros cambiados como máximo en la muestra de una simulación
+MAX_SIMULATION_SAMPLE = 500
+
+class SimulationRequest(BaseModel):
+    """Cambio de reglas a simular sobre la cartera (ver app/simulation.py)."""
+    overlay: Dict[str, Any] = Field(
+        ..., description="Claves de las reglas que cambian; períodos indexados por su identificador"
+    )
+    sample_size: int = Field(
+        20, ge=0, le=MAX_SIMULATION_SAMPLE, description="Registros cambiados a devolver (los de mayor diferencia)"
+    )
+
+class SimulationGroup(BaseModel):
+    """Efecto de la simulación en un período y tipo de pensión."""
+    period: Optional[PeriodType] = Field(None, description="Período con las reglas simuladas (nulo fuera de rango)")
+    pension_type: PensionType = Field(..., description="Tipo de pensión")
+    records: int = Field(..., description="Registros del grupo")
+    changed: int = Field(..., description="Registros cuyo resultado cambia")
+    old_amount: float = Field(..., description="Importe mensual almacenado")
+    new_amount: float = Field(..., description="Importe mensual simulado")
+    delta: float = Field(..., description="Diferencia mensual")
+
+class SimulationRecord(BaseModel):
+    """Registro de la cartera cuyo resultado cambia."""
+    key: str = Field(..., description="Clave del pensionista")
+    pension_type: PensionType = Field(..., description="Tipo de pensión")
+    start_date: date = Field(..., description="Fecha de inicio")
+    num_children: int = Field(..., description="Número de hijos")
+    old_eligible: bool = Field(..., description="Elegibilidad almacenada")
+    new_eligible: bool = Field(..., description="Elegibilidad simulada")
+    old_amount: float = Field(..., description="Importe almacenado")
+    new_amount: float = Field(..., description="Importe simulado")
+    delta: float = Field(..., description="Diferencia")
+
+class SimulationResponse(BaseModel):
+    """Coste de un cambio de reglas sobre toda la cartera."""
+    base_version: str = Field(..., description="Reglas aplicadas a la cartera")
+    rules_version: str = Field(..., description="Reglas simuladas")
+    records: int = Field(..., description="Registros de la cartera")
+    changed: int = Field(..., description="Registros cuyo resultado cambia")
+    newly_eligible: int = Field(..., description="Registros que pasan a ser elegibles")
+    no_longer_eligible: int = Field(..., description="Registros que dejan de ser elegibles")
+    old_total: float = Field(..., description="Importe mensual almacenado de la cartera")
+    new_total: float = Field(..., description="Importe mensual simulado de la cartera")
+    delta: float = Field(..., description="Diferencia mensual")
+    groups: List[SimulationGroup] = Field(..., description="Períodos y tipos de pensión con cambios")
+    sample: List[SimulationRecord] = Field(..., description="Registros cambiados de mayor diferencia")
+
+# Meses como máximo de una previsión de pagos
+MAX_FORECAST_MONTHS = 600
+
+class ForecastMonth(BaseModel):
+    """Total previsto de un mes."""
+    month: str = Field(..., description="Mes (YYYY-MM)")
+    beneficiaries: int = Field(..., description="Pensionistas que cobran el complemento ese mes")
+    amount: float = Field(..., description="Importe total del mes en euros")
+
+class ForecastResponse(BaseModel):
+    """Previsión mensual del complemento a pagar a la cartera."""
+    start: str = Field(..., description="Primer mes (YYYY-MM)")
+    months: int = Field(..., description="Meses de la previsión")
+    population: int = Field(..., description="Pensionistas de la cartera")
+    series: List[ForecastMonth] = Field(..., description="Total de cada mes")
+    total_amount: float = Field(..., description="Importe total de la previsión en euros")
+    rules_version: str = Field(..., description="Versión de las reglas aplicadas")
+
 class HealthResponse(BaseModel):
     """Respuesta del endpoint de salud."""
     status: str = Field(..., description="Estado del servicio")
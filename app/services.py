@@ -2,31 +2,52 @@
 Lógica de negocio para el cálculo del Complemento de Paternidad.
 """
 
+import heapq
+import json
 import logging
+import math
 from datetime import date, datetime
-from typing import Tuple, Optional
-from .schemas import PensionType, PeriodType, EligibilityResponse, CalculationResponse
-from .utils import date_to_period, calculate_months_between_dates
+from itertools import islice
+from typing import Tuple, Optional, List, Iterator
+import numpy as np
+from .schemas import PensionType, PeriodType, EligibilityResponse, CalculationResponse, MAX_SWEEP_POINTS
+from .utils import calculate_months_between_dates, add_months, count_month_steps
+from .engine import VectorizedEngine, PENSION_TYPE_CODES, REASON_OK, encode_dates, round_cents
+from .cache import ResultCache
+from .rules import CompiledRules, Outcome, get_rules
+from .coalescing import request_key
 
 logger = logging.getLogger(__name__)
 
+
+def ineligible_message(outcome: Outcome) -> str:
+    """Mensaje de un resultado no elegible (el de la excepción de calculate_complement)."""
+    return f"No cumple los criterios de elegibilidad: {outcome.reason}"
+
+
 class ComplementoPaternidadService:
     """Servicio para calcular el Complemento de Paternidad."""
     
-    # Constantes para los cálculos
-    PERIOD_1_START = date(2016, 1, 1)
-    PERIOD_1_END = date(2021, 2, 3)
-    PERIOD_2_START = date(2021, 2, 4)
+    def __init__(self, cache: Optional[ResultCache] = None, rules: Optional[CompiledRules] = None):
+        """
+        Args:
+            cache: Caché de resultados (en memoria o compartida entre workers);
+                sin caché si es None
+            rules: Reglas compiladas fijas; si es None se usan en cada llamada
+                las vigentes (get_rules), que se pueden recargar en caliente
+        """
+        self._rules = rules
+        self.cache = cache
     
-    # Porcentajes para el Período 1
-    PERIOD_1_PERCENTAGES = {
-        2: 5.0,   # 5%
-        3: 10.0,  # 10%
-        4: 15.0   # 15% para 4 o más hijos
-    }
+    @property
+    def rules(self) -> CompiledRules:
+        """Reglas con las que calcula el servicio."""
+        return self._rules or get_rules()
     
-    # Importe fijo para el Período 2 (35,90€ por hijo desde febrero 2021)
-    PERIOD_2_AMOUNT_PER_CHILD = 35.90
+    @property
+    def engine(self) -> VectorizedEngine:
+        """Motor vectorizado de las reglas vigentes."""
+        return self.rules.engine
     
     def check_eligibility(
         self, 
@@ -45,53 +66,14 @@ class ComplementoPaternidadService:
         Returns:
             EligibilityResponse con el resultado de la elegibilidad
         """
-        logger.info(f"Verificando elegibilidad: {pension_type}, {start_date}, {num_children} hijos")
-        
-        # Determinar el período
-        period = date_to_period(start_date)
-        
-        if period == PeriodType.PERIOD_1:
-            # Período 1: Jubilaciones (excepto anticipadas voluntarias), viudedad e incapacidad
-            if pension_type not in [PensionType.JUBILACION, PensionType.VIUDEDAD, PensionType.INCAPACIDAD]:
-                return EligibilityResponse(
-                    eligible=False,
-                    period=period,
-                    reason=f"En el Período 1 solo aplica para jubilación (excepto anticipadas voluntarias), viudedad e incapacidad, no {pension_type}"
-                )
-            
-            # Período 1 requiere mínimo 2 hijos
-            if num_children < 2:
-                return EligibilityResponse(
-                    eligible=False,
-                    period=period,
-                    reason=f"Para el Período 1 se requieren al menos 2 hijos (tiene {num_children})"
-                )
-        
-        elif period == PeriodType.PERIOD_2:
-            # Período 2: Jubilaciones (ordinarias y anticipadas), incapacidad y viudedad
-            if pension_type not in [PensionType.JUBILACION, PensionType.JUBILACION_ANTICIPADA, 
-                                   PensionType.INCAPACIDAD, PensionType.VIUDEDAD]:
-                return EligibilityResponse(
-                    eligible=False,
-                    period=period,
-                    reason=f"En el Período 2 solo aplica para jubilación, incapacidad y viudedad, no {pension_type}"
-                )
+        logger.info("Verificando elegibilidad: %s, %s, %s hijos", pension_type, start_date, num_children)
         
-        else:
-            return EligibilityResponse(
-                eligible=False,
-                reason="Fecha fuera del rango de aplicación del complemento"
-            )
+        rule, reason = self.rules.check(pension_type, start_date, num_children)
+        period = rule.period if rule is not None else None
+        if reason is not None:
+            return EligibilityResponse(eligible=False, period=period, reason=reason)
         
-        # Verificar número mínimo de hijos
-        if num_children < 1:
-            return EligibilityResponse(
-                eligible=False,
-                period=period,
-                reason="Debe tener al menos 1 hijo para optar al complemento"
-            )
-        
-        logger.info(f"Elegibilidad aprobada para el período {period}")
+        logger.info("Elegibilidad aprobada para el período %s", period)
         return EligibilityResponse(
             eligible=True,
             period=period
@@ -116,61 +98,236 @@ class ComplementoPaternidadService:
         Returns:
             CalculationResponse con el cálculo del complemento
         """
-        logger.info(f"Calculando complemento: {pension_type}, {start_date}, {num_children} hijos, {pension_amount}€")
-        
-        # Verificar elegibilidad primero
-        eligibility = self.check_eligibility(pension_type, start_date, num_children)
-        
-        if not eligibility.eligible:
-            raise ValueError(f"No cumple los criterios de elegibilidad: {eligibility.reason}")
+        logger.info("Calculando complemento: %s, %s, %s hijos, %s€", pension_type, start_date, num_children, pension_amount)
+        
+        # Se leen una vez: una recarga a mitad del cálculo no mezcla versiones
+        rules = self.rules
+        
+        if self.cache is not None:
+            # La versión de las reglas forma parte de la clave: al recargarlas
+            # las entradas anteriores dejan de usarse sin tener que borrarlas
+            key = self._cache_key('calculate', rules.version, pension_type, start_date, num_children, pension_amount)
+            cached = self.cache.get(key)
+            if cached is not None:
+                # API v2 directa: parse_raw/json pasan por el aviso de obsolescencia
+                # y cuestan más que el propio cálculo
+                return CalculationResponse.model_validate_json(cached)
+            result = self._calculate_complement(rules, pension_type, start_date, num_children, pension_amount)
+            self.cache.set(key, result.model_dump_json().encode())
+            return result
+        
+        return self._calculate_complement(rules, pension_type, start_date, num_children, pension_amount)
+    
+    @staticmethod
+    def _calculate_complement(
+        rules: CompiledRules,
+        pension_type: PensionType,
+        start_date: date,
+        num_children: int,
+        pension_amount: float
+    ) -> CalculationResponse:
+        outcome = rules.evaluate(pension_type, start_date, num_children, pension_amount)
+        if not outcome.eligible:
+            raise ValueError(ineligible_message(outcome))
         
-        period = eligibility.period
+        logger.info("%s: %s hijos, %s€ -> %s€", outcome.rule.name, num_children, pension_amount, outcome.amount)
         
-        if period == PeriodType.PERIOD_1:
-            return self._calculate_period_1(num_children, pension_amount)
-        else:
-            return self._calculate_period_2(num_children, pension_amount)
+        return CalculationResponse(
+            period=outcome.rule.period,
+            complement_percent=outcome.percentage,
+            complement_fixed=outcome.fixed,
+            amount=outcome.amount,
+            pension_with_complement=pension_amount + outcome.amount
+        )
     
-    def _calculate_period_1(self, num_children: int, pension_amount: float) -> CalculationResponse:
-        """Calcular complemento para el Período 1 (porcentajes)."""
-        
-        # Determinar el porcentaje según número de hijos
-        if num_children >= 4:
-            percentage = self.PERIOD_1_PERCENTAGES[4]
-        else:
-            percentage = self.PERIOD_1_PERCENTAGES.get(num_children, 0.0)
+    def calculate_batch(self, items: List[dict]) -> dict:
+        """
+        Calcular el complemento para un lote de pensionistas.
         
-        if percentage == 0.0:
-            raise ValueError(f"Para el Período 1, se requieren al menos 2 hijos (tiene {num_children})")
+        Args:
+            items: Lista de dicts con pension_type, start_date, num_children y pension_amount
+            
+        Returns:
+            Dict con los resultados en el orden de entrada y los totales del lote
+        """
+        logger.info("Calculando lote de %s pensionistas", len(items))
         
-        complement_amount = pension_amount * (percentage / 100)
+        # Los no elegibles son un resultado más: sin excepciones por pensionista
+        rules = self.rules
+        results = []
+        total_amount = 0.0
+        eligible_count = 0
+        
+        for index, data in enumerate(items):
+            outcome = rules.evaluate(
+                data['pension_type'],
+                data['start_date'],
+                data['num_children'],
+                data['pension_amount']
+            )
+            if not outcome.eligible:
+                results.append({
+                    'index': index,
+                    'eligible': False,
+                    'period': None,
+                    'amount': None,
+                    'pension_with_complement': None,
+                    'reason': ineligible_message(outcome),
+                    'reason_code': outcome.reason_name
+                })
+                continue
+            
+            results.append({
+                'index': index,
+                'eligible': True,
+                'period': outcome.rule.period,
+                'amount': outcome.amount,
+                'pension_with_complement': data['pension_amount'] + outcome.amount,
+                'reason': None,
+                'reason_code': None
+            })
+            total_amount += outcome.amount
+            eligible_count += 1
         
-        logger.info(f"Período 1: {percentage}% de {pension_amount}€ = {complement_amount}€")
+        return {
+            'results': results,
+            'eligible_count': eligible_count,
+            'total_amount': round(total_amount, 2)
+        }
+    
+    def calculate_arrow(self, body: bytes, key: str = 'id') -> bytes:
+        """
+        Calcular un lote recibido como flujo Arrow IPC (ver app/arrow.py).
         
-        return CalculationResponse(
-            period=PeriodType.PERIOD_1,
-            complement_percent=percentage,
-            complement_fixed=None,
-            amount=complement_amount,
-            pension_with_complement=pension_amount + complement_amount
-        )
+        Args:
+            body: Flujo Arrow IPC con la clave y las columnas de entrada
+            key: Nombre de la columna clave
+            
+        Returns:
+            Flujo Arrow IPC con la clave, período, elegibilidad, importe y motivo
+            
+        Raises:
+            ValueError: Si el flujo, sus columnas o alguna fila son inválidos
+        """
+        from .arrow import calculate_ipc
+        return calculate_ipc(body, self.rules, key)
     
-    def _calculate_period_2(self, num_children: int, pension_amount: float) -> CalculationResponse:
-        """Calcular complemento para el Período 2 (importe fijo)."""
+    def sweep(
+        self,
+        pension_type: PensionType,
+        num_children: List[int],
+        pension_amounts: Optional[List[float]] = None,
+        pension_amount_range: Optional[dict] = None,
+        start_dates: Optional[List[date]] = None,
+        start_date_range: Optional[dict] = None
+    ) -> dict:
+        """
+        Evaluar el complemento sobre el producto cartesiano de fechas, hijos y cuantías.
         
-        # Máximo 4 hijos para el cálculo
-        children_for_calculation = min(num_children, 4)
-        complement_amount = self.PERIOD_2_AMOUNT_PER_CHILD * children_for_calculation
+        Cada eje se indica como lista o como rango. La rejilla completa se
+        calcula en una sola pasada vectorizada y se devuelve en forma columnar:
+        los valores de cada eje y un array plano de importes en orden
+        (start_date, num_children, pension_amount), el último eje el más rápido.
+        
+        Args:
+            pension_type: Tipo de pensión
+            num_children: Números de hijos a evaluar
+            pension_amounts: Cuantías a evaluar (o pension_amount_range)
+            pension_amount_range: Dict con start, stop y step
+            start_dates: Fechas de inicio a evaluar (o start_date_range)
+            start_date_range: Dict con start, end y step_months
+            
+        Returns:
+            Dict con ejes, forma, importes planos y número de puntos elegibles
+            
+        Raises:
+            ValueError: Si los ejes son inválidos o la rejilla supera MAX_SWEEP_POINTS
+        """
+        if any(children < 1 for children in num_children):
+            raise ValueError("El número de hijos debe ser al menos 1 en todos los escenarios")
+        if pension_amounts is not None and any(not amount > 0 for amount in pension_amounts):
+            raise ValueError("La cuantía de la pensión debe ser mayor que 0 en todos los escenarios")
+        
+        amount_count = self._sweep_axis_length(pension_amounts, pension_amount_range, 'pension_amount')
+        date_count = self._sweep_axis_length(start_dates, start_date_range, 'start_date')
+        points = amount_count * date_count * len(num_children)
+        if points > MAX_SWEEP_POINTS:
+            raise ValueError(f"La rejilla tiene {points} escenarios; el máximo es {MAX_SWEEP_POINTS}")
+        
+        if pension_amounts is None:
+            start, step = pension_amount_range['start'], pension_amount_range['step']
+            pension_amounts = [round(start + i * step, 2) for i in range(amount_count)]
+        if start_dates is None:
+            start, step = start_date_range['start'], start_date_range['step_months']
+            start_dates = [add_months(start, i * step) for i in range(date_count)]
+        
+        logger.info("Evaluando rejilla de %s escenarios (%sx%sx%s)", points, date_count, len(num_children), amount_count)
+        
+        # Ejes con broadcasting: (fechas, 1, 1) x (1, hijos, 1) x (1, 1, cuantías)
+        engine = self.engine
+        period_codes = engine.periods(encode_dates(start_dates))[:, None, None]
+        children = np.array(num_children, dtype=np.int64)[None, :, None]
+        amounts = np.array(pension_amounts, dtype=np.float64)[None, None, :]
+        type_code = PENSION_TYPE_CODES[PensionType(pension_type)]
+        
+        reasons, complements = engine.calculate(type_code, period_codes, children, amounts)
+        reasons = np.broadcast_to(reasons, complements.shape).ravel()
+        flat = round_cents(complements.ravel()).tolist()
+        eligible = (reasons == REASON_OK).tolist()
         
-        logger.info(f"Período 2: {children_for_calculation} hijos x {self.PERIOD_2_AMOUNT_PER_CHILD}€ = {complement_amount}€")
+        return {
+            'pension_type': pension_type,
+            'axes': {
+                'start_date': start_dates,
+                'num_children': num_children,
+                'pension_amount': pension_amounts
+            },
+            'order': ['start_date', 'num_children', 'pension_amount'],
+            'shape': list(complements.shape),
+            'amounts': [amount if ok else None for amount, ok in zip(flat, eligible)],
+            'eligible_count': int(np.count_nonzero(reasons == REASON_OK))
+        }
+    
+    def sweep_points(
+        self,
+        num_children: List[int],
+        pension_amounts: Optional[List[float]] = None,
+        pension_amount_range: Optional[dict] = None,
+        start_dates: Optional[List[date]] = None,
+        start_date_range: Optional[dict] = None
+    ) -> int:
+        """
+        Número de puntos de una rejilla de escenarios sin llegar a evaluarla.
         
-        return CalculationResponse(
-            period=PeriodType.PERIOD_2,
-            complement_percent=None,
-            complement_fixed=self.PERIOD_2_AMOUNT_PER_CHILD,
-            amount=complement_amount,
-            pension_with_complement=pension_amount + complement_amount
-        )
+        Raises:
+            ValueError: Si los ejes son inválidos
+        """
+        amount_count = self._sweep_axis_length(pension_amounts, pension_amount_range, 'pension_amount')
+        date_count = self._sweep_axis_length(start_dates, start_date_range, 'start_date')
+        return amount_count * date_count * len(num_children)
+    
+    @staticmethod
+    def _sweep_axis_length(values: Optional[list], value_range: Optional[dict], name: str) -> int:
+        """Número de puntos de un eje de la rejilla sin llegar a expandirlo."""
+        if (values is None) == (value_range is None):
+            raise ValueError(f"Indique {name}s o {name}_range (uno de los dos)")
+        
+        if values is not None:
+            if not values:
+                raise ValueError(f"El eje {name} no puede estar vacío")
+            return len(values)
+        
+        if name == 'start_date':
+            if value_range['end'] < value_range['start']:
+                raise ValueError("El rango de fechas termina antes de empezar")
+            months = calculate_months_between_dates(value_range['start'], value_range['end'])
+            if add_months(value_range['start'], months) > value_range['end']:
+                months -= 1
+            return months // value_range['step_months'] + 1
+        
+        if value_range['stop'] < value_range['start']:
+            raise ValueError("El rango de cuantías termina antes de empezar")
+        return math.floor((value_range['stop'] - value_range['start']) / value_range['step'] + 1e-9) + 1
     
     def calculate_retroactive(
         self,
@@ -191,54 +348,222 @@ class ComplementoPaternidadService:
         Returns:
             Dict con el cálculo de atrasos
         """
-        logger.info(f"Calculando atrasos del {start_date} al {end_date}")
+        logger.info("Calculando atrasos del %s al %s", start_date, end_date)
         
-        total_amount = 0.0
-        period_1_amount = 0.0
-        period_2_amount = 0.0
+        rules = self.rules
+        
+        if self.cache is not None:
+            key = self._cache_key('retroactive', rules.version, start_date, end_date, pension_amount, num_children)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return json.loads(cached)
+        
+        result = self._retroactive_segments(rules, start_date, end_date, [{
+            'effective_from': start_date,
+            'pension_amount': pension_amount,
+            'num_children': num_children
+        }])
+        del result['segments']
+        
+        if self.cache is not None:
+            self.cache.set(key, json.dumps(result, separators=(',', ':')).encode())
+        
+        return result
+    
+    @staticmethod
+    def _cache_key(operation: str, *values) -> bytes:
+        """Clave de caché a partir de las entradas normalizadas."""
+        return '\x1f'.join(map(str, request_key(operation, *values))).encode()
+    
+    def calculate_retroactive_segments(
+        self,
+        start_date: date,
+        end_date: date,
+        segments: List[dict]
+    ) -> dict:
+        """
+        Calcular atrasos con un historial de pensión por tramos.
+        
+        Los cambios de tramo se combinan con las fronteras de la tabla de
+        importes en un único barrido ordenado. Dentro de cada tramo resultante
+        la pensión, los hijos y la tarifa son constantes, así que sus meses se
+        cuentan en tiempo constante: el coste es O(tramos), no O(meses).
+        
+        Args:
+            start_date: Fecha de inicio del período
+            end_date: Fecha de fin del período (excluida)
+            segments: Dicts con effective_from, pension_amount y num_children,
+                ordenados por effective_from; el primero debe empezar en
+                start_date o antes
+            
+        Returns:
+            Dict con los totales de atrasos y el desglose por tramo
+        """
+        return self._retroactive_segments(self.rules, start_date, end_date, segments)
+    
+    def _retroactive_segments(
+        self,
+        rules: CompiledRules,
+        start_date: date,
+        end_date: date,
+        segments: List[dict]
+    ) -> dict:
+        logger.info("Calculando atrasos por tramos del %s al %s (%s tramos)", start_date, end_date, len(segments))
+        
+        if segments[0]['effective_from'] > start_date:
+            raise ValueError("El primer tramo debe empezar en la fecha de inicio o antes")
+        
+        breakdown = []
+        totals = {rule.period: 0.0 for rule in rules.periods}
         total_months = 0
         
-        current_date = start_date
+        # Cortes: inicios de tramo y fronteras de las reglas, ambos ya ordenados
+        cuts = heapq.merge([segment['effective_from'] for segment in segments], rules.boundaries)
+        
+        segment_index = 0
+        piece_start = start_date
+        steps_before = 0
         
-        while current_date < end_date:
-            # Determinar qué período aplica para esta fecha
-            period = date_to_period(current_date)
+        for cut in [*cuts, end_date]:
+            if cut <= piece_start:
+                continue
+            piece_end = min(cut, end_date)
+            
+            while segment_index + 1 < len(segments) and segments[segment_index + 1]['effective_from'] <= piece_start:
+                segment_index += 1
+            segment = segments[segment_index]
+            
+            steps_until = count_month_steps(start_date, piece_end)
+            months = steps_until - steps_before
             
-            try:
-                if period == PeriodType.PERIOD_1:
-                    # Calcular solo si es pensión de jubilación y tiene al menos 2 hijos
-                    if num_children >= 2:
-                        calc = self._calculate_period_1(num_children, pension_amount)
-                        monthly_amount = calc.amount
-                        period_1_amount += monthly_amount
-                        total_amount += monthly_amount
-                        total_months += 1
+            if months > 0:
+                rule = rules.period_for(piece_start)
+                period = rule.period if rule is not None else None
+                monthly_amount = rule.monthly_amount(segment['num_children'], segment['pension_amount']) if rule else 0.0
+                paid_months = months if monthly_amount > 0 else 0
+                # El importe mensual ya está en céntimos: cada tramo es exacto
+                # y la suma de los tramos coincide con el total
+                amount = round(monthly_amount * paid_months, 2)
                 
-                elif period == PeriodType.PERIOD_2:
-                    calc = self._calculate_period_2(num_children, pension_amount)
-                    monthly_amount = calc.amount
-                    period_2_amount += monthly_amount
-                    total_amount += monthly_amount
-                    total_months += 1
-                    
-            except ValueError:
-                # No aplica para esta fecha/condiciones
-                pass
+                if paid_months:
+                    totals[period] += amount
+                    total_months += paid_months
+                
+                breakdown.append({
+                    'date_from': piece_start,
+                    'date_to': piece_end,
+                    'pension_amount': segment['pension_amount'],
+                    'num_children': segment['num_children'],
+                    'period': period,
+                    'rate_version': rules.rate_version(piece_start) if paid_months else None,
+                    'months': paid_months,
+                    'monthly_amount': monthly_amount,
+                    'amount': amount
+                })
             
-            # Avanzar al siguiente mes
-            if current_date.month == 12:
-                current_date = current_date.replace(year=current_date.year + 1, month=1)
-            else:
-                current_date = current_date.replace(month=current_date.month + 1)
+            piece_start = piece_end
+            steps_before = steps_until
+            if piece_start >= end_date:
+                break
+        
+        period_1_amount = totals.get(PeriodType.PERIOD_1, 0.0)
+        period_2_amount = totals.get(PeriodType.PERIOD_2, 0.0)
+        total_amount = sum(totals.values())
         
-        logger.info(f"Atrasos calculados: {total_amount}€ en {total_months} meses")
+        logger.info("Atrasos calculados: %s€ en %s meses", total_amount, total_months)
         
         return {
             "total_amount": round(total_amount, 2),
             "months_calculated": total_months,
             "period_1_amount": round(period_1_amount, 2) if period_1_amount > 0 else None,
-            "period_2_amount": round(period_2_amount, 2) if period_2_amount > 0 else None
+            "period_2_amount": round(period_2_amount, 2) if period_2_amount > 0 else None,
+            "segments": breakdown
+        }
+    
+    def iter_retroactive_months(
+        self,
+        start_date: date,
+        end_date: date,
+        pension_amount: float,
+        num_children: int,
+        start_index: int = 0
+    ) -> Iterator[dict]:
+        """
+        Generar el desglose mensual de atrasos de forma perezosa.
+        
+        Cada mes es un paso mensual desde start_date (mismo día, ajustado al
+        último día del mes si no existe) anterior a end_date. Los meses en los
+        que no aplica el complemento se devuelven con importe 0.
+        
+        Args:
+            start_date: Fecha de inicio del período
+            end_date: Fecha de fin del período (excluida)
+            pension_amount: Cuantía de la pensión
+            num_children: Número de hijos
+            start_index: Primer mes a generar (para reanudar una paginación)
+            
+        Yields:
+            Dict con index, month, period, rate_version y amount de cada mes
+        """
+        rules = self.rules
+        
+        # El importe mensual solo depende del período: se calcula una vez
+        monthly_amounts = {
+            rule.period: rule.monthly_amount(num_children, pension_amount)
+            for rule in rules.periods
         }
+        
+        for index in range(start_index, count_month_steps(start_date, end_date)):
+            month = add_months(start_date, index)
+            rule = rules.period_for(month)
+            period = rule.period if rule is not None else None
+            amount = monthly_amounts.get(period, 0.0)
+            
+            yield {
+                'index': index,
+                'month': month,
+                'period': period,
+                'rate_version': rules.rate_version(month) if amount > 0 else None,
+                'amount': amount
+            }
+    
+    def retroactive_months_page(
+        self,
+        start_date: date,
+        end_date: date,
+        pension_amount: float,
+        num_children: int,
+        start_index: int,
+        limit: int
+    ) -> List[dict]:
+        """
+        Obtener una página del desglose mensual de atrasos.
+        
+        Args:
+            start_date: Fecha de inicio del período
+            end_date: Fecha de fin del período (excluida)
+            pension_amount: Cuantía de la pensión
+            num_children: Número de hijos
+            start_index: Primer mes de la página
+            limit: Número máximo de meses
+            
+        Returns:
+            Lista de meses como los que genera iter_retroactive_months
+        """
+        months = self.iter_retroactive_months(start_date, end_date, pension_amount, num_children, start_index)
+        return list(islice(months, limit))
+    
+    def rate_version(self, input_date: date) -> Optional[str]:
+        """
+        Obtener la versión de la tabla de importes vigente en una fecha.
+        
+        Args:
+            input_date: Fecha a evaluar
+            
+        Returns:
+            Identificador de la versión o None si la fecha es anterior a todas
+        """
+        return self.rules.rate_version(input_date)
     
     def compare_progenitors(
         self,
@@ -257,31 +582,33 @@ class ComplementoPaternidadService:
         """
         logger.info("Comparando dos progenitores para determinar derecho al complemento")
         
+        rules = self.rules
         results = []
         
-        for i, data in enumerate([progenitor_1_data, progenitor_2_data], 1):
-            try:
-                calculation = self.calculate_complement(
-                    data['pension_type'],
-                    data['start_date'], 
-                    data['num_children'],
-                    data['pension_amount']
-                )
-                
+        for data in (progenitor_1_data, progenitor_2_data):
+            outcome = rules.evaluate(
+                data['pension_type'],
+                data['start_date'],
+                data['num_children'],
+                data['pension_amount']
+            )
+            if outcome.eligible:
                 results.append({
                     'name': data['name'],
                     'eligible': True,
-                    'complement_amount': calculation.amount,
-                    'total_pension': calculation.pension_with_complement
+                    'complement_amount': outcome.amount,
+                    'total_pension': data['pension_amount'] + outcome.amount,
+                    'reason': None,
+                    'reason_code': None
                 })
-                
-            except ValueError as e:
+            else:
                 results.append({
                     'name': data['name'],
                     'eligible': False,
                     'complement_amount': None,
                     'total_pension': None,
-                    'reason': str(e)
+                    'reason': ineligible_message(outcome),
+                    'reason_code': outcome.reason_name
                 })
         
         # Determinar quién tiene derecho
@@ -299,7 +626,7 @@ class ComplementoPaternidadService:
             eligible_progenitor = min_pension['name']
             explanation = f"Ambos son elegibles, se otorga a {eligible_progenitor} por tener menor pensión"
         
-        logger.info(f"Resultado comparación: {eligible_progenitor} tiene derecho")
+        logger.info("Resultado comparación: %s tiene derecho", eligible_progenitor)
         
         return {
             'eligible_progenitor': eligible_progenitor,
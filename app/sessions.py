@@ -0,0 +1,296 @@
+"""
+Sesiones WebSocket para el cálculo interactivo.
+
+Una calculadora interactiva recalcula cada vez que cambia un control. Por
+HTTP, cada cambio es una petición completa: cabeceras, middleware y la
+validación de todos los campos. En ``/ws`` el cliente abre una sesión y
+envía mensajes pequeños con solo los campos que cambian::
+
+    {"id": 1, "type": "calculate", "data": {"pension_type": "jubilacion", "start_date": "2021-06-15",
+                                            "num_children": 2, "pension_amount": 1000}}
+    {"id": 2, "type": "calculate", "data": {"num_children": 3}}
+    {"id": 3, "type": "retroactive", "data": {"end_date": "2024-01-01"}}
+    {"id": 4, "type": "reset"}
+
+La sesión guarda el contexto (el último valor de cada campo) y la última
+petición validada de cada tipo. Si no cambia ninguno de los campos que usa
+un tipo, no se vuelve a validar; si además no han cambiado las reglas, se
+reenvía el último resultado sin calcular. Cada respuesta lleva el ``id``
+del mensaje al que responde::
+
+    {"id": 2, "type": "calculate", "rules_version": "2021.02", "result": {...}}
+    {"id": 5, "type": "error", "status": 422, "detail": [...]}
+
+Los errores usan los códigos de HTTP: 400 (mensaje inválido o pensionista
+sin derecho, con ``reason_code``), 413 (mensaje demasiado grande), 422
+(campos inválidos) y 429 (sesión saturada).
+
+Contrapresión: los mensajes se atienden en orden desde una cola acotada
+(``WS_MAX_PENDING``). Un cliente que envía más rápido de lo que lee las
+respuestas llena la cola, y los mensajes que no caben se rechazan con 429
+en el acto, sin calcularlos. El número de sesiones por worker
+(``WS_MAX_SESSIONS``, cierre 1013 al superarlo), el tamaño de los mensajes
+(``WS_MAX_MESSAGE_BYTES``) y el tiempo sin mensajes (``WS_IDLE_TIMEOUT``)
+también están acotados.
+"""
+
+import asyncio
+import json
+import logging
+from collections import Counter
+from typing import Optional
+
+from fastapi import WebSocket
+from pydantic import ValidationError
+
+from .config import env_float, env_int
+from .schemas import CalculationRequest, RetroactiveRequest
+from .services import ComplementoPaternidadService, ineligible_message
+
+logger = logging.getLogger('app.sessions')
+
+# Código de cierre WebSocket "Try Again Later"
+WS_TRY_AGAIN_LATER = 1013
+
+# Tipo de mensaje -> (esquema de validación, campos del contexto que usa)
+OPERATIONS = {
+    'calculate': (CalculationRequest, ('pension_type', 'start_date', 'num_children', 'pension_amount')),
+    'retroactive': (RetroactiveRequest, ('start_date', 'end_date', 'pension_amount', 'num_children')),
+}
+
+
+def _error(message_id, status: int, detail, **extra) -> dict:
+    return {'id': message_id, 'type': 'error', 'status': status, 'detail': detail, **extra}
+
+
+class CalculationSession:
+    """Contexto, peticiones validadas y últimos resultados de una conexión."""
+
+    def __init__(self, service: ComplementoPaternidadService, counters: Optional[Counter] = None):
+        """
+        Args:
+            service: Servicio con el que se calcula
+            counters: Contadores compartidos (validaciones y reutilizaciones)
+        """
+        self.service = service
+        self.counters = counters if counters is not None else Counter()
+        self.context = {}
+        # Tipo -> (valores de sus campos, petición validada)
+        self._requests = {}
+        # Tipo -> (petición, versión de las reglas, respuesta sin id)
+        self._results = {}
+
+    def reset(self) -> None:
+        """Olvidar el contexto y los resultados."""
+        self.context.clear()
+        self._requests.clear()
+        self._results.clear()
+
+    def handle(self, message) -> dict:
+        """
+        Atender un mensaje de la sesión.
+
+        Args:
+            message: Mensaje JSON ya decodificado (id, type y data)
+
+        Returns:
+            Respuesta con el mismo id: resultado o error
+        """
+        if not isinstance(message, dict):
+            return _error(None, 400, "El mensaje debe ser un objeto JSON")
+        message_id = message.get('id')
+        operation = message.get('type')
+        if operation == 'reset':
+            self.reset()
+            return {'id': message_id, 'type': 'reset'}
+        if operation not in OPERATIONS:
+            return _error(
+                message_id, 400, f"Tipo de mensaje desconocido '{operation}' (se espera {', '.join(OPERATIONS)} o reset)"
+            )
+        data = message.get('data') or {}
+        if not isinstance(data, dict):
+            return _error(message_id, 400, "'data' debe ser un objeto con los campos que cambian")
+        self.context.update(data)
+
+        model, fields = OPERATIONS[operation]
+        values = tuple(self.context.get(field) for field in fields)
+        cached = self._requests.get(operation)
+        if cached is not None and cached[0] == values:
+            request = cached[1]
+            self.counters['validations_reused'] += 1
+        else:
+            try:
+                request = model(**{field: self.context[field] for field in fields if field in self.context})
+            except ValidationError as e:
+                self._requests.pop(operation, None)
+                detail = [{'loc': list(error['loc']), 'msg': error['msg']} for error in e.errors()]
+                return _error(message_id, 422, detail)
+            self._requests[operation] = (values, request)
+            self.counters['validations'] += 1
+
+        rules = self.service.rules
+        last = self._results.get(operation)
+        if last is not None and last[0] is request and last[1] == rules.version:
+            self.counters['results_reused'] += 1
+            return {'id': message_id, **last[2]}
+
+        if operation == 'calculate':
+            response = self._calculate(rules, request)
+        else:
+            response = {
+                'type': operation,
+                'rules_version': rules.version,
+                'result': self.service.calculate_retroactive(
+                    request.start_date, request.end_date, request.pension_amount, request.num_children
+                )
+            }
+        self._results[operation] = (request, rules.version, response)
+        return {'id': message_id, **response}
+
+    @staticmethod
+    def _calculate(rules, request: CalculationRequest) -> dict:
+        # Sin excepciones: un pensionista sin derecho es una respuesta más
+        outcome = rules.evaluate(request.pension_type, request.start_date, request.num_children, request.pension_amount)
+        if not outcome.eligible:
+            return {
+                'type': 'error', 'status': 400, 'detail': ineligible_message(outcome),
+                'reason_code': outcome.reason_name, 'rules_version': rules.version
+            }
+        return {
+            'type': 'calculate',
+            'rules_version': rules.version,
+            'result': {
+                'period': outcome.rule.period.value,
+                'complement_percent': outcome.percentage,
+                'complement_fixed': outcome.fixed,
+                'amount': outcome.amount,
+                'pension_with_complement': request.pension_amount + outcome.amount
+            }
+        }
+
+
+class SessionManager:
+    """Sesiones WebSocket de un worker, con sus límites."""
+
+    def __init__(
+        self,
+        service: ComplementoPaternidadService,
+        max_sessions: int = 100,
+        max_pending: int = 16,
+        max_message_bytes: int = 4096,
+        idle_timeout: float = 300.0
+    ):
+        """
+        Args:
+            service: Servicio con el que calculan las sesiones
+            max_sessions: Sesiones abiertas a la vez en el worker
+            max_pending: Mensajes por sesión esperando a ser atendidos (al menos 1)
+            max_message_bytes: Tamaño máximo de un mensaje
+            idle_timeout: Segundos sin mensajes antes de cerrar la sesión
+                (0 = sin límite)
+        """
+        self.service = service
+        self.max_sessions = max_sessions
+        self.max_pending = max(1, max_pending)
+        self.max_message_bytes = max_message_bytes
+        self.idle_timeout = idle_timeout or None
+        self.open = 0
+        self.counters = Counter()
+
+    @classmethod
+    def from_env(cls, service: ComplementoPaternidadService) -> 'SessionManager':
+        """Crear el gestor con WS_MAX_SESSIONS, WS_MAX_PENDING, WS_MAX_MESSAGE_BYTES y WS_IDLE_TIMEOUT."""
+        return cls(
+            service,
+            max_sessions=env_int('WS_MAX_SESSIONS', 100),
+            max_pending=env_int('WS_MAX_PENDING', 16),
+            max_message_bytes=env_int('WS_MAX_MESSAGE_BYTES', 4096),
+            idle_timeout=env_float('WS_IDLE_TIMEOUT', 300.0)
+        )
+
+    async def serve(self, websocket: WebSocket) -> None:
+        """
+        Atender una conexión hasta que el cliente la cierre.
+
+        Un lector recibe los mensajes y los deja en la cola de la sesión (o
+        los rechaza si no caben); un único atendedor, en su propia tarea, los
+        calcula en orden, envía las respuestas y cierra la sesión inactiva.
+        """
+        await websocket.accept()
+        if self.open >= self.max_sessions:
+            self.counters['sessions_rejected'] += 1
+            await websocket.close(code=WS_TRY_AGAIN_LATER, reason="Demasiadas sesiones abiertas")
+            return
+
+        self.open += 1
+        self.counters['sessions'] += 1
+        session = CalculationSession(self.service, self.counters)
+        pending = asyncio.Queue(self.max_pending)
+        worker = asyncio.create_task(self._work(websocket, session, pending))
+        logger.info("Sesión WebSocket abierta (%s abiertas)", self.open)
+        try:
+            await self._read(websocket, pending, worker)
+        finally:
+            worker.cancel()
+            await asyncio.gather(worker, return_exceptions=True)
+            self.open -= 1
+            logger.info("Sesión WebSocket cerrada (%s abiertas)", self.open)
+
+    async def _read(self, websocket: WebSocket, pending: asyncio.Queue, worker: asyncio.Task) -> None:
+        # Sin wait_for en esta tarea: el servidor puede cancelarla, y wait_for
+        # confunde la cancelación de anyio; el plazo de inactividad lo vigila
+        # el atendedor
+        while True:
+            message = await websocket.receive()
+            if message['type'] == 'websocket.disconnect' or worker.done():
+                return
+
+            raw = message.get('text')
+            if raw is None:
+                raw = message.get('bytes') or b''
+            if len(raw) > self.max_message_bytes:
+                self.counters['rejected_too_large'] += 1
+                await self._send(websocket, _error(
+                    None, 413, f"El mensaje supera el máximo de {self.max_message_bytes} bytes"
+                ))
+                continue
+            try:
+                decoded = json.loads(raw)
+            except ValueError:
+                await self._send(websocket, _error(None, 400, "El mensaje no es JSON válido"))
+                continue
+
+            self.counters['messages'] += 1
+            try:
+                pending.put_nowait(decoded)
+            except asyncio.QueueFull:
+                self.counters['rejected_busy'] += 1
+                message_id = decoded.get('id') if isinstance(decoded, dict) else None
+                await self._send(websocket, _error(
+                    message_id, 429, "Sesión saturada: espere a las respuestas pendientes"
+                ))
+
+    async def _work(self, websocket: WebSocket, session: CalculationSession, pending: asyncio.Queue) -> None:
+        while True:
+            try:
+                message = await asyncio.wait_for(pending.get(), self.idle_timeout)
+            except asyncio.TimeoutError:
+                self.counters['sessions_idle'] += 1
+                await websocket.close(reason="Sesión inactiva")
+                return
+            await self._send(websocket, session.handle(message))
+
+    @staticmethod
+    async def _send(websocket: WebSocket, response: dict) -> None:
+        await websocket.send_text(json.dumps(response, separators=(',', ':')))
+
+    def stats(self) -> dict:
+        return {
+            'open': self.open,
+            'max_sessions': self.max_sessions,
+            'max_pending': self.max_pending,
+            **{name: self.counters[name] for name in (
+                'sessions', 'sessions_rejected', 'sessions_idle', 'messages', 'rejected_busy',
+                'rejected_too_large', 'validations', 'validations_reused', 'results_reused'
+            )}
+        }
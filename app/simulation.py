@@ -0,0 +1,177 @@
+"""
+Simulación de cambios normativos sobre la cartera almacenada.
+
+Un cambio se describe como una superposición (``overlay``) sobre el
+documento de reglas: solo las claves que cambian. Los períodos se indican
+por su identificador; los diccionarios se combinan y las listas se
+sustituyen enteras. Por ejemplo::
+
+    {"periods": {"2": {"calculation": {"amount_per_child": 40.0}}}}
+    {"periods": {"1": {"eligible_pension_types": ["jubilacion", "jubilacion_anticipada",
+                                                   "viudedad", "incapacidad"]}}}
+
+Las reglas resultantes se validan y compilan aparte: las reglas publicadas
+no cambian. Toda la cartera se calcula en bloque con el motor vectorizado
+y se compara con el resultado almacenado.
+"""
+
+import copy
+import json
+import logging
+
+import numpy as np
+
+from .engine import PERIODS, PENSION_TYPES, REASON_OK, round_cents
+from .rules import CompiledRules, RulesError, compile_rules
+
+logger = logging.getLogger('app.simulation')
+
+# Registros cambiados que se devuelven como muestra (los de mayor diferencia)
+DEFAULT_SAMPLE_SIZE = 20
+
+
+def apply_overlay(rules: CompiledRules, overlay: dict) -> CompiledRules:
+    """
+    Compilar unas reglas con una superposición aplicada.
+
+    Args:
+        rules: Reglas de partida
+        overlay: Claves del documento de reglas que cambian
+
+    Returns:
+        CompiledRules resultantes (versión '<versión>+simulación' salvo que
+        la superposición indique otra)
+
+    Raises:
+        RulesError: Si la superposición no encaja o las reglas resultantes
+            no son válidas
+    """
+    if not isinstance(overlay, dict):
+        raise RulesError("La superposición debe ser un objeto JSON")
+    document = json.loads(rules.document.json())
+    overlay = copy.deepcopy(overlay)
+
+    periods = overlay.pop('periods', {})
+    if not isinstance(periods, dict):
+        raise RulesError("'periods' debe ser un objeto indexado por período")
+    by_period = {rule['period']: rule for rule in document['periods']}
+    for period, changes in periods.items():
+        if period not in by_period:
+            raise RulesError(f"Período desconocido '{period}' (se admiten {', '.join(by_period)})")
+        _merge(by_period[period], changes)
+    _merge(document, overlay)
+    if 'version' not in overlay:
+        document['version'] = f"{rules.version}+simulación"
+
+    return compile_rules(document, source='superposición de simulación')
+
+
+def _merge(target: dict, changes) -> None:
+    if not isinstance(changes, dict):
+        raise RulesError("Cada cambio de la superposición debe ser un objeto")
+    for name, value in changes.items():
+        if isinstance(value, dict) and isinstance(target.get(name), dict):
+            _merge(target[name], value)
+        else:
+            target[name] = value
+
+
+def simulate(
+    rules: CompiledRules,
+    keys: np.ndarray,
+    type_codes: np.ndarray,
+    start_days: np.ndarray,
+    num_children: np.ndarray,
+    pension_amounts: np.ndarray,
+    old_eligible: np.ndarray,
+    old_amounts: np.ndarray,
+    sample_size: int = DEFAULT_SAMPLE_SIZE
+) -> dict:
+    """
+    Recalcular una población con otras reglas y compararla con su resultado.
+
+    Args:
+        rules: Reglas simuladas
+        keys: Identificadores de los pensionistas (se copian a la muestra)
+        type_codes: Códigos de tipo de pensión
+        start_days: Fechas de inicio (días desde 1970-01-01)
+        num_children: Número de hijos
+        pension_amounts: Cuantías de la pensión
+        old_eligible: Elegibilidad almacenada
+        old_amounts: Importe almacenado
+        sample_size: Registros cambiados a devolver
+
+    Returns:
+        Dict con los totales antes y después, los grupos por período y tipo
+        de pensión con cambios, y una muestra de los registros cambiados
+    """
+    engine = rules.engine
+    periods = engine.periods_from_epoch_days(start_days)
+    reasons, amounts = engine.calculate(type_codes, periods, num_children, pension_amounts)
+    new_eligible = reasons == REASON_OK
+    # Mismo redondeo que los importes almacenados (portfolio.evaluate)
+    new_amounts = round_cents(amounts)
+    old_eligible = old_eligible.astype(bool)
+    deltas = new_amounts - old_amounts
+    changed = (new_eligible != old_eligible) | (np.abs(deltas) >= 0.005)
+
+    # Grupos por (período simulado, tipo de pensión) con bincount
+    groups_index = periods.astype(np.int64) * len(PENSION_TYPES) + type_codes
+    size = len(PERIODS) * len(PENSION_TYPES)
+    counts = {
+        'records': np.bincount(groups_index, minlength=size),
+        'changed': np.bincount(groups_index, changed, minlength=size),
+        'old_amount': np.bincount(groups_index, old_amounts, minlength=size),
+        'new_amount': np.bincount(groups_index, new_amounts, minlength=size)
+    }
+    groups = []
+    for index in np.flatnonzero(counts['changed']).tolist():
+        period, pension_type = PERIODS[index // len(PENSION_TYPES)], PENSION_TYPES[index % len(PENSION_TYPES)]
+        old_total, new_total = float(counts['old_amount'][index]), float(counts['new_amount'][index])
+        groups.append({
+            'period': period.value if period else None,
+            'pension_type': pension_type.value,
+            'records': int(counts['records'][index]),
+            'changed': int(counts['changed'][index]),
+            'old_amount': round(old_total, 2),
+            'new_amount': round(new_total, 2),
+            'delta': round(new_total - old_total, 2)
+        })
+
+    # Muestra: los cambios de mayor importe absoluto
+    changed_positions = np.flatnonzero(changed)
+    sample_positions = changed_positions[np.argsort(-np.abs(deltas[changed_positions]), kind='stable')[:sample_size]]
+    sample = [
+        {
+            'key': key,
+            'pension_type': PENSION_TYPES[type_codes[position]].value,
+            'start_date': str(np.datetime64(int(start_days[position]), 'D')),
+            'num_children': int(num_children[position]),
+            'old_eligible': bool(old_eligible[position]),
+            'new_eligible': bool(new_eligible[position]),
+            'old_amount': float(old_amounts[position]),
+            'new_amount': float(new_amounts[position]),
+            'delta': round(float(deltas[position]), 2)
+        }
+        for key, position in zip(np.asarray(keys)[sample_positions].tolist(), sample_positions.tolist())
+    ]
+
+    old_total, new_total = float(old_amounts.sum()), float(new_amounts.sum())
+    result = {
+        'rules_version': rules.version,
+        'records': len(keys),
+        'changed': int(changed.sum()),
+        'newly_eligible': int((new_eligible & ~old_eligible).sum()),
+        'no_longer_eligible': int((old_eligible & ~new_eligible).sum()),
+        'old_total': round(old_total, 2),
+        'new_total': round(new_total, 2),
+        'delta': round(new_total - old_total, 2),
+        'groups': groups,
+        'sample': sample
+    }
+    logger.info(
+        "Simulación %s: %s de %s registros cambian, %s€ -> %s€ al mes",
+        rules.version, result['changed'], result['records'], result['old_total'], result['new_total']
+    )
+    return result
+
@@ -0,0 +1,135 @@
+"""
+Índice ordenado de fechas de inicio por tipo de pensión.
+
+Responde en tiempo logarítmico a preguntas como "cuántos pensionistas de
+viudedad empezaron entre X e Y y cuánto cobran" sin recorrer la cartera.
+Por cada tipo de pensión guarda arrays ordenados por fecha de inicio, con
+una entrada por fecha distinta (registros, elegibles e importe en
+céntimos), y sus sumas acumuladas. Un rango se resuelve con dos búsquedas
+binarias y una resta de sumas acumuladas.
+
+Los cambios no se aplican uno a uno: se acumulan como deltas (registros
++1/-1 e importe con signo) y se funden por lotes, ordenándolos y
+combinándolos con los arrays existentes en una sola pasada.
+"""
+
+from datetime import date
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .schemas import PensionType
+
+# Columnas de valores: registros, elegibles e importe en céntimos
+_VALUES = 3
+
+
+def epoch_days(value: date) -> int:
+    """Días desde 1970-01-01 de una fecha."""
+    return int(np.datetime64(value, 'D').astype(np.int64))
+
+
+class StartDateIndex:
+    """Fechas de inicio ordenadas y sumas acumuladas, por tipo de pensión."""
+
+    def __init__(self):
+        # Por tipo: fechas distintas ordenadas (días desde 1970-01-01) y
+        # sumas acumuladas de los valores, con una fila inicial de ceros
+        self._dates: Dict[str, np.ndarray] = {}
+        self._cumulative: Dict[str, np.ndarray] = {}
+        self._pending = []
+
+    def add(self, deltas: Iterable[Tuple[str, str, int, int, int]]) -> None:
+        """
+        Acumular cambios para el próximo lote.
+
+        Args:
+            deltas: Tuplas (pension_type, start_date ISO, registros,
+                elegibles, céntimos), con signo negativo para lo que se retira
+        """
+        self._pending.extend(deltas)
+
+    def merge(self) -> int:
+        """
+        Fundir los cambios acumulados con los arrays del índice.
+
+        Returns:
+            Número de cambios fundidos
+        """
+        pending, self._pending = self._pending, []
+        if not pending:
+            return 0
+        types, dates, *values = zip(*pending)
+        types = np.array(types)
+        dates = np.array(dates, dtype='datetime64[D]').astype(np.int64)
+        values = np.array(values, dtype=np.int64).T
+
+        for pension_type in np.unique(types).tolist():
+            selected = types == pension_type
+            self._merge_type(pension_type, dates[selected], values[selected])
+        return len(pending)
+
+    def _merge_type(self, pension_type: str, dates: np.ndarray, values: np.ndarray) -> None:
+        current = self._dates.get(pension_type, np.empty(0, dtype=np.int64))
+        cumulative = self._cumulative.get(pension_type, np.zeros((1, _VALUES), dtype=np.int64))
+        all_dates = np.concatenate([current, dates])
+        all_values = np.concatenate([np.diff(cumulative, axis=0), values])
+
+        # Una entrada por fecha: se suman los deltas de la misma fecha y se
+        # descartan las fechas que se quedan sin registros
+        merged_dates, positions = np.unique(all_dates, return_inverse=True)
+        merged = np.zeros((len(merged_dates), _VALUES), dtype=np.int64)
+        np.add.at(merged, positions, all_values)
+        keep = merged[:, 0] != 0
+
+        self._dates[pension_type] = merged_dates[keep]
+        self._cumulative[pension_type] = np.vstack([
+            np.zeros((1, _VALUES), dtype=np.int64), np.cumsum(merged[keep], axis=0)
+        ])
+
+    def query(
+        self,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+        pension_types: Optional[Sequence[PensionType]] = None
+    ) -> Dict[str, dict]:
+        """
+        Totales de las fechas de inicio de un rango, por tipo de pensión.
+
+        Args:
+            date_from: Primera fecha del rango (incluida); None = sin límite
+            date_to: Última fecha del rango (incluida); None = sin límite
+            pension_types: Tipos a consultar (por defecto todos los del índice)
+
+        Returns:
+            Dict por tipo de pensión con records, eligible y total_amount
+            (solo los tipos con algún registro en el rango)
+        """
+        self.merge()
+        names = [PensionType(t).value for t in pension_types] if pension_types else sorted(self._dates)
+        totals = {}
+        for name in names:
+            dates = self._dates.get(name)
+            if dates is None:
+                continue
+            low = np.searchsorted(dates, epoch_days(date_from), side='left') if date_from else 0
+            high = np.searchsorted(dates, epoch_days(date_to), side='right') if date_to else len(dates)
+            if high <= low:
+                continue
+            cumulative = self._cumulative[name]
+            records, eligible, cents = (cumulative[high] - cumulative[low]).tolist()
+            totals[name] = {'records': records, 'eligible': eligible, 'total_amount': cents / 100}
+        return totals
+
+    def clear(self) -> None:
+        """Vaciar el índice (antes de reconstruirlo)."""
+        self._dates.clear()
+        self._cumulative.clear()
+        self._pending = []
+
+    def stats(self) -> dict:
+        """Fechas distintas y registros indexados por tipo."""
+        return {
+            name: {'dates': len(dates), 'records': int(self._cumulative[name][-1, 0])}
+            for name, dates in sorted(self._dates.items())
+        }
@@ -0,0 +1,255 @@
+"""
+Generador determinista de poblaciones sintéticas de pensionistas.
+
+Para pruebas de carga y de escala sin copiar datos reales. A partir de
+una semilla genera pensionistas con:
+
+- fechas de inicio repartidas entre el primer día del período 1 y una
+  fecha final (por defecto cubre los dos períodos);
+- la mezcla de tipos de pensión y de número de hijos de ``TYPE_WEIGHTS`` y
+  ``CHILDREN_WEIGHTS``;
+- cuantías log-normales con la mediana de cada tipo, entre
+  ``MIN_AMOUNT`` y ``MAX_AMOUNT``;
+- hogares: en una parte de las parejas de filas (2k, 2k+1) el segundo
+  pensionista es el otro progenitor del primero (mismo ``household_id`` y
+  mismos hijos), para comparar progenitores.
+
+La población se genera por bloques de ``BLOCK_ROWS`` filas, cada uno con
+su propio generador aleatorio derivado de (semilla, número de bloque):
+la fila N es la misma sea cual sea el tamaño total y el formato, y la
+memoria no depende del número de filas.
+
+Cada bloque es un dict de arrays numpy (la forma columnar en memoria):
+``id``, ``household_id``, ``pension_type`` (códigos de app/engine.py),
+``start_date`` (datetime64[D]), ``num_children`` y ``pension_amount``.
+``write_population`` los escribe como CSV, NDJSON, Arrow IPC o Parquet;
+Arrow y Parquet requieren ``pyarrow``.
+"""
+
+import json
+import logging
+from datetime import date
+from typing import BinaryIO, Dict, Iterator
+
+import numpy as np
+
+from .engine import PENSION_TYPES, PENSION_TYPE_CODES
+from .schemas import PensionType, MIN_START_DATE
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - depende del entorno
+    pa = None
+    pq = None
+
+logger = logging.getLogger('app.synthetic')
+
+# Filas por bloque (par: los hogares se forman con parejas de filas)
+BLOCK_ROWS = 65536
+
+POPULATION_FORMATS = ('csv', 'ndjson', 'arrow', 'parquet')
+
+POPULATION_COLUMNS = ('id', 'household_id', 'pension_type', 'start_date', 'num_children', 'pension_amount')
+
+# Proporción de cada tipo de pensión
+TYPE_WEIGHTS = {
+    PensionType.JUBILACION: 0.55,
+    PensionType.JUBILACION_ANTICIPADA: 0.13,
+    PensionType.VIUDEDAD: 0.20,
+    PensionType.INCAPACIDAD: 0.12,
+}
+
+# Proporción de cada número de hijos
+CHILDREN_WEIGHTS = {1: 0.25, 2: 0.42, 3: 0.22, 4: 0.11}
+
+# Mediana de la cuantía mensual por tipo y dispersión de su logaritmo
+AMOUNT_MEDIANS = {
+    PensionType.JUBILACION: 1300.0,
+    PensionType.JUBILACION_ANTICIPADA: 1500.0,
+    PensionType.VIUDEDAD: 850.0,
+    PensionType.INCAPACIDAD: 1100.0,
+}
+AMOUNT_SIGMA = 0.35
+MIN_AMOUNT, MAX_AMOUNT = 400.0, 3200.0
+
+
+class PopulationGenerator:
+    """Población sintética reproducible a partir de una semilla."""
+
+    def __init__(
+        self,
+        seed: int = 0,
+        start: date = MIN_START_DATE,
+        end: date = date(2025, 12, 31),
+        household_rate: float = 0.15
+    ):
+        """
+        Args:
+            seed: Semilla; la misma semilla da la misma población
+            start: Primera fecha de inicio posible
+            end: Última fecha de inicio posible
+            household_rate: Proporción de parejas de filas (2k, 2k+1) que
+                comparten hogar e hijos
+        """
+        if end < start:
+            raise ValueError("La fecha final es anterior a la inicial")
+        if start < MIN_START_DATE:
+            raise ValueError(f"La fecha inicial debe ser posterior al {MIN_START_DATE}")
+        if not 0 <= household_rate <= 1:
+            raise ValueError("household_rate debe estar entre 0 y 1")
+        self.seed = seed
+        self.start = start
+        self.end = end
+        self.household_rate = household_rate
+
+        types = list(TYPE_WEIGHTS)
+        self._type_codes = np.array([PENSION_TYPE_CODES[t] for t in types], dtype=np.int8)
+        self._type_weights = np.array([TYPE_WEIGHTS[t] for t in types])
+        self._children = np.array(list(CHILDREN_WEIGHTS), dtype=np.int8)
+        self._children_weights = np.array(list(CHILDREN_WEIGHTS.values()))
+        # Logaritmo de la mediana indexado por código de tipo
+        self._log_medians = np.zeros(len(PENSION_TYPES))
+        for pension_type, median in AMOUNT_MEDIANS.items():
+            self._log_medians[PENSION_TYPE_CODES[pension_type]] = np.log(median)
+
+    def block(self, index: int, rows: int = BLOCK_ROWS) -> Dict[str, np.ndarray]:
+        """
+        Generar las primeras ``rows`` filas del bloque ``index``.
+
+        Args:
+            index: Número de bloque (la primera fila es index * BLOCK_ROWS)
+            rows: Filas a generar (como mucho BLOCK_ROWS)
+
+        Returns:
+            Dict de arrays con las columnas de POPULATION_COLUMNS
+        """
+        rng = np.random.default_rng([self.seed, index])
+        first = index * BLOCK_ROWS
+        # Siempre se genera el bloque entero: las filas no dependen del total
+        size = BLOCK_ROWS
+
+        type_codes = self._type_codes[
+            np.searchsorted(np.cumsum(self._type_weights), rng.random(size) * self._type_weights.sum())
+        ]
+        days = (self.end - self.start).days + 1
+        start_dates = np.datetime64(self.start, 'D') + rng.integers(0, days, size)
+        num_children = self._children[
+            np.searchsorted(np.cumsum(self._children_weights), rng.random(size) * self._children_weights.sum())
+        ]
+        amounts = np.exp(self._log_medians[type_codes] + AMOUNT_SIGMA * rng.standard_normal(size))
+        amounts = np.round(np.clip(amounts, MIN_AMOUNT, MAX_AMOUNT), 2)
+
+        ids = np.arange(first, first + size, dtype=np.int64)
+        households = ids.copy()
+        # Parejas (2k, 2k+1): el segundo es el otro progenitor del primero
+        shared = np.flatnonzero(rng.random(size // 2) < self.household_rate) * 2 + 1
+        households[shared] = ids[shared - 1]
+        num_children[shared] = num_children[shared - 1]
+
+        columns = {
+            'id': ids,
+            'household_id': households,
+            'pension_type': type_codes,
+            'start_date': start_dates,
+            'num_children': num_children,
+            'pension_amount': amounts,
+        }
+        return {name: values[:rows] for name, values in columns.items()}
+
+    def blocks(self, rows: int) -> Iterator[Dict[str, np.ndarray]]:
+        """
+        Generar ``rows`` filas bloque a bloque.
+
+        Yields:
+            Dict de arrays de cada bloque (el último puede ser más corto)
+        """
+        for index in range((rows + BLOCK_ROWS - 1) // BLOCK_ROWS):
+            yield self.block(index, min(BLOCK_ROWS, rows - index * BLOCK_ROWS))
+
+    def columns(self, rows: int) -> Dict[str, np.ndarray]:
+        """Población entera en memoria, como dict de arrays."""
+        blocks = list(self.blocks(rows)) or [self.block(0, 0)]
+        return {name: np.concatenate([block[name] for block in blocks]) for name in POPULATION_COLUMNS}
+
+
+def _type_names(codes: np.ndarray) -> np.ndarray:
+    return np.array([t.value for t in PENSION_TYPES], dtype=object)[codes]
+
+
+def _text_lines(block: Dict[str, np.ndarray], template: str) -> str:
+    values = zip(
+        block['id'].tolist(), block['household_id'].tolist(), _type_names(block['pension_type']).tolist(),
+        block['start_date'].astype(str).tolist(), block['num_children'].tolist(), block['pension_amount'].tolist()
+    )
+    return ''.join(template.format(*row) for row in values)
+
+
+def _record_batch(block: Dict[str, np.ndarray]):
+    names = [t.value for t in PENSION_TYPES]
+    return pa.record_batch([
+        pa.array(block['id']),
+        pa.array(block['household_id']),
+        pa.DictionaryArray.from_arrays(pa.array(block['pension_type']), pa.array(names)),
+        pa.array(block['start_date'], type=pa.date32()),
+        pa.array(block['num_children']),
+        pa.array(block['pension_amount']),
+    ], names=list(POPULATION_COLUMNS))
+
+
+def write_population(
+    generator: PopulationGenerator,
+    rows: int,
+    sink: BinaryIO,
+    fmt: str = 'csv'
+) -> int:
+    """
+    Escribir una población sintética en streaming, bloque a bloque.
+
+    Args:
+        generator: Generador de la población
+        rows: Número de pensionistas
+        sink: Destino binario (un fichero para Parquet)
+        fmt: Uno de POPULATION_FORMATS
+
+    Returns:
+        Filas escritas
+
+    Raises:
+        ValueError: Si el formato no existe o requiere pyarrow y no está
+    """
+    if fmt not in POPULATION_FORMATS:
+        raise ValueError(f"Formato desconocido '{fmt}' (se espera {', '.join(POPULATION_FORMATS)})")
+    if fmt in ('arrow', 'parquet') and pa is None:
+        raise ValueError(f"El formato {fmt} requiere pyarrow (pip install pyarrow)")
+
+    written = 0
+    if fmt == 'csv':
+        sink.write((','.join(POPULATION_COLUMNS) + '\n').encode())
+        for block in generator.blocks(rows):
+            sink.write(_text_lines(block, '{},{},{},{},{},{:.2f}\n').encode())
+            written += len(block['id'])
+    elif fmt == 'ndjson':
+        template = ''.join([
+            '{{', ', '.join(f'{json.dumps(name)}: {value}' for name, value in zip(POPULATION_COLUMNS, (
+                '{}', '{}', '"{}"', '"{}"', '{}', '{:.2f}'
+            ))), '}}\n'
+        ])
+        for block in generator.blocks(rows):
+            sink.write(_text_lines(block, template).encode())
+            written += len(block['id'])
+    else:
+        schema = _record_batch(generator.block(0, 0)).schema
+        writer = pa.ipc.new_stream(sink, schema) if fmt == 'arrow' else pq.ParquetWriter(sink, schema)
+        with writer:
+            for block in generator.blocks(rows):
+                batch = _record_batch(block)
+                if fmt == 'arrow':
+                    writer.write_batch(batch)
+                else:
+                    writer.write_table(pa.Table.from_batches([batch]))
+                written += batch.num_rows
+
+    logger.info("Población sintética (semilla %s): %s filas en %s", generator.seed, written, fmt)
+    return written
+
@@ -0,0 +1,187 @@
+"""
+Trazas ligeras por petición basadas en contextvars.
+
+El middleware abre una traza por petición HTTP; dentro de ella, ``span()``
+mide fases (validación, servicio, serialización...). Al responder, las
+duraciones se envían en la cabecera ``Server-Timing``, se registran como
+campos estructurados del log y, opcionalmente, se exportan a un fichero en
+formato Trace Event (cargable en chrome://tracing o Perfetto).
+"""
+
+import itertools
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Optional
+
+from .config import env_str
+
+logger = logging.getLogger('app.tracing')
+
+_current_trace: ContextVar[Optional["Trace"]] = ContextVar('current_trace', default=None)
+
+
+class Trace:
+    """Fases medidas durante una petición."""
+
+    __slots__ = ('name', 'start', 'spans', '_last_mark')
+
+    def __init__(self, name: str):
+        self.name = name
+        self.start = perf_counter()
+        self.spans = []
+        self._last_mark = self.start
+
+    def add(self, name: str, start: float, end: float) -> None:
+        """Registrar una fase con sus instantes de inicio y fin (perf_counter)."""
+        self.spans.append((name, start, end))
+
+    def mark(self, name: str) -> None:
+        """Registrar una fase desde la marca anterior (o el inicio) hasta ahora."""
+        now = perf_counter()
+        self.add(name, self._last_mark, now)
+        self._last_mark = now
+
+    def durations(self) -> dict:
+        """Duración total por nombre de fase, en milisegundos."""
+        totals = {}
+        for name, start, end in self.spans:
+            totals[name] = totals.get(name, 0.0) + (end - start) * 1000
+        return {name: round(value, 3) for name, value in totals.items()}
+
+    def server_timing(self, total_ms: float) -> str:
+        """Valor de la cabecera Server-Timing."""
+        entries = [f"{name};dur={duration}" for name, duration in self.durations().items()]
+        entries.append(f"total;dur={round(total_ms, 3)}")
+        return ", ".join(entries)
+
+
+def current_trace() -> Optional[Trace]:
+    """Traza de la petición en curso (None fuera de una petición)."""
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name: str):
+    """
+    Medir un bloque como fase de la traza actual.
+
+    Fuera de una petición trazada no hace nada.
+
+    Args:
+        name: Nombre de la fase
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(name, start, perf_counter())
+
+
+def mark(name: str) -> None:
+    """
+    Cerrar una fase que empezó en la marca anterior (o al recibir la petición).
+
+    Útil para fases que ocurren antes de entrar en el endpoint, como la
+    lectura y validación del cuerpo: ``mark("validation")`` al inicio del
+    endpoint mide todo lo transcurrido desde que llegó la petición.
+
+    Args:
+        name: Nombre de la fase
+    """
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.mark(name)
+
+
+class TraceFileExporter:
+    """
+    Exportador de trazas a fichero en formato Trace Event de Chrome.
+
+    Cada fase se escribe como evento completo ("ph": "X") en un array JSON
+    abierto, formato que chrome://tracing y Perfetto aceptan sin el "]" final.
+    Cada petición usa su propio tid para que las peticiones concurrentes
+    aparezcan en filas separadas.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._pid = os.getpid()
+
+    def export(self, trace: Trace, end: float) -> None:
+        """Añadir al fichero la traza completa de una petición."""
+        tid = next(self._ids)
+        events = [self._event(trace.name, trace.start, end, tid)]
+        events.extend(self._event(name, start, finish, tid) for name, start, finish in trace.spans)
+
+        lines = "".join(json.dumps(event) + ",\n" for event in events)
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as handle:
+                if handle.tell() == 0:
+                    handle.write("[\n")
+                handle.write(lines)
+
+    def _event(self, name: str, start: float, end: float, tid: int) -> dict:
+        return {
+            "name": name,
+            "ph": "X",
+            "ts": round(start * 1_000_000, 1),
+            "dur": round((end - start) * 1_000_000, 1),
+            "pid": self._pid,
+            "tid": tid
+        }
+
+
+class TracingMiddleware:
+    """Middleware ASGI que abre una traza por petición HTTP."""
+
+    def __init__(self, app, exporter: Optional[TraceFileExporter] = None):
+        self.app = app
+        self.exporter = exporter
+
+    @classmethod
+    def exporter_from_env(cls) -> Optional[TraceFileExporter]:
+        """Exportador configurado en TRACE_EXPORT_FILE (None si no se define)."""
+        path = env_str('TRACE_EXPORT_FILE')
+        return TraceFileExporter(path) if path else None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace(f"{scope['method']} {scope['path']}")
+        token = _current_trace.set(trace)
+
+        async def send_with_timing(message):
+            if message['type'] == 'http.response.start':
+                total_ms = (perf_counter() - trace.start) * 1000
+                headers = list(message.get('headers', []))
+                headers.append((b'server-timing', trace.server_timing(total_ms).encode('latin-1')))
+                message = {**message, 'headers': headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_trace.reset(token)
+            end = perf_counter()
+            if trace.spans:
+                if logger.isEnabledFor(logging.INFO):
+                    logger.info(
+                        "Traza %s", trace.name,
+                        extra={'spans': trace.durations(), 'duration': round((end - trace.start) * 1000, 3)}
+                    )
+                if self.exporter is not None:
+                    self.exporter.export(trace, end)
@@ -2,9 +2,14 @@
 Funciones de utilidad para el cálculo del Complemento de Paternidad.
 """
 
+import base64
+import calendar
+import hashlib
+import json
 from datetime import date, datetime
 from typing import Optional
 from .schemas import PeriodType
+from .rules import get_rules
 
 def date_to_period(input_date: date) -> Optional[PeriodType]:
     """
@@ -16,16 +21,8 @@ def date_to_period(input_date: date) -> Optional[PeriodType]:
     Returns:
         PeriodType correspondiente o None si está fuera de rango
     """
-    period_1_start = date(2016, 1, 1)
-    period_1_end = date(2021, 2, 3)
-    period_2_start = date(2021, 2, 4)
-    
-    if period_1_start <= input_date <= period_1_end:
-        return PeriodType.PERIOD_1
-    elif input_date >= period_2_start:
-        return PeriodType.PERIOD_2
-    else:
-        return None
+    rule = get_rules().period_for(input_date)
+    return rule.period if rule is not None else None
 
 def calculate_months_between_dates(start_date: date, end_date: date) -> int:
     """
@@ -46,6 +43,102 @@ def calculate_months_between_dates(start_date: date, end_date: date) -> int:
     
     return months
 
+def add_months(input_date: date, months: int) -> date:
+    """
+    Desplazar una fecha un número de meses conservando el día.
+    
+    Si el día no existe en el mes destino (p. ej. 31 de abril) se usa el
+    último día de ese mes.
+    
+    Args:
+        input_date: Fecha de partida
+        months: Número de meses a desplazar (puede ser negativo)
+        
+    Returns:
+        Fecha desplazada
+    """
+    month_index = input_date.year * 12 + input_date.month - 1 + months
+    year, month = divmod(month_index, 12)
+    month += 1
+    day = min(input_date.day, calendar.monthrange(year, month)[1])
+    return date(year, month, day)
+
+def count_month_steps(start_date: date, end_date: date) -> int:
+    """
+    Contar los pasos mensuales desde start_date que caen antes de end_date.
+    
+    Equivale a contar los i >= 0 con add_months(start_date, i) < end_date,
+    pero en tiempo constante.
+    
+    Args:
+        start_date: Fecha del primer paso
+        end_date: Fecha límite (excluida)
+        
+    Returns:
+        Número de pasos mensuales
+    """
+    if end_date <= start_date:
+        return 0
+    
+    months = calculate_months_between_dates(start_date, end_date)
+    if add_months(start_date, months) < end_date:
+        months += 1
+    
+    return months
+
+def encode_cursor(position: int, fingerprint: str) -> str:
+    """
+    Codificar un cursor opaco de paginación.
+    
+    Args:
+        position: Siguiente posición a devolver
+        fingerprint: Huella de los parámetros de la consulta
+        
+    Returns:
+        Cursor en base64 URL-safe
+    """
+    raw = json.dumps({"p": position, "f": fingerprint}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str, fingerprint: str) -> int:
+    """
+    Decodificar un cursor opaco y comprobar que pertenece a la misma consulta.
+    
+    Args:
+        cursor: Cursor devuelto por encode_cursor
+        fingerprint: Huella de los parámetros de la consulta actual
+        
+    Returns:
+        Posición codificada en el cursor
+        
+    Raises:
+        ValueError: Si el cursor es inválido o de otra consulta
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        position = int(data["p"])
+        cursor_fingerprint = data["f"]
+    except Exception:
+        raise ValueError("Cursor de paginación inválido")
+    
+    if cursor_fingerprint != fingerprint or position < 0:
+        raise ValueError("El cursor no corresponde a esta consulta")
+    
+    return position
+
+def query_fingerprint(*values) -> str:
+    """
+    Calcular una huella corta y estable de los parámetros de una consulta.
+    
+    Args:
+        values: Valores de los parámetros
+        
+    Returns:
+        Huella hexadecimal de 16 caracteres
+    """
+    return hashlib.sha256(repr(values).encode()).hexdigest()[:16]
+
 def format_currency(amount: float) -> str:
     """
     Formatear cantidad como moneda española.
@@ -85,7 +178,7 @@ def is_valid_pension_date(pension_date: date) -> bool:
     Returns:
         True si la fecha es válida
     """
-    min_date = date(2016, 1, 1)
+    min_date = get_rules().periods[0].start
     max_date = date.today()
     
     return min_date <= pension_date <= max_date
@@ -124,12 +217,8 @@ def get_period_description(period: PeriodType) -> str:
     Returns:
         Descripción del período
     """
-    if period == PeriodType.PERIOD_1:
-        return "Período 1 (01/01/2016 - 03/02/2021): Solo jubilación, cálculo porcentual"
-    elif period == PeriodType.PERIOD_2:
-        return "Período 2 (desde 04/02/2021): Jubilación e incapacidad, importe fijo"
-    else:
-        return "Período no definido"
+    rule = get_rules().by_period.get(period)
+    return rule.description if rule is not None else "Período no definido"
 
 def round_currency(amount: float) -> float:
     """
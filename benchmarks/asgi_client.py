@@ -0,0 +1,108 @@
+"""
+Cliente ASGI mínimo para los benchmarks.
+
+Llama directamente a la aplicación, sin servidor ni cliente HTTP, para que
+las mediciones reflejen solo el coste de la aplicación.
+"""
+
+import asyncio
+import json
+from urllib.parse import urlencode
+
+
+async def call(app, method: str, path: str, params=None, body=None, headers=None, yield_on_receive=False):
+    """
+    Ejecutar una petición contra la aplicación ASGI.
+
+    Args:
+        app: Aplicación ASGI
+        method: Método HTTP
+        path: Ruta
+        params: Parámetros de consulta
+        body: Cuerpo JSON
+        headers: Cabeceras adicionales (dict)
+        yield_on_receive: Ceder el bucle al leer el cuerpo, como haría un
+            servidor real esperando a la red
+
+    Returns:
+        Tupla (código de estado, cabeceras de respuesta como dict)
+    """
+    payload = json.dumps(body).encode() if body is not None else b""
+    raw_headers = [
+        (b"host", b"bench"), (b"content-type", b"application/json"),
+        (b"content-length", str(len(payload)).encode())
+    ]
+    raw_headers.extend((name.lower().encode(), value.encode()) for name, value in (headers or {}).items())
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": method, "scheme": "http", "path": path, "raw_path": path.encode(),
+        "query_string": urlencode(params or {}).encode(), "root_path": "",
+        "headers": raw_headers, "client": ("127.0.0.1", 0), "server": ("bench", 80),
+    }
+    sent = False
+    response = {"status": 0, "headers": {}}
+
+    async def receive():
+        nonlocal sent
+        if yield_on_receive:
+            await asyncio.sleep(0)
+        if sent:
+            return {"type": "http.disconnect"}
+        sent = True
+        return {"type": "http.request", "body": payload, "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+            response["headers"] = {k.decode(): v.decode() for k, v in message.get("headers", [])}
+
+    await app(scope, receive, send)
+    return response["status"], response["headers"]
+
+
+class WebSocketSession:
+    """
+    Conexión WebSocket en proceso contra la aplicación ASGI.
+
+    Uso::
+
+        async with WebSocketSession(app, "/ws") as ws:
+            await ws.send({"id": 1, ...})
+            response = await ws.receive()
+    """
+
+    def __init__(self, app, path: str):
+        self.app = app
+        self.path = path
+        self._incoming = asyncio.Queue()
+        self._outgoing = asyncio.Queue()
+        self._task = None
+
+    async def __aenter__(self):
+        scope = {
+            "type": "websocket", "asgi": {"version": "3.0"}, "http_version": "1.1",
+            "scheme": "ws", "path": self.path, "raw_path": self.path.encode(), "query_string": b"",
+            "root_path": "", "headers": [(b"host", b"bench")], "client": ("127.0.0.1", 0),
+            "server": ("bench", 80), "subprotocols": [],
+        }
+        await self._incoming.put({"type": "websocket.connect"})
+        self._task = asyncio.create_task(self.app(scope, self._incoming.get, self._outgoing.put))
+        message = await self._outgoing.get()
+        if message["type"] != "websocket.accept":
+            raise RuntimeError(f"Conexión rechazada: {message}")
+        return self
+
+    async def send(self, body) -> None:
+        """Enviar un mensaje JSON."""
+        await self._incoming.put({"type": "websocket.receive", "text": json.dumps(body)})
+
+    async def receive(self):
+        """Recibir el siguiente mensaje JSON."""
+        message = await self._outgoing.get()
+        if message["type"] != "websocket.send":
+            raise RuntimeError(f"Conexión cerrada: {message}")
+        return json.loads(message["text"])
+
+    async def __aexit__(self, *exc_info):
+        await self._incoming.put({"type": "websocket.disconnect", "code": 1000})
+        await self._task
@@ -0,0 +1,78 @@
+"""
+Rendimiento y memoria del cálculo de ficheros CSV por rangos (app/bulk.py).
+
+Genera ficheros CSV sintéticos de varios tamaños (app/synthetic.py) y los calcula con 1..N
+procesos. Cada ejecución se hace en un proceso nuevo para medir su memoria
+máxima (RSS) sin arrastrar la de ejecuciones anteriores: la del proceso
+principal y la máxima de los procesos del pool.
+
+Si la memoria no depende del tamaño del fichero, el RSS debe ser casi el
+mismo para todos los tamaños con el mismo número de procesos.
+
+Uso:
+    python -m benchmarks.bulk_csv [--rows 200000 1000000] [--workers 1 2 4] [--chunk-mb 8]
+"""
+
+import argparse
+import logging
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.bulk import calculate_csv  # noqa: E402
+from app.synthetic import PopulationGenerator, write_population  # noqa: E402
+
+
+def write_file(path: str, rows: int, seed: int = 7) -> None:
+    """Escribir un CSV de pensionistas sin tenerlo entero en memoria."""
+    with open(path, 'wb') as f:
+        write_population(PopulationGenerator(seed), rows, f, 'csv')
+
+
+def run(path: str, workers: int, chunk_size: int, results) -> None:
+    logging.disable(logging.INFO)
+    start = time.perf_counter()
+    with open(os.devnull, 'wb') as sink:
+        summary = calculate_csv(path, sink, workers=workers, chunk_size=chunk_size)
+    elapsed = time.perf_counter() - start
+    results.put((
+        summary, elapsed,
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    ))
+
+
+def main(sizes: list, workers_list: list, chunk_mb: float) -> None:
+    context = multiprocessing.get_context('spawn')
+    print(f"CPUs: {os.cpu_count()}, rango: {chunk_mb} MiB")
+    print(f"{'filas':>10}{'MiB':>8}{'procesos':>10}{'s':>8}{'filas/s':>12}{'RSS principal':>15}{'RSS pool':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        for rows in sizes:
+            path = os.path.join(directory, f'{rows}.csv')
+            write_file(path, rows)
+            size_mb = os.path.getsize(path) / 1024 / 1024
+            for workers in workers_list:
+                results = context.Queue()
+                process = context.Process(target=run, args=(path, workers, int(chunk_mb * 1024 * 1024), results))
+                process.start()
+                summary, elapsed, rss_self, rss_children = results.get()
+                process.join()
+                # Con un solo rango (o un proceso) se calcula sin pool
+                workers = summary['workers']
+                pool_rss = f"{rss_children / 1024:.0f}" if workers > 1 else '-'
+                print(f"{summary['rows']:>10,}{size_mb:>8.0f}{workers:>10}{elapsed:>8.2f}"
+                      f"{summary['rows'] / elapsed:>12,.0f}{rss_self / 1024:>12.0f} MiB{pool_rss:>10}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[200000, 1000000], help='Filas de cada fichero')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4], help='Procesos a probar')
+    parser.add_argument('--chunk-mb', type=float, default=8, help='Tamaño de cada rango en MiB')
+    args = parser.parse_args()
+    main(args.rows, args.workers, args.chunk_mb)
@@ -0,0 +1,117 @@
+"""
+Prueba de carga del control de admisión.
+
+Mide primero la capacidad del endpoint (peticiones por segundo en serie) y
+después lanza una carga de llegada abierta (las peticiones llegan a ritmo
+fijo, se atiendan o no) por encima de esa capacidad, con y sin control de
+admisión. La latencia se mide desde el instante en que *debía* llegar cada
+petición, para no ocultar la espera (omisión coordinada).
+
+Sin límite, la cola crece durante toda la prueba y el p99 de todas las
+peticiones se dispara. Con límite, el exceso se rechaza con 503 en el acto
+y el p99 de las admitidas queda acotado por el tiempo de cola.
+
+Uso:
+    python -m benchmarks.load_shedding [--overload 2.0] [--duration 5]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+from benchmarks.asgi_client import call  # noqa: E402
+
+PATH = "/batch/calculate"
+BODY = {"items": [{
+    "pension_type": "jubilacion",
+    "start_date": "2021-06-15",
+    "num_children": 2,
+    "pension_amount": 1000.0
+}] * 50}
+
+SCENARIOS = {
+    "sin límite": {},
+    "con límite": {
+        "ADMISSION_MAX_IN_FLIGHT": "4",
+        "ADMISSION_MAX_QUEUE": "8",
+        "ADMISSION_QUEUE_TIMEOUT": "0.05",
+    },
+}
+
+
+def build_app(env: dict):
+    for name in ("ADMISSION_MAX_IN_FLIGHT", "ADMISSION_MAX_QUEUE", "ADMISSION_QUEUE_TIMEOUT"):
+        os.environ.pop(name, None)
+    os.environ.update(env)
+    app = create_app()
+    logging.disable(logging.CRITICAL)
+    return app
+
+
+async def capacity(app, requests: int = 200) -> float:
+    """Peticiones por segundo atendidas en serie."""
+    for _ in range(20):
+        await call(app, "POST", PATH, body=BODY)
+    start = time.perf_counter()
+    for _ in range(requests):
+        await call(app, "POST", PATH, body=BODY)
+    return requests / (time.perf_counter() - start)
+
+
+async def open_loop(app, rate: float, duration: float) -> dict:
+    """Lanzar peticiones a ritmo fijo y medir su latencia desde la llegada prevista."""
+    loop = asyncio.get_running_loop()
+    latencies = {}
+
+    async def one(scheduled: float):
+        status, _ = await call(app, "POST", PATH, body=BODY, yield_on_receive=True)
+        latencies.setdefault(status, []).append(loop.time() - scheduled)
+
+    tasks = []
+    start = loop.time()
+    for i in range(int(rate * duration)):
+        scheduled = start + i / rate
+        delay = scheduled - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(one(scheduled)))
+    await asyncio.gather(*tasks)
+    return latencies
+
+
+def percentile(values, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def main(overload: float, duration: float) -> None:
+    base_capacity = await capacity(build_app({}))
+    rate = base_capacity * overload
+    print(f"Capacidad en serie: {base_capacity:,.0f} pet/s; carga aplicada: {rate:,.0f} pet/s durante {duration}s\n")
+    print(f"{'escenario':<12}{'estado':>7}{'peticiones':>12}{'p50 (ms)':>11}{'p99 (ms)':>11}{'máx. (ms)':>11}")
+
+    for name, env in SCENARIOS.items():
+        app = build_app(env)
+        await capacity(app, requests=20)  # calentamiento
+        latencies = await open_loop(app, rate, duration)
+        for status in sorted(latencies):
+            values = latencies[status]
+            print(
+                f"{name:<12}{status:>7}{len(values):>12}"
+                f"{percentile(values, 0.5) * 1000:>11.1f}{percentile(values, 0.99) * 1000:>11.1f}"
+                f"{max(values) * 1000:>11.1f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--overload", type=float, default=2.0, help="Carga aplicada como múltiplo de la capacidad")
+    parser.add_argument("--duration", type=float, default=5.0, help="Duración de cada escenario en segundos")
+    args = parser.parse_args()
+    asyncio.run(main(args.overload, args.duration))
@@ -0,0 +1,121 @@
+"""
+Memoria asignada por petición en cada endpoint.
+
+Ejecuta la aplicación en el mismo proceso (llamando directamente a la
+interfaz ASGI, sin servidor ni cliente HTTP) con tracemalloc activo y, para
+cada endpoint, mide:
+
+- pico: bytes reservados en el pico de la petición por encima de la memoria
+  viva antes de empezarla (coste transitorio: modelos, dicts, logs...).
+- retenidos: memoria viva que queda tras N peticiones, dividida entre N
+  (crecimiento que no se libera: cachés, contadores, fugas).
+
+Además se listan las líneas de ``app/`` a las que se atribuye la memoria
+retenida.
+
+Uso:
+    python -m benchmarks.memory_per_request [--requests 200] [--top 5]
+"""
+
+import argparse
+import asyncio
+import gc
+import logging
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+from app.memory import MemoryTracker  # noqa: E402
+from benchmarks.asgi_client import call  # noqa: E402
+
+PERSON = {
+    "pension_type": "jubilacion",
+    "start_date": "2021-06-15",
+    "num_children": 2,
+    "pension_amount": 1000.0
+}
+
+ENDPOINTS = [
+    ("GET", "/health", None, None),
+    ("GET", "/eligibility", {"pension_type": "jubilacion", "start_date": "2021-06-15", "num_children": 2}, None),
+    ("POST", "/calculate", None, PERSON),
+    ("GET", "/retroactive", {
+        "start_date": "2021-06-15", "end_date": "2024-06-15", "pension_amount": 1000.0, "num_children": 2
+    }, None),
+    ("POST", "/compare", None, {
+        "progenitor_1": {**PERSON, "name": "A"},
+        "progenitor_2": {**PERSON, "name": "B", "pension_amount": 900.0}
+    }),
+    ("POST", "/batch/calculate", None, {"items": [PERSON] * 100}),
+]
+
+
+async def measure(app, endpoint, requests: int, top: int) -> dict:
+    method, path, params, body = endpoint
+
+    # Calentamiento: importaciones perezosas, cachés de validadores, etc.
+    for _ in range(5):
+        status, _ = await call(app, method, path, params, body)
+
+    tracker = MemoryTracker()
+    gc.collect()
+    tracker.take_snapshot("antes")
+    current_before, _ = tracemalloc.get_traced_memory()
+    peaks = [0] * requests
+
+    for i in range(requests):
+        base, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        await call(app, method, path, params, body)
+        _, peak = tracemalloc.get_traced_memory()
+        peaks[i] = peak - base
+
+    gc.collect()
+    current_after, _ = tracemalloc.get_traced_memory()
+    tracker.take_snapshot("despues")
+    # Los mismos puntos de asignación que /debug/memory, solo los que crecen
+    retained_sites = [
+        (entry["size_diff"] / requests, f"{entry['file']}:{entry['line']} {entry['code']}")
+        for entry in tracker.diff("antes", "despues", limit=sys.maxsize)
+        if entry["size_diff"] > 0
+    ][:top]
+
+    peaks.sort()
+    return {
+        "endpoint": f"{method} {path}",
+        "status": status,
+        "peak_median": peaks[len(peaks) // 2],
+        "peak_max": peaks[-1],
+        "retained_per_request": (current_after - current_before) / requests,
+        "retained_sites": retained_sites,
+    }
+
+
+async def main(requests: int, top: int) -> None:
+    app = create_app()
+    logging.disable(logging.CRITICAL)
+    tracemalloc.start(25)
+
+    print(f"{'endpoint':<26}{'estado':>7}{'pico med.':>12}{'pico máx.':>12}{'retenidos/pet.':>16}")
+    for endpoint in ENDPOINTS:
+        result = await measure(app, endpoint, requests, top)
+        print(
+            f"{result['endpoint']:<26}{result['status']:>7}"
+            f"{result['peak_median']:>11,}B{result['peak_max']:>11,}B"
+            f"{result['retained_per_request']:>15,.1f}B"
+        )
+        for per_request, site in result["retained_sites"]:
+            print(f"    {per_request:>10,.1f} B/pet.  {site}")
+
+    tracemalloc.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="Peticiones medidas por endpoint")
+    parser.add_argument("--top", type=int, default=5, help="Puntos de retención a mostrar por endpoint")
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.top))
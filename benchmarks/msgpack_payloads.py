@@ -0,0 +1,104 @@
+"""
+Tamaño y coste de CPU de JSON frente a MessagePack para lotes de pensionistas.
+
+Para N registros se compara el cuerpo de una petición de lote (``items``)
+y el de su respuesta (``results``) en tres formas:
+
+- json: lista de objetos, como el API JSON.
+- msgpack filas: la misma lista de objetos en MessagePack.
+- msgpack columnas: un array por campo, como las respuestas MessagePack.
+
+Se mide el tamaño y el mejor tiempo de codificar y de decodificar. En la
+forma por columnas, la decodificación incluye volver a filas (lo que hace
+el servidor antes de validar el cuerpo).
+
+Uso:
+    python -m benchmarks.msgpack_payloads [--sizes 10000 100000] [--repeat 3]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.negotiation import columnar, decode_msgpack, encode_msgpack  # noqa: E402
+from app.schemas import PensionType  # noqa: E402
+from app.utils import add_months  # noqa: E402
+
+PENSION_TYPES = [pension_type.value for pension_type in PensionType]
+
+
+def make_items(count: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    return [{
+        'pension_type': rng.choice(PENSION_TYPES),
+        'start_date': add_months(date(2016, 1, 1), rng.randrange(0, 100)).isoformat(),
+        'num_children': rng.randint(1, 5),
+        'pension_amount': round(rng.uniform(600, 3000), 2)
+    } for _ in range(count)]
+
+
+def make_results(items: list) -> list:
+    return [{
+        'index': index,
+        'eligible': item['num_children'] > 1,
+        'period': '2' if item['start_date'] >= '2021-02-04' else '1',
+        'amount': round(item['pension_amount'] * 0.05, 2) if item['num_children'] > 1 else None,
+        'pension_with_complement': round(item['pension_amount'] * 1.05, 2) if item['num_children'] > 1 else None,
+        'reason': None if item['num_children'] > 1 else 'No cumple los criterios de elegibilidad'
+    } for index, item in enumerate(items)]
+
+
+def best_time(function, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def compare(name: str, payload: dict, repeat: int) -> None:
+    # Como en una ruta: solo las listas de objetos pueden venir por columnas
+    row_fields = frozenset(key for key, value in payload.items() if isinstance(value, list))
+    forms = {
+        'json': (
+            lambda: json.dumps(payload).encode(),
+            lambda body: json.loads(body)
+        ),
+        'msgpack filas': (
+            lambda: encode_msgpack(payload),
+            lambda body: decode_msgpack(body, row_fields)
+        ),
+        'msgpack columnas': (
+            lambda: encode_msgpack(columnar(payload)),
+            lambda body: decode_msgpack(body, row_fields)
+        ),
+    }
+    for form, (encode, decode) in forms.items():
+        body = encode()
+        encode_s = best_time(encode, repeat)
+        decode_s = best_time(lambda: decode(body), repeat)
+        print(f"  {name:<10}{form:<18}{len(body) / 1024:>14,.0f}{encode_s * 1000:>16.1f}{decode_s * 1000:>18.1f}")
+
+
+def main(sizes: list, repeat: int) -> None:
+    for size in sizes:
+        items = make_items(size)
+        print(f"\n{size:,} registros")
+        print(f"  {'cuerpo':<10}{'forma':<18}{'tamaño (KiB)':>14}{'codificar (ms)':>16}{'decodificar (ms)':>18}")
+        compare('petición', {'items': items}, repeat)
+        compare('respuesta', {'results': make_results(items), 'eligible_count': 0, 'total_amount': 0.0}, repeat)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000], help='Número de registros')
+    parser.add_argument('--repeat', type=int, default=3, help='Repeticiones (se toma la mejor)')
+    args = parser.parse_args()
+    main(args.sizes, args.repeat)
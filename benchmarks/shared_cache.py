@@ -0,0 +1,130 @@
+"""
+Caché por worker frente a caché compartida entre workers.
+
+Lanza N procesos (como los workers de gunicorn/uvicorn de un host); cada
+uno atiende M peticiones de cálculo y de atrasos elegidas con una
+distribución de Zipf sobre un universo fijo de peticiones distintas (unas
+pocas muy repetidas y una cola larga). Se compara:
+
+- memory: cada worker con su MemoryCache (se calienta N veces).
+- shared: todos los workers con la misma SharedMemoryCache.
+- none: sin caché, como referencia.
+
+Para cada escenario se muestra la tasa de aciertos global, cuántos cálculos
+se hicieron realmente y el rendimiento agregado.
+
+Uso:
+    python -m benchmarks.shared_cache [--workers 4] [--requests 20000] [--universe 20000]
+"""
+
+import argparse
+import logging
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.cache import MemoryCache, SharedMemoryCache  # noqa: E402
+from app.schemas import PensionType  # noqa: E402
+from app.services import ComplementoPaternidadService  # noqa: E402
+from app.utils import add_months  # noqa: E402
+
+
+def make_universe(size: int, seed: int = 7) -> list:
+    """Peticiones distintas: mitad cálculos, mitad atrasos."""
+    rng = random.Random(seed)
+    requests = []
+    for i in range(size):
+        start = add_months(date(2016, 1, 1), rng.randrange(0, 100))
+        amount = round(rng.uniform(600, 3000), 2)
+        children = rng.randint(2, 4)
+        if i % 2:
+            requests.append(('calculate_complement', (PensionType.JUBILACION, start, children, amount)))
+        else:
+            end = add_months(start, rng.randrange(1, 60))
+            requests.append(('calculate_retroactive', (start, end, amount, children)))
+    return requests
+
+
+def zipf_indices(count: int, universe: int, seed: int, exponent: float = 1.1) -> list:
+    rng = random.Random(seed)
+    weights = [1 / (rank ** exponent) for rank in range(1, universe + 1)]
+    return rng.choices(range(universe), weights=weights, k=count)
+
+
+def worker(backend: str, path: str, requests: int, universe: int, seed: int, barrier, results) -> None:
+    logging.disable(logging.CRITICAL)
+    if backend == 'memory':
+        cache = MemoryCache(max_entries=universe)
+    elif backend == 'shared':
+        cache = SharedMemoryCache(path, slots=65536, slot_size=384)
+    else:
+        cache = None
+    service = ComplementoPaternidadService(cache=cache)
+    catalog = make_universe(universe)
+    order = zipf_indices(requests, universe, seed)
+
+    barrier.wait()
+    start = time.perf_counter()
+    for index in order:
+        method, args = catalog[index]
+        try:
+            getattr(service, method)(*args)
+        except ValueError:
+            pass
+    elapsed = time.perf_counter() - start
+
+    stats = cache.stats() if cache is not None else {'hits': 0, 'misses': requests}
+    results.put((stats['hits'], stats['misses'], elapsed))
+
+
+def run(backend: str, workers: int, requests: int, universe: int) -> dict:
+    context = multiprocessing.get_context('fork')
+    barrier = context.Barrier(workers)
+    results = context.Queue()
+    directory = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    path = os.path.join(directory, f'bench-cache-{os.getpid()}')
+
+    processes = [
+        context.Process(target=worker, args=(backend, path, requests, universe, seed, barrier, results))
+        for seed in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    outcomes = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    for leftover in (path, path + '.lock'):
+        if os.path.exists(leftover):
+            os.remove(leftover)
+
+    hits = sum(outcome[0] for outcome in outcomes)
+    misses = sum(outcome[1] for outcome in outcomes)
+    slowest = max(outcome[2] for outcome in outcomes)
+    return {
+        'hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+        'computed': misses,
+        'throughput': workers * requests / slowest
+    }
+
+
+def main(workers: int, requests: int, universe: int) -> None:
+    print(f"{workers} workers x {requests} peticiones, universo de {universe} peticiones distintas (Zipf)\n")
+    print(f"{'caché':<10}{'aciertos':>10}{'cálculos':>12}{'pet/s':>12}")
+    for backend in ('none', 'memory', 'shared'):
+        result = run(backend, workers, requests, universe)
+        print(f"{backend:<10}{result['hit_rate']:>9.1%}{result['computed']:>12,}{result['throughput']:>12,.0f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=4, help='Procesos worker')
+    parser.add_argument('--requests', type=int, default=20000, help='Peticiones por worker')
+    parser.add_argument('--universe', type=int, default=20000, help='Peticiones distintas posibles')
+    args = parser.parse_args()
+    main(args.workers, args.requests, args.universe)
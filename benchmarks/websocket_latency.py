@@ -0,0 +1,107 @@
+"""
+Latencia de ida y vuelta del cálculo interactivo: HTTP frente a WebSocket.
+
+Simula a un usuario que mueve los controles de la calculadora: cada paso
+cambia un campo (hijos, cuantía, fecha de inicio o fecha de fin) y pide el
+complemento o los atrasos. Por HTTP, cada paso es una petición completa a
+``POST /calculate`` o ``GET /retroactive``. Por WebSocket, una sola sesión
+en ``/ws`` recibe solo el campo que cambia.
+
+Se llama a la aplicación en proceso, sin red, así que la diferencia es el
+coste de la petición HTTP (middleware, cabeceras, validación de todos los
+campos) frente al de un mensaje de la sesión.
+
+Uso:
+    python -m benchmarks.websocket_latency [--steps 5000]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+from benchmarks.asgi_client import WebSocketSession, call  # noqa: E402
+
+CONTEXT = {
+    "pension_type": "jubilacion",
+    "start_date": "2021-06-15",
+    "end_date": "2024-01-01",
+    "num_children": 2,
+    "pension_amount": 1000.0,
+}
+
+
+def widget_changes(steps: int):
+    """Secuencia reproducible de (tipo de mensaje, campo que cambia)."""
+    for step in range(steps):
+        kind = step % 4
+        if kind == 0:
+            yield "calculate", {"num_children": 2 + step % 3}
+        elif kind == 1:
+            yield "calculate", {"pension_amount": 900.0 + step % 50 * 10}
+        elif kind == 2:
+            yield "calculate", {"start_date": f"2021-{1 + step % 12:02d}-15"}
+        else:
+            yield "retroactive", {"end_date": f"2024-{1 + step % 12:02d}-01"}
+
+
+async def http_round_trips(app, steps: int) -> list:
+    context = dict(CONTEXT)
+    latencies = []
+    for operation, change in widget_changes(steps):
+        context.update(change)
+        start = time.perf_counter()
+        if operation == "calculate":
+            body = {name: context[name] for name in ("pension_type", "start_date", "num_children", "pension_amount")}
+            status, _ = await call(app, "POST", "/calculate", body=body)
+        else:
+            params = {name: context[name] for name in ("start_date", "end_date", "pension_amount", "num_children")}
+            status, _ = await call(app, "GET", "/retroactive", params=params)
+        latencies.append(time.perf_counter() - start)
+        assert status == 200, status
+    return latencies
+
+
+async def websocket_round_trips(app, steps: int) -> list:
+    latencies = []
+    async with WebSocketSession(app, "/ws") as ws:
+        await ws.send({"id": 0, "type": "calculate", "data": CONTEXT})
+        await ws.receive()
+        for message_id, (operation, change) in enumerate(widget_changes(steps), 1):
+            start = time.perf_counter()
+            await ws.send({"id": message_id, "type": operation, "data": change})
+            response = await ws.receive()
+            latencies.append(time.perf_counter() - start)
+            assert response["id"] == message_id and response["type"] == operation, response
+    return latencies
+
+
+def percentile(values, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def main(steps: int) -> None:
+    app = create_app()
+    logging.disable(logging.CRITICAL)
+    print(f"{steps} cambios de control (3 de cada 4 piden el complemento, 1 los atrasos)\n")
+    print(f"{'transporte':<12}{'p50 (µs)':>10}{'p99 (µs)':>10}{'media (µs)':>12}")
+    for name, run in (("HTTP", http_round_trips), ("WebSocket", websocket_round_trips)):
+        await run(app, min(steps, 500))  # calentamiento
+        latencies = await run(app, steps)
+        print(
+            f"{name:<12}{percentile(latencies, 0.5) * 1e6:>10.0f}{percentile(latencies, 0.99) * 1e6:>10.0f}"
+            f"{sum(latencies) / len(latencies) * 1e6:>12.0f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--steps", type=int, default=5000, help="Cambios de control a simular")
+    args = parser.parse_args()
+    asyncio.run(main(args.steps))
@@ -0,0 +1,329 @@
+"""
+Línea de comandos para cálculos por lotes sin pasar por la API.
+
+Uso:
+    python cli.py arrow [entrada] [salida] [--key id] [--rules reglas.json]
+    python cli.py csv entrada.csv [salida.csv] [--key id] [--workers N] [--chunk-mb 8]
+    python cli.py portfolio load cartera.db entrada.csv [--key id] [--rules reglas.json]
+    python cli.py portfolio recompute cartera.db [--rules reglas.json] [--report diferencias.csv]
+    python cli.py portfolio rebuild cartera.db
+    python cli.py portfolio forecast cartera.db [salida.csv] [--from 2025-01] [--months 12] [--rules reglas.json]
+    python cli.py forecast entrada.csv [salida.csv] [--from 2025-01] [--months 12] [--rules reglas.json]
+    python cli.py generate filas [salida] [--seed 0] [--format csv|ndjson|arrow|parquet] [--households 0.15]
+
+``arrow`` lee un flujo Arrow IPC de pensionistas (fichero o ``-`` para la
+entrada estándar) y escribe el flujo de resultados (fichero o ``-`` para la
+salida estándar), lote de registros a lote de registros, con las mismas
+columnas que ``POST /batch/arrow`` (ver app/arrow.py).
+
+``csv`` calcula un fichero CSV de cualquier tamaño por rangos de bytes en
+un pool de procesos y escribe los resultados en orden (ver app/bulk.py).
+La entrada debe ser un fichero (se proyecta en memoria); la salida puede
+ser ``-``.
+
+``portfolio load`` calcula y guarda un CSV de pensionistas en la cartera
+SQLite; ``portfolio recompute`` la recalcula con otras reglas, solo en los
+registros afectados, y escribe el informe de diferencias;
+``portfolio rebuild`` reconstruye desde los registros los contadores de
+``GET /portfolio/summary`` y termina con código 1 si no cuadraban (ver
+app/portfolio.py).
+
+``portfolio forecast`` y ``forecast`` escriben la previsión mensual del
+complemento a pagar (mes, pensionistas que cobran e importe) de la cartera
+o de un CSV de pensionistas, que puede llevar una columna ``end_date`` con
+la fecha de baja (ver app/forecast.py).
+
+``generate`` escribe en streaming una población sintética reproducible
+(misma semilla, mismas filas) para pruebas de carga y de escala (ver
+app/synthetic.py). Parquet necesita un fichero de salida.
+
+Los logs van a la salida de errores para no mezclarse con los datos.
+"""
+
+import argparse
+import csv
+import os
+import sys
+from contextlib import ExitStack
+from datetime import date
+from itertools import islice
+from typing import List, Optional
+
+# Antes de importar la aplicación, que configura el logging al importarse
+os.environ.setdefault('LOG_STREAM', 'stderr')
+
+from app.arrow import arrow_available, convert_stream  # noqa: E402
+from app.bulk import DEFAULT_CHUNK_SIZE, calculate_csv  # noqa: E402
+from app.forecast import forecast_payouts, parse_month, read_population  # noqa: E402
+from app.logging_config import get_logger  # noqa: E402
+from app.portfolio import PortfolioStore  # noqa: E402
+from app.rules import RulesError, get_rules, load_rules  # noqa: E402
+from app.synthetic import POPULATION_FORMATS, PopulationGenerator, write_population  # noqa: E402
+
+logger = get_logger('cli')
+
+# Registros por transacción al cargar la cartera
+LOAD_BATCH_SIZE = 10000
+
+REPORT_COLUMNS = ('key', 'start_date', 'old_period', 'new_period', 'old_amount', 'new_amount', 'delta')
+
+FORECAST_COLUMNS = ('month', 'beneficiaries', 'amount')
+
+
+def _open(path: str, mode: str, stack: ExitStack):
+    if path == '-':
+        return sys.stdin.buffer if 'r' in mode else sys.stdout.buffer
+    return stack.enter_context(open(path, mode))
+
+
+def run_arrow(args: argparse.Namespace) -> int:
+    """Calcular un flujo Arrow IPC de la entrada a la salida."""
+    if not arrow_available():
+        print("error: pyarrow no está instalado (pip install pyarrow)", file=sys.stderr)
+        return 1
+    try:
+        rules = load_rules(args.rules) if args.rules else get_rules()
+        with ExitStack() as stack:
+            source = _open(args.input, 'rb', stack)
+            sink = _open(args.output, 'wb', stack)
+            rows = convert_stream(source, sink, rules, args.key)
+            sink.flush()
+    except (RulesError, ValueError, OSError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    logger.info("Flujo Arrow calculado: %s filas con las reglas %s", rows, rules.version)
+    return 0
+
+
+def run_csv(args: argparse.Namespace) -> int:
+    """Calcular un fichero CSV por rangos en paralelo."""
+    try:
+        with ExitStack() as stack:
+            sink = _open(args.output, 'wb', stack)
+            summary = calculate_csv(
+                args.input, sink, key=args.key, workers=args.workers,
+                chunk_size=int(args.chunk_mb * 1024 * 1024), rules_path=args.rules
+            )
+            sink.flush()
+    except (RulesError, ValueError, OSError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    logger.info(
+        "CSV calculado: %s filas (%s elegibles, %s inválidas), %s€ en %s rangos con %s procesos",
+        summary['rows'], summary['eligible'], summary['invalid'], summary['total_amount'],
+        summary['ranges'], summary['workers']
+    )
+    return 0
+
+
+def run_portfolio_load(args: argparse.Namespace) -> int:
+    """Calcular y guardar un CSV de pensionistas en la cartera."""
+    try:
+        rules = load_rules(args.rules) if args.rules else get_rules()
+        store = PortfolioStore(args.db)
+        written = 0
+        with open(args.input, encoding='utf-8', newline='') as f:
+            reader = csv.DictReader(f)
+            records = ({**row, 'key': row.get(args.key)} for row in reader)
+            while True:
+                batch = list(islice(records, LOAD_BATCH_SIZE))
+                if not batch:
+                    break
+                written += store.write(batch, rules)
+    except (RulesError, ValueError, OSError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    logger.info("Cartera %s: %s registros guardados con las reglas %s", args.db, written, rules.version)
+    return 0
+
+
+def run_portfolio_recompute(args: argparse.Namespace) -> int:
+    """Recalcular la cartera con otras reglas y escribir el informe de diferencias."""
+    try:
+        rules = load_rules(args.rules) if args.rules else get_rules()
+        report = PortfolioStore(args.db).recompute(rules)
+        with ExitStack() as stack:
+            sink = stack.enter_context(open(args.report, 'w', encoding='utf-8', newline='')) \
+                if args.report != '-' else sys.stdout
+            writer = csv.DictWriter(sink, fieldnames=REPORT_COLUMNS, lineterminator='\n')
+            writer.writeheader()
+            writer.writerows(report['changes'])
+    except (RulesError, ValueError, OSError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    logger.info(
+        "Cartera %s recalculada %s -> %s: %s registros afectados en %s tramos, %s cambian (%s€)",
+        args.db, report['from_version'], report['to_version'], report['recomputed'],
+        len(report['intervals']), len(report['changes']), report['total_delta']
+    )
+    return 0
+
+
+def run_portfolio_rebuild(args: argparse.Namespace) -> int:
+    """Reconstruir y comprobar los contadores de la cartera."""
+    try:
+        result = PortfolioStore(args.db).rebuild_rollup()
+    except (ValueError, OSError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    for mismatch in result['mismatches']:
+        print(
+            f"distinto: período {mismatch['period']}, {mismatch['pension_type']}, {mismatch['num_children']} hijos: "
+            f"contadores {mismatch['found']}, registros {mismatch['expected']}",
+            file=sys.stderr
+        )
+    logger.info(
+        "Contadores de %s reconstruidos: %s registros en %s grupos, %s grupos corregidos",
+        args.db, result['records'], result['groups'], len(result['mismatches'])
+    )
+    return 1 if result['mismatches'] else 0
+
+
+def _write_forecast(forecast: dict, output: str) -> None:
+    with ExitStack() as stack:
+        sink = stack.enter_context(open(output, 'w', encoding='utf-8', newline='')) \
+            if output != '-' else sys.stdout
+        writer = csv.DictWriter(sink, fieldnames=FORECAST_COLUMNS, lineterminator='\n')
+        writer.writeheader()
+        writer.writerows(forecast['series'])
+    logger.info(
+        "Previsión de %s pensionistas, %s meses desde %s con las reglas %s: %s€",
+        forecast['population'], forecast['months'], forecast['start'], forecast['rules_version'],
+        forecast['total_amount']
+    )
+
+
+def run_portfolio_forecast(args: argparse.Namespace) -> int:
+    """Escribir la previsión mensual de pagos de la cartera."""
+    try:
+        rules = load_rules(args.rules) if args.rules else None
+        forecast = PortfolioStore(args.db).forecast(parse_month(args.start), args.months, rules)
+        _write_forecast(forecast, args.output)
+    except (RulesError, ValueError, OSError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    return 0
+
+
+def run_forecast(args: argparse.Namespace) -> int:
+    """Escribir la previsión mensual de pagos de un CSV de pensionistas."""
+    try:
+        rules = load_rules(args.rules) if args.rules else get_rules()
+        with open(args.input, encoding='utf-8', newline='') as f:
+            population = read_population(csv.DictReader(f))
+        type_codes, start_dates, children, amounts, end_dates = population
+        forecast = forecast_payouts(
+            rules, type_codes, start_dates, children, amounts, parse_month(args.start), args.months, end_dates
+        )
+        _write_forecast(forecast, args.output)
+    except (RulesError, ValueError, OSError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    return 0
+
+
+def run_generate(args: argparse.Namespace) -> int:
+    """Escribir una población sintética."""
+    if args.format == 'parquet' and args.output == '-':
+        print("error: Parquet necesita un fichero de salida", file=sys.stderr)
+        return 2
+    try:
+        start = date.fromisoformat(args.start) if args.start else None
+        end = date.fromisoformat(args.end) if args.end else None
+        generator = PopulationGenerator(
+            args.seed, household_rate=args.households,
+            **{name: value for name, value in (('start', start), ('end', end)) if value is not None}
+        )
+        with ExitStack() as stack:
+            sink = _open(args.output, 'wb', stack)
+            write_population(generator, args.rows, sink, args.format)
+            sink.flush()
+    except (ValueError, OSError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    return 0
+
+
+def _add_forecast_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument('--from', dest='start', default=date.today().strftime('%Y-%m'),
+                        help='Primer mes YYYY-MM (por defecto el mes en curso)')
+    parser.add_argument('--months', type=int, default=12, help='Meses de la previsión')
+    parser.add_argument('--rules', help='Fichero de reglas (por defecto RULES_FILE o el incluido)')
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='cli.py', description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    arrow = commands.add_parser('arrow', help='Calcular un flujo Arrow IPC de pensionistas')
+    arrow.add_argument('input', nargs='?', default='-', help="Flujo de entrada ('-' = entrada estándar)")
+    arrow.add_argument('output', nargs='?', default='-', help="Flujo de salida ('-' = salida estándar)")
+    arrow.add_argument('--key', default='id', help='Columna clave que se copia a la salida')
+    arrow.add_argument('--rules', help='Fichero de reglas (por defecto RULES_FILE o el incluido)')
+    arrow.set_defaults(run=run_arrow)
+
+    bulk = commands.add_parser('csv', help='Calcular un fichero CSV grande en paralelo')
+    bulk.add_argument('input', help='Fichero CSV de entrada')
+    bulk.add_argument('output', nargs='?', default='-', help="Fichero de salida ('-' = salida estándar)")
+    bulk.add_argument('--key', default='id', help='Columna clave que se copia a la salida')
+    bulk.add_argument('--workers', type=int, default=None, help='Procesos (por defecto uno por CPU)')
+    bulk.add_argument('--chunk-mb', type=float, default=DEFAULT_CHUNK_SIZE / 1024 / 1024,
+                      help='Tamaño de cada rango en MiB')
+    bulk.add_argument('--rules', help='Fichero de reglas (por defecto RULES_FILE o el incluido)')
+    bulk.set_defaults(run=run_csv)
+
+    portfolio = commands.add_parser('portfolio', help='Cartera de cálculos almacenada')
+    actions = portfolio.add_subparsers(dest='action', required=True)
+
+    load = actions.add_parser('load', help='Calcular y guardar un CSV de pensionistas')
+    load.add_argument('db', help='Fichero SQLite de la cartera')
+    load.add_argument('input', help='Fichero CSV de entrada')
+    load.add_argument('--key', default='id', help='Columna clave de cada pensionista')
+    load.add_argument('--rules', help='Fichero de reglas (por defecto RULES_FILE o el incluido)')
+    load.set_defaults(run=run_portfolio_load)
+
+    recompute = actions.add_parser('recompute', help='Recalcular lo afectado por un cambio de reglas')
+    recompute.add_argument('db', help='Fichero SQLite de la cartera')
+    recompute.add_argument('--rules', help='Fichero de reglas nuevo (por defecto RULES_FILE o el incluido)')
+    recompute.add_argument('--report', default='-', help="Informe de diferencias CSV ('-' = salida estándar)")
+    recompute.set_defaults(run=run_portfolio_recompute)
+
+    rebuild = actions.add_parser('rebuild', help='Reconstruir y comprobar los contadores de la cartera')
+    rebuild.add_argument('db', help='Fichero SQLite de la cartera')
+    rebuild.set_defaults(run=run_portfolio_rebuild)
+
+    portfolio_forecast = actions.add_parser('forecast', help='Previsión mensual de pagos de la cartera')
+    portfolio_forecast.add_argument('db', help='Fichero SQLite de la cartera')
+    portfolio_forecast.add_argument('output', nargs='?', default='-', help="Fichero CSV ('-' = salida estándar)")
+    _add_forecast_arguments(portfolio_forecast)
+    portfolio_forecast.set_defaults(run=run_portfolio_forecast)
+
+    forecast = commands.add_parser('forecast', help='Previsión mensual de pagos de un CSV de pensionistas')
+    forecast.add_argument('input', help='Fichero CSV de pensionistas (end_date opcional)')
+    forecast.add_argument('output', nargs='?', default='-', help="Fichero CSV ('-' = salida estándar)")
+    _add_forecast_arguments(forecast)
+    forecast.set_defaults(run=run_forecast)
+
+    generate = commands.add_parser('generate', help='Generar una población sintética de pensionistas')
+    generate.add_argument('rows', type=int, help='Número de pensionistas')
+    generate.add_argument('output', nargs='?', default='-', help="Fichero de salida ('-' = salida estándar)")
+    generate.add_argument('--seed', type=int, default=0, help='Semilla (la misma semilla da las mismas filas)')
+    generate.add_argument('--format', choices=POPULATION_FORMATS, default='csv', help='Formato de salida')
+    generate.add_argument('--households', type=float, default=0.15,
+                          help='Proporción de parejas de filas que comparten hogar e hijos')
+    generate.add_argument('--start', help='Primera fecha de inicio (YYYY-MM-DD)')
+    generate.add_argument('--end', help='Última fecha de inicio (YYYY-MM-DD)')
+    generate.set_defaults(run=run_generate)
+
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.run(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -4,9 +4,12 @@ Aplicación Streamlit para consumir la API del Complemento de Paternidad
 
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
 from datetime import datetime, date
 import pandas as pd
+import altair as alt
 
 # Configuración de la página
 st.set_page_config(
@@ -19,14 +22,55 @@ st.set_page_config(
 # URL base de la API
 API_BASE_URL = "http://localhost:8000"
 
+# Timeout (segundos) para todas las llamadas a la API
+REQUEST_TIMEOUT = 10
+
+# Pensionistas enviados en cada llamada a /batch/calculate (máximo de la API: 1000)
+BATCH_CHUNK_SIZE = 500
+
+# Columnas obligatorias del CSV de carga masiva
+BULK_COLUMNS = ["pension_type", "start_date", "num_children", "pension_amount"]
+
+@st.cache_resource
+def get_session():
+    """Sesión HTTP compartida con pool de conexiones y reintentos."""
+    session = requests.Session()
+    retries = Retry(total=3, backoff_factor=0.3, status_forcelist=[502, 503, 504],
+                    allowed_methods=["GET", "POST"])
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=10, max_retries=retries)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+@st.cache_data(ttl=30, show_spinner=False)
 def check_api_health():
-    """Verificar si la API está disponible"""
+    """Verificar si la API está disponible (se cachea durante 30 segundos)"""
     try:
-        response = requests.get(f"{API_BASE_URL}/health", timeout=5)
+        response = get_session().get(f"{API_BASE_URL}/health", timeout=5)
         return response.status_code == 200
     except:
         return False
 
+@st.cache_data(max_entries=256, show_spinner=False)
+def api_get(path, params):
+    """GET cacheado para respuestas deterministas. Devuelve (status_code, json|texto)."""
+    response = get_session().get(f"{API_BASE_URL}{path}", params=params, timeout=REQUEST_TIMEOUT)
+    return _unpack_response(response)
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def api_post(path, payload):
+    """POST cacheado para respuestas deterministas. Devuelve (status_code, json|texto)."""
+    response = get_session().post(f"{API_BASE_URL}{path}", json=payload, timeout=REQUEST_TIMEOUT)
+    return _unpack_response(response)
+
+def _unpack_response(response):
+    # Los errores del servidor no se cachean: se elevan para que st.cache_data no los guarde
+    if response.status_code >= 500:
+        response.raise_for_status()
+    if response.status_code == 200:
+        return response.status_code, response.json()
+    return response.status_code, response.text
+
 def main():
     st.title("🍼 Calculadora del Complemento de Paternidad")
     st.markdown("---")
@@ -47,6 +91,8 @@ def main():
             "💰 Calcular Complemento",
             "⏮️ Calcular Atrasos",
             "⚖️ Comparar Progenitores",
+            "🧮 Escenarios (Qué pasaría si)",
+            "📂 Carga Masiva (CSV)",
             "📊 Información del Sistema"
         ]
     )
@@ -59,6 +105,10 @@ def main():
         calcular_atrasos()
     elif opcion == "⚖️ Comparar Progenitores":
         comparar_progenitores()
+    elif opcion == "🧮 Escenarios (Qué pasaría si)":
+        explorar_escenarios()
+    elif opcion == "📂 Carga Masiva (CSV)":
+        carga_masiva()
     elif opcion == "📊 Información del Sistema":
         informacion_sistema()
 
@@ -98,10 +148,9 @@ def verificar_elegibilidad():
                 "num_children": num_children
             }
             
-            response = requests.get(f"{API_BASE_URL}/eligibility", params=params)
+            status_code, data = api_get("/eligibility", params)
             
-            if response.status_code == 200:
-                data = response.json()
+            if status_code == 200:
                 
                 if data["eligible"]:
                     st.success("✅ ¡Eres elegible para el complemento!")
@@ -121,7 +170,7 @@ def verificar_elegibilidad():
                     if data["reason"]:
                         st.warning(f"Motivo: {data['reason']}")
             else:
-                st.error(f"Error: {response.text}")
+                st.error(f"Error: {data}")
                 
         except Exception as e:
             st.error(f"Error conectando con la API: {str(e)}")
@@ -168,10 +217,9 @@ def calcular_complemento():
                 "pension_amount": pension_amount
             }
             
-            response = requests.post(f"{API_BASE_URL}/calculate", json=data)
+            status_code, result = api_post("/calculate", data)
             
-            if response.status_code == 200:
-                result = response.json()
+            if status_code == 200:
                 
                 st.success("✅ Cálculo completado")
                 
@@ -214,7 +262,7 @@ def calcular_complemento():
                     st.json(result)
                 
             else:
-                st.error(f"Error: {response.text}")
+                st.error(f"Error: {result}")
                 
         except Exception as e:
             st.error(f"Error conectando con la API: {str(e)}")
@@ -262,10 +310,9 @@ def calcular_atrasos():
                 "num_children": num_children
             }
             
-            response = requests.get(f"{API_BASE_URL}/retroactive", params=params)
+            status_code, result = api_get("/retroactive", params)
             
-            if response.status_code == 200:
-                result = response.json()
+            if status_code == 200:
                 
                 st.success("✅ Cálculo de atrasos completado")
                 
@@ -297,7 +344,7 @@ def calcular_atrasos():
                     st.dataframe(df, use_container_width=True)
                 
             else:
-                st.error(f"Error: {response.text}")
+                st.error(f"Error: {result}")
                 
         except Exception as e:
             st.error(f"Error conectando con la API: {str(e)}")
@@ -343,10 +390,9 @@ def comparar_progenitores():
                 }
             }
             
-            response = requests.post(f"{API_BASE_URL}/compare", json=data)
+            status_code, result = api_post("/compare", data)
             
-            if response.status_code == 200:
-                result = response.json()
+            if status_code == 200:
                 
                 st.success("✅ Comparación completada")
                 
@@ -388,17 +434,161 @@ def comparar_progenitores():
                     st.json(result)
                 
             else:
-                st.error(f"Error: {response.text}")
+                st.error(f"Error: {result}")
                 
         except Exception as e:
             st.error(f"Error conectando con la API: {str(e)}")
 
+def explorar_escenarios():
+    st.header("🧮 Escenarios (Qué pasaría si)")
+    st.markdown("Explora cómo cambia el complemento según la cuantía, los hijos y la fecha de inicio")
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        pension_type = st.selectbox(
+            "Tipo de pensión:",
+            ["jubilacion", "jubilacion_anticipada", "incapacidad", "viudedad"],
+            key="sweep_type"
+        )
+        date_from = st.date_input("Fecha de inicio desde:", value=date(2019, 1, 1), key="sweep_from")
+        date_to = st.date_input("Fecha de inicio hasta:", value=date(2023, 1, 1), key="sweep_to")
+        step_months = st.number_input("Paso (meses):", min_value=1, max_value=24, value=3, key="sweep_step")
+    
+    with col2:
+        amount_from = st.number_input("Cuantía desde (€):", min_value=1.0, value=600.0, step=50.0, key="sweep_amount_from")
+        amount_to = st.number_input("Cuantía hasta (€):", min_value=1.0, value=2400.0, step=50.0, key="sweep_amount_to")
+        amount_step = st.number_input("Paso de cuantía (€):", min_value=1.0, value=100.0, step=10.0, key="sweep_amount_step")
+        children = st.multiselect("Número de hijos:", [1, 2, 3, 4], default=[1, 2, 3, 4], key="sweep_children")
+    
+    if st.button("🧮 Evaluar escenarios", type="primary"):
+        if not children:
+            st.warning("Selecciona al menos un número de hijos")
+            return
+        
+        payload = {
+            "pension_type": pension_type,
+            "num_children": sorted(children),
+            "pension_amount_range": {"start": amount_from, "stop": amount_to, "step": amount_step},
+            "start_date_range": {
+                "start": date_from.strftime("%Y-%m-%d"),
+                "end": date_to.strftime("%Y-%m-%d"),
+                "step_months": step_months
+            }
+        }
+        
+        try:
+            status_code, result = api_post("/sweep", payload)
+        except Exception as e:
+            st.error(f"Error conectando con la API: {str(e)}")
+            return
+        
+        if status_code != 200:
+            st.error(f"Error: {result}")
+            return
+        
+        # Reconstruir la rejilla a partir de los ejes y el array plano
+        axes = result["axes"]
+        index = pd.MultiIndex.from_product(
+            [axes[name] for name in result["order"]], names=result["order"]
+        )
+        df = pd.DataFrame({"amount": result["amounts"]}, index=index).reset_index()
+        
+        st.success(f"✅ {len(df)} escenarios evaluados ({result['eligible_count']} con derecho)")
+        
+        for num_children in axes["num_children"]:
+            st.markdown(f"#### 👶 {num_children} hijo(s)")
+            chart = alt.Chart(df[df["num_children"] == num_children]).mark_rect().encode(
+                x=alt.X("start_date:O", title="Fecha de inicio"),
+                y=alt.Y("pension_amount:O", title="Cuantía (€)", sort="descending"),
+                color=alt.Color("amount:Q", title="Complemento (€)"),
+                tooltip=["start_date", "pension_amount", "amount"]
+            )
+            st.altair_chart(chart, use_container_width=True)
+
+def carga_masiva():
+    st.header("📂 Carga Masiva (CSV)")
+    st.markdown("Calcula el complemento de muchos pensionistas a la vez a partir de un fichero CSV")
+    st.markdown(f"Columnas obligatorias: `{', '.join(BULK_COLUMNS)}` (fechas en formato YYYY-MM-DD)")
+    
+    uploaded = st.file_uploader("Fichero CSV de pensionistas:", type=["csv"])
+    
+    if uploaded is None:
+        return
+    
+    try:
+        df = pd.read_csv(uploaded, dtype={"pension_type": str, "start_date": str})
+    except Exception as e:
+        st.error(f"No se pudo leer el CSV: {str(e)}")
+        return
+    
+    missing = [col for col in BULK_COLUMNS if col not in df.columns]
+    if missing:
+        st.error(f"Faltan columnas en el CSV: {', '.join(missing)}")
+        return
+    
+    st.write(f"**{len(df)}** pensionistas cargados")
+    st.dataframe(df.head(20), use_container_width=True)
+    
+    if st.button("📂 Calcular lote", type="primary"):
+        items = df[BULK_COLUMNS].to_dict(orient="records")
+        session = get_session()
+        results = []
+        failed_chunks = 0
+        progress = st.progress(0.0, text="Enviando lotes a la API...")
+        
+        for offset in range(0, len(items), BATCH_CHUNK_SIZE):
+            chunk = items[offset:offset + BATCH_CHUNK_SIZE]
+            try:
+                response = session.post(
+                    f"{API_BASE_URL}/batch/calculate",
+                    json={"items": chunk},
+                    timeout=REQUEST_TIMEOUT
+                )
+            except Exception as e:
+                st.error(f"Error conectando con la API: {str(e)}")
+                return
+            
+            if response.status_code == 200:
+                for item in response.json()["results"]:
+                    item["index"] += offset
+                    results.append(item)
+            else:
+                failed_chunks += 1
+                st.warning(f"Filas {offset}-{offset + len(chunk) - 1} rechazadas: {response.text}")
+            
+            done = min(offset + BATCH_CHUNK_SIZE, len(items))
+            progress.progress(done / len(items), text=f"{done}/{len(items)} pensionistas procesados")
+        
+        if not results:
+            st.error("Ningún lote pudo calcularse")
+            return
+        
+        result_df = pd.DataFrame(results).set_index("index")
+        output = df.join(result_df)
+        
+        st.success(f"✅ Lote completado ({failed_chunks} bloques con errores)" if failed_chunks else "✅ Lote completado")
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric("✅ Pensionistas con derecho", int(result_df["eligible"].sum()))
+        with col2:
+            st.metric("💰 Total complementos", f"{result_df['amount'].fillna(0).sum():.2f}€")
+        
+        st.dataframe(output, use_container_width=True)
+        st.download_button(
+            "⬇️ Descargar resultados",
+            output.to_csv(index=False).encode("utf-8"),
+            file_name="complementos.csv",
+            mime="text/csv"
+        )
+
 def informacion_sistema():
     st.header("📊 Información del Sistema")
     
     # Health check
     try:
-        response = requests.get(f"{API_BASE_URL}/health")
+        response = get_session().get(f"{API_BASE_URL}/health", timeout=REQUEST_TIMEOUT)
         if response.status_code == 200:
             health_data = response.json()
             
@@ -0,0 +1,152 @@
+"""
+Tests para el control de admisión y la limitación por cliente.
+"""
+
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+from app import create_app
+from app.admission import AdmissionController, ConcurrencyLimit, TokenBucket
+
+CALCULATION = {
+    "pension_type": "jubilacion",
+    "start_date": "2021-06-15",
+    "num_children": 2,
+    "pension_amount": 1000.0
+}
+
+class TestConcurrencyLimit:
+    """Tests para ConcurrencyLimit."""
+    
+    def test_queue_and_handoff(self):
+        """Test las peticiones esperan en cola y reciben el hueco en orden."""
+        async def scenario():
+            limit = ConcurrencyLimit(limit=1, max_queue=2, queue_timeout=1.0)
+            assert await limit.acquire()
+            
+            waiting = [asyncio.create_task(limit.acquire()) for _ in range(2)]
+            await asyncio.sleep(0)
+            assert not await limit.acquire()  # cola llena
+            
+            limit.release()
+            assert await waiting[0]
+            limit.release()
+            assert await waiting[1]
+            limit.release()
+            return limit.stats()
+        
+        stats = asyncio.run(scenario())
+        
+        assert stats["in_flight"] == 0
+        assert stats["admitted"] == 3
+        assert stats["queued"] == 2
+        assert stats["rejected_queue_full"] == 1
+    
+    def test_queue_timeout(self):
+        """Test una petición en cola se descarta al vencer el plazo."""
+        async def scenario():
+            limit = ConcurrencyLimit(limit=1, max_queue=1, queue_timeout=0.01)
+            await limit.acquire()
+            admitted = await limit.acquire()
+            limit.release()
+            return admitted, limit.stats()
+        
+        admitted, stats = asyncio.run(scenario())
+        
+        assert admitted == False
+        assert stats["rejected_timeout"] == 1
+        assert stats["queue_length"] == 0
+        assert stats["in_flight"] == 0
+
+class TestTokenBucket:
+    """Tests para TokenBucket."""
+    
+    def test_burst_and_refill(self):
+        """Test la ráfaga inicial y la recarga a ritmo constante."""
+        bucket = TokenBucket(rate=2.0, burst=2.0, now=0.0)
+        
+        assert bucket.take(0.0) == 0
+        assert bucket.take(0.0) == 0
+        assert bucket.take(0.0) == pytest.approx(0.5)
+        assert bucket.take(0.5) == 0
+
+    def test_slow_rate_default_burst(self):
+        """Test con menos de una petición por segundo y sin ráfaga se admite al menos una."""
+        controller = AdmissionController(client_header="X-Client-Id", client_rate=0.5)
+        
+        assert controller.clients.burst == 1
+        assert controller.clients.check("a") == 0
+        assert controller.clients.check("a") == pytest.approx(2.0, abs=0.01)
+    
+    def test_burst_below_one_rejected(self):
+        """Test una ráfaga configurada menor que 1 se rechaza al arrancar."""
+        with pytest.raises(ValueError, match="RATE_LIMIT_BURST"):
+            AdmissionController(client_header="X-Client-Id", client_rate=0.5, client_burst=0.5)
+
+class TestAdmissionMiddleware:
+    """Tests del middleware integrado en la aplicación."""
+    
+    def test_disabled_by_default(self, monkeypatch):
+        """Test sin configuración no se limita nada."""
+        for name in ("ADMISSION_MAX_IN_FLIGHT", "ADMISSION_ROUTE_LIMITS", "RATE_LIMIT_HEADER"):
+            monkeypatch.delenv(name, raising=False)
+        
+        assert AdmissionController.from_env().enabled == False
+    
+    def test_route_limit_metrics(self, monkeypatch):
+        """Test las peticiones admitidas por ruta aparecen en /metrics."""
+        monkeypatch.setenv("ADMISSION_ROUTE_LIMITS", "/calculate=1")
+        client = TestClient(create_app())
+        
+        assert client.post("/calculate", json=CALCULATION).status_code == 200
+        
+        admission = client.get("/metrics").json()["admission"]
+        assert admission["routes"]["/calculate"]["admitted"] >= 1
+    
+    def test_shed_response(self, monkeypatch):
+        """Test respuesta de descarte cuando no quedan huecos ni cola."""
+        monkeypatch.setenv("ADMISSION_MAX_IN_FLIGHT", "1")
+        monkeypatch.setenv("ADMISSION_MAX_QUEUE", "0")
+        monkeypatch.setenv("ADMISSION_RETRY_AFTER", "3")
+        app = create_app()
+        client = TestClient(app)
+        
+        # Ocupar el único hueco, como si hubiera una petición en curso
+        admission = app.state.admission
+        admission.global_limit.in_flight = 1
+        response = client.post("/calculate", json=CALCULATION, headers={"Origin": "https://example.org"})
+        
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == "3"
+        # CORS envuelve a la admisión: el navegador puede leer Retry-After
+        assert response.headers["access-control-allow-origin"] == "https://example.org"
+        assert "Retry-After" in response.headers["access-control-expose-headers"]
+        assert response.json()["error"] == "ServiceUnavailable"
+        assert client.get("/health").status_code == 200  # exenta
+        
+        admission.global_limit.in_flight = 0
+        assert client.post("/calculate", json=CALCULATION).status_code == 200
+    
+    def test_client_rate_limit(self, monkeypatch):
+        """Test 429 cuando un cliente agota su cubo de fichas."""
+        monkeypatch.setenv("RATE_LIMIT_HEADER", "X-Client-Id")
+        monkeypatch.setenv("RATE_LIMIT_RATE", "0.1")
+        monkeypatch.setenv("RATE_LIMIT_BURST", "2")
+        client = TestClient(create_app())
+        
+        statuses = [
+            client.post("/calculate", json=CALCULATION, headers={"X-Client-Id": "a"}).status_code
+            for _ in range(3)
+        ]
+        other = client.post("/calculate", json=CALCULATION, headers={"X-Client-Id": "b"})
+        anonymous = client.post("/calculate", json=CALCULATION)
+        limited = client.post(
+            "/calculate", json=CALCULATION, headers={"X-Client-Id": "a", "Origin": "https://example.org"}
+        )
+        
+        assert statuses == [200, 200, 429]
+        assert other.status_code == 200
+        assert anonymous.status_code == 200
+        assert int(limited.headers["retry-after"]) >= 1
+        assert limited.headers["access-control-allow-origin"] == "https://example.org"
+        assert client.get("/metrics").json()["admission"]["clients"]["rate_limited"] == 2
@@ -176,6 +176,112 @@ class TestAPIEndpoints:
         
         assert response.status_code == 400
     
+    def test_retroactive_segments_endpoint(self, client):
+        """Test endpoint de atrasos por tramos."""
+        payload = {
+            "start_date": "2021-06-01",
+            "end_date": "2022-06-01",
+            "segments": [
+                {"effective_from": "2021-01-01", "pension_amount": 1000.0, "num_children": 1},
+                {"effective_from": "2022-01-01", "pension_amount": 1050.0, "num_children": 2}
+            ]
+        }
+        
+        response = client.post("/retroactive/segments", json=payload)
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["months_calculated"] == 12
+        assert data["total_amount"] == 610.3  # 7 x 35,90€ + 5 x 71,80€
+        assert [s["months"] for s in data["segments"]] == [7, 5]
+    
+    def test_retroactive_segments_endpoint_unsorted(self, client):
+        """Test endpoint de atrasos por tramos desordenados."""
+        payload = {
+            "start_date": "2021-06-01",
+            "end_date": "2022-06-01",
+            "segments": [
+                {"effective_from": "2022-01-01", "pension_amount": 1050.0, "num_children": 2},
+                {"effective_from": "2021-01-01", "pension_amount": 1000.0, "num_children": 1}
+            ]
+        }
+        
+        response = client.post("/retroactive/segments", json=payload)
+        
+        assert response.status_code == 422
+    
+    def test_retroactive_timeline_pagination(self, client):
+        """Test desglose mensual paginado con cursor."""
+        params = {
+            "start_date": "2021-01-01",
+            "end_date": "2021-06-01",
+            "pension_amount": 1000.0,
+            "num_children": 2,
+            "limit": 3
+        }
+        
+        first = client.get("/retroactive/timeline", params=params).json()
+        second = client.get(
+            "/retroactive/timeline",
+            params={**params, "cursor": first["next_cursor"]}
+        ).json()
+        
+        assert first["months_in_range"] == 5
+        assert [m["index"] for m in first["items"]] == [0, 1, 2]
+        assert first["items"][1]["rate_version"] == "P1-2016"
+        assert first["items"][2]["rate_version"] == "P2-2021"
+        assert [m["index"] for m in second["items"]] == [3, 4]
+        assert second["next_cursor"] is None
+    
+    def test_retroactive_timeline_ndjson(self, client):
+        """Test desglose mensual en streaming NDJSON."""
+        response = client.get(
+            "/retroactive/timeline",
+            params={
+                "start_date": "2021-01-01",
+                "end_date": "2021-06-01",
+                "pension_amount": 1000.0,
+                "num_children": 2
+            },
+            headers={"Accept": "application/x-ndjson"}
+        )
+        
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert len(lines) == 5
+        assert lines[-1]["amount"] == 71.8
+    
+    def test_retroactive_timeline_matches_total(self, client):
+        """Test la suma del desglose mensual coincide con el total de atrasos."""
+        params = {
+            "start_date": "2014-04-11",
+            "end_date": "2020-02-12",
+            "pension_amount": 777.77,
+            "num_children": 4
+        }
+        
+        total = client.get("/retroactive", params=params).json()["total_amount"]
+        response = client.get("/retroactive/timeline", params=params, headers={"Accept": "application/x-ndjson"})
+        
+        amounts = [json.loads(line)["amount"] for line in response.text.splitlines()]
+        assert round(sum(amounts), 2) == total
+    
+    def test_retroactive_timeline_invalid_cursor(self, client):
+        """Test desglose mensual con cursor inválido."""
+        response = client.get(
+            "/retroactive/timeline",
+            params={
+                "start_date": "2021-01-01",
+                "end_date": "2021-06-01",
+                "pension_amount": 1000.0,
+                "num_children": 2,
+                "cursor": "invalido"
+            }
+        )
+        
+        assert response.status_code == 400
+    
     def test_compare_endpoint(self, client):
         """Test endpoint de comparación."""
         payload = {
@@ -231,6 +337,94 @@ class TestAPIEndpoints:
         assert data["progenitor_1"]["eligible"] == True
         assert data["progenitor_2"]["eligible"] == False
     
+    def test_batch_calculate_endpoint(self, client):
+        """Test endpoint de cálculo por lotes."""
+        payload = {
+            "items": [
+                {
+                    "pension_type": "jubilacion",
+                    "start_date": "2021-06-15",
+                    "num_children": 2,
+                    "pension_amount": 1000.0
+                },
+                {
+                    "pension_type": "jubilacion_anticipada",
+                    "start_date": "2020-06-15",
+                    "num_children": 2,
+                    "pension_amount": 1000.0
+                }
+            ]
+        }
+        
+        response = client.post("/batch/calculate", json=payload)
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["eligible_count"] == 1
+        assert data["results"][0]["index"] == 0
+        assert data["results"][0]["eligible"] == True
+        assert data["results"][0]["amount"] == 71.8
+        assert data["results"][1]["eligible"] == False
+        assert data["results"][1]["reason"] is not None
+        assert data["total_amount"] == 71.8
+    
+    def test_batch_calculate_endpoint_empty(self, client):
+        """Test endpoint de cálculo por lotes sin pensionistas."""
+        response = client.post("/batch/calculate", json={"items": []})
+        
+        assert response.status_code == 422
+    
+    def test_sweep_endpoint(self, client):
+        """Test endpoint de rejilla de escenarios."""
+        payload = {
+            "pension_type": "jubilacion",
+            "num_children": [1, 2],
+            "pension_amounts": [1000.0, 2000.0],
+            "start_date_range": {"start": "2021-01-15", "end": "2021-03-15", "step_months": 1}
+        }
+        
+        response = client.post("/sweep", json=payload)
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["shape"] == [3, 2, 2]
+        assert data["order"] == ["start_date", "num_children", "pension_amount"]
+        assert len(data["amounts"]) == 12
+        assert data["amounts"][0] is None
+        assert data["amounts"][2:4] == [50.0, 100.0]
+    
+    def test_sweep_endpoint_missing_axis(self, client):
+        """Test endpoint de rejilla sin eje de cuantías."""
+        payload = {"start_dates": ["2021-06-15"]}
+        
+        response = client.post("/sweep", json=payload)
+        
+        assert response.status_code == 400
+    
+    def test_sweep_endpoint_non_positive_amounts(self, client):
+        """Test endpoint de rejilla con cuantías negativas o cero."""
+        for amounts, field in (([-1000.0, 0.0], "pension_amounts"), (None, "pension_amount_range")):
+            payload = {"start_dates": ["2021-06-15"], "num_children": [2]}
+            if amounts is None:
+                payload[field] = {"start": -100.0, "stop": 1000.0, "step": 100.0}
+            else:
+                payload[field] = amounts
+            
+            response = client.post("/sweep", json=payload)
+            
+            assert response.status_code == 422
+            assert response.json()["detail"][0]["loc"][1] == field
+    
+    def test_metrics_endpoint(self, client):
+        """Test endpoint de métricas."""
+        client.get("/health")
+        response = client.get("/metrics")
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert "logging" in data
+        assert data["logging"]["app.routes"]["kept"] >= 1
+    
     def test_spec_endpoint(self, client):
         """Test endpoint de especificación OpenAPI."""
         response = client.get("/spec")
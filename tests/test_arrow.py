@@ -0,0 +1,191 @@
+"""
+Tests para el cálculo sobre flujos Arrow IPC.
+"""
+
+import io
+from datetime import date
+import pytest
+from fastapi.testclient import TestClient
+from app import create_app
+from app.rules import get_rules
+from app.services import ComplementoPaternidadService
+from app.schemas import PensionType
+
+pa = pytest.importorskip("pyarrow")
+
+from app.arrow import ARROW_STREAM_MEDIA_TYPE, calculate_ipc, convert_stream  # noqa: E402
+import cli  # noqa: E402
+
+ROWS = [
+    ("A-1", "jubilacion", date(2020, 1, 1), 2, 1000.0),
+    ("A-2", "jubilacion_anticipada", date(2019, 6, 1), 3, 1200.0),
+    ("A-3", "viudedad", date(2022, 5, 1), 3, 900.0),
+    ("A-4", "incapacidad", date(2018, 3, 1), 1, 800.0),
+    ("A-5", "jubilacion", date(2021, 2, 4), 4, 1500.0),
+]
+
+def make_table(rows=ROWS, key="id"):
+    keys, types, dates, children, amounts = zip(*rows)
+    return pa.table({
+        key: list(keys),
+        "pension_type": pa.array(types).dictionary_encode(),
+        "start_date": pa.array(dates, pa.date32()),
+        "num_children": pa.array(children, pa.int8()),
+        "pension_amount": list(amounts),
+    })
+
+def to_stream(table, max_chunksize=None) -> bytes:
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table, max_chunksize=max_chunksize)
+    return sink.getvalue().to_pybytes()
+
+def read_stream(body: bytes):
+    return pa.ipc.open_stream(body).read_all()
+
+class TestArrowCalculation:
+    """Tests del cálculo vectorizado sobre columnas Arrow."""
+
+    def test_matches_service(self):
+        """Test cada fila coincide con el cálculo escalar del servicio."""
+        service = ComplementoPaternidadService()
+        result = read_stream(calculate_ipc(to_stream(make_table(), max_chunksize=2), get_rules()))
+
+        assert result.column_names == ["id", "period", "eligible", "amount", "reason"]
+        assert result.schema.metadata[b"rules_version"] == b"2021.02"
+        for (key, pension_type, start_date, children, amount), row in zip(ROWS, result.to_pylist()):
+            eligibility = service.check_eligibility(PensionType(pension_type), start_date, children)
+            assert row["id"] == key
+            assert row["eligible"] == eligibility.eligible
+            assert row["period"] == (eligibility.period.value if eligibility.period else None)
+            if eligibility.eligible:
+                expected = service.calculate_complement(PensionType(pension_type), start_date, children, amount)
+                assert row["amount"] == pytest.approx(expected.amount)
+                assert row["reason"] is None
+            else:
+                assert row["amount"] is None
+
+        assert [row["reason"] for row in result.to_pylist()] == [None, "tipo_de_pension", None, "minimo_de_hijos", None]
+
+    def test_half_cent_matches_batch(self):
+        """Test un complemento de medio céntimo da los mismos céntimos que /batch/calculate."""
+        service = ComplementoPaternidadService()
+        rows = [("M-1", "jubilacion", date(2018, 3, 1), 4, 1770.70)]
+        result = read_stream(calculate_ipc(to_stream(make_table(rows)), get_rules()))
+        batch = service.calculate_batch([{
+            "pension_type": PensionType.JUBILACION, "start_date": date(2018, 3, 1),
+            "num_children": 4, "pension_amount": 1770.70
+        }])
+
+        assert result.to_pylist()[0]["amount"] == 265.61
+        assert batch["total_amount"] == 265.61
+
+    def test_plain_string_columns(self):
+        """Test tipos de pensión y fechas como texto sin codificar."""
+        table = pa.table({
+            "nif": ["X"], "pension_type": ["jubilacion"], "start_date": ["2022-01-01"],
+            "num_children": [2], "pension_amount": [1000.0],
+        })
+        result = read_stream(calculate_ipc(to_stream(table), get_rules(), key="nif"))
+
+        assert result.to_pylist() == [{"nif": "X", "period": "2", "eligible": True, "amount": 71.8, "reason": None}]
+
+    @pytest.mark.parametrize("column, values, message", [
+        ("num_children", [2, 5, 2, 1, 3], "Fila 1: 'num_children'"),
+        ("pension_amount", [1000.0, 1.0, 1.0, 0.0, 1.0], "Fila 3: 'pension_amount'"),
+        ("pension_type", ["jubilacion"] * 4 + ["orfandad"], "Fila 4: 'pension_type'"),
+        ("start_date", [date(2016, 1, 1)] * 2 + [date(2015, 12, 31)] * 3, "Fila 2: La fecha"),
+        ("num_children", [2, None, 2, 2, 2], "Fila 1: 'num_children' no puede ser nulo"),
+    ])
+    def test_invalid_rows(self, column, values, message):
+        """Test las restricciones de CalculationRequest se comprueban por columna."""
+        table = make_table()
+        table = table.set_column(table.schema.get_field_index(column), column, pa.array(values))
+
+        with pytest.raises(ValueError, match=message):
+            calculate_ipc(to_stream(table), get_rules())
+
+    def test_row_numbers_across_batches(self):
+        """Test el número de fila de un error cuenta los lotes anteriores."""
+        rows = list(ROWS)
+        rows[4] = ("A-5", "jubilacion", date(2021, 2, 4), 0, 1500.0)
+
+        with pytest.raises(ValueError, match="Fila 4"):
+            calculate_ipc(to_stream(make_table(rows), max_chunksize=2), get_rules())
+
+    def test_missing_key(self):
+        """Test la columna clave es obligatoria."""
+        with pytest.raises(ValueError, match="Falta la columna 'nif'"):
+            calculate_ipc(to_stream(make_table()), get_rules(), key="nif")
+
+    def test_invalid_stream(self):
+        """Test un cuerpo que no es Arrow IPC."""
+        with pytest.raises(ValueError, match="Arrow IPC"):
+            calculate_ipc(b"no es arrow", get_rules())
+
+class TestArrowEndpoint:
+    """Tests del endpoint POST /batch/arrow."""
+
+    @pytest.fixture
+    def client(self):
+        with TestClient(create_app()) as client:
+            yield client
+
+    def test_arrow_round_trip(self, client):
+        """Test el endpoint devuelve un flujo Arrow con la clave pedida."""
+        response = client.post(
+            "/batch/arrow?key=nif",
+            content=to_stream(make_table(key="nif")),
+            headers={"Content-Type": ARROW_STREAM_MEDIA_TYPE}
+        )
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == ARROW_STREAM_MEDIA_TYPE
+        result = read_stream(response.content)
+        assert result.column("nif").to_pylist() == ["A-1", "A-2", "A-3", "A-4", "A-5"]
+        assert result.column("eligible").to_pylist() == [True, False, True, False, True]
+
+    def test_invalid_rows_rejected(self, client):
+        """Test filas inválidas -> 400 con la fila en el detalle."""
+        rows = list(ROWS)
+        rows[2] = ("A-3", "viudedad", date(2022, 5, 1), 7, 900.0)
+        response = client.post(
+            "/batch/arrow", content=to_stream(make_table(rows)), headers={"Content-Type": ARROW_STREAM_MEDIA_TYPE}
+        )
+
+        assert response.status_code == 400
+        assert "Fila 2" in response.json()["detail"]
+
+    def test_requires_arrow_content_type(self, client):
+        """Test otros tipos de contenido -> 415."""
+        response = client.post("/batch/arrow", content=b"{}", headers={"Content-Type": "application/json"})
+
+        assert response.status_code == 415
+
+class TestArrowCli:
+    """Tests del modo CLI `cli.py arrow`."""
+
+    def test_convert_stream_to_file(self):
+        """Test la conversión escribe un flujo por cada lote de entrada."""
+        sink = io.BytesIO()
+        rows = convert_stream(io.BytesIO(to_stream(make_table(), max_chunksize=2)), sink, get_rules())
+
+        assert rows == len(ROWS)
+        reader = pa.ipc.open_stream(sink.getvalue())
+        assert [batch.num_rows for batch in reader] == [2, 2, 1]
+
+    def test_cli_files(self, tmp_path):
+        """Test la CLI lee y escribe ficheros."""
+        source, target = tmp_path / "entrada.arrows", tmp_path / "salida.arrows"
+        source.write_bytes(to_stream(make_table()))
+
+        assert cli.main(["arrow", str(source), str(target)]) == 0
+        assert read_stream(target.read_bytes()).num_rows == len(ROWS)
+
+    def test_cli_error(self, tmp_path, capsys):
+        """Test un flujo inválido termina con código 2 y el error en stderr."""
+        source = tmp_path / "entrada.arrows"
+        source.write_bytes(to_stream(make_table()))
+
+        assert cli.main(["arrow", str(source), str(tmp_path / "salida.arrows"), "--key", "nif"]) == 2
+        assert "Falta la columna 'nif'" in capsys.readouterr().err
@@ -0,0 +1,152 @@
+"""
+Tests para el cálculo de ficheros CSV por rangos (app/bulk.py).
+"""
+
+import csv
+import io
+from datetime import date
+import pytest
+from app.bulk import calculate_csv, calculate_range, column_indexes, split_ranges
+from app.rules import get_rules
+from app.services import ComplementoPaternidadService
+from app.schemas import PensionType
+
+HEADER = "id,pension_type,start_date,num_children,pension_amount\n"
+
+ROWS = [
+    ("1", "jubilacion", "2020-01-01", "2", "1000"),
+    ("2", "viudedad", "2023-03-01", "3", "800.50"),
+    ("3", "jubilacion_anticipada", "2019-06-01", "3", "1200"),
+    ("4", "incapacidad", "2018-03-01", "1", "900"),
+    ("5", "jubilacion", "2021-02-04", "4", "1500"),
+]
+
+def write_csv(path, rows=ROWS, header=HEADER, newline="\n"):
+    path.write_text(header.replace("\n", newline) + "".join(",".join(row) + newline for row in rows), encoding="utf-8")
+    return str(path)
+
+def calculate(path, **kwargs):
+    sink = io.BytesIO()
+    summary = calculate_csv(path, sink, **kwargs)
+    return summary, list(csv.DictReader(io.StringIO(sink.getvalue().decode("utf-8"))))
+
+class TestSplitRanges:
+    """Tests para la partición del fichero en rangos de líneas completas."""
+
+    def test_ranges_cover_whole_lines(self, tmp_path):
+        """Test los rangos son contiguos, terminan en salto de línea y cubren el fichero."""
+        path = write_csv(tmp_path / "cartera.csv", ROWS * 20)
+        data = open(path, "rb").read()
+
+        columns, ranges = split_ranges(path, chunk_size=50)
+
+        assert columns == ["id", "pension_type", "start_date", "num_children", "pension_amount"]
+        assert ranges[0][0] == len(HEADER)
+        assert ranges[-1][1] == len(data)
+        assert all(end == next_start for (_, end), (next_start, _) in zip(ranges, ranges[1:]))
+        assert all(data[end - 1:end] == b"\n" for _, end in ranges)
+        assert len(ranges) > 1
+
+    def test_last_line_without_newline(self, tmp_path):
+        """Test la última línea sin salto de línea entra en el último rango."""
+        path = tmp_path / "cartera.csv"
+        path.write_text(HEADER + "1,jubilacion,2020-01-01,2,1000", encoding="utf-8")
+
+        _, ranges = split_ranges(str(path), chunk_size=4)
+
+        assert ranges == [(len(HEADER), path.stat().st_size)]
+
+    def test_empty_file(self, tmp_path):
+        """Test un fichero vacío se rechaza."""
+        path = tmp_path / "vacio.csv"
+        path.write_bytes(b"")
+
+        with pytest.raises(ValueError, match="vacío"):
+            split_ranges(str(path))
+
+    def test_missing_columns(self):
+        """Test la cabecera debe tener la clave y las columnas de entrada."""
+        with pytest.raises(ValueError, match="num_children"):
+            column_indexes(["nif", "pension_type", "start_date", "pension_amount"], key="nif")
+
+class TestCalculateCsv:
+    """Tests del cálculo y la escritura ordenada de resultados."""
+
+    def test_matches_service(self, tmp_path):
+        """Test cada fila coincide con el cálculo escalar del servicio."""
+        service = ComplementoPaternidadService()
+        summary, results = calculate(write_csv(tmp_path / "cartera.csv"), workers=1)
+
+        assert [row["id"] for row in results] == [row[0] for row in ROWS]
+        for (_, pension_type, start_date, children, amount), row in zip(ROWS, results):
+            eligibility = service.check_eligibility(PensionType(pension_type), date.fromisoformat(start_date), int(children))
+            assert row["eligible"] == ("true" if eligibility.eligible else "false")
+            assert row["period"] == (eligibility.period.value if eligibility.period else "")
+            if eligibility.eligible:
+                expected = service.calculate_complement(
+                    PensionType(pension_type), date.fromisoformat(start_date), int(children), float(amount)
+                )
+                assert float(row["amount"]) == pytest.approx(expected.amount, abs=0.005)
+        assert [row["reason"] for row in results] == ["", "", "tipo_de_pension", "minimo_de_hijos", ""]
+        assert summary["rows"] == 5
+        assert summary["eligible"] == 3
+
+    def test_invalid_rows_do_not_stop(self, tmp_path):
+        """Test las filas inválidas se marcan y el resto se calcula."""
+        rows = ROWS + [
+            ("6", "orfandad", "2020-01-01", "2", "1000"),
+            ("7", "jubilacion", "2015-12-31", "2", "1000"),
+            ("8", "jubilacion", "2020-01-01", "5", "1000"),
+            ("9", "jubilacion", "no-es-fecha", "2", "1000"),
+            ("10", "jubilacion", "2020-01-01", "2"),
+            ("11", "jubilacion", "2021-06-01", "2", "inf"),
+            ("12", "jubilacion", "2021-06-01", "2", "nan"),
+        ]
+        summary, results = calculate(write_csv(tmp_path / "cartera.csv", rows), workers=1)
+
+        assert [row["reason"] for row in results[5:]] == ["datos_invalidos"] * 7
+        assert all(row["eligible"] == "false" and row["amount"] == "" for row in results[5:])
+        assert summary["invalid"] == 7
+        assert summary["eligible"] == 3
+        assert summary["total_amount"] == pytest.approx(sum(float(row["amount"]) for row in results if row["amount"]))
+
+    def test_half_cent_matches_batch(self, tmp_path):
+        """Test un complemento de medio céntimo da los mismos céntimos que /batch/calculate."""
+        rows = [("M-1", "jubilacion", "2018-03-01", "4", "1770.70")]
+        summary, results = calculate(write_csv(tmp_path / "cartera.csv", rows), workers=1)
+
+        assert results[0]["amount"] == "265.61"
+        assert summary["total_amount"] == 265.61
+
+    def test_columns_in_any_order(self, tmp_path):
+        """Test la cabecera fija las columnas, con otra clave y finales CRLF."""
+        header = "pension_amount,num_children,start_date,pension_type,nif\n"
+        rows = [tuple(reversed(row)) for row in ROWS]
+        _, results = calculate(write_csv(tmp_path / "cartera.csv", rows, header, "\r\n"), key="nif", workers=1)
+
+        assert [row["nif"] for row in results] == [row[0] for row in ROWS]
+        assert results[0]["amount"] == "50.00"
+
+    def test_process_pool_keeps_order(self, tmp_path):
+        """Test con varios procesos y rangos pequeños la salida conserva el orden."""
+        rows = [(str(i),) + row[1:] for i in range(300) for row in ROWS[i % 5:i % 5 + 1]]
+        path = write_csv(tmp_path / "cartera.csv", rows)
+
+        summary, results = calculate(path, workers=2, chunk_size=512)
+        _, inline = calculate(path, workers=1, chunk_size=512)
+
+        assert summary["workers"] == 2
+        assert summary["ranges"] > 4
+        assert [row["id"] for row in results] == [str(i) for i in range(300)]
+        assert results == inline
+
+    def test_range_counts(self, tmp_path):
+        """Test los contadores de un rango."""
+        path = write_csv(tmp_path / "cartera.csv")
+        columns, ranges = split_ranges(path)
+
+        data, counts = calculate_range(path, ranges[0], column_indexes(columns), get_rules())
+
+        assert data.count(b"\n") == len(ROWS)
+        assert counts["rows"] == 5
+        assert counts["total_amount"] == pytest.approx(50.0 + 107.7 + 143.6)
@@ -0,0 +1,149 @@
+"""
+Tests para las cachés de resultados (en memoria y compartida con mmap).
+"""
+
+import multiprocessing
+import time
+from datetime import date
+import pytest
+from app.cache import MemoryCache, SharedMemoryCache, WAYS
+from app.services import ComplementoPaternidadService
+from app.schemas import PensionType
+
+def _write_from_child(path):
+    """Escribir en la caché compartida desde otro proceso."""
+    cache = SharedMemoryCache(path, slots=64, slot_size=128, stripes=4)
+    cache.set(b"desde-hijo", b"valor-hijo")
+    cache.close()
+
+class TestMemoryCache:
+    """Tests para MemoryCache."""
+    
+    def test_lru_eviction(self):
+        """Test se desaloja la entrada usada menos recientemente."""
+        cache = MemoryCache(max_entries=2)
+        cache.set(b"a", b"1")
+        cache.set(b"b", b"2")
+        cache.get(b"a")
+        cache.set(b"c", b"3")
+        
+        assert cache.get(b"a") == b"1"
+        assert cache.get(b"b") is None
+        assert cache.get(b"c") == b"3"
+        assert cache.stats()["evictions"] == 1
+
+class TestSharedMemoryCache:
+    """Tests para SharedMemoryCache."""
+    
+    @pytest.fixture
+    def path(self, tmp_path):
+        return str(tmp_path / "cache")
+    
+    def test_set_get_and_overwrite(self, path):
+        """Test guardar, leer y reemplazar valores."""
+        cache = SharedMemoryCache(path, slots=64, slot_size=128, stripes=4)
+        
+        assert cache.get(b"k") is None
+        cache.set(b"k", b"v1")
+        cache.set(b"k", b"v2")
+        
+        assert cache.get(b"k") == b"v2"
+        assert cache.stats()["entries"] == 1
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+    
+    def test_value_too_large(self, path):
+        """Test los valores que no caben en una ranura no se guardan."""
+        cache = SharedMemoryCache(path, slots=64, slot_size=64, stripes=4)
+        cache.set(b"k", b"x" * 100)
+        
+        assert cache.get(b"k") is None
+        assert cache.stats()["too_large"] == 1
+    
+    def test_eviction_least_recently_used_in_set(self, path):
+        """Test con el conjunto lleno se reemplaza la ranura con el acceso más antiguo."""
+        cache = SharedMemoryCache(path, slots=WAYS, slot_size=64, stripes=1)
+        keys = [f"k{i}".encode() for i in range(WAYS)]
+        for key in keys:
+            cache.set(key, key)
+        time.sleep(0.15)
+        for key in keys[1:]:
+            assert cache.get(key) == key
+        
+        cache.set(b"nueva", b"v")
+        
+        assert cache.get(keys[0]) is None
+        assert cache.get(b"nueva") == b"v"
+        assert all(cache.get(key) == key for key in keys[1:])
+        assert cache.stats()["evictions"] == 1
+    
+    def test_shared_between_instances(self, path):
+        """Test dos instancias sobre el mismo fichero (dos workers) ven los mismos datos."""
+        worker_1 = SharedMemoryCache(path, slots=64, slot_size=128, stripes=4)
+        worker_2 = SharedMemoryCache(path, slots=64, slot_size=128, stripes=4)
+        worker_1.set(b"k", b"v")
+        
+        assert worker_2.get(b"k") == b"v"
+    
+    def test_shared_between_processes(self, path):
+        """Test un valor escrito por otro proceso es visible."""
+        cache = SharedMemoryCache(path, slots=64, slot_size=128, stripes=4)
+        process = multiprocessing.get_context("fork").Process(target=_write_from_child, args=(path,))
+        process.start()
+        process.join(10)
+        
+        assert process.exitcode == 0
+        assert cache.get(b"desde-hijo") == b"valor-hijo"
+    
+    def test_recreated_on_format_change(self, path):
+        """Test un fichero con otro formato se recrea vacío."""
+        old = SharedMemoryCache(path, slots=64, slot_size=128, stripes=4)
+        old.set(b"k", b"v")
+        
+        new = SharedMemoryCache(path, slots=128, slot_size=128, stripes=4)
+        
+        assert new.get(b"k") is None
+        assert old.get(b"k") == b"v"  # el proceso antiguo conserva su fichero
+    
+    def test_clear(self, path):
+        """Test vaciar la caché."""
+        cache = SharedMemoryCache(path, slots=64, slot_size=128, stripes=4)
+        cache.set(b"k", b"v")
+        cache.clear()
+        
+        assert cache.get(b"k") is None
+        assert cache.stats()["entries"] == 0
+    
+    def test_invalid_layout(self, path):
+        """Test configuración de ranuras inválida."""
+        with pytest.raises(ValueError):
+            SharedMemoryCache(path, slots=WAYS + 1)
+
+class TestServiceCache:
+    """Tests del servicio con caché."""
+    
+    @pytest.mark.parametrize("backend", ["memory", "shared"])
+    def test_cached_results_equal(self, backend, tmp_path):
+        """Test los resultados de la caché son idénticos a los calculados."""
+        cache = MemoryCache() if backend == "memory" else SharedMemoryCache(str(tmp_path / "cache"), slots=64)
+        cached_service = ComplementoPaternidadService(cache=cache)
+        plain_service = ComplementoPaternidadService()
+        args = (PensionType.JUBILACION, date(2021, 6, 15), 2, 1000.0)
+        retro_args = (date(2019, 3, 31), date(2022, 1, 1), 1000.0, 3)
+        
+        for _ in range(2):
+            assert cached_service.calculate_complement(*args) == plain_service.calculate_complement(*args)
+            assert cached_service.calculate_retroactive(*retro_args) == plain_service.calculate_retroactive(*retro_args)
+        
+        assert cache.stats()["hits"] == 2
+    
+    def test_errors_not_cached(self):
+        """Test los errores de elegibilidad no se guardan en la caché."""
+        cache = MemoryCache()
+        service = ComplementoPaternidadService(cache=cache)
+        
+        for _ in range(2):
+            with pytest.raises(ValueError):
+                service.calculate_complement(PensionType.JUBILACION, date(2010, 1, 1), 2, 1000.0)
+        
+        assert cache.stats()["entries"] == 0
@@ -0,0 +1,163 @@
+"""
+Tests para la agrupación de peticiones idénticas concurrentes (single flight).
+"""
+
+import asyncio
+from datetime import date
+import httpx
+import pytest
+from app import create_app
+from app.coalescing import SingleFlight, request_key
+from app.schemas import PensionType
+
+class TestRequestKey:
+    """Tests para request_key."""
+    
+    def test_equivalent_inputs(self):
+        """Test entradas equivalentes producen la misma clave."""
+        key_1 = request_key('calculate', PensionType.JUBILACION, date(2021, 6, 15), 2, 1000)
+        key_2 = request_key('calculate', "jubilacion", date(2021, 6, 15), 2, 1000.0)
+        
+        assert key_1 == key_2
+        assert hash(key_1) == hash(key_2)
+    
+    def test_different_operation(self):
+        """Test la operación forma parte de la clave."""
+        assert request_key('calculate', 1) != request_key('retroactive', 1)
+
+class TestSingleFlight:
+    """Tests para SingleFlight."""
+    
+    def test_concurrent_calls_share_result(self):
+        """Test las llamadas concurrentes idénticas comparten un único cálculo."""
+        flight = SingleFlight()
+        calls = []
+        
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return {"amount": 42}
+        
+        async def scenario():
+            return await asyncio.gather(*(flight.run(("k",), compute) for _ in range(5)))
+        
+        results = asyncio.run(scenario())
+        
+        assert len(calls) == 1
+        assert all(result == {"amount": 42} for result in results)
+        assert flight.stats() == {"leaders": 1, "coalesced": 4, "errors": 0, "in_flight": 0}
+    
+    def test_different_keys_not_shared(self):
+        """Test claves distintas se calculan por separado."""
+        flight = SingleFlight()
+        
+        async def scenario():
+            return await asyncio.gather(
+                flight.run(("a",), lambda: asyncio.sleep(0, result="a")),
+                flight.run(("b",), lambda: asyncio.sleep(0, result="b"))
+            )
+        
+        assert asyncio.run(scenario()) == ["a", "b"]
+        assert flight.stats()["leaders"] == 2
+    
+    def test_errors_shared_but_not_cached(self):
+        """Test un error se comparte con las peticiones en espera pero no con las posteriores."""
+        flight = SingleFlight()
+        attempts = []
+        
+        async def compute():
+            attempts.append(1)
+            await asyncio.sleep(0.01)
+            if len(attempts) == 1:
+                raise ValueError("fallo")
+            return "ok"
+        
+        async def scenario():
+            first = await asyncio.gather(
+                *(flight.run(("k",), compute) for _ in range(3)), return_exceptions=True
+            )
+            second = await flight.run(("k",), compute)
+            return first, second
+        
+        first, second = asyncio.run(scenario())
+        
+        assert all(isinstance(result, ValueError) for result in first)
+        assert second == "ok"
+        assert len(attempts) == 2
+        assert flight.stats()["errors"] == 1
+    
+    def test_leader_cancellation_does_not_cancel_followers(self):
+        """Test si el líder se cancela, las demás peticiones reciben el resultado."""
+        flight = SingleFlight()
+        
+        async def compute():
+            await asyncio.sleep(0.02)
+            return "ok"
+        
+        async def scenario():
+            leader = asyncio.create_task(flight.run(("k",), compute))
+            await asyncio.sleep(0)
+            follower = asyncio.create_task(flight.run(("k",), compute))
+            await asyncio.sleep(0.005)
+            leader.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await leader
+            return await follower
+        
+        assert asyncio.run(scenario()) == "ok"
+
+class TestCoalescedEndpoints:
+    """Tests de los endpoints con peticiones idénticas concurrentes."""
+    
+    @pytest.mark.parametrize("method,path,kwargs", [
+        ("POST", "/calculate", {"json": {
+            "pension_type": "jubilacion",
+            "start_date": "2021-06-15",
+            "num_children": 2,
+            "pension_amount": 1000.0
+        }}),
+        ("GET", "/retroactive", {"params": {
+            "start_date": "2021-03-01",
+            "end_date": "2021-09-01",
+            "pension_amount": 1000.0,
+            "num_children": 2
+        }}),
+    ])
+    def test_identical_requests_coalesced(self, method, path, kwargs):
+        """Test una ráfaga de peticiones idénticas se resuelve con un único cálculo."""
+        app = create_app()
+        
+        async def scenario():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                before = (await client.get("/metrics")).json()["coalescing"]
+                responses = await asyncio.gather(*(client.request(method, path, **kwargs) for _ in range(8)))
+                after = (await client.get("/metrics")).json()["coalescing"]
+            return responses, before, after
+        
+        responses, before, after = asyncio.run(scenario())
+        
+        assert all(response.status_code == 200 for response in responses)
+        assert len({response.content for response in responses}) == 1
+        assert (after["leaders"] - before["leaders"]) + (after["coalesced"] - before["coalesced"]) == 8
+        assert after["coalesced"] > before["coalesced"]
+        assert after["in_flight"] == 0
+    
+    def test_validation_error_shared(self):
+        """Test los errores de cálculo se devuelven igual a todas las copias."""
+        app = create_app()
+        payload = {
+            "pension_type": "jubilacion",
+            "start_date": "2010-06-15",
+            "num_children": 2,
+            "pension_amount": 1000.0
+        }
+        
+        async def scenario():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await asyncio.gather(*(client.post("/calculate", json=payload) for _ in range(3)))
+        
+        responses = asyncio.run(scenario())
+        
+        assert len({(response.status_code, response.content) for response in responses}) == 1
@@ -0,0 +1,141 @@
+"""
+Tests unitarios para el motor vectorizado.
+"""
+
+import pytest
+import numpy as np
+from datetime import date
+from app.services import ComplementoPaternidadService
+from app.engine import (
+    encode_dates, encode_pension_types, round_cents, PENSION_TYPES,
+    REASON_OK, REASON_OUT_OF_RANGE, REASON_PENSION_TYPE, REASON_MIN_CHILDREN
+)
+from app.schemas import PensionType
+
+class TestVectorizedEngine:
+    """Tests para VectorizedEngine."""
+    
+    def setup_method(self):
+        """Configurar test."""
+        self.service = ComplementoPaternidadService()
+        self.engine = self.service.engine
+    
+    def test_matches_scalar_calculation(self):
+        """Test el motor coincide con calculate_complement en todos los casos."""
+        dates = [date(2015, 12, 31), date(2016, 1, 1), date(2021, 2, 3), date(2021, 2, 4), date(2024, 5, 31)]
+        rows = [
+            (pension_type, start_date, children, 1234.56)
+            for pension_type in PENSION_TYPES
+            for start_date in dates
+            for children in range(1, 7)
+        ]
+        
+        reasons, amounts = self.engine.calculate(
+            encode_pension_types([r[0] for r in rows]),
+            self.engine.periods(encode_dates([r[1] for r in rows])),
+            np.array([r[2] for r in rows]),
+            np.array([r[3] for r in rows])
+        )
+        
+        for (pension_type, start_date, children, pension), reason, amount in zip(rows, reasons, amounts):
+            try:
+                expected = self.service.calculate_complement(pension_type, start_date, children, pension)
+            except ValueError:
+                assert reason != REASON_OK
+                assert amount == 0.0
+            else:
+                assert reason == REASON_OK
+                assert amount == expected.amount
+    
+    def test_reason_codes(self):
+        """Test códigos de motivo de no elegibilidad."""
+        reasons, _ = self.engine.calculate(
+            encode_pension_types([PensionType.JUBILACION, PensionType.JUBILACION_ANTICIPADA, PensionType.JUBILACION]),
+            self.engine.periods(encode_dates([date(2015, 6, 1), date(2020, 6, 1), date(2020, 6, 1)])),
+            np.array([2, 2, 1]),
+            np.array([1000.0, 1000.0, 1000.0])
+        )
+        
+        assert reasons.tolist() == [REASON_OUT_OF_RANGE, REASON_PENSION_TYPE, REASON_MIN_CHILDREN]
+
+class TestRoundCents:
+    """Tests para el redondeo a céntimos compartido."""
+    
+    def test_matches_python_round(self):
+        """Test coincide con round(x, 2), también en los medios céntimos."""
+        rng = np.random.default_rng(47)
+        amounts = np.concatenate([
+            rng.uniform(0, 5000, 20000),
+            rng.integers(0, 500000, 20000) / 100 + 0.005,
+            rng.integers(30000, 300000, 20000) / 100 * 0.15,
+            [265.605, 0.0, 0.005, 2.675]
+        ])
+        
+        assert round_cents(amounts).tolist() == [round(amount, 2) for amount in amounts.tolist()]
+        assert float(round_cents(1770.70 * 0.15)) == 265.61
+    
+class TestSweep:
+    """Tests para la rejilla de escenarios."""
+    
+    def setup_method(self):
+        """Configurar test."""
+        self.service = ComplementoPaternidadService()
+    
+    def test_sweep_shape_and_order(self):
+        """Test forma y orden del array plano."""
+        result = self.service.sweep(
+            PensionType.JUBILACION,
+            [1, 2],
+            pension_amount_range={'start': 1000.0, 'stop': 1200.0, 'step': 100.0},
+            start_dates=[date(2020, 6, 15), date(2021, 6, 15)]
+        )
+        
+        assert result['shape'] == [2, 2, 3]
+        assert result['axes']['pension_amount'] == [1000.0, 1100.0, 1200.0]
+        # Período 1 con 1 hijo no es elegible; con 2 hijos es el 5%
+        assert result['amounts'][0:6] == [None, None, None, 50.0, 55.0, 60.0]
+        # Período 2: importe fijo por hijo
+        assert result['amounts'][6:12] == [35.9, 35.9, 35.9, 71.8, 71.8, 71.8]
+        assert result['eligible_count'] == 9
+    
+    def test_sweep_date_range(self):
+        """Test rango de fechas con paso mensual y fin de mes."""
+        result = self.service.sweep(
+            PensionType.VIUDEDAD,
+            [2],
+            pension_amounts=[1000.0],
+            start_date_range={'start': date(2021, 1, 31), 'end': date(2021, 4, 30), 'step_months': 1}
+        )
+        
+        assert result['axes']['start_date'] == [date(2021, 1, 31), date(2021, 2, 28), date(2021, 3, 31), date(2021, 4, 30)]
+    
+    def test_sweep_amounts(self):
+        """Test importes redondeados como el resto de endpoints y cuantías no positivas rechazadas."""
+        result = self.service.sweep(PensionType.JUBILACION, [4], pension_amounts=[1770.70], start_dates=[date(2018, 3, 1)])
+        
+        assert result['amounts'] == [265.61]
+        with pytest.raises(ValueError, match="cuantía"):
+            self.service.sweep(PensionType.JUBILACION, [2], pension_amounts=[-1000.0, 0.0], start_dates=[date(2021, 6, 15)])
+    
+    def test_sweep_too_large(self):
+        """Test rechazo de rejillas por encima del límite."""
+        with pytest.raises(ValueError) as exc_info:
+            self.service.sweep(
+                PensionType.JUBILACION,
+                [1, 2, 3, 4],
+                pension_amount_range={'start': 1.0, 'stop': 100000.0, 'step': 1.0},
+                start_dates=[date(2021, 6, 15)]
+            )
+        
+        assert "máximo" in str(exc_info.value)
+    
+    def test_sweep_requires_one_axis_form(self):
+        """Test error si un eje se indica como lista y como rango a la vez."""
+        with pytest.raises(ValueError):
+            self.service.sweep(
+                PensionType.JUBILACION,
+                [1],
+                pension_amounts=[1000.0],
+                pension_amount_range={'start': 1.0, 'stop': 2.0, 'step': 1.0},
+                start_dates=[date(2021, 6, 15)]
+            )
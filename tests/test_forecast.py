@@ -0,0 +1,210 @@
+"""
+Tests para la previsión mensual de pagos (app/forecast.py).
+"""
+
+import random
+from collections import Counter
+from datetime import date, timedelta
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from app import create_app, routes
+from app.engine import encode_pension_types
+from app.forecast import forecast_payouts, month_steps, parse_month, read_population
+from app.portfolio import PortfolioStore
+from app.rules import get_rules
+from app.schemas import PensionType
+from app.services import ComplementoPaternidadService
+from app.utils import count_month_steps
+
+POPULATION = [
+    # (pension_type, start_date, num_children, pension_amount, end_date)
+    ("jubilacion", date(2020, 11, 30), 2, 1000.0, None),
+    ("viudedad", date(2021, 1, 15), 3, 800.0, date(2021, 6, 1)),
+    ("incapacidad", date(2021, 2, 4), 4, 900.0, None),
+    ("jubilacion_anticipada", date(2019, 5, 10), 2, 1200.0, None),
+    ("jubilacion", date(2016, 3, 31), 1, 700.0, date(2022, 1, 1)),
+]
+
+def forecast(population, first_month, months):
+    pension_types, start_dates, children, amounts, end_dates = zip(*population)
+    return forecast_payouts(
+        get_rules(), encode_pension_types(pension_types), np.array(start_dates, dtype='datetime64[D]'),
+        children, amounts, first_month, months, np.array(end_dates, dtype='datetime64[D]')
+    )
+
+def monthly_retroactive(population, horizon):
+    """
+    Total por mes sumando el desglose de atrasos de cada pensionista (que no
+    comprueba el tipo de pensión: la previsión solo cuenta los meses en que
+    el tipo es elegible).
+    """
+    service = ComplementoPaternidadService()
+    rules = get_rules()
+    totals = Counter()
+    for pension_type, start_date, children, amount, end_date in population:
+        end = min(end_date, horizon) if end_date else horizon
+        for month in service.iter_retroactive_months(start_date, end, amount, children):
+            if PensionType(pension_type) in rules.period_for(month['month']).eligible_types:
+                totals[month['month'].strftime('%Y-%m')] += month['amount']
+    return totals
+
+class TestMonthSteps:
+    """Tests para el conteo vectorizado de pasos mensuales."""
+
+    def test_matches_count_month_steps(self):
+        """Test coincide con count_month_steps, también a fin de mes."""
+        rng = random.Random(3)
+        starts = [date(2016, 1, 1) + timedelta(days=rng.randrange(3000)) for _ in range(500)]
+        starts += [date(2020, 1, 31), date(2020, 1, 30), date(2021, 3, 31)]
+        ends = [start + timedelta(days=rng.randrange(-30, 2000)) for start in starts]
+        ends[-3:] = [date(2020, 2, 29), date(2020, 3, 1), date(2021, 4, 30)]
+
+        steps = month_steps(np.array(starts, dtype='datetime64[D]'), np.array(ends, dtype='datetime64[D]'))
+
+        assert steps.tolist() == [count_month_steps(start, end) for start, end in zip(starts, ends)]
+
+    def test_scalar_boundary(self):
+        """Test un límite común a todos los inicios."""
+        starts = [date(2021, 1, 3), date(2021, 1, 4), date(2021, 2, 4), date(2021, 3, 1)]
+
+        steps = month_steps(np.array(starts, dtype='datetime64[D]'), np.datetime64('2021-02-04'))
+
+        assert steps.tolist() == [2, 1, 0, 0]
+
+class TestForecastPayouts:
+    """Tests para la serie mensual de pagos de una población."""
+
+    def test_matches_retroactive_months(self):
+        """Test cada mes coincide con la suma de los atrasos de cada pensionista."""
+        result = forecast(POPULATION, date(2016, 1, 1), 96)
+        expected = monthly_retroactive(POPULATION, date(2024, 1, 1))
+
+        assert len(result["series"]) == 96
+        for month in result["series"]:
+            assert month["amount"] == pytest.approx(expected.get(month["month"], 0.0), abs=0.01)
+        assert result["total_amount"] == pytest.approx(sum(expected.values()), abs=0.01)
+
+    def test_random_population(self):
+        """Test con una población aleatoria con y sin bajas."""
+        rng = random.Random(11)
+        population = []
+        for _ in range(300):
+            start_date = date(2016, 1, 1) + timedelta(days=rng.randrange(3500))
+            end_date = start_date + timedelta(days=rng.randrange(1, 2500)) if rng.random() < 0.5 else None
+            population.append((
+                rng.choice(list(PensionType)).value, start_date,
+                rng.randint(1, 4), rng.randint(60000, 300000) / 100, end_date
+            ))
+
+        result = forecast(population, date(2018, 6, 1), 120)
+        expected = monthly_retroactive(population, date(2028, 6, 1))
+
+        for month in result["series"]:
+            assert month["amount"] == pytest.approx(expected.get(month["month"], 0.0), abs=0.01)
+
+    def test_half_cent_matches_retroactive(self):
+        """Test con un complemento de medio céntimo el total coincide con los atrasos."""
+        service = ComplementoPaternidadService()
+        rng = random.Random(45)
+        cases = [(date(2017, 10, 18), date(2020, 4, 18), 4, 1770.70)]
+        for _ in range(100):
+            start_date = date(2016, 1, 1) + timedelta(days=rng.randrange(2500))
+            cases.append((start_date, start_date + timedelta(days=rng.randrange(30, 1500)),
+                          rng.randint(2, 4), rng.randint(60000, 300000) / 100))
+
+        for start_date, end_date, children, amount in cases:
+            result = forecast([("jubilacion", start_date, children, amount, end_date)], date(2016, 1, 1), 180)
+            expected = service.calculate_retroactive(start_date, end_date, amount, children)
+
+            assert result["total_amount"] == expected["total_amount"], (start_date, end_date, children, amount)
+
+    def test_beneficiaries(self):
+        """Test cuenta quién cobra cada mes: altas, bajas y cambio de período."""
+        series = {month["month"]: month["beneficiaries"] for month in forecast(POPULATION, date(2021, 1, 1), 14)["series"]}
+
+        # Enero 2021: jubilación (2 hijos) y viudedad; la anticipada y la de
+        # 1 hijo solo cobran en el período 2
+        assert series["2021-01"] == 2
+        assert series["2021-03"] == 5
+        assert series["2021-06"] == 4
+        assert series["2022-01"] == 3
+
+    def test_starts_after_first_month(self):
+        """Test la previsión empieza tras el alta: lo anterior entra en el primer mes."""
+        result = forecast(POPULATION[:1], date(2024, 1, 1), 2)
+
+        assert result["start"] == "2024-01"
+        assert [month["amount"] for month in result["series"]] == [71.8, 71.8]
+
+    def test_no_months(self):
+        """Test una previsión sin meses se rechaza."""
+        with pytest.raises(ValueError):
+            forecast(POPULATION, date(2024, 1, 1), 0)
+
+class TestReadPopulation:
+    """Tests para la lectura de la población y del mes inicial."""
+
+    def test_rows(self):
+        """Test se convierten los registros, con y sin baja."""
+        type_codes, start_dates, children, amounts, end_dates = read_population([
+            {"pension_type": "viudedad", "start_date": "2021-01-15", "num_children": "3",
+             "pension_amount": "800", "end_date": "2021-06-01"},
+            {"pension_type": "jubilacion", "start_date": "2020-11-30", "num_children": "2", "pension_amount": "1000"},
+        ])
+
+        assert children.tolist() == [3, 2]
+        assert start_dates[1] == np.datetime64("2020-11-30")
+        assert np.isnat(end_dates[1]) and end_dates[0] == np.datetime64("2021-06-01")
+
+    def test_invalid_row(self):
+        """Test el error indica la fila."""
+        with pytest.raises(ValueError, match="Fila 2"):
+            read_population([
+                {"pension_type": "jubilacion", "start_date": "2020-11-30", "num_children": "2", "pension_amount": "1000"},
+                {"pension_type": "jubilacion", "start_date": "2020-11-30", "num_children": "7", "pension_amount": "1000"},
+            ])
+
+    def test_parse_month(self):
+        """Test el mes se lee como YYYY-MM."""
+        assert parse_month("2025-03") == date(2025, 3, 1)
+        with pytest.raises(ValueError):
+            parse_month("2025-13")
+
+class TestForecastAPI:
+    """Tests del endpoint GET /portfolio/forecast."""
+
+    @pytest.fixture
+    def client(self, tmp_path, monkeypatch):
+        store = PortfolioStore(str(tmp_path / "cartera.db"))
+        store.write([
+            {"key": str(i), "pension_type": pension_type, "start_date": start_date.isoformat(),
+             "num_children": children, "pension_amount": amount}
+            for i, (pension_type, start_date, children, amount, _) in enumerate(POPULATION)
+        ], get_rules())
+        monkeypatch.setattr(routes, "portfolio", store)
+        with TestClient(create_app()) as client:
+            yield client
+
+    def test_forecast(self, client):
+        """Test la previsión de la cartera, sin bajas."""
+        response = client.get("/portfolio/forecast", params={"start": "2024-01", "months": 3})
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["population"] == 5
+        assert [month["month"] for month in data["series"]] == ["2024-01", "2024-02", "2024-03"]
+        assert data["series"][0]["beneficiaries"] == 5
+        assert data["series"][0]["amount"] == pytest.approx(35.9 * (2 + 3 + 4 + 2 + 1))
+        assert data["rules_version"] == "2021.02"
+
+    def test_invalid_parameters(self, client):
+        """Test mes o número de meses inválidos -> 400."""
+        assert client.get("/portfolio/forecast", params={"start": "2024-1x"}).status_code == 400
+        assert client.get("/portfolio/forecast", params={"months": 0}).status_code == 400
+
+    def test_not_configured(self, monkeypatch):
+        """Test sin PORTFOLIO_DB -> 404."""
+        monkeypatch.setattr(routes, "portfolio", None)
+        with TestClient(create_app()) as client:
+            assert client.get("/portfolio/forecast").status_code == 404
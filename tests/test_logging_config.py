@@ -0,0 +1,58 @@
+"""
+Tests unitarios para la configuración de logging y el muestreo de logs.
+"""
+
+import logging
+import pytest
+from app.logging_config import SamplingFilter
+from app.config import parse_mapping
+
+def make_record(name, level):
+    """Crear un registro de log de prueba."""
+    return logging.LogRecord(name, level, __file__, 1, "mensaje", None, None)
+
+class TestSamplingFilter:
+    """Tests para SamplingFilter."""
+    
+    def test_errors_always_pass(self):
+        """Test los errores se emiten aunque la tasa sea 0."""
+        sampling = SamplingFilter({'app': 0.0})
+        
+        assert sampling.filter(make_record('app.routes', logging.ERROR)) == True
+        assert sampling.filter(make_record('app.routes', logging.WARNING)) == True
+        assert sampling.stats() == {}
+    
+    def test_info_sampled_out_and_counted(self):
+        """Test los logs de éxito con tasa 0 se descartan y se cuentan."""
+        sampling = SamplingFilter({'app.services': 0.0})
+        
+        for _ in range(5):
+            assert sampling.filter(make_record('app.services', logging.INFO)) == False
+        assert sampling.filter(make_record('app.routes', logging.INFO)) == True
+        
+        stats = sampling.stats()
+        assert stats['app.services'] == {'rate': 0.0, 'kept': 0, 'sampled_out': 5}
+        assert stats['app.routes'] == {'rate': 1.0, 'kept': 1, 'sampled_out': 0}
+    
+    def test_longest_prefix_wins(self):
+        """Test se aplica la tasa del prefijo más largo."""
+        sampling = SamplingFilter({'app': 0.5, 'app.routes': 0.1}, default_rate=1.0)
+        
+        assert sampling.rate_for('app.routes') == 0.1
+        assert sampling.rate_for('app.routes.sub') == 0.1
+        assert sampling.rate_for('app.services') == 0.5
+        assert sampling.rate_for('application') == 1.0
+        assert sampling.rate_for('uvicorn') == 1.0
+
+class TestParseMapping:
+    """Tests para parse_mapping."""
+    
+    def test_parse_rates(self):
+        """Test lectura de tasas por logger."""
+        assert parse_mapping("app.routes=0.1, app.services=0.01") == {'app.routes': 0.1, 'app.services': 0.01}
+        assert parse_mapping("") == {}
+    
+    def test_parse_invalid(self):
+        """Test elemento sin separador."""
+        with pytest.raises(ValueError):
+            parse_mapping("app.routes")
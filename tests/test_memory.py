@@ -0,0 +1,115 @@
+"""
+Tests para la contabilidad de memoria (/debug/memory).
+"""
+
+import tracemalloc
+import pytest
+from fastapi.testclient import TestClient
+from app import create_app
+from app.memory import MemoryTracker
+
+ADMIN_HEADERS = {"X-Admin-Token": "secreto"}
+
+@pytest.fixture
+def admin_client(monkeypatch):
+    """Cliente con administración habilitada; detiene tracemalloc al terminar."""
+    monkeypatch.setenv("ADMIN_TOKEN", "secreto")
+    with TestClient(create_app()) as client:
+        yield client
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+class TestMemoryTracker:
+    """Tests para MemoryTracker."""
+    
+    def setup_method(self):
+        """Configurar tracker para cada test."""
+        self.tracker = MemoryTracker(max_snapshots=2)
+    
+    def teardown_method(self):
+        """Detener tracemalloc tras cada test."""
+        self.tracker.stop()
+    
+    def test_snapshot_requires_tracing(self):
+        """Test no se pueden tomar instantáneas sin tracemalloc activo."""
+        with pytest.raises(RuntimeError):
+            self.tracker.take_snapshot("a")
+    
+    def test_diff_attributes_to_app_lines(self):
+        """Test la diferencia atribuye a líneas de app/ la memoria reservada por librerías."""
+        from app.engine import VectorizedEngine
+        from app.rules import get_rules
+        
+        rules = get_rules()
+        self.tracker.start()
+        self.tracker.take_snapshot("antes")
+        engine = VectorizedEngine(rules)
+        self.tracker.take_snapshot("despues")
+        
+        stats = self.tracker.diff("antes", "despues")
+        
+        assert stats
+        assert all(stat["file"].startswith("app") for stat in stats)
+        assert any(stat["file"].endswith("engine.py") and stat["size_diff"] > 0 for stat in stats)
+        assert not any(stat["file"].endswith("memory.py") for stat in stats)
+        assert engine is not None
+    
+    def test_max_snapshots(self):
+        """Test se descartan las instantáneas más antiguas."""
+        self.tracker.start()
+        for name in ("a", "b", "c"):
+            self.tracker.take_snapshot(name)
+        
+        assert [snapshot["name"] for snapshot in self.tracker.list_snapshots()] == ["b", "c"]
+        with pytest.raises(KeyError):
+            self.tracker.top("a")
+    
+    def test_invalid_group_by(self):
+        """Test agrupación no soportada."""
+        self.tracker.start()
+        self.tracker.take_snapshot("a")
+        
+        with pytest.raises(ValueError):
+            self.tracker.top("a", group_by="traceback")
+
+class TestMemoryEndpoints:
+    """Tests para los endpoints de memoria."""
+    
+    def test_requires_admin(self, admin_client):
+        """Test los endpoints exigen el token de administración."""
+        response = admin_client.post("/debug/memory/start", json={})
+        
+        assert response.status_code == 403
+    
+    def test_snapshot_flow(self, admin_client):
+        """Test activar, tomar instantáneas, consultar y comparar."""
+        assert admin_client.post("/debug/memory/start", json={"frames": 10}, headers=ADMIN_HEADERS).json()["active"] == True
+        assert admin_client.post("/debug/memory/start", json={}, headers=ADMIN_HEADERS).status_code == 409
+        
+        assert admin_client.post("/debug/memory/snapshots", json={"name": "a"}, headers=ADMIN_HEADERS).status_code == 201
+        admin_client.post("/calculate", json={
+            "pension_type": "jubilacion",
+            "start_date": "2021-06-15",
+            "num_children": 2,
+            "pension_amount": 1000.0
+        })
+        assert admin_client.post("/debug/memory/snapshots", json={"name": "b"}, headers=ADMIN_HEADERS).status_code == 201
+        
+        top = admin_client.get("/debug/memory/snapshots/b", params={"limit": 5}, headers=ADMIN_HEADERS).json()
+        assert top["group_by"] == "lineno"
+        assert len(top["stats"]) <= 5
+        
+        diff = admin_client.get("/debug/memory/diff", params={"base": "a", "target": "b"}, headers=ADMIN_HEADERS).json()
+        assert diff["base"] == "a"
+        assert all(stat["size_diff"] is not None for stat in diff["stats"])
+        
+        status = admin_client.get("/debug/memory", headers=ADMIN_HEADERS).json()
+        assert [snapshot["name"] for snapshot in status["snapshots"]] == ["a", "b"]
+        
+        assert admin_client.post("/debug/memory/stop", headers=ADMIN_HEADERS).json()["active"] == False
+    
+    def test_unknown_snapshot(self, admin_client):
+        """Test instantánea inexistente."""
+        response = admin_client.get("/debug/memory/snapshots/nope", headers=ADMIN_HEADERS)
+        
+        assert response.status_code == 404
@@ -0,0 +1,132 @@
+"""
+Tests para la negociación de contenido JSON / MessagePack.
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+from app import create_app
+from app.negotiation import accepts_msgpack, columnar, row_list_fields, rows_from_columns
+from app.schemas import BatchCalculationRequest, RetroactiveSegmentsRequest, SimulationRequest
+
+msgpack = pytest.importorskip("msgpack")
+
+MSGPACK_HEADERS = {"Content-Type": "application/msgpack", "Accept": "application/msgpack"}
+
+ITEMS = [
+    {"pension_type": "jubilacion", "start_date": "2021-06-15", "num_children": 2, "pension_amount": 1000.0},
+    {"pension_type": "jubilacion_anticipada", "start_date": "2019-01-01", "num_children": 3, "pension_amount": 1200.0},
+    {"pension_type": "viudedad", "start_date": "2018-03-01", "num_children": 4, "pension_amount": 900.0},
+]
+
+@pytest.fixture
+def client():
+    with TestClient(create_app()) as client:
+        yield client
+
+class TestNegotiationHelpers:
+    """Tests para las funciones de negociación y de columnas."""
+    
+    def test_accepts_msgpack(self):
+        """Test preferencia según la cabecera Accept."""
+        assert accepts_msgpack("application/msgpack")
+        assert accepts_msgpack("application/x-msgpack, application/json;q=0.5")
+        assert not accepts_msgpack("application/json, application/msgpack")
+        assert not accepts_msgpack("application/msgpack;q=0")
+        assert not accepts_msgpack("*/*")
+        assert not accepts_msgpack(None)
+    
+    def test_columns_round_trip(self):
+        """Test filas -> columnas -> filas."""
+        columns = columnar({"items": ITEMS, "total": 3})
+        
+        assert columns["items"]["num_children"] == [2, 3, 4]
+        assert columns["total"] == 3
+        assert rows_from_columns(columns["items"]) == ITEMS
+    
+    def test_columns_must_have_same_length(self):
+        """Test columnas de distinta longitud."""
+        with pytest.raises(ValueError):
+            rows_from_columns({"a": [1, 2], "b": [1]})
+
+    def test_row_list_fields(self):
+        """Test solo las listas de objetos del esquema pueden ir por columnas."""
+        assert row_list_fields(BatchCalculationRequest) == {"items"}
+        assert row_list_fields(RetroactiveSegmentsRequest) == {"segments"}
+        assert row_list_fields(SimulationRequest) == set()
+        assert row_list_fields(None) == set()
+
+class TestMsgpackEndpoints:
+    """Tests de los endpoints con cuerpos y respuestas MessagePack."""
+    
+    def test_batch_same_result_as_json(self, client):
+        """Test el lote en MessagePack por columnas da el mismo resultado que en JSON."""
+        json_response = client.post("/batch/calculate", json={"items": ITEMS})
+        response = client.post(
+            "/batch/calculate",
+            content=msgpack.packb({"items": columnar({"items": ITEMS})["items"]}),
+            headers=MSGPACK_HEADERS
+        )
+        
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/msgpack"
+        data = msgpack.unpackb(response.content)
+        assert rows_from_columns(data["results"]) == json_response.json()["results"]
+        assert data["total_amount"] == json_response.json()["total_amount"]
+    
+    def test_rows_body_json_response(self, client):
+        """Test cuerpo MessagePack por filas con respuesta JSON."""
+        response = client.post(
+            "/batch/calculate",
+            content=msgpack.packb({"items": ITEMS}),
+            headers={"Content-Type": "application/msgpack"}
+        )
+        
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/json"
+        assert response.json()["eligible_count"] == 2
+    
+    def test_validation_same_as_json(self, client):
+        """Test los errores de validación son los mismos que con JSON."""
+        body = {"items": [{**ITEMS[0], "num_children": 0}]}
+        json_response = client.post("/batch/calculate", json=body)
+        response = client.post("/batch/calculate", content=msgpack.packb(body), headers=MSGPACK_HEADERS)
+        
+        assert response.status_code == json_response.status_code == 422
+        assert response.json()["detail"][0]["loc"] == json_response.json()["detail"][0]["loc"]
+    
+    def test_invalid_msgpack(self, client):
+        """Test cuerpo que no es MessagePack."""
+        response = client.post("/batch/calculate", content=b"\xc1", headers=MSGPACK_HEADERS)
+        
+        assert response.status_code == 400
+    
+    def test_segments_columns(self, client):
+        """Test atrasos por tramos con tramos y desglose por columnas."""
+        body = {
+            "start_date": "2020-01-01",
+            "end_date": "2022-01-01",
+            "segments": [
+                {"effective_from": "2020-01-01", "pension_amount": 1000.0, "num_children": 2},
+                {"effective_from": "2021-06-01", "pension_amount": 1100.0, "num_children": 3},
+            ]
+        }
+        json_response = client.post("/retroactive/segments", json=body)
+        response = client.post(
+            "/retroactive/segments",
+            content=msgpack.packb(columnar(body)),
+            headers=MSGPACK_HEADERS
+        )
+        
+        data = msgpack.unpackb(response.content)
+        assert data["total_amount"] == json_response.json()["total_amount"]
+        assert rows_from_columns(data["segments"]) == json_response.json()["segments"]
+    
+    def test_timeline_msgpack(self, client):
+        """Test página del desglose mensual en MessagePack."""
+        params = {"start_date": "2020-01-01", "end_date": "2020-04-01", "pension_amount": 1000, "num_children": 2}
+        response = client.get("/retroactive/timeline", params=params, headers={"Accept": "application/msgpack"})
+        
+        data = msgpack.unpackb(response.content)
+        assert data["items"]["month"] == ["2020-01-01", "2020-02-01", "2020-03-01"]
+        assert data["items"]["amount"] == [50.0, 50.0, 50.0]
+        assert "Accept" in response.headers["vary"]
@@ -0,0 +1,144 @@
+"""
+Tests para la descarga de trabajo de CPU a pools (ServiceOffloader).
+"""
+
+import asyncio
+import time
+from datetime import date
+import pytest
+from fastapi.testclient import TestClient
+from app import create_app, routes
+from app.offload import ServiceOffloader
+from app.services import ComplementoPaternidadService
+
+class SlowService:
+    """Servicio de prueba con un cálculo largo de CPU y otro inmediato."""
+    
+    def slow(self, seconds):
+        end = time.perf_counter() + seconds
+        total = 0
+        while time.perf_counter() < end:
+            total += 1
+        return total
+    
+    def fast(self, value):
+        return value * 2
+
+class TestServiceOffloader:
+    """Tests para ServiceOffloader."""
+    
+    def test_inline_below_threshold(self):
+        """Test las llamadas baratas se ejecutan en línea y las caras en el pool."""
+        offloader = ServiceOffloader(SlowService(), threshold=10)
+        
+        async def scenario():
+            return await offloader.call(1, 'fast', 2), await offloader.call(10, 'fast', 3)
+        
+        assert asyncio.run(scenario()) == (4, 6)
+        stats = offloader.stats()
+        assert stats["inline"] == 1
+        assert stats["offloaded"] == 1
+        assert stats["in_pool"] == 0
+        offloader.shutdown()
+    
+    def test_mode_off(self):
+        """Test con el modo off todo se ejecuta en línea."""
+        offloader = ServiceOffloader(SlowService(), mode='off', threshold=1)
+        
+        assert asyncio.run(offloader.call(1000, 'fast', 1)) == 2
+        assert offloader.stats()["offloaded"] == 0
+    
+    def test_invalid_mode(self):
+        """Test modo de descarga desconocido."""
+        with pytest.raises(ValueError):
+            ServiceOffloader(SlowService(), mode='gpu')
+    
+    def test_small_requests_not_blocked_by_large_job(self):
+        """Test la latencia de las peticiones pequeñas se mantiene mientras corre un trabajo grande."""
+        offloader = ServiceOffloader(SlowService(), threshold=100)
+        job_seconds = 0.5
+        
+        async def small_requests(count):
+            latencies = []
+            for i in range(count):
+                start = time.perf_counter()
+                await asyncio.sleep(0.005)
+                assert await offloader.call(1, 'fast', i) == i * 2
+                latencies.append(time.perf_counter() - start)
+            return latencies
+        
+        async def scenario():
+            job = asyncio.create_task(offloader.call(1000, 'slow', job_seconds))
+            await asyncio.sleep(0)
+            started = time.perf_counter()
+            latencies = await small_requests(20)
+            finished_before_job = not job.done()
+            await job
+            return latencies, finished_before_job, time.perf_counter() - started
+        
+        latencies, finished_before_job, elapsed = asyncio.run(scenario())
+        offloader.shutdown()
+        
+        # Las 20 peticiones pequeñas terminan mientras el trabajo grande sigue en curso
+        assert finished_before_job
+        assert elapsed >= job_seconds * 0.9
+        assert max(latencies) < job_seconds / 4
+    
+    def test_process_mode(self):
+        """Test en modo process cada worker usa su propia instancia del servicio."""
+        offloader = ServiceOffloader(ComplementoPaternidadService(), mode='process', threshold=1, processes=1)
+        
+        async def scenario():
+            return await offloader.call(
+                5, 'calculate_retroactive', date(2021, 3, 1), date(2021, 6, 1), 1000.0, 2
+            )
+        
+        try:
+            result = asyncio.run(scenario())
+        finally:
+            offloader.shutdown()
+        
+        assert result["months_calculated"] == 3
+        assert offloader.stats()["offloaded"] == 1
+
+class TestRoutesOffload:
+    """Tests de los endpoints con descarga activada."""
+    
+    def test_batch_offloaded(self, monkeypatch):
+        """Test un lote por encima del umbral se calcula en el pool con el mismo resultado."""
+        monkeypatch.setattr(routes.offloader, "threshold", 2)
+        item = {
+            "pension_type": "jubilacion",
+            "start_date": "2021-06-15",
+            "num_children": 2,
+            "pension_amount": 1000.0
+        }
+        
+        with TestClient(create_app()) as client:
+            before = client.get("/metrics").json()["offload"]["offloaded"]
+            small = client.post("/batch/calculate", json={"items": [item]})
+            large = client.post("/batch/calculate", json={"items": [item] * 3})
+            after = client.get("/metrics").json()["offload"]["offloaded"]
+        
+        assert small.status_code == 200
+        assert large.status_code == 200
+        assert large.json()["results"][0] == small.json()["results"][0]
+        assert after == before + 1
+    
+    def test_timeline_page_offloaded(self, monkeypatch):
+        """Test la página del desglose mensual se calcula igual en el pool."""
+        params = {
+            "start_date": "2021-01-15",
+            "end_date": "2021-07-15",
+            "pension_amount": 1000.0,
+            "num_children": 2,
+            "limit": 4
+        }
+        client = TestClient(create_app())
+        inline = client.get("/retroactive/timeline", params=params).json()
+        
+        monkeypatch.setattr(routes.offloader, "threshold", 1)
+        offloaded = client.get("/retroactive/timeline", params=params).json()
+        
+        assert offloaded == inline
+        assert len(offloaded["items"]) == 4
@@ -0,0 +1,232 @@
+"""
+Tests para la cartera almacenada y su recálculo incremental.
+"""
+
+import copy
+import json
+import sqlite3
+from datetime import date
+import pytest
+from fastapi.testclient import TestClient
+from app import create_app, routes
+from app.portfolio import PortfolioStore
+from app.rules import DEFAULT_RULES_PATH, changed_intervals, compile_rules
+from app.schemas import PeriodType
+
+RECORDS = [
+    {"key": "p1-a", "pension_type": "jubilacion", "start_date": "2018-05-01", "num_children": 2, "pension_amount": 1000.0},
+    {"key": "p1-b", "pension_type": "viudedad", "start_date": "2020-12-15", "num_children": 3, "pension_amount": 800.0},
+    {"key": "p2-a", "pension_type": "jubilacion", "start_date": "2021-02-04", "num_children": 2, "pension_amount": 1200.0},
+    {"key": "p2-b", "pension_type": "incapacidad", "start_date": "2024-06-01", "num_children": 4, "pension_amount": 900.0},
+    {"key": "p2-c", "pension_type": "jubilacion_anticipada", "start_date": "2023-01-01", "num_children": 1, "pension_amount": 700.0},
+]
+
+@pytest.fixture
+def rules_data():
+    with open(DEFAULT_RULES_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+def revised(rules_data, version, change):
+    """Reglas con un cambio aplicado sobre las vigentes."""
+    data = copy.deepcopy(rules_data)
+    data["version"] = version
+    change(data)
+    return compile_rules(data)
+
+@pytest.fixture
+def store(tmp_path, rules_data):
+    store = PortfolioStore(str(tmp_path / "cartera.db"))
+    store.write(RECORDS, compile_rules(rules_data))
+    return store
+
+class TestChangedIntervals:
+    """Tests para la comparación de versiones de las reglas."""
+
+    def test_revaluation_affects_period_2(self, rules_data):
+        """Test revalorizar el importe por hijo afecta solo al período 2."""
+        old = compile_rules(rules_data)
+        new = revised(rules_data, "2025.01", lambda d: d["periods"][1]["calculation"].update(amount_per_child=40.0))
+
+        assert changed_intervals(old, new) == [(date(2021, 2, 4), None, PeriodType.PERIOD_2, "P2-2021")]
+
+    def test_same_rules(self, rules_data):
+        """Test sin cambios no hay tramos afectados."""
+        assert changed_intervals(compile_rules(rules_data), compile_rules(rules_data)) == []
+
+    def test_shortened_period(self, rules_data):
+        """Test acortar un período afecta solo al tramo que deja de cubrir."""
+        old = compile_rules(rules_data)
+        new = revised(rules_data, "corto", lambda d: d["periods"][0].update(end="2020-12-31"))
+
+        assert changed_intervals(old, new) == [(date(2021, 1, 1), date(2021, 2, 4), PeriodType.PERIOD_1, "P1-2016")]
+
+class TestPortfolioStore:
+    """Tests para la escritura y el recálculo de la cartera."""
+
+    def test_write_and_get(self, store):
+        """Test se guardan los datos de entrada y el resultado."""
+        record = store.get("p2-a")
+
+        assert store.count() == 5
+        assert record["period"] == "2"
+        assert record["rate_version"] == "P2-2021"
+        assert record["eligible"] is True
+        assert record["amount"] == 71.8
+        assert store.get("p2-c")["reason"] is None
+        assert store.applied_rules().version == "2021.02"
+
+    def test_write_replaces_record(self, store, rules_data):
+        """Test escribir una clave existente sustituye el registro."""
+        store.write([{**RECORDS[0], "num_children": 4}], compile_rules(rules_data))
+
+        assert store.count() == 5
+        assert store.get("p1-a")["amount"] == 150.0
+
+    def test_invalid_record(self, store, rules_data):
+        """Test un registro inválido impide guardar el lote."""
+        with pytest.raises(ValueError, match="Registro 1"):
+            store.write([{**RECORDS[0], "key": "nuevo"}, {**RECORDS[1], "num_children": 5}], compile_rules(rules_data))
+
+        assert store.get("nuevo") is None
+
+    def test_revaluation_recomputes_only_period_2(self, store, rules_data):
+        """Test la revalorización recalcula solo el período 2 y da sus diferencias."""
+        new = revised(rules_data, "2025.01", lambda d: d["periods"][1]["calculation"].update(amount_per_child=40.0))
+
+        report = store.recompute(new)
+
+        assert (report["from_version"], report["to_version"]) == ("2021.02", "2025.01")
+        assert report["recomputed"] == 3
+        assert {change["key"]: (change["old_amount"], change["new_amount"]) for change in report["changes"]} == {
+            "p2-a": (71.8, 80.0), "p2-b": (143.6, 160.0), "p2-c": (35.9, 40.0)
+        }
+        assert report["total_delta"] == 28.7
+        assert store.get("p2-b")["amount"] == 160.0
+        assert store.get("p1-a")["amount"] == 50.0
+        assert store.applied_rules().version == "2025.01"
+
+    def test_rate_version_only(self, store, rules_data):
+        """Test una versión de importes nueva sin cambio de importe no produce diferencias."""
+        new = revised(rules_data, "2025.01", lambda d: d["rate_versions"].append(
+            {"id": "P2-2024", "effective_from": "2024-01-01"}
+        ))
+
+        report = store.recompute(new)
+
+        assert report["recomputed"] == 1
+        assert report["changes"] == []
+        assert store.get("p2-b")["rate_version"] == "P2-2024"
+
+    def test_period_gap(self, store, rules_data):
+        """Test acortar el período 1 deja fuera de rango solo a quien cae en el hueco."""
+        new = revised(rules_data, "corto", lambda d: d["periods"][0].update(end="2020-12-01"))
+
+        report = store.recompute(new)
+
+        assert [change["key"] for change in report["changes"]] == ["p1-b"]
+        assert report["changes"][0]["new_period"] is None
+        assert store.get("p1-b")["eligible"] is False
+
+    def test_unchanged_rules(self, store, rules_data):
+        """Test recalcular con las mismas reglas no lee ningún registro."""
+        report = store.recompute(compile_rules(rules_data))
+
+        assert report["recomputed"] == 0
+        assert report["intervals"] == []
+
+    def test_write_with_new_rules_syncs_first(self, store, rules_data):
+        """Test escribir con otras reglas recalcula antes el resto de la cartera."""
+        new = revised(rules_data, "2025.01", lambda d: d["periods"][1]["calculation"].update(amount_per_child=40.0))
+
+        store.write([{**RECORDS[0], "key": "nuevo"}], new)
+
+        assert store.get("p2-a")["amount"] == 80.0
+        assert store.last_report["recomputed"] == 3
+        assert store.applied_rules().version == "2025.01"
+
+class TestPortfolioRollup:
+    """Tests para los contadores de la cartera y su resumen agrupado."""
+
+    def test_summary_by_period(self, store):
+        """Test el resumen por período sale de los contadores."""
+        summary = store.summary(["period"])
+
+        assert summary["groups"] == [
+            {"period": "1", "records": 2, "eligible": 2, "total_amount": 130.0},
+            {"period": "2", "records": 3, "eligible": 3, "total_amount": 251.3},
+        ]
+        assert summary["total"] == {"records": 5, "eligible": 5, "total_amount": 381.3}
+        assert summary["rules_version"] == "2021.02"
+
+    def test_summary_filters(self, store):
+        """Test los filtros restringen los grupos y el total."""
+        summary = store.summary(["num_children"], pension_type="jubilacion")
+
+        assert [(group["num_children"], group["records"]) for group in summary["groups"]] == [(2, 2)]
+        assert summary["total"]["total_amount"] == 121.8
+
+    def test_counters_follow_writes(self, store, rules_data):
+        """Test sustituir registros y recalcular mantiene los contadores."""
+        store.write([{**RECORDS[0], "pension_type": "jubilacion_anticipada"}], compile_rules(rules_data))
+        store.recompute(revised(rules_data, "2025.01", lambda d: d["periods"][1]["calculation"].update(amount_per_child=40.0)))
+
+        summary = store.summary(["period"])
+
+        assert summary["groups"][0] == {"period": "1", "records": 2, "eligible": 1, "total_amount": 80.0}
+        assert summary["groups"][1]["total_amount"] == 280.0
+        assert store.rebuild_rollup()["mismatches"] == []
+
+    def test_unknown_dimension(self, store):
+        """Test una dimensión inexistente se rechaza."""
+        with pytest.raises(ValueError, match="Dimensiones desconocidas"):
+            store.summary(["provincia"])
+
+    def test_rebuild_fixes_counters(self, store):
+        """Test la reconstrucción detecta y corrige contadores alterados."""
+        with sqlite3.connect(store.path) as conn:
+            conn.execute("UPDATE portfolio_rollup SET records = records + 1 WHERE period = '2' AND num_children = 4")
+
+        result = store.rebuild_rollup()
+
+        assert result["records"] == 5
+        assert [(m["period"], m["num_children"]) for m in result["mismatches"]] == [("2", 4)]
+        assert store.summary()["total"]["records"] == 5
+        assert store.rebuild_rollup()["mismatches"] == []
+
+    def test_existing_store_gets_counters(self, store):
+        """Test una cartera sin contadores los construye al abrirse."""
+        with sqlite3.connect(store.path) as conn:
+            conn.execute("DELETE FROM portfolio_rollup")
+
+        assert PortfolioStore(store.path).summary()["total"]["records"] == 5
+
+class TestPortfolioSummaryAPI:
+    """Tests del endpoint GET /portfolio/summary."""
+
+    @pytest.fixture
+    def client(self, store, monkeypatch):
+        monkeypatch.setattr(routes, "portfolio", store)
+        with TestClient(create_app()) as client:
+            yield client
+
+    def test_group_by(self, client):
+        """Test agrupar por período y tipo de pensión."""
+        response = client.get("/portfolio/summary", params={"group_by": "period,pension_type", "period": "2"})
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["group_by"] == ["period", "pension_type"]
+        assert [(g["period"], g["pension_type"], g["records"]) for g in data["groups"]] == [
+            ("2", "incapacidad", 1), ("2", "jubilacion", 1), ("2", "jubilacion_anticipada", 1)
+        ]
+        assert data["total"]["total_amount"] == 251.3
+
+    def test_invalid_dimension(self, client):
+        """Test una dimensión desconocida -> 400."""
+        assert client.get("/portfolio/summary", params={"group_by": "provincia"}).status_code == 400
+
+    def test_not_configured(self, monkeypatch):
+        """Test sin PORTFOLIO_DB -> 404."""
+        monkeypatch.setattr(routes, "portfolio", None)
+        with TestClient(create_app()) as client:
+            assert client.get("/portfolio/summary").status_code == 404
@@ -0,0 +1,154 @@
+"""
+Tests para el perfilado bajo demanda (/debug/profile).
+"""
+
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+from app import create_app
+from app.profiling import ProfilerController, ProfilingMiddleware
+
+ADMIN_HEADERS = {"X-Admin-Token": "secreto"}
+
+@pytest.fixture
+def admin_client(monkeypatch, tmp_path):
+    """Cliente con administración habilitada y ficheros de perfil en tmp_path.
+    
+    Se usa como context manager para que todas las peticiones compartan el
+    mismo hilo de bucle de eventos, como en un worker real.
+    """
+    monkeypatch.setenv("ADMIN_TOKEN", "secreto")
+    monkeypatch.setenv("PROFILE_OUTPUT_DIR", str(tmp_path))
+    with TestClient(create_app()) as client:
+        yield client
+
+class TestProfiling:
+    """Tests para el perfilador bajo demanda."""
+    
+    def test_admin_disabled_without_token(self, monkeypatch):
+        """Test sin ADMIN_TOKEN los endpoints de administración están cerrados."""
+        monkeypatch.delenv("ADMIN_TOKEN", raising=False)
+        client = TestClient(create_app())
+        
+        response = client.post("/debug/profile", json={"requests": 1}, headers=ADMIN_HEADERS)
+        
+        assert response.status_code == 403
+    
+    def test_wrong_token(self, admin_client):
+        """Test token de administración incorrecto."""
+        response = admin_client.get("/debug/profile", headers={"X-Admin-Token": "otro"})
+        
+        assert response.status_code == 403
+    
+    def test_profile_next_requests(self, admin_client, tmp_path):
+        """Test perfilado de las próximas N peticiones."""
+        armed = admin_client.post("/debug/profile", json={"requests": 2}, headers=ADMIN_HEADERS)
+        assert armed.status_code == 202
+        assert armed.json()["active"] == True
+        
+        for _ in range(2):
+            admin_client.post("/calculate", json={
+                "pension_type": "jubilacion",
+                "start_date": "2021-06-15",
+                "num_children": 2,
+                "pension_amount": 1000.0
+            })
+        
+        report = admin_client.get("/debug/profile", headers=ADMIN_HEADERS).json()
+        assert report["requests"] == 2
+        assert "calculate_complement" in report["stats"]
+        assert len(report["files"]) == 2
+        assert (tmp_path / report["files"][0].split("/")[-1]).exists()
+        
+        status = admin_client.delete("/debug/profile", headers=ADMIN_HEADERS).json()
+        assert status["active"] == False
+    
+    def test_profile_already_active(self, admin_client):
+        """Test no se puede armar dos veces a la vez."""
+        admin_client.post("/debug/profile", json={"seconds": 60}, headers=ADMIN_HEADERS)
+        
+        response = admin_client.post("/debug/profile", json={"requests": 1}, headers=ADMIN_HEADERS)
+        
+        assert response.status_code == 409
+        admin_client.delete("/debug/profile", headers=ADMIN_HEADERS)
+    
+    def test_profile_requires_one_limit(self, admin_client):
+        """Test hay que indicar requests o seconds."""
+        response = admin_client.post("/debug/profile", json={}, headers=ADMIN_HEADERS)
+        
+        assert response.status_code == 400
+    
+    def test_profile_single_request_header(self, admin_client):
+        """Test perfilado de una petición con la cabecera X-Profile."""
+        response = admin_client.get("/health", headers={"X-Profile": "secreto"})
+        
+        assert response.status_code == 200
+        profile_id = response.headers["x-profile-id"]
+        
+        report = admin_client.get("/debug/profile", headers=ADMIN_HEADERS).json()
+        assert str(report["id"]) == profile_id
+        assert report["requests"] == 1
+        
+        collapsed = admin_client.get("/debug/profile", params={"format": "collapsed"}, headers=ADMIN_HEADERS)
+        assert collapsed.headers["content-type"].startswith("text/plain")
+    
+    def test_profile_header_ignored_with_wrong_token(self, admin_client):
+        """Test la cabecera X-Profile con otro valor no activa el perfilador."""
+        response = admin_client.get("/health", headers={"X-Profile": "1"})
+        
+        assert "x-profile-id" not in response.headers
+
+class TestProfilingMiddleware:
+    """Tests de la sesión de una petición con cabecera frente a otras peticiones concurrentes."""
+    
+    @staticmethod
+    def scope(headers=()):
+        return {"type": "http", "path": "/", "headers": list(headers)}
+    
+    def test_header_session_owned_by_its_request(self):
+        """Test otras peticiones no detienen la sesión de la cabecera, y esta no detiene otra."""
+        async def scenario():
+            controller = ProfilerController()
+            release = asyncio.Event()
+            
+            async def app(scope, receive, send):
+                if scope["path"] == "/lenta":
+                    await release.wait()
+                await send({"type": "http.response.start", "status": 200, "headers": []})
+            
+            middleware = ProfilingMiddleware(app, controller, header_token="secreto")
+            sent = []
+            
+            async def send(message):
+                sent.append(message)
+            
+            profiled = asyncio.create_task(middleware(
+                {**self.scope([(b"x-profile", b"secreto")]), "path": "/lenta"}, None, send
+            ))
+            await asyncio.sleep(0)
+            await middleware(self.scope(), None, lambda message: asyncio.sleep(0))
+            still_active = controller.active
+            
+            release.set()
+            await profiled
+            
+            # El administrador para esa sesión y arranca otra: el final de la
+            # petición con cabecera no debe detenerla
+            release.clear()
+            profiled = asyncio.create_task(middleware(
+                {**self.scope([(b"x-profile", b"secreto")]), "path": "/lenta"}, None, send
+            ))
+            await asyncio.sleep(0)
+            controller.stop()
+            controller.start(requests=5)
+            release.set()
+            await profiled
+            admin_active = controller.active
+            controller.stop()
+            return still_active, sent, admin_active
+        
+        still_active, sent, admin_active = asyncio.run(scenario())
+        
+        assert still_active
+        assert (b"x-profile-id", b"1") in sent[0]["headers"]
+        assert admin_active
@@ -0,0 +1,332 @@
+"""
+Tests para el fichero de reglas y su compilación.
+"""
+
+import asyncio
+import copy
+import json
+import time
+from datetime import date
+import httpx
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from app import create_app
+from app.cache import MemoryCache
+from app.rules import (
+    DEFAULT_RULES_PATH, RulesError, RulesMiddleware, RulesPublisher,
+    compile_rules, get_rules, load_rules, publisher
+)
+from app.services import ComplementoPaternidadService
+from app.engine import encode_dates, encode_pension_types, REASON_OK
+from app.schemas import PensionType, PeriodType
+
+@pytest.fixture
+def rules_data():
+    """Contenido del fichero de reglas por defecto."""
+    with open(DEFAULT_RULES_PATH, encoding='utf-8') as f:
+        return json.load(f)
+
+class TestLoadRules:
+    """Tests para la carga y validación de las reglas."""
+
+    def test_default_rules(self):
+        """Test el fichero por defecto se carga y compila."""
+        rules = load_rules(DEFAULT_RULES_PATH)
+
+        assert rules.version == "2021.02"
+        assert [rule.period for rule in rules.periods] == [PeriodType.PERIOD_1, PeriodType.PERIOD_2]
+        assert rules.period_for(date(2021, 2, 3)).period == PeriodType.PERIOD_1
+        assert rules.period_for(date(2021, 2, 4)).period == PeriodType.PERIOD_2
+        assert rules.period_for(date(2015, 12, 31)) is None
+        assert rules.rate_version(date(2021, 2, 4)) == "P2-2021"
+
+    def test_rules_file_from_env(self, tmp_path, monkeypatch, rules_data):
+        """Test RULES_FILE selecciona otro fichero."""
+        rules_data['version'] = "pruebas"
+        path = tmp_path / "reglas.json"
+        path.write_text(json.dumps(rules_data), encoding='utf-8')
+        monkeypatch.setenv("RULES_FILE", str(path))
+
+        assert load_rules().version == "pruebas"
+
+    def test_missing_file(self, tmp_path):
+        """Test un fichero inexistente produce RulesError."""
+        with pytest.raises(RulesError):
+            load_rules(str(tmp_path / "no-existe.json"))
+
+    def test_overlapping_periods(self, rules_data):
+        """Test los períodos no pueden solaparse."""
+        rules_data['periods'][1]['start'] = "2021-01-01"
+
+        with pytest.raises(RulesError, match="solapa"):
+            compile_rules(rules_data)
+
+    def test_missing_percentage(self, rules_data):
+        """Test cada número de hijos computable necesita su porcentaje."""
+        del rules_data['periods'][0]['calculation']['percentages']['3']
+
+        with pytest.raises(RulesError, match="Faltan porcentajes"):
+            compile_rules(rules_data)
+
+    def test_unknown_pension_type(self, rules_data):
+        """Test los tipos de pensión deben existir."""
+        rules_data['periods'][0]['eligible_pension_types'].append("orfandad")
+
+        with pytest.raises(RulesError):
+            compile_rules(rules_data)
+
+class TestCustomRules:
+    """Tests del servicio y el motor con reglas distintas de las vigentes."""
+
+    @pytest.fixture
+    def service(self, rules_data):
+        data = copy.deepcopy(rules_data)
+        data['periods'][0]['end'] = "2020-12-31"  # hueco de un mes entre períodos
+        data['periods'][1]['calculation']['amount_per_child'] = 40.0
+        data['periods'][1]['max_children'] = 3
+        return ComplementoPaternidadService(rules=compile_rules(data))
+
+    def test_amounts_follow_rules(self, service):
+        """Test el cálculo usa el importe y el máximo de hijos del fichero."""
+        result = service.calculate_complement(PensionType.JUBILACION, date(2022, 1, 1), 4, 1000.0)
+
+        assert result.complement_fixed == 40.0
+        assert result.amount == 120.0
+
+    def test_gap_between_periods(self, service):
+        """Test una fecha en el hueco entre períodos queda fuera de rango."""
+        result = service.check_eligibility(PensionType.JUBILACION, date(2021, 1, 15), 2)
+
+        assert result.eligible is False
+        assert result.period is None
+
+    def test_engine_matches_service(self, service):
+        """Test el motor vectorizado se construye con las mismas reglas."""
+        dates = [date(2020, 12, 31), date(2021, 1, 15), date(2021, 2, 4)]
+        rows = [(t, d, n) for t in PensionType for d in dates for n in range(1, 6)]
+
+        reasons, amounts = service.engine.calculate(
+            encode_pension_types([r[0] for r in rows]),
+            service.engine.periods(encode_dates([r[1] for r in rows])),
+            np.array([r[2] for r in rows]),
+            np.full(len(rows), 1000.0)
+        )
+
+        for (pension_type, start_date, children), reason, amount in zip(rows, reasons, amounts):
+            eligibility = service.check_eligibility(pension_type, start_date, children)
+            assert (reason == REASON_OK) == eligibility.eligible
+            if eligibility.eligible:
+                expected = service.calculate_complement(pension_type, start_date, children, 1000.0)
+                assert amount == expected.amount
+
+    def test_evaluate_matches_engine(self, service):
+        """Test evaluate da el mismo código de motivo e importe que el motor, sin excepciones."""
+        dates = [date(2020, 12, 31), date(2021, 1, 15), date(2021, 2, 4)]
+        rows = [(t, d, n) for t in PensionType for d in dates for n in range(1, 6)]
+
+        reasons, amounts = service.engine.calculate(
+            encode_pension_types([r[0] for r in rows]),
+            service.engine.periods(encode_dates([r[1] for r in rows])),
+            np.array([r[2] for r in rows]),
+            np.full(len(rows), 1000.0)
+        )
+
+        for (pension_type, start_date, children), reason, amount in zip(rows, reasons, amounts):
+            outcome = service.rules.evaluate(pension_type, start_date, children, 1000.0)
+            assert outcome.reason_code == reason
+            assert outcome.eligible == (outcome.reason is None)
+            if outcome.eligible:
+                assert outcome.amount == amount
+            else:
+                assert outcome.amount is None
+                assert outcome.reason == service.rules.check(pension_type, start_date, children)[1]
+
+    def test_retroactive_cuts_at_period_end(self, service):
+        """Test los atrasos no cuentan los meses del hueco entre períodos."""
+        result = service.calculate_retroactive(date(2020, 12, 5), date(2021, 3, 1), 1000.0, 2)
+
+        # dic-2020 (5% de 1000) + ene-2021 (hueco) + feb-2021 (2 x 40)
+        assert result['months_calculated'] == 2
+        assert result['total_amount'] == 130.0
+
+@pytest.fixture
+def rules_file(tmp_path, rules_data):
+    """Fichero de reglas temporal publicado como fuente de las reglas del proceso."""
+    path = tmp_path / "reglas.json"
+    path.write_text(json.dumps(rules_data), encoding='utf-8')
+    original = publisher.source
+    publisher.source = str(path)
+    yield path
+    publisher.source = original
+    publisher.reload()
+
+def write_rules(path, rules_data, version, amount_per_child):
+    """Escribir una revisión del fichero de reglas."""
+    data = copy.deepcopy(rules_data)
+    data['version'] = version
+    data['periods'][1]['calculation']['amount_per_child'] = amount_per_child
+    path.write_text(json.dumps(data), encoding='utf-8')
+
+class TestRulesPublisher:
+    """Tests para la recarga en caliente de las reglas."""
+
+    def test_reload_swaps_rules(self, tmp_path, rules_data):
+        """Test la recarga publica la versión nueva y avisa a los suscriptores."""
+        path = tmp_path / "reglas.json"
+        write_rules(path, rules_data, "v1", 35.90)
+        rules_publisher = RulesPublisher(str(path))
+        notified = []
+        rules_publisher.subscribe(lambda: notified.append(1))
+        old = rules_publisher.current
+
+        write_rules(path, rules_data, "v2", 40.0)
+        new = rules_publisher.reload()
+
+        assert (old.version, new.version) == ("v1", "v2")
+        assert rules_publisher.current is new
+        assert rules_publisher.stats()['reloads'] == 1
+        assert notified == [1]
+
+    def test_failing_listener_keeps_reload(self, tmp_path, rules_data):
+        """Test un suscriptor que falla no convierte la recarga en un error ni para la vigilancia."""
+        path = tmp_path / "reglas.json"
+        write_rules(path, rules_data, "v1", 35.90)
+        rules_publisher = RulesPublisher(str(path))
+        notified = []
+
+        def failing():
+            raise RuntimeError("fallo del suscriptor")
+
+        rules_publisher.subscribe(failing)
+        rules_publisher.subscribe(lambda: notified.append(rules_publisher.current.version))
+        rules_publisher.current
+
+        write_rules(path, rules_data, "v2", 40.0)
+        assert rules_publisher.reload().version == "v2"
+
+        rules_publisher.watch(0.01)
+        try:
+            write_rules(path, rules_data, "v3-revalorizacion", 41.0)
+            deadline = time.monotonic() + 2
+            while len(notified) < 2 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            watching = rules_publisher.stats()['watching']
+        finally:
+            rules_publisher.stop_watching()
+
+        assert notified == ["v2", "v3-revalorizacion"]
+        assert watching
+
+    def test_invalid_reload_keeps_rules(self, tmp_path, rules_data):
+        """Test un fichero inválido no sustituye las reglas vigentes."""
+        path = tmp_path / "reglas.json"
+        write_rules(path, rules_data, "v1", 35.90)
+        rules_publisher = RulesPublisher(str(path))
+        old = rules_publisher.current
+
+        path.write_text("{", encoding='utf-8')
+        with pytest.raises(RulesError):
+            rules_publisher.reload()
+
+        assert rules_publisher.current is old
+        assert rules_publisher.stats()['failures'] == 1
+        assert rules_publisher.stats()['last_error']
+
+    def test_watch_reloads_on_change(self, tmp_path, rules_data):
+        """Test la vigilancia del fichero recarga al cambiar."""
+        path = tmp_path / "reglas.json"
+        write_rules(path, rules_data, "v1", 35.90)
+        rules_publisher = RulesPublisher(str(path))
+        rules_publisher.current
+        rules_publisher.watch(0.01)
+        try:
+            write_rules(path, rules_data, "v2-revalorizacion", 40.0)
+            deadline = time.monotonic() + 2
+            while rules_publisher.current.version != "v2-revalorizacion" and time.monotonic() < deadline:
+                time.sleep(0.01)
+        finally:
+            rules_publisher.stop_watching()
+
+        assert rules_publisher.current.version == "v2-revalorizacion"
+
+    def test_in_flight_request_keeps_version(self, tmp_path, rules_data):
+        """Test una petición en curso termina con las reglas con las que empezó."""
+        path = tmp_path / "reglas.json"
+        write_rules(path, rules_data, "v1", 35.90)
+        rules_publisher = RulesPublisher(str(path))
+        seen = []
+
+        async def app(scope, receive, send):
+            seen.append(get_rules().version)
+            write_rules(path, rules_data, "v2", 40.0)
+            rules_publisher.reload()
+            await asyncio.sleep(0)
+            seen.append(get_rules().version)
+            await send({'type': 'http.response.start', 'status': 200, 'headers': []})
+            await send({'type': 'http.response.body', 'body': b''})
+
+        async def run():
+            transport = httpx.ASGITransport(app=RulesMiddleware(app, publisher=rules_publisher))
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                first = await client.get("/")
+                second = await client.get("/")
+            return first, second
+
+        first, second = asyncio.run(run())
+
+        assert seen[:2] == ["v1", "v1"]
+        assert first.headers["x-rules-version"] == "v1"
+        assert second.headers["x-rules-version"] == "v2"
+
+class TestRulesReloadAPI:
+    """Tests del endpoint de recarga y de la versión en las respuestas."""
+
+    @pytest.fixture
+    def client(self, monkeypatch, rules_file):
+        monkeypatch.setenv("ADMIN_TOKEN", "secreto")
+        with TestClient(create_app()) as client:
+            yield client
+
+    def test_reload_endpoint(self, client, rules_file, rules_data):
+        """Test la recarga cambia los importes y la cabecera X-Rules-Version."""
+        body = {"pension_type": "jubilacion", "start_date": "2022-01-01", "num_children": 2, "pension_amount": 1000.0}
+        before = client.post("/calculate", json=body)
+        assert before.headers["x-rules-version"] == "2021.02"
+
+        write_rules(rules_file, rules_data, "2025.01", 40.0)
+        reloaded = client.post("/debug/rules/reload", headers={"X-Admin-Token": "secreto"})
+        after = client.post("/calculate", json=body)
+
+        assert reloaded.status_code == 200
+        assert reloaded.json()["previous_version"] == "2021.02"
+        assert reloaded.json()["version"] == "2025.01"
+        assert after.headers["x-rules-version"] == "2025.01"
+        assert after.json()["amount"] == 80.0
+
+    def test_reload_invalid_file(self, client, rules_file):
+        """Test un fichero inválido se rechaza con 422 y se mantienen las reglas."""
+        rules_file.write_text('{"version": "roto"}', encoding='utf-8')
+        response = client.post("/debug/rules/reload", headers={"X-Admin-Token": "secreto"})
+
+        assert response.status_code == 422
+        assert client.get("/health").headers["x-rules-version"] == "2021.02"
+
+    def test_reload_requires_admin(self, client):
+        """Test la recarga exige el token de administración."""
+        assert client.post("/debug/rules/reload").status_code == 403
+
+class TestVersionedCache:
+    """Tests de la versión de las reglas en las claves de caché."""
+
+    def test_reload_invalidates_cache(self, rules_file, rules_data):
+        """Test tras una recarga no se sirven resultados de la versión anterior."""
+        service = ComplementoPaternidadService(cache=MemoryCache())
+        first = service.calculate_complement(PensionType.JUBILACION, date(2022, 1, 1), 2, 1000.0)
+
+        write_rules(rules_file, rules_data, "2025.01", 40.0)
+        publisher.reload()
+        second = service.calculate_complement(PensionType.JUBILACION, date(2022, 1, 1), 2, 1000.0)
+
+        assert (first.amount, second.amount) == (71.8, 80.0)
+        assert service.cache.stats()["hits"] == 0
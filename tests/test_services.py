@@ -2,10 +2,12 @@
 Tests unitarios para los servicios de cálculo del complemento.
 """
 
+import random
 import pytest
-from datetime import date
+from datetime import date, timedelta
 from app.services import ComplementoPaternidadService
 from app.schemas import PensionType, PeriodType
+from app.utils import add_months, count_month_steps
 
 class TestComplementoPaternidadService:
     """Tests para ComplementoPaternidadService."""
@@ -233,6 +235,159 @@ class TestComplementoPaternidadService:
         assert result['period_2_amount'] > 0
         assert result['period_1_amount'] is None
     
+    def test_calculate_retroactive_end_of_month_start(self):
+        """Test atrasos desde un día 31 (meses más cortos)."""
+        result = self.service.calculate_retroactive(
+            date(2021, 1, 31),
+            date(2021, 5, 1),
+            1000.0,
+            2
+        )
+        
+        # 31/01 (Período 1) + 28/02, 31/03 y 30/04 (Período 2)
+        assert result['months_calculated'] == 4
+        assert result['period_1_amount'] == 50.0
+        assert result['period_2_amount'] == 215.4
+    
+    def test_calculate_retroactive_segments(self):
+        """Test atrasos con cambio de pensión y frontera de tarifa."""
+        result = self.service.calculate_retroactive_segments(
+            date(2020, 11, 1),
+            date(2021, 6, 1),
+            [
+                {'effective_from': date(2020, 1, 1), 'pension_amount': 1000.0, 'num_children': 2},
+                {'effective_from': date(2021, 1, 1), 'pension_amount': 1200.0, 'num_children': 2},
+                {'effective_from': date(2021, 4, 1), 'pension_amount': 1200.0, 'num_children': 3}
+            ]
+        )
+        
+        pieces = [(p['date_from'], p['date_to'], p['months'], p['monthly_amount']) for p in result['segments']]
+        assert pieces == [
+            (date(2020, 11, 1), date(2021, 1, 1), 2, 50.0),   # 5% de 1000€
+            (date(2021, 1, 1), date(2021, 2, 4), 2, 60.0),    # 5% de 1200€ (enero y febrero)
+            (date(2021, 2, 4), date(2021, 4, 1), 1, 71.8),    # 2 x 35,90€ (marzo)
+            (date(2021, 4, 1), date(2021, 6, 1), 2, 107.7)    # 3 x 35,90€
+        ]
+        assert result['months_calculated'] == 7
+        assert result['period_1_amount'] == 220.0
+        assert result['period_2_amount'] == 287.2
+        assert result['total_amount'] == 507.2
+    
+    def test_calculate_retroactive_matches_month_by_month(self):
+        """Test el total por tramos coincide con sumar mes a mes lo abonado."""
+        rng = random.Random(29)
+        cases = [(date(2014, 4, 11), date(2020, 2, 12), 777.77, 4)]
+        for _ in range(2000):
+            start = date(2014, 1, 1) + timedelta(days=rng.randrange(3650))
+            end = start + timedelta(days=rng.randrange(1, 2400))
+            cases.append((start, end, round(rng.uniform(300, 3000), 2), rng.randint(1, 4)))
+        rules = self.service.rules
+        
+        for start, end, pension_amount, num_children in cases:
+            result = self.service.calculate_retroactive(start, end, pension_amount, num_children)
+            
+            # Algoritmo anterior: un pago mensual (en céntimos) por cada mes
+            expected = 0.0
+            for index in range(count_month_steps(start, end)):
+                rule = rules.period_for(add_months(start, index))
+                if rule is not None and num_children >= rule.min_children:
+                    expected += round(rule.calculate(num_children, pension_amount)[2], 2)
+            segments = self.service.calculate_retroactive_segments(start, end, [
+                {'effective_from': start, 'pension_amount': pension_amount, 'num_children': num_children}
+            ])['segments']
+            months = self.service.iter_retroactive_months(start, end, pension_amount, num_children)
+            
+            assert result['total_amount'] == round(expected, 2), (start, end, pension_amount, num_children)
+            assert round(sum(p['amount'] for p in segments), 2) == result['total_amount']
+            assert round(sum(m['amount'] for m in months), 2) == result['total_amount']
+    
+    def test_calculate_retroactive_segments_first_segment_after_start(self):
+        """Test error si el primer tramo empieza después del inicio."""
+        with pytest.raises(ValueError):
+            self.service.calculate_retroactive_segments(
+                date(2021, 6, 1),
+                date(2021, 9, 1),
+                [{'effective_from': date(2021, 7, 1), 'pension_amount': 1000.0, 'num_children': 2}]
+            )
+    
+    def test_iter_retroactive_months(self):
+        """Test desglose mensual perezoso con versión de tarifa."""
+        months = list(self.service.iter_retroactive_months(
+            date(2021, 1, 15),
+            date(2021, 4, 1),
+            1000.0,
+            2
+        ))
+        
+        assert [m['month'] for m in months] == [date(2021, 1, 15), date(2021, 2, 15), date(2021, 3, 15)]
+        assert [m['rate_version'] for m in months] == ["P1-2016", "P2-2021", "P2-2021"]
+        assert [m['amount'] for m in months] == [50.0, 71.8, 71.8]
+    
+    def test_iter_retroactive_months_start_index(self):
+        """Test reanudar el desglose desde un mes concreto."""
+        months = self.service.iter_retroactive_months(
+            date(2021, 6, 1),
+            date(2031, 6, 1),
+            1000.0,
+            1,
+            start_index=119
+        )
+        
+        assert [m['index'] for m in months] == [119]
+    
+    def test_calculate_batch_mixed(self):
+        """Test cálculo por lotes con pensionistas elegibles y no elegibles."""
+        items = [
+            {
+                'pension_type': PensionType.JUBILACION,
+                'start_date': date(2020, 6, 15),
+                'num_children': 3,
+                'pension_amount': 1000.0
+            },
+            {
+                'pension_type': PensionType.JUBILACION,
+                'start_date': date(2020, 6, 15),
+                'num_children': 1,
+                'pension_amount': 1000.0
+            }
+        ]
+        
+        result = self.service.calculate_batch(items)
+        
+        assert result['eligible_count'] == 1
+        assert result['total_amount'] == 100.0
+        assert result['results'][0]['period'] == PeriodType.PERIOD_1
+        assert result['results'][1]['eligible'] == False
+        assert "2 hijos" in result['results'][1]['reason']
+        assert result['results'][0]['reason_code'] is None
+        assert result['results'][1]['reason_code'] == 'minimo_de_hijos'
+    
+    def test_calculate_batch_matches_calculate_complement(self):
+        """Test el lote sin excepciones da lo mismo que calculate_complement, que sigue lanzando."""
+        items = [
+            {
+                'pension_type': pension_type,
+                'start_date': start_date,
+                'num_children': 2,
+                'pension_amount': 1000.0
+            }
+            for pension_type in PensionType
+            for start_date in (date(2015, 6, 1), date(2020, 6, 15), date(2021, 6, 15))
+        ]
+        
+        result = self.service.calculate_batch(items)
+        
+        for item, data in zip(result['results'], items):
+            try:
+                expected = self.service.calculate_complement(**data)
+            except ValueError as e:
+                assert item['eligible'] == False
+                assert item['reason'] == str(e)
+                assert item['reason_code'] in ('fuera_de_rango', 'tipo_de_pension')
+            else:
+                assert item['amount'] == expected.amount
+                assert item['pension_with_complement'] == expected.pension_with_complement
+    
     def test_compare_progenitors_both_eligible(self):
         """Test comparación con ambos progenitores elegibles."""
         progenitor_1 = {
@@ -281,4 +436,29 @@ class TestComplementoPaternidadService:
         assert result['eligible_progenitor'] == 'María'
         assert result['progenitor_1']['eligible'] == True
         assert result['progenitor_2']['eligible'] == False
-        assert "Solo María cumple" in result['explanation']
\ No newline at end of file
+        assert "Solo María cumple" in result['explanation']
+    
+    def test_compare_progenitors_reason_code(self):
+        """Test el progenitor sin derecho lleva el motivo y su código."""
+        progenitor_1 = {
+            'name': 'María',
+            'pension_type': PensionType.JUBILACION,
+            'start_date': date(2020, 6, 15),
+            'num_children': 2,
+            'pension_amount': 1000.0
+        }
+        
+        progenitor_2 = {
+            'name': 'José',
+            'pension_type': PensionType.JUBILACION_ANTICIPADA,  # No válido en período 1
+            'start_date': date(2020, 6, 15),
+            'num_children': 2,
+            'pension_amount': 1200.0
+        }
+        
+        result = self.service.compare_progenitors(progenitor_1, progenitor_2)
+        
+        assert result['eligible_progenitor'] == 'María'
+        assert result['progenitor_1']['reason_code'] is None
+        assert result['progenitor_2']['reason_code'] == 'tipo_de_pension'
+        assert result['progenitor_2']['reason'].startswith("No cumple los criterios de elegibilidad")
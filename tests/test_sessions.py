@@ -0,0 +1,196 @@
+"""
+Tests para las sesiones WebSocket de cálculo interactivo (app/sessions.py).
+"""
+
+import asyncio
+import json
+from datetime import date
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+from app import create_app, routes
+from app.schemas import PensionType
+from app.services import ComplementoPaternidadService
+from app.sessions import WS_TRY_AGAIN_LATER, CalculationSession, SessionManager
+
+CONTEXT = {
+    "pension_type": "jubilacion",
+    "start_date": "2021-06-15",
+    "num_children": 2,
+    "pension_amount": 1000.0
+}
+
+class TestCalculationSession:
+    """Tests del contexto y la reutilización de una sesión."""
+
+    def setup_method(self):
+        self.service = ComplementoPaternidadService()
+        self.session = CalculationSession(self.service)
+
+    def test_partial_updates(self):
+        """Test los mensajes solo llevan lo que cambia y coinciden con el servicio."""
+        first = self.session.handle({"id": 1, "type": "calculate", "data": CONTEXT})
+        second = self.session.handle({"id": "b", "type": "calculate", "data": {"num_children": 3}})
+        expected = self.service.calculate_complement(PensionType.JUBILACION, date(2021, 6, 15), 3, 1000.0)
+
+        assert first["id"] == 1 and first["type"] == "calculate"
+        assert first["result"]["amount"] == 71.8
+        assert second["id"] == "b"
+        assert second["result"]["amount"] == expected.amount
+        assert second["result"]["period"] == "2"
+        assert second["rules_version"] == self.service.rules.version
+
+    def test_reuses_validation_and_result(self):
+        """Test un mensaje sin cambios no se valida ni se calcula de nuevo."""
+        self.session.handle({"id": 1, "type": "calculate", "data": CONTEXT})
+        repeated = self.session.handle({"id": 2, "type": "calculate", "data": {"num_children": 2}})
+
+        assert repeated["id"] == 2
+        assert self.session.counters["validations"] == 1
+        assert self.session.counters["validations_reused"] == 1
+        assert self.session.counters["results_reused"] == 1
+
+    def test_retroactive_shares_context(self):
+        """Test los atrasos usan el mismo contexto y solo añaden end_date."""
+        self.session.handle({"id": 1, "type": "calculate", "data": CONTEXT})
+        response = self.session.handle({"id": 2, "type": "retroactive", "data": {"end_date": "2022-06-15"}})
+
+        assert response["type"] == "retroactive"
+        assert response["result"]["months_calculated"] == 12
+        assert response["result"]["total_amount"] == pytest.approx(12 * 71.8)
+
+    def test_errors(self):
+        """Test errores de validación, de elegibilidad y de mensaje, con su id."""
+        invalid = self.session.handle({"id": 1, "type": "calculate", "data": {**CONTEXT, "num_children": 9}})
+        ineligible = self.session.handle({"id": 2, "type": "calculate", "data": {
+            "num_children": 2, "pension_type": "jubilacion_anticipada", "start_date": "2020-06-15"
+        }})
+        unknown = self.session.handle({"id": 3, "type": "borrar"})
+
+        assert (invalid["id"], invalid["status"]) == (1, 422)
+        assert invalid["detail"][0]["loc"] == ["num_children"]
+        assert (ineligible["id"], ineligible["status"]) == (2, 400)
+        assert ineligible["reason_code"] == "tipo_de_pension"
+        assert ineligible["detail"].startswith("No cumple los criterios de elegibilidad")
+        assert (unknown["id"], unknown["status"]) == (3, 400)
+
+    def test_reset(self):
+        """Test reset olvida el contexto."""
+        self.session.handle({"id": 1, "type": "calculate", "data": CONTEXT})
+        assert self.session.handle({"id": 2, "type": "reset"}) == {"id": 2, "type": "reset"}
+
+        response = self.session.handle({"id": 3, "type": "calculate", "data": {"num_children": 2}})
+
+        assert response["status"] == 422
+
+class FakeWebSocket:
+    """WebSocket de prueba: el cliente no lee las respuestas hasta que se le indica."""
+
+    def __init__(self, messages):
+        self.incoming = asyncio.Queue()
+        for message in messages:
+            self.incoming.put_nowait({"type": "websocket.receive", "text": json.dumps(message)})
+        self.sent = []
+        self.reading = asyncio.Event()
+
+    async def accept(self):
+        pass
+
+    async def close(self, code=1000, reason=None):
+        self.closed = (code, reason)
+        self.incoming.put_nowait({"type": "websocket.disconnect", "code": code})
+
+    async def receive(self):
+        return await self.incoming.get()
+
+    async def send_text(self, text):
+        frame = json.loads(text)
+        self.sent.append(frame)
+        if frame["type"] != "error":
+            await self.reading.wait()
+
+class TestSessionManager:
+    """Tests de los límites de las sesiones."""
+
+    def test_backpressure(self):
+        """Test con la cola llena los mensajes se rechazan con 429 sin calcularlos."""
+        async def scenario():
+            manager = SessionManager(ComplementoPaternidadService(), max_pending=2)
+            messages = [{"id": i, "type": "calculate", "data": CONTEXT} for i in range(1, 7)]
+            websocket = FakeWebSocket(messages)
+            serving = asyncio.create_task(manager.serve(websocket))
+            await asyncio.sleep(0.01)
+            rejected = [frame["id"] for frame in websocket.sent if frame["type"] == "error"]
+
+            websocket.reading.set()
+            await asyncio.sleep(0.01)
+            websocket.incoming.put_nowait({"type": "websocket.disconnect", "code": 1000})
+            await serving
+            return rejected, websocket.sent, manager.stats()
+
+        rejected, sent, stats = asyncio.run(scenario())
+
+        # Llegan todos de golpe: el 1 y el 2 caben en la cola
+        assert rejected == [3, 4, 5, 6]
+        assert all(frame["status"] == 429 for frame in sent if frame["type"] == "error")
+        assert [frame["id"] for frame in sent if frame["type"] == "calculate"] == [1, 2]
+        assert stats["rejected_busy"] == 4
+        assert stats["open"] == 0
+
+    def test_idle_timeout(self):
+        """Test una sesión sin mensajes se cierra."""
+        async def scenario():
+            manager = SessionManager(ComplementoPaternidadService(), idle_timeout=0.01)
+            websocket = FakeWebSocket([])
+            await manager.serve(websocket)
+            return websocket.closed, manager.stats()
+
+        closed, stats = asyncio.run(scenario())
+
+        assert closed[0] == 1000
+        assert stats["sessions_idle"] == 1
+
+class TestWebSocketAPI:
+    """Tests del endpoint /ws."""
+
+    @pytest.fixture
+    def client(self, monkeypatch):
+        manager = SessionManager(routes.service, max_sessions=1, max_message_bytes=512)
+        monkeypatch.setattr(routes, "sessions", manager)
+        with TestClient(create_app()) as client:
+            yield client
+
+    def test_session(self, client):
+        """Test una sesión con cálculo, cambio parcial y atrasos."""
+        with client.websocket_connect("/ws") as websocket:
+            websocket.send_json({"id": 1, "type": "calculate", "data": CONTEXT})
+            first = websocket.receive_json()
+            websocket.send_json({"id": 2, "type": "calculate", "data": {"pension_amount": 1200.0}})
+            second = websocket.receive_json()
+            websocket.send_json({"id": 3, "type": "retroactive", "data": {"end_date": "2021-09-15"}})
+            third = websocket.receive_json()
+
+        http = client.post("/calculate", json={**CONTEXT, "pension_amount": 1200.0}).json()
+        assert first["result"]["amount"] == 71.8
+        assert second["result"] == http
+        assert third["result"]["months_calculated"] == 3
+
+    def test_invalid_messages(self, client):
+        """Test JSON inválido y mensajes demasiado grandes no cierran la sesión."""
+        with client.websocket_connect("/ws") as websocket:
+            websocket.send_text("{no es json")
+            assert websocket.receive_json()["status"] == 400
+            websocket.send_text(json.dumps({"id": 1, "type": "calculate", "data": {"name": "x" * 600}}))
+            assert websocket.receive_json()["status"] == 413
+            websocket.send_json({"id": 2, "type": "calculate", "data": CONTEXT})
+            assert websocket.receive_json()["type"] == "calculate"
+
+    def test_session_limit(self, client):
+        """Test por encima de WS_MAX_SESSIONS la conexión se cierra con 1013."""
+        with client.websocket_connect("/ws"):
+            with client.websocket_connect("/ws") as rejected:
+                with pytest.raises(WebSocketDisconnect) as exc_info:
+                    rejected.receive_json()
+
+        assert exc_info.value.code == WS_TRY_AGAIN_LATER
+        assert routes.sessions.stats()["sessions_rejected"] == 1
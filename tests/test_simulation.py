@@ -0,0 +1,155 @@
+"""
+Tests para la simulación de cambios de reglas sobre la cartera (app/simulation.py).
+"""
+
+import random
+import pytest
+from fastapi.testclient import TestClient
+from app import create_app, routes
+from app.portfolio import PortfolioStore
+from app.rules import RulesError, get_rules
+from app.simulation import apply_overlay
+
+RECORDS = [
+    {"key": "p1-a", "pension_type": "jubilacion", "start_date": "2018-05-01", "num_children": 2, "pension_amount": 1000.0},
+    {"key": "p1-b", "pension_type": "jubilacion_anticipada", "start_date": "2019-03-01", "num_children": 3, "pension_amount": 1000.0},
+    {"key": "p2-a", "pension_type": "jubilacion", "start_date": "2021-02-04", "num_children": 2, "pension_amount": 1200.0},
+    {"key": "p2-b", "pension_type": "incapacidad", "start_date": "2024-06-01", "num_children": 4, "pension_amount": 900.0},
+]
+
+EARLY_RETIREMENT = {"periods": {"1": {"eligible_pension_types": [
+    "jubilacion", "jubilacion_anticipada", "viudedad", "incapacidad"
+]}}}
+
+@pytest.fixture
+def store(tmp_path):
+    store = PortfolioStore(str(tmp_path / "cartera.db"))
+    store.write(RECORDS, get_rules())
+    return store
+
+class TestApplyOverlay:
+    """Tests para la superposición sobre las reglas."""
+
+    def test_merges_period(self):
+        """Test solo cambia la clave indicada del período."""
+        rules = apply_overlay(get_rules(), {"periods": {"2": {"calculation": {"amount_per_child": 40.0}}}})
+
+        assert rules.version == "2021.02+simulación"
+        assert rules.periods[1].monthly_amount(2, 1000.0) == 80.0
+        assert rules.periods[0].monthly_amount(2, 1000.0) == 50.0
+        assert get_rules().periods[1].monthly_amount(2, 1000.0) == 71.8
+
+    def test_unknown_period(self):
+        """Test un período que no existe se rechaza."""
+        with pytest.raises(RulesError, match="Período desconocido"):
+            apply_overlay(get_rules(), {"periods": {"3": {"max_children": 5}}})
+
+    def test_invalid_result(self):
+        """Test las reglas resultantes se validan."""
+        with pytest.raises(RulesError):
+            apply_overlay(get_rules(), {"periods": {"1": {"max_children": 5}}})
+
+class TestPortfolioSimulate:
+    """Tests de la simulación sobre la cartera almacenada."""
+
+    def test_amount_per_child(self, store):
+        """Test subir el importe por hijo cambia solo el período 2."""
+        result = store.simulate({"periods": {"2": {"calculation": {"amount_per_child": 40.0}}}})
+
+        assert result["base_version"] == "2021.02"
+        assert result["changed"] == 2
+        assert result["delta"] == pytest.approx(8.2 + 16.4)
+        assert [record["key"] for record in result["sample"]] == ["p2-b", "p2-a"]
+        assert [(g["period"], g["pension_type"], g["changed"]) for g in result["groups"]] == [
+            ("2", "jubilacion", 1), ("2", "incapacidad", 1)
+        ]
+
+    def test_newly_eligible(self, store):
+        """Test admitir la jubilación anticipada en el período 1."""
+        result = store.simulate(EARLY_RETIREMENT, sample_size=1)
+
+        assert result["newly_eligible"] == 1
+        assert result["sample"] == [{
+            "key": "p1-b", "pension_type": "jubilacion_anticipada", "start_date": "2019-03-01", "num_children": 3,
+            "old_eligible": False, "new_eligible": True, "old_amount": 0.0, "new_amount": 100.0, "delta": 100.0
+        }]
+
+    def test_cap_lowered(self, store):
+        """Test bajar el tope de hijos computables reduce el coste."""
+        result = store.simulate({"periods": {"2": {"max_children": 3}}})
+
+        assert result["changed"] == 1
+        assert result["delta"] == -35.9
+
+    def test_empty_overlay_half_cents(self, tmp_path):
+        """Test sin cambios en las reglas no hay cambios, tampoco en importes de medio céntimo."""
+        rng = random.Random(47)
+        records = [{"key": "medio", "pension_type": "jubilacion", "start_date": "2018-03-01",
+                    "num_children": 4, "pension_amount": 1770.70}]
+        records += [
+            {"key": f"r{i}", "pension_type": "jubilacion", "start_date": "2018-03-01",
+             "num_children": rng.randint(2, 4), "pension_amount": rng.randint(30000, 300000) / 100}
+            for i in range(300)
+        ]
+        store = PortfolioStore(str(tmp_path / "cartera.db"))
+        store.write(records, get_rules())
+
+        result = store.simulate({})
+
+        assert store.get("medio")["amount"] == 265.61
+        assert result["changed"] == 0
+        assert result["delta"] == 0
+
+    def test_store_unchanged(self, store):
+        """Test simular no cambia la cartera ni sus reglas."""
+        store.simulate(EARLY_RETIREMENT)
+
+        assert store.get("p1-b")["eligible"] is False
+        assert store.applied_rules().version == "2021.02"
+
+    def test_empty_store(self, tmp_path):
+        """Test sin reglas aplicadas no se puede simular."""
+        with pytest.raises(RulesError, match="vacía"):
+            PortfolioStore(str(tmp_path / "vacia.db")).simulate(EARLY_RETIREMENT)
+
+class TestSimulateAPI:
+    """Tests del endpoint POST /portfolio/simulate."""
+
+    @pytest.fixture
+    def client(self, store, monkeypatch):
+        monkeypatch.setattr(routes, "portfolio", store)
+        with TestClient(create_app()) as client:
+            yield client
+
+    def test_simulate(self, client):
+        """Test la simulación devuelve totales y muestra."""
+        response = client.post("/portfolio/simulate", json={"overlay": EARLY_RETIREMENT})
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["rules_version"] == "2021.02+simulación"
+        assert data["new_total"] - data["old_total"] == pytest.approx(100.0)
+        assert data["sample"][0]["key"] == "p1-b"
+
+    def test_msgpack_overlay_not_expanded(self, client):
+        """Test una superposición con listas en MessagePack se valida igual que en JSON."""
+        msgpack = pytest.importorskip("msgpack")
+        body = {"overlay": {"rate_versions": [
+            {"id": "P1-2016", "effective_from": "2016-01-01"},
+            {"id": "P2-2021", "effective_from": "2021-02-04"},
+            {"id": "P2-2023", "effective_from": "2023-01-01"}
+        ]}}
+
+        json_response = client.post("/portfolio/simulate", json=body)
+        response = client.post(
+            "/portfolio/simulate", content=msgpack.packb(body), headers={"Content-Type": "application/msgpack"}
+        )
+
+        assert response.status_code == json_response.status_code == 200
+        assert response.json() == json_response.json()
+
+    def test_invalid_overlay(self, client):
+        """Test una superposición que da reglas inválidas -> 400."""
+        response = client.post("/portfolio/simulate", json={"overlay": {"periods": {"1": {"max_children": 5}}}})
+
+        assert response.status_code == 400
@@ -0,0 +1,155 @@
+"""
+Tests para el índice ordenado de fechas de inicio (app/start_index.py).
+"""
+
+import random
+import sqlite3
+from datetime import date, timedelta
+import pytest
+from fastapi.testclient import TestClient
+from app import create_app, routes
+from app.portfolio import PortfolioStore
+from app.rules import get_rules
+from app.schemas import PensionType, PeriodType
+from app.start_index import StartDateIndex
+
+def scan(rows, date_from, date_to):
+    """Totales por tipo recorriendo todas las filas."""
+    totals = {}
+    for pension_type, start_date, records, eligible, cents in rows:
+        if date_from <= date.fromisoformat(start_date) <= date_to:
+            counts = totals.setdefault(pension_type, [0, 0, 0])
+            counts[0] += records
+            counts[1] += eligible
+            counts[2] += cents
+    return {name: {"records": r, "eligible": e, "total_amount": c / 100} for name, (r, e, c) in totals.items() if r}
+
+class TestStartDateIndex:
+    """Tests de las consultas por rango y de la fusión por lotes."""
+
+    @pytest.fixture
+    def rows(self):
+        rng = random.Random(5)
+        return [
+            (rng.choice(list(PensionType)).value, (date(2016, 1, 1) + timedelta(days=rng.randrange(2000))).isoformat(),
+             1, rng.randint(0, 1), rng.randint(0, 20000))
+            for _ in range(2000)
+        ]
+
+    def test_matches_scan(self, rows):
+        """Test los rangos coinciden con recorrer todas las filas."""
+        index = StartDateIndex()
+        index.add(rows)
+
+        for date_from, date_to in [(date(2016, 1, 1), date(2030, 1, 1)), (date(2017, 3, 5), date(2018, 7, 1)),
+                                   (date(2019, 1, 1), date(2019, 1, 1)), (date(2025, 1, 1), date(2026, 1, 1))]:
+            assert index.query(date_from, date_to) == scan(rows, date_from, date_to)
+
+    def test_batched_merges_with_removals(self, rows):
+        """Test fundir en varios lotes, con retiradas, equivale a indexar el resultado."""
+        index = StartDateIndex()
+        index.add(rows[:1500])
+        index.merge()
+        removed = rows[:700]
+        index.add(rows[1500:])
+        index.add((t, d, -r, -e, -c) for t, d, r, e, c in removed)
+
+        assert index.merge() == 500 + 700
+        assert index.query() == scan(rows[700:], date.min, date.max)
+
+    def test_pension_type_and_open_range(self, rows):
+        """Test un tipo de pensión y un rango sin fecha final."""
+        index = StartDateIndex()
+        index.add(rows)
+
+        result = index.query(date(2018, 1, 1), pension_types=[PensionType.VIUDEDAD])
+
+        assert result == {"viudedad": scan(rows, date(2018, 1, 1), date.max)["viudedad"]}
+
+    def test_removed_dates_are_dropped(self):
+        """Test una fecha sin registros deja de ocupar el índice."""
+        index = StartDateIndex()
+        index.add([("jubilacion", "2020-01-01", 1, 1, 5000), ("jubilacion", "2020-01-02", 1, 1, 5000)])
+        index.merge()
+        index.add([("jubilacion", "2020-01-01", -1, -1, -5000)])
+
+        assert index.query() == {"jubilacion": {"records": 1, "eligible": 1, "total_amount": 50.0}}
+        assert index.stats() == {"jubilacion": {"dates": 1, "records": 1}}
+
+RECORDS = [
+    {"key": "a", "pension_type": "jubilacion", "start_date": "2018-05-01", "num_children": 2, "pension_amount": 1000.0},
+    {"key": "b", "pension_type": "viudedad", "start_date": "2020-12-15", "num_children": 3, "pension_amount": 800.0},
+    {"key": "c", "pension_type": "jubilacion", "start_date": "2021-02-04", "num_children": 2, "pension_amount": 1200.0},
+    {"key": "d", "pension_type": "incapacidad", "start_date": "2024-06-01", "num_children": 4, "pension_amount": 900.0},
+]
+
+@pytest.fixture
+def store(tmp_path):
+    store = PortfolioStore(str(tmp_path / "cartera.db"))
+    store.write(RECORDS, get_rules())
+    return store
+
+class TestPortfolioStartDates:
+    """Tests del índice de fechas de inicio de la cartera."""
+
+    def test_period_range(self, store):
+        """Test el período 1 restringe el rango a sus fechas."""
+        result = store.start_dates(period=PeriodType.PERIOD_1)
+
+        assert (result["date_from"], result["date_to"]) == (date(2016, 1, 1), date(2021, 2, 3))
+        assert [(g["pension_type"], g["records"], g["total_amount"]) for g in result["groups"]] == [
+            ("jubilacion", 1, 50.0), ("viudedad", 1, 80.0)
+        ]
+        assert result["total"] == {"records": 2, "eligible": 2, "total_amount": 130.0}
+
+    def test_follows_writes(self, store):
+        """Test las escrituras posteriores se funden en la siguiente consulta."""
+        store.start_dates()
+        store.write([{**RECORDS[0], "start_date": "2022-01-01"}, {**RECORDS[0], "key": "e"}], get_rules())
+
+        result = store.start_dates(date(2018, 1, 1), date(2018, 12, 31))
+
+        assert result["total"]["records"] == 1
+        assert store.start_dates()["total"]["records"] == 5
+
+    def test_other_process_writes(self, store):
+        """Test los cambios hechos con otra instancia también llegan."""
+        store.start_dates()
+        PortfolioStore(store.path).write([{**RECORDS[1], "key": "f"}], get_rules())
+
+        assert store.start_dates(pension_types=[PensionType.VIUDEDAD])["total"]["records"] == 2
+
+    def test_rebuild_after_trimmed_log(self, store):
+        """Test si el registro de cambios ya no tiene los pendientes, se reconstruye."""
+        store.start_dates()
+        store.write([{**RECORDS[1], "key": "f"}], get_rules())
+        with sqlite3.connect(store.path) as conn:
+            conn.execute("DELETE FROM calculations_log")
+        store.write([{**RECORDS[1], "key": "g"}], get_rules())
+
+        assert store.start_dates(pension_types=[PensionType.VIUDEDAD])["total"]["records"] == 3
+
+class TestPortfolioStartsAPI:
+    """Tests del endpoint GET /portfolio/starts."""
+
+    @pytest.fixture
+    def client(self, store, monkeypatch):
+        monkeypatch.setattr(routes, "portfolio", store)
+        with TestClient(create_app()) as client:
+            yield client
+
+    def test_range(self, client):
+        """Test rango de fechas y tipo de pensión."""
+        response = client.get("/portfolio/starts", params={
+            "date_from": "2018-01-01", "date_to": "2021-12-31", "pension_type": "jubilacion"
+        })
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["groups"] == [{"pension_type": "jubilacion", "records": 2, "eligible": 2, "total_amount": 121.8}]
+
+    def test_inverted_range(self, client):
+        """Test un rango invertido -> 400."""
+        response = client.get("/portfolio/starts", params={"date_from": "2021-01-01", "date_to": "2020-01-01"})
+
+        assert response.status_code == 400
@@ -0,0 +1,121 @@
+"""
+Tests para el generador de poblaciones sintéticas (app/synthetic.py).
+"""
+
+import csv
+import io
+import json
+import numpy as np
+import pytest
+from app.bulk import calculate_csv
+from app.engine import PENSION_TYPE_CODES
+from app.schemas import CalculationRequest, PensionType
+from app.synthetic import (
+    BLOCK_ROWS, CHILDREN_WEIGHTS, POPULATION_COLUMNS, TYPE_WEIGHTS, PopulationGenerator, write_population
+)
+
+class TestPopulationGenerator:
+    """Tests de la población en memoria."""
+
+    def test_same_seed_same_rows(self):
+        """Test la fila N no depende de la semilla ni del tamaño pedido."""
+        large = PopulationGenerator(7).columns(BLOCK_ROWS + 500)
+        small = PopulationGenerator(7).columns(BLOCK_ROWS + 10)
+        other = PopulationGenerator(8).columns(100)
+
+        for name in POPULATION_COLUMNS:
+            assert np.array_equal(large[name][:BLOCK_ROWS + 10], small[name])
+        assert not np.array_equal(large['pension_amount'][:100], other['pension_amount'])
+
+    def test_distributions(self):
+        """Test la mezcla de tipos e hijos y el rango de fechas."""
+        population = PopulationGenerator(1).columns(100000)
+
+        for pension_type, weight in TYPE_WEIGHTS.items():
+            share = np.mean(population['pension_type'] == PENSION_TYPE_CODES[pension_type])
+            assert share == pytest.approx(weight, abs=0.01)
+        for children, weight in CHILDREN_WEIGHTS.items():
+            # Los hogares copian los hijos del primer progenitor: misma mezcla
+            assert np.mean(population['num_children'] == children) == pytest.approx(weight, abs=0.01)
+        assert population['start_date'].min() >= np.datetime64('2016-01-01')
+        assert np.mean(population['start_date'] >= np.datetime64('2021-02-04')) == pytest.approx(0.49, abs=0.02)
+
+    def test_households(self):
+        """Test los hogares son parejas que comparten hijos."""
+        population = PopulationGenerator(3, household_rate=0.5).columns(20000)
+
+        shared = np.flatnonzero(population['household_id'] != population['id'])
+        assert len(shared) / 10000 == pytest.approx(0.5, abs=0.03)
+        assert np.all(shared % 2 == 1)
+        assert np.array_equal(population['household_id'][shared], shared - 1)
+        assert np.array_equal(population['num_children'][shared], population['num_children'][shared - 1])
+
+    def test_rows_are_valid(self):
+        """Test cada fila cumple los límites de CalculationRequest."""
+        population = PopulationGenerator(5).columns(300)
+        names = {code: pension_type for pension_type, code in PENSION_TYPE_CODES.items()}
+
+        for code, start_date, children, amount in zip(
+            population['pension_type'].tolist(), population['start_date'].tolist(),
+            population['num_children'].tolist(), population['pension_amount'].tolist()
+        ):
+            CalculationRequest(
+                pension_type=names[code], start_date=start_date, num_children=children, pension_amount=amount
+            )
+
+    def test_invalid_options(self):
+        """Test opciones fuera de rango."""
+        with pytest.raises(ValueError):
+            PopulationGenerator(household_rate=1.5)
+
+class TestWritePopulation:
+    """Tests de la escritura en streaming."""
+
+    def test_csv(self, tmp_path):
+        """Test el CSV se calcula con app/bulk.py sin filas inválidas."""
+        path = tmp_path / "poblacion.csv"
+        with open(path, "wb") as f:
+            assert write_population(PopulationGenerator(2), 1000, f, "csv") == 1000
+
+        rows = list(csv.DictReader(open(path, encoding="utf-8")))
+        assert list(rows[0]) == list(POPULATION_COLUMNS)
+        assert rows[0]["pension_type"] in {t.value for t in PensionType}
+        summary = calculate_csv(str(path), io.BytesIO(), workers=1)
+        assert (summary["rows"], summary["invalid"]) == (1000, 0)
+
+    def test_ndjson(self):
+        """Test NDJSON: un objeto por línea con las mismas filas que el CSV."""
+        ndjson, text = io.BytesIO(), io.BytesIO()
+        write_population(PopulationGenerator(2), 50, ndjson, "ndjson")
+        write_population(PopulationGenerator(2), 50, text, "csv")
+
+        records = [json.loads(line) for line in ndjson.getvalue().decode().splitlines()]
+        rows = list(csv.DictReader(io.StringIO(text.getvalue().decode())))
+        assert len(records) == 50
+        assert [(r["id"], r["start_date"], r["pension_amount"]) for r in records] == [
+            (int(r["id"]), r["start_date"], float(r["pension_amount"])) for r in rows
+        ]
+
+    def test_arrow_and_parquet(self, tmp_path):
+        """Test Arrow IPC y Parquet con las columnas que espera app/arrow.py."""
+        pa = pytest.importorskip("pyarrow")
+        pq = pytest.importorskip("pyarrow.parquet")
+        from app.arrow import calculate_ipc
+        from app.rules import get_rules
+
+        stream = io.BytesIO()
+        write_population(PopulationGenerator(4), BLOCK_ROWS + 3, stream, "arrow")
+        with open(tmp_path / "poblacion.parquet", "wb") as f:
+            write_population(PopulationGenerator(4), 100, f, "parquet")
+
+        table = pa.ipc.open_stream(stream.getvalue()).read_all()
+        assert table.num_rows == BLOCK_ROWS + 3
+        result = pa.ipc.open_stream(calculate_ipc(stream.getvalue(), get_rules(), "id")).read_all()
+        assert result.num_rows == table.num_rows
+        parquet = pq.read_table(tmp_path / "poblacion.parquet")
+        assert parquet.column("id").to_pylist() == table.column("id").to_pylist()[:100]
+
+    def test_unknown_format(self):
+        """Test un formato desconocido se rechaza."""
+        with pytest.raises(ValueError, match="Formato"):
+            write_population(PopulationGenerator(), 10, io.BytesIO(), "xml")
@@ -0,0 +1,79 @@
+"""
+Tests para las trazas por petición y la cabecera Server-Timing.
+"""
+
+import json
+import pytest
+from fastapi.testclient import TestClient
+from app import create_app
+from app.tracing import Trace, TraceFileExporter, TracingMiddleware, span, current_trace
+
+class TestTrace:
+    """Tests para Trace y span."""
+    
+    def test_span_outside_request_is_noop(self):
+        """Test span fuera de una petición no falla ni crea traza."""
+        with span("service"):
+            pass
+        
+        assert current_trace() is None
+    
+    def test_durations_and_server_timing(self):
+        """Test agregación de fases por nombre y formato de la cabecera."""
+        trace = Trace("GET /x")
+        trace.add("service", 1.0, 1.002)
+        trace.add("service", 2.0, 2.001)
+        trace.add("serialization", 3.0, 3.0005)
+        
+        assert trace.durations() == {"service": 3.0, "serialization": 0.5}
+        assert trace.server_timing(4.0) == "service;dur=3.0, serialization;dur=0.5, total;dur=4.0"
+    
+    def test_exporter_writes_trace_events(self, tmp_path):
+        """Test exportación en formato Trace Event."""
+        path = tmp_path / "trace.json"
+        exporter = TraceFileExporter(str(path))
+        trace = Trace("POST /compare")
+        trace.add("service", trace.start, trace.start + 0.001)
+        
+        exporter.export(trace, trace.start + 0.002)
+        exporter.export(trace, trace.start + 0.002)
+        
+        text = path.read_text()
+        assert text.startswith("[\n")
+        events = json.loads(text.rstrip().rstrip(",") + "]")
+        assert [e["name"] for e in events] == ["POST /compare", "service"] * 2
+        assert all(e["ph"] == "X" for e in events)
+        assert events[1]["dur"] == pytest.approx(1000.0, abs=0.2)
+        assert events[0]["tid"] != events[2]["tid"]
+
+class TestServerTiming:
+    """Tests de integración de la cabecera Server-Timing."""
+    
+    def test_compare_phases_in_header(self):
+        """Test /compare informa de sus fases en Server-Timing."""
+        client = TestClient(create_app())
+        payload = {
+            "progenitor_1": {
+                "name": "María", "pension_amount": 1000.0, "num_children": 2,
+                "start_date": "2021-06-15", "pension_type": "jubilacion"
+            },
+            "progenitor_2": {
+                "name": "José", "pension_amount": 1200.0, "num_children": 2,
+                "start_date": "2021-06-15", "pension_type": "jubilacion"
+            }
+        }
+        
+        response = client.post("/compare", json=payload)
+        
+        assert response.status_code == 200
+        phases = [entry.split(";")[0] for entry in response.headers["server-timing"].split(", ")]
+        assert phases == ["validation", "service", "response_model", "serialization", "total"]
+        assert response.json()["eligible_progenitor"] == "María"
+    
+    def test_health_has_total_only(self):
+        """Test endpoints sin fases solo informan del total."""
+        client = TestClient(create_app())
+        
+        response = client.get("/health")
+        
+        assert response.headers["server-timing"].startswith("total;dur=")
@@ -7,7 +7,8 @@ from datetime import date
 from app.utils import (
     date_to_period, calculate_months_between_dates, format_currency,
     validate_date_range, is_valid_pension_date, calculate_annual_amount,
-    normalize_pension_type, get_period_description, round_currency
+    normalize_pension_type, get_period_description, round_currency,
+    add_months, count_month_steps, encode_cursor, decode_cursor
 )
 from app.schemas import PeriodType
 
@@ -144,4 +145,29 @@ class TestUtils:
     def test_round_currency_exact(self):
         """Test redondeo de moneda exacta."""
         result = round_currency(123.45)
-        assert result == 123.45
\ No newline at end of file
+        assert result == 123.45
+    
+    def test_add_months_end_of_month(self):
+        """Test desplazamiento de meses ajustando al último día."""
+        assert add_months(date(2021, 1, 31), 1) == date(2021, 2, 28)
+        assert add_months(date(2020, 1, 31), 1) == date(2020, 2, 29)
+        assert add_months(date(2021, 11, 15), 3) == date(2022, 2, 15)
+    
+    def test_count_month_steps(self):
+        """Test conteo de pasos mensuales antes de la fecha de fin."""
+        assert count_month_steps(date(2021, 5, 1), date(2021, 8, 1)) == 3
+        assert count_month_steps(date(2021, 5, 15), date(2021, 8, 16)) == 4
+        assert count_month_steps(date(2021, 8, 1), date(2021, 5, 1)) == 0
+    
+    def test_cursor_roundtrip(self):
+        """Test codificación y decodificación del cursor."""
+        cursor = encode_cursor(42, "abc")
+        assert decode_cursor(cursor, "abc") == 42
+    
+    def test_cursor_other_query(self):
+        """Test cursor usado con otra consulta."""
+        cursor = encode_cursor(42, "abc")
+        with pytest.raises(ValueError):
+            decode_cursor(cursor, "xyz")
+        with pytest.raises(ValueError):
+            decode_cursor("no-es-un-cursor", "abc")